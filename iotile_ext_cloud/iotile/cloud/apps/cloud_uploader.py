@@ -10,6 +10,7 @@ from iotile.core.hw import IOTileApp
 from iotile.core.hw.reports import SignedListReport
 from iotile.core.utilities.console import ProgressBar
 from iotile.cloud import IOTileCloud, device_id_to_slug
+from iotile.cloud.report_uploader import StreamingReportUploader, UploadCheckpoint
 from typedargs.annotate import docannotate, context
 
 
@@ -22,8 +23,7 @@ class CloudUploader(IOTileApp):
     will start a loop that:
         - acknowledges old data from the device that has safely reched iotile.cloud
         - triggers the device to send all of its data
-        - waits for all data to be sent
-        - uploads all reports to iotile.cloud
+        - uploads each report to iotile.cloud as soon as it is received
 
     Args:
         hw (HardwareManager): A HardwareManager instance connected to a
@@ -71,6 +71,39 @@ class CloudUploader(IOTileApp):
         comm_status, = struct.unpack("<18xBx", res['buffer'])
         return comm_status == 0
 
+    def _iter_streamed_reports(self, timeout=60*10.0):
+        """Yield reports as they are received until all streamers are finished.
+
+        Streamers are polled in order until we find one that does not exist.
+        Any reports that arrive while we are waiting are yielded immediately
+        so that callers never need to hold all of them at once.
+        """
+
+        start = time.time()
+        index = 0
+
+        while True:
+            for report in self._hw.iter_reports():
+                yield report
+
+            if (time.time() - start) > timeout:
+                raise HardwareError("Device took too long to stream data", timeout_seconds=timeout)
+
+            status = self._streamer_finished(index)
+            if status is None:
+                self.logger.info("No streamer %d, all streamers finished", index)
+                break
+            elif status is True:
+                self.logger.info("Streamer %d finished", index)
+                index += 1
+                continue
+
+            self.logger.info("Waiting for streamer %d", index)
+            time.sleep(1.0)
+
+        for report in self._hw.iter_reports():
+            yield report
+
     def _wait_streamers_finished(self, timeout=60*10.0):
         start = time.time()
 
@@ -141,19 +174,29 @@ class CloudUploader(IOTileApp):
             list of IOTileReport: The list of reports received from the device.
         """
 
+        self._start_streaming(trigger, acknowledge, force)
+
+        reports = [x for x in self._iter_streamed_reports()]
+        signed_reports = [x for x in reports if isinstance(x, SignedListReport)]
+
+        self.logger.info("Received %d signed reports, ignored %d realtime reports", len(signed_reports), len(reports) - len(signed_reports))
+
+        return signed_reports
+
+    def _start_streaming(self, trigger, acknowledge, force, checkpoint=None):
+        """Acknowledge old data and enable streaming from the device.
+
+        If a checkpoint is passed, any streamer that has been uploaded past
+        what the cloud reports is acknowledged from the checkpoint instead so
+        that the device does not resend readings that were already uploaded.
+        """
+
         device_id = self._get_uuid()
         slug = device_id_to_slug(device_id)
 
         self.logger.info("Connected to device 0x%X", device_id)
 
-        streamer_acks = []
-        if force is not None:
-            for index, value in viewitems(force):
-                force_ack = False
-                if isinstance(value, tuple):
-                    value, force_ack = value
-
-                streamer_acks.append((index, value, force_ack))
+        streamer_acks = {}
 
         if acknowledge:
             self.logger.info("Getting acknowledgements from cloud for slug %s", slug)
@@ -167,14 +210,27 @@ class CloudUploader(IOTileApp):
                 last_id = ack['last_id']
 
                 if index <= 0xFF:
-                    streamer_acks.append((index, last_id, False))
+                    streamer_acks[index] = (last_id, False)
 
+            if checkpoint is not None:
+                for index, last_id in viewitems(checkpoint.streamers(device_id)):
+                    if index <= 0xFF and last_id > streamer_acks.get(index, (0, False))[0]:
+                        self.logger.info("Resuming streamer %d from checkpoint at id %d", index, last_id)
+                        streamer_acks[index] = (last_id, False)
         else:
             self.logger.info("Not acknowledging readings from cloud per user request")
 
-        for index, last_id, force in streamer_acks:
-            self.logger.info("Acknowledging highest ID %d for streamer %d (force=%s)", last_id, index, force)
-            self._ack_streamer(index, last_id, force=force)
+        if force is not None:
+            for index, value in viewitems(force):
+                force_ack = False
+                if isinstance(value, tuple):
+                    value, force_ack = value
+
+                streamer_acks[index] = (value, force_ack)
+
+        for index, (last_id, force_ack) in sorted(viewitems(streamer_acks)):
+            self.logger.info("Acknowledging highest ID %d for streamer %d (force=%s)", last_id, index, force_ack)
+            self._ack_streamer(index, last_id, force=force_ack)
 
         # Configure Downloader to not break up the report
         self.set_report_size()  #Set to max report size
@@ -184,17 +240,8 @@ class CloudUploader(IOTileApp):
             self.logger.info("Explicitly triggering streamer %d", trigger)
             self._trigger_streamer(trigger)
 
-        self._wait_streamers_finished()
-
-        reports = [x for x in self._hw.iter_reports()]
-        signed_reports = [x for x in reports if isinstance(x, SignedListReport)]
-
-        self.logger.info("Received %d signed reports, ignored %d realtime reports", len(signed_reports), len(reports) - len(signed_reports))
-
-        return signed_reports
-
     @docannotate
-    def upload(self, trigger=None, acknowledge=True):
+    def upload(self, trigger=None, acknowledge=True, workers=4, max_pending=8, checkpoint=None):
         """Synchronously get all data from the device and upload it to iotile.cloud.
 
         This function will:
@@ -204,8 +251,17 @@ class CloudUploader(IOTileApp):
           when we enable_streaming.  However, if you need to manually trigger a
           streamer, you can specify that using trigger=X where X is in the index
           of the streamer to trigger.
-        - wait for all data to be received from the device.
-        - upload all reports to iotile.cloud securely.
+        - upload each report to iotile.cloud securely as soon as it is received.
+
+        Reports are uploaded concurrently by a pool of workers while the device
+        is still streaming.  At most max_pending reports are held in memory at
+        once, so devices with a large amount of stored data can be uploaded
+        without buffering everything first.
+
+        If you pass a checkpoint file, the highest reading id that has been
+        uploaded for each streamer is saved there as uploads complete.  If an
+        upload is interrupted, calling upload again with the same checkpoint
+        will skip readings that were already uploaded.
 
         If you want to see details about what is happening, you can capture the
         logging output.
@@ -220,13 +276,28 @@ class CloudUploader(IOTileApp):
             acknowledge (bool): If you don't want to send all cloud acknowledgements
                 down to the device before enabling streaming, you can pass False.  The
                 default behavior is True.
+            workers (int): The number of reports to upload concurrently.  The
+                default is 4.
+            max_pending (int): The maximum number of received reports waiting
+                to be uploaded.  The default is 8.
+            checkpoint (str): Optional path to a file used to save upload progress
+                so that interrupted uploads can be resumed.
         """
 
-        signed_reports = self.download(trigger, acknowledge)
+        upload_checkpoint = UploadCheckpoint(checkpoint)
+        self._start_streaming(trigger, acknowledge, None, upload_checkpoint)
+
+        ignored = 0
+        with StreamingReportUploader(self._cloud, workers, max_pending, upload_checkpoint) as uploader:
+            for report in self._iter_streamed_reports():
+                if not isinstance(report, SignedListReport):
+                    ignored += 1
+                    continue
+
+                uploader.put(report)
 
-        for report in signed_reports:
-            self.logger.info("Uploading report with ids in (%d, %d)", report.lowest_id, report.highest_id)
-            self._cloud.upload_report(report)
+        self.logger.info("Uploaded %d signed reports (%d new readings), skipped %d already uploaded, ignored %d realtime reports",
+                         uploader.uploaded, uploader.accepted_readings, uploader.skipped, ignored)
 
     @docannotate
     def get_report_size(self):
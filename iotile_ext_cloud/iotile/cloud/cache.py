@@ -0,0 +1,85 @@
+"""A small thread-safe cache for metadata queried from iotile.cloud."""
+
+import threading
+from copy import deepcopy
+from monotonic import monotonic
+from future.utils import viewitems
+
+_MISSING = object()
+
+
+class TTLCache(object):
+    """A dictionary whose entries expire a fixed time after they are stored.
+
+    Values are copied on the way in and out so that callers are free to
+    modify what they get back without corrupting the cache.  A ttl of 0
+    disables the cache entirely.
+
+    Args:
+        ttl (float): The number of seconds that an entry stays valid.
+        clock (callable): Optional function returning the current time in
+            seconds.  Defaults to a monotonic clock.
+    """
+
+    def __init__(self, ttl, clock=monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key, default=None):
+        """Get a cached value if it has not expired.
+
+        Args:
+            key (object): The key to look up.
+            default (object): The value to return if there is no valid entry.
+
+        Returns:
+            object: The cached value or default.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            expiration, value = entry
+            if expiration <= self._clock():
+                del self._entries[key]
+                return default
+
+            return deepcopy(value)
+
+    def set(self, key, value):
+        """Store a value in the cache.
+
+        Args:
+            key (object): The key to store the value under.
+            value (object): The value to store.
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, deepcopy(value))
+
+    def invalidate(self, match=None):
+        """Remove entries from the cache.
+
+        Args:
+            match (callable): Optional function called with each key that
+                returns True if that entry should be removed.  If not given,
+                the entire cache is cleared.
+        """
+
+        with self._lock:
+            if match is None:
+                self._entries = {}
+                return
+
+            self._entries = {key: value for key, value in viewitems(self._entries) if not match(key)}
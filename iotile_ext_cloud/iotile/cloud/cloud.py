@@ -2,10 +2,13 @@
 """
 
 from builtins import input
+from future.utils import viewitems
 from io import BytesIO
 import getpass
+import threading
 import datetime
 import requests
+from requests.adapters import HTTPAdapter
 from dateutil.tz import tzutc
 import dateutil.parser
 from collections import namedtuple
@@ -17,7 +20,8 @@ from iotile.core.dev.config import ConfigManager
 from iotile.core.hw.reports import IndividualReadingReport, SignedListReport, FlexibleDictionaryReport
 from iotile.core.exceptions import ArgumentError, ExternalError, DataError
 from iotile.core.utilities.typedargs import context, param, return_type, annotated, type_system
-from .utilities import device_id_to_slug, fleet_id_to_slug
+from .utilities import device_id_to_slug, device_slug_to_id, fleet_id_to_slug
+from .cache import TTLCache
 
 Acknowledgement = namedtuple("Acknowledgement", ["index", "ack", "selector"])
 
@@ -34,23 +38,43 @@ class IOTileCloud(object):
     user will be prompted for a password on the command line IF
     the session is interactive, otherwise __init__ will fail.
 
+    Device metadata like device info, streamer acknowledgements and
+    whitelists can be cached for cache_ttl seconds so that repeated queries
+    for the same device do not each cost a round trip.  The cache is shared
+    between all IOTileCloud objects talking to the same domain with the same
+    credentials in this process.  Changes made through IOTileCloud invalidate the affected
+    entries automatically and invalidate_cache() can be used to drop
+    entries explicitly.
+
     Args:
         domain (str): Optional server domain.  If not specified,
             the default will be whatever is stored in the registry
         username (str): Optional username to force the user to use
             if they don't have stored credentials
+        cache_ttl (float): Optional number of seconds to cache metadata.
+            If not specified, the cloud:cache-ttl config variable is used,
+            which defaults to 0, disabling the cache.
     """
 
     DEVICE_TOKEN_TYPE = 'a-jwt'
+    MAX_CONNECTIONS = 8
+    PAGE_SIZE = 100
+
+    _shared_caches = {}
+    _shared_caches_lock = threading.Lock()
 
-    def __init__(self, domain=None, username=None):
+    def __init__(self, domain=None, username=None, cache_ttl=None):
         reg = ComponentRegistry()
         conf = ConfigManager()
 
         if domain is None:
             domain = conf.get('cloud:server')
 
+        if cache_ttl is None:
+            cache_ttl = conf.get('cloud:cache-ttl')
+
         self.api = Api(domain=domain)
+        self._session = self._create_session()
 
         try:
             token = reg.get_config('arch:cloud_token')
@@ -74,6 +98,112 @@ class IOTileCloud(object):
         self.token = self.api.token
         self.token_type = self.api.token_type
 
+        # Cached metadata depends on who fetched it, so only share the cache
+        # between objects authenticated with the same token
+        self._cache = self._get_shared_cache(domain, self.token, cache_ttl)
+
+    @classmethod
+    def _get_shared_cache(cls, domain, token, cache_ttl):
+        with cls._shared_caches_lock:
+            key = (domain, token, cache_ttl)
+            if key not in cls._shared_caches:
+                cls._shared_caches[key] = TTLCache(cache_ttl)
+
+            return cls._shared_caches[key]
+
+    def _create_session(self):
+        """Create a pooled HTTP session that can be shared between threads.
+
+        If our Api object has its own session, we reuse it so that all REST
+        calls share the same connection pool.
+        """
+
+        session = getattr(self.api, 'session', None)
+        if session is None:
+            session = requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=self.MAX_CONNECTIONS, pool_maxsize=self.MAX_CONNECTIONS)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def _iter_pages(self, resource, **filters):
+        """Iterate over all results of a paginated list api."""
+
+        page = 1
+        seen = 0
+
+        while True:
+            resp = resource.get(page=page, page_size=self.PAGE_SIZE, **filters)
+            results = resp.get('results', [])
+
+            for result in results:
+                yield result
+
+            seen += len(results)
+            if len(results) == 0 or seen >= resp.get('count', 0):
+                break
+
+            page += 1
+
+    def _list_all(self, resource, max_requests=None, **filters):
+        """List all results of a paginated list api if it is cheap enough.
+
+        Args:
+            resource: The api resource to list.
+            max_requests (int): Optional maximum number of requests that
+                listing everything may take.  The first page tells us how
+                many results there are, so at most one request is made if
+                listing would take more than this.
+
+        Returns:
+            list: All of the results or None if there were more than
+            max_requests pages of them.
+        """
+
+        results = []
+        page = 1
+
+        while True:
+            resp = resource.get(page=page, page_size=self.PAGE_SIZE, **filters)
+            page_results = resp.get('results', [])
+            results.extend(page_results)
+
+            count = resp.get('count', 0)
+            if len(page_results) == 0 or len(results) >= count:
+                return results
+
+            if page == 1 and max_requests is not None:
+                pages = (count + self.PAGE_SIZE - 1) // self.PAGE_SIZE
+                if pages > max_requests:
+                    return None
+
+            page += 1
+
+    @classmethod
+    def _unique_missing(cls, device_ids, found):
+        missing = []
+        for device_id in device_ids:
+            if device_id not in found and device_id not in missing:
+                missing.append(device_id)
+
+        return missing
+
+    def invalidate_cache(self, device_id=None):
+        """Drop cached metadata so that it is queried again from the cloud.
+
+        Args:
+            device_id (int): Optional device whose cached information should
+                be dropped.  If not given, the entire cache is cleared.
+        """
+
+        if device_id is None:
+            self._cache.invalidate()
+            return
+
+        self._cache.invalidate(lambda key: key[0] != 'fleet' and key[1] == device_id)
+
     @property
     def refresh_required(self):
         return self.token_type == 'jwt'
@@ -90,6 +220,10 @@ class IOTileCloud(object):
         """Query information about a device by its device id
         """
 
+        dev = self._cache.get(('device', device_id))
+        if dev is not None:
+            return dev
+
         slug = device_id_to_slug(device_id)
 
         try:
@@ -97,8 +231,71 @@ class IOTileCloud(object):
         except HttpNotFoundError:
             raise ArgumentError("Device does not exist in cloud database", device_id=device_id, slug=slug)
 
+        self._cache.set(('device', device_id), dev)
         return dev
 
+    def devices_info(self, device_ids=None, project_id=None):
+        """Query information about many devices at once.
+
+        If device_ids is given, only the devices that are not already
+        cached are queried.  They are found by listing the visible devices a
+        page at a time if that takes fewer requests than querying each of
+        them individually, otherwise each one is queried by its slug, so the
+        cost never grows with the size of the organization.  Every device
+        that is returned is cached for later calls to device_info.
+
+        Args:
+            device_ids (list of int): Optional list of the devices that we
+                want information about.  If not given, all devices are returned.
+            project_id (str): Optional project to restrict the query to.
+
+        Returns:
+            dict: A map of device id to the information about that device.
+
+        Raises:
+            ArgumentError: If any of the requested devices does not exist.
+        """
+
+        filters = {}
+        if project_id:
+            filters['project'] = project_id
+
+        if device_ids is None:
+            devices = {}
+            for dev in self._iter_pages(self.api.device, **filters):
+                self._cache.set(('device', dev['id']), dev)
+                devices[dev['id']] = dev
+
+            return devices
+
+        devices = {}
+        for device_id in device_ids:
+            dev = self._cache.get(('device', device_id))
+            if dev is not None:
+                devices[device_id] = dev
+
+        missing = self._unique_missing(device_ids, devices)
+        if len(missing) == 0:
+            return devices
+
+        listed = self._list_all(self.api.device, max_requests=len(missing), **filters)
+        if listed is not None:
+            for dev in listed:
+                self._cache.set(('device', dev['id']), dev)
+                if dev['id'] in missing:
+                    devices[dev['id']] = dev
+
+            missing = [x for x in missing if x not in devices]
+            if missing:
+                raise ArgumentError("Devices do not exist in cloud database", device_ids=missing)
+
+            return devices
+
+        for device_id in missing:
+            devices[device_id] = self.device_info(device_id)
+
+        return devices
+
     @param("fleet_id", "integer", desc="Id of the fleet we want to retrieve")
     @return_type("basic_dict")
     def get_fleet(self, fleet_id):
@@ -106,20 +303,32 @@ class IOTileCloud(object):
 
         api = self.api
 
+        fleet = self._cache.get(('fleet', fleet_id))
+        if fleet is not None:
+            return fleet
+
         slug = fleet_id_to_slug(fleet_id)
 
         try:
             results = api.fleet(slug).devices.get()
             entries = results.get('results', [])
-            return {entry.pop('device'): entry for entry in entries}
+            fleet = {entry.pop('device'): entry for entry in entries}
         except HttpNotFoundError:
             raise ArgumentError("Fleet does not exist in cloud database", fleet_id=fleet_id, slug=slug)
 
+        self._cache.set(('fleet', fleet_id), fleet)
+        return fleet
+
     @param("device_id", "integer", desc="Id of the device whose fleet we want to retrieve")
     @return_type("basic_dict")
     def get_whitelist(self, device_id):
         """ Returns the whitelist associated with the given device_id if any"""
         api = self.api
+
+        whitelist = self._cache.get(('whitelist', device_id))
+        if whitelist is not None:
+            return whitelist
+
         slug = device_id_to_slug(device_id)
         try:
             fleets = api.fleet.get(device=slug)['results']
@@ -144,6 +353,7 @@ class IOTileCloud(object):
         if not out:
             raise ExternalError("No device to manage in these fleets !")
 
+        self._cache.set(('whitelist', device_id), out)
         return out
 
     @param("max_slop", "integer", desc="Optional max time difference value")
@@ -188,6 +398,7 @@ class IOTileCloud(object):
 
         slug = device_id_to_slug(device_id)
         patch = {'sg': new_sg}
+        self.invalidate_cache(device_id)
 
         try:
             self.api.device(slug).patch(patch)
@@ -222,6 +433,7 @@ class IOTileCloud(object):
 
         slug = device_id_to_slug(device_id)
         patch = {'template': new_template}
+        self.invalidate_cache(device_id)
 
         try:
             self.api.device(slug).patch(patch, staff=1)
@@ -285,6 +497,7 @@ class IOTileCloud(object):
         slug = device_id_to_slug(device_id)
 
         payload = {'clean_streams': clean}
+        self.invalidate_cache(device_id)
 
         try:
             self.api.device(slug).unclaim.post(payload)
@@ -306,6 +519,9 @@ class IOTileCloud(object):
         The filename of the uploaded report will have an extension set based
         on the type of report that you are uploading.
 
+        The upload is sent through a persistent, pooled HTTP session so it is
+        safe to call this method from multiple threads at once.
+
         Args:
             report (IOTileReport): The report that you want to upload.  This should
                 not be an IndividualReadingReport.
@@ -333,9 +549,13 @@ class IOTileCloud(object):
         authorization_str = '{0} {1}'.format(self.token_type, self.token)
         headers['Authorization'] = authorization_str
 
-        resp = requests.post(resource.url(), files=payload, headers=headers, params={'timestamp': timestamp})
+        resp = self._session.post(resource.url(), files=payload, headers=headers, params={'timestamp': timestamp})
 
         count = resource._process_response(resp)['count']
+
+        if report.origin is not None:
+            self._cache.invalidate(lambda key: key == ('acks', report.origin))
+
         return count
 
     def highest_acknowledged(self, device_id, streamer):
@@ -350,6 +570,12 @@ class IOTileCloud(object):
             int: The highest reading id that has been acknowledged by the cloud
         """
 
+        acknowledgements = self._cache.get(('acks', device_id))
+        if acknowledgements is not None:
+            for acknowledgement in acknowledgements:
+                if acknowledgement.index == streamer:
+                    return acknowledgement.ack
+
         slug = self._build_streamer_slug(device_id, streamer)
 
         try:
@@ -374,6 +600,10 @@ class IOTileCloud(object):
                 record in the cloud.
         """
 
+        acknowledgements = self._cache.get(('acks', device_id))
+        if acknowledgements is not None:
+            return acknowledgements
+
         slug = device_id_to_slug(device_id)
 
         try:
@@ -383,18 +613,78 @@ class IOTileCloud(object):
 
         results = data.get('results', [])
 
-        acknowledgements = []
+        acknowledgements = [self._build_acknowledgement(result) for result in results]
 
-        for result in results:
-            acknowledgement = Acknowledgement(
-                result.get("index"),
-                result.get("last_id"),
-                result.get("selector")
-            )
+        self._cache.set(('acks', device_id), acknowledgements)
+        return acknowledgements
 
-            acknowledgements.append(acknowledgement)
+    def devices_acknowledgements(self, device_ids=None):
+        """Get all streamer acknowledgements for many devices at once.
 
-        return acknowledgements
+        If device_ids is given, only the devices that are not already
+        cached are queried.  Their streamers are found by listing all
+        visible streamers a page at a time if that takes fewer requests
+        than querying each device individually, otherwise the streamers of
+        each device are queried by its slug.  The results are cached for
+        later calls to device_acknowledgements and highest_acknowledged.
+
+        Args:
+            device_ids (list of int): Optional list of the devices that we
+                want acknowledgements for.  If not given, all visible devices
+                are returned.
+
+        Returns:
+            dict: A map of device id to a list of Acknowledgement namedtuples.
+            Devices without any streamers map to an empty list.
+        """
+
+        found = {}
+        max_requests = None
+
+        if device_ids is not None:
+            for device_id in device_ids:
+                acknowledgements = self._cache.get(('acks', device_id))
+                if acknowledgements is not None:
+                    found[device_id] = acknowledgements
+
+            missing = self._unique_missing(device_ids, found)
+            if len(missing) == 0:
+                return found
+
+            max_requests = len(missing)
+
+        try:
+            listed = self._list_all(self.api.streamer, max_requests=max_requests)
+        except RestHttpBaseException as exc:
+            raise ArgumentError("Could not get information for streamers", err=str(exc))
+
+        if listed is None:
+            for device_id in missing:
+                found[device_id] = self.device_acknowledgements(device_id)
+
+            return found
+
+        devices = {}
+        for result in listed:
+            device_id = device_slug_to_id(result['device'])
+            devices.setdefault(device_id, []).append(self._build_acknowledgement(result))
+
+        if device_ids is not None:
+            devices = {device_id: devices.get(device_id, []) for device_id in missing}
+
+        for device_id, acknowledgements in viewitems(devices):
+            self._cache.set(('acks', device_id), acknowledgements)
+
+        found.update(devices)
+        return found
+
+    @classmethod
+    def _build_acknowledgement(cls, result):
+        return Acknowledgement(
+            result.get("index"),
+            result.get("last_id"),
+            result.get("selector")
+        )
 
     @annotated
     def refresh_token(self):
@@ -68,5 +68,6 @@ def get_variables():
 
     conf_vars = []
     conf_vars.append(["server", "string", "The domain name to talk to for iotile.cloud operations (including https:// prefix)", 'https://iotile.cloud'])
+    conf_vars.append(["cache-ttl", "float", "The number of seconds to cache device metadata queried from iotile.cloud, 0 disables caching", '0'])
 
     return prefix, conf_vars
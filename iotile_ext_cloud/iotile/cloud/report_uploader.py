@@ -0,0 +1,309 @@
+"""A pipelined uploader that sends reports to iotile.cloud as they arrive."""
+
+import os
+import platform
+import json
+import logging
+import threading
+from collections import deque
+from future.utils import viewitems
+from queue import Queue
+from iotile.core.exceptions import ArgumentError, ExternalError
+
+
+class UploadCheckpoint(object):
+    """The highest reading id that has been safely uploaded for each streamer.
+
+    A checkpoint is kept in memory and optionally persisted to a json file
+    every time it advances so that an interrupted upload can be resumed
+    without resending readings that the cloud has already accepted.
+
+    Args:
+        path (str): Optional path to a json file used to persist the
+            checkpoint.  If the file exists, it is loaded.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._highest = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as infile:
+                data = json.load(infile)
+
+            for key, value in viewitems(data):
+                device_id, streamer = [int(x) for x in key.split('/')]
+                self._highest[(device_id, streamer)] = value
+
+    def get(self, device_id, streamer):
+        """Get the highest uploaded reading id for a streamer.
+
+        Args:
+            device_id (int): The device that the streamer is on.
+            streamer (int): The index of the streamer.
+
+        Returns:
+            int: The highest reading id or 0 if nothing has been uploaded.
+        """
+
+        with self._lock:
+            return self._highest.get((device_id, streamer), 0)
+
+    def streamers(self, device_id):
+        """Get all checkpointed streamers for a device.
+
+        Args:
+            device_id (int): The device that we are interested in.
+
+        Returns:
+            dict: A map of streamer index to highest uploaded reading id.
+        """
+
+        with self._lock:
+            return {streamer: value for (dev, streamer), value in viewitems(self._highest) if dev == device_id}
+
+    def advance(self, device_id, streamer, highest_id):
+        """Record that all readings up to highest_id have been uploaded.
+
+        The checkpoint never moves backwards.
+
+        Args:
+            device_id (int): The device that the streamer is on.
+            streamer (int): The index of the streamer.
+            highest_id (int): The highest reading id that has been uploaded.
+        """
+
+        with self._lock:
+            key = (device_id, streamer)
+            if highest_id <= self._highest.get(key, 0):
+                return
+
+            self._highest[key] = highest_id
+            self._save()
+
+    def _save(self):
+        if self.path is None:
+            return
+
+        data = {"{}/{}".format(dev, streamer): value for (dev, streamer), value in viewitems(self._highest)}
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as outfile:
+            json.dump(data, outfile)
+
+        _replace_file(tmp_path, self.path)
+
+
+def _replace_file(src, dest):
+    """Atomically replace dest with src."""
+
+    if hasattr(os, 'replace'):
+        os.replace(src, dest)  #pylint:disable=no-member;Only on python 3
+        return
+
+    # On python 2, rename already replaces atomically except on Windows
+    if platform.system() == 'Windows' and os.path.exists(dest):
+        os.remove(dest)
+
+    os.rename(src, dest)
+
+
+class _PendingReport(object):
+    """Internal bookkeeping for a report that has been queued for upload."""
+
+    def __init__(self, report):
+        self.report = report
+        self.done = False
+
+
+class StreamingReportUploader(object):
+    """Upload reports to iotile.cloud concurrently as they are received.
+
+    Reports are passed in one at a time using put() and handed to a fixed
+    pool of worker threads through a bounded queue, so at most max_pending
+    reports are held in memory at once and put() blocks while the workers
+    catch up.  Each worker uploads through the shared HTTP session of the
+    IOTileCloud object.
+
+    SignedListReports are tracked per streamer so that the checkpoint only
+    advances once every earlier report from that streamer has been
+    uploaded, even though uploads can finish out of order.  Reports that are
+    entirely below the checkpoint are skipped.  If a report from a streamer
+    fails to upload, the checkpoint for that streamer stops advancing and
+    later reports from it are still uploaded but no longer tracked, so that
+    a resumed upload starts again from the failed report.  The errors are
+    raised from finish().
+
+    Args:
+        cloud (IOTileCloud): The cloud connection to upload through.
+        max_workers (int): The number of concurrent uploads.
+        max_pending (int): The maximum number of reports waiting to be
+            uploaded before put() blocks.
+        checkpoint (UploadCheckpoint): Optional checkpoint to resume from
+            and update as reports are uploaded.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, cloud, max_workers=4, max_pending=8, checkpoint=None):
+        if max_workers < 1:
+            raise ArgumentError("You must have at least one upload worker", max_workers=max_workers)
+
+        if checkpoint is None:
+            checkpoint = UploadCheckpoint()
+
+        self.checkpoint = checkpoint
+        self.uploaded = 0
+        self.skipped = 0
+        self.accepted_readings = 0
+        self.errors = []
+
+        self._cloud = cloud
+        self._queue = Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._in_order = {}
+        self._failed_streamers = set()
+        self._workers = [threading.Thread(target=self._upload_worker) for _i in range(0, max_workers)]
+
+        for worker in self._workers:
+            worker.daemon = True
+
+        self._started = False
+
+    def start(self):
+        """Start the upload workers."""
+
+        for worker in self._workers:
+            worker.start()
+
+        self._started = True
+
+    def put(self, report):
+        """Queue a report for upload, blocking if too many are pending.
+
+        Args:
+            report (IOTileReport): The report to upload.
+
+        Returns:
+            bool: False if the report was skipped because it was already
+            uploaded according to the checkpoint, otherwise True.
+        """
+
+        if not self._started:
+            raise ArgumentError("You must call start() before queuing reports")
+
+        pending = _PendingReport(report)
+
+        key = self._streamer_key(report)
+        if key is not None:
+            if report.highest_id <= self.checkpoint.get(*key):
+                self.logger.info("Skipping report with ids in (%d, %d), already uploaded", report.lowest_id, report.highest_id)
+                with self._lock:
+                    self.skipped += 1
+                return False
+
+            with self._lock:
+                if key not in self._failed_streamers:
+                    self._in_order.setdefault(key, deque()).append(pending)
+
+        self._queue.put(pending)
+        return True
+
+    def finish(self):
+        """Wait for all queued reports to be uploaded and stop the workers.
+
+        Raises:
+            ExternalError: If any report could not be uploaded.
+        """
+
+        if self._started:
+            for _worker in self._workers:
+                self._queue.put(None)
+
+            for worker in self._workers:
+                worker.join()
+
+            self._started = False
+
+        if self.errors:
+            raise ExternalError("Error uploading reports to iotile.cloud", failed_reports=len(self.errors), uploaded=self.uploaded, first_error=str(self.errors[0]))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # If we are exiting because of an exception, still make sure to drain
+        # the queue so that the checkpoint includes everything sent so far.
+        if exc_type is not None:
+            try:
+                self.finish()
+            except ExternalError:
+                pass
+
+            return False
+
+        self.finish()
+        return False
+
+    @classmethod
+    def _streamer_key(cls, report):
+        if not hasattr(report, 'origin_streamer'):
+            return None
+
+        return (report.origin, report.origin_streamer)
+
+    def _upload_worker(self):
+        while True:
+            pending = self._queue.get()
+            if pending is None:
+                return
+
+            report = pending.report
+
+            try:
+                self.logger.info("Uploading report with ids in (%d, %d)", report.lowest_id, report.highest_id)
+                count = self._cloud.upload_report(report)
+            except Exception as exc:  # pylint: disable=W0703; errors are aggregated and raised in finish()
+                self.logger.exception("Error uploading report")
+                with self._lock:
+                    self.errors.append(exc)
+
+                self._abandon_streamer(report)
+                continue
+
+            with self._lock:
+                self.uploaded += 1
+                self.accepted_readings += count
+                pending.done = True
+
+            self._advance_checkpoint(report)
+
+    def _advance_checkpoint(self, report):
+        key = self._streamer_key(report)
+        if key is None:
+            return
+
+        highest = None
+        with self._lock:
+            in_order = self._in_order.get(key)
+            if in_order is None:
+                return
+
+            while len(in_order) > 0 and in_order[0].done:
+                highest = in_order.popleft().report.highest_id
+
+        if highest is not None:
+            self.checkpoint.advance(key[0], key[1], highest)
+
+    def _abandon_streamer(self, report):
+        """Stop tracking a streamer whose checkpoint can no longer advance."""
+
+        key = self._streamer_key(report)
+        if key is None:
+            return
+
+        with self._lock:
+            self._failed_streamers.add(key)
+            self._in_order.pop(key, None)
@@ -11,6 +11,7 @@ from iotile.cloud.config import link_cloud
 from iotile.core.hw.reports import IndividualReadingReport, SignedListReport, FlexibleDictionaryReport, IOTileReading
 from iotile.cloud.cloud import IOTileCloud
 from iotile.cloud.cloud import Acknowledgement
+from iotile_cloud.api.exceptions import HttpClientError
 from iotile.core.dev.registry import ComponentRegistry
 from iotile.core.exceptions import ArgumentError, ExternalError
 
@@ -175,3 +176,136 @@ def test_report_upload(basic_cloud):
 
     cloud.upload_report(signed_report)
     cloud.upload_report(dict_report)
+
+
+def count_requests(cloud, monkeypatch):
+    """Count all requests made through an IOTileCloud's shared session."""
+
+    calls = []
+    session = cloud.api.session
+    original = session.request
+
+    def _counting_request(method, url, *args, **kwargs):
+        calls.append((method, url))
+        return original(method, url, *args, **kwargs)
+
+    monkeypatch.setattr(session, 'request', _counting_request)
+    return calls
+
+
+def test_metadata_cache(basic_cloud, monkeypatch):
+    """Make sure metadata is cached and invalidated correctly."""
+
+    _cloud, proj_id, server = basic_cloud
+
+    cloud = IOTileCloud(cache_ttl=60)
+    cloud.invalidate_cache()
+    calls = count_requests(cloud, monkeypatch)
+
+    assert cloud.device_info(1)['id'] == 1
+    assert cloud.device_info(1)['id'] == 1
+    assert len(calls) == 1
+
+    assert len(cloud.device_acknowledgements(1)) == 2
+    assert cloud.highest_acknowledged(1, 1) == 200
+    assert len(calls) == 2
+
+    # Make sure changes through the cloud object invalidate the cache
+    cloud.set_sensorgraph(1, 'water-meter-v1-1-1')
+    before = len(calls)
+    assert cloud.device_info(1)['sg'] == 'water-meter-v1-1-1'
+    assert len(calls) == before + 1
+
+    cloud.upload_report(make_sequential(1, 0x5000, 10, give_ids=True))
+    before = len(calls)
+    cloud.device_acknowledgements(1)
+    assert len(calls) == before + 1
+
+    # Make sure the cache is shared between objects and can be disabled
+    other = IOTileCloud(cache_ttl=60)
+    other.device_info(1)
+    assert len(calls) == before + 1
+
+    uncached = IOTileCloud(cache_ttl=0)
+    uncached_calls = count_requests(uncached, monkeypatch)
+    uncached.device_info(1)
+    uncached.device_info(1)
+    assert len(uncached_calls) == 2
+
+
+def test_metadata_cache_per_user(basic_cloud, monkeypatch):
+    """Make sure cached metadata is not shared between different users."""
+
+    _cloud, proj_id, server = basic_cloud
+
+    cloud = IOTileCloud(cache_ttl=60)
+    cloud.invalidate_cache()
+    cloud.device_info(1)
+
+    reg = ComponentRegistry()
+    reg.set_config('arch:cloud_token', 'JWT_OTHER_USER')
+
+    # The mock cloud rejects this token, so the request must reach the server
+    # rather than being answered from the first user's cached data
+    other = IOTileCloud(cache_ttl=60)
+    calls = count_requests(other, monkeypatch)
+    with pytest.raises(HttpClientError):
+        other.device_info(1)
+    assert len(calls) == 1
+
+
+def test_bulk_queries(basic_cloud, monkeypatch):
+    """Make sure we can query devices and acknowledgements in bulk."""
+
+    _cloud, proj_id, server = basic_cloud
+
+    cloud = IOTileCloud(cache_ttl=60)
+    cloud.invalidate_cache()
+    monkeypatch.setattr(cloud, 'PAGE_SIZE', 2)
+    calls = count_requests(cloud, monkeypatch)
+
+    devices = cloud.devices_info(project_id=proj_id)
+    assert set(devices) == set([1, 2, 3, 4, 5])
+    assert len(calls) == 3
+
+    for device_id in range(1, 6):
+        assert cloud.device_info(device_id)['project'] == proj_id
+
+    assert cloud.devices_info([1, 2]) == {1: devices[1], 2: devices[2]}
+    assert len(calls) == 3
+
+    with pytest.raises(ArgumentError):
+        cloud.devices_info([1, 10])
+
+    calls[:] = []
+    acks = cloud.devices_acknowledgements([1, 2, 3, 6])
+    assert len(calls) == 5
+
+    assert sorted(x.ack for x in acks[1]) == [100, 200]
+    assert acks[6] == []
+
+    assert cloud.highest_acknowledged(2, 0) == 100
+    assert cloud.device_acknowledgements(3) == acks[3]
+    assert len(calls) == 5
+
+
+def test_bulk_queries_few_devices(basic_cloud, monkeypatch):
+    """Make sure bulk queries for a few devices do not list every device."""
+
+    _cloud, _proj_id, _server = basic_cloud
+
+    cloud = IOTileCloud(cache_ttl=0)
+    monkeypatch.setattr(cloud, 'PAGE_SIZE', 1)
+    calls = count_requests(cloud, monkeypatch)
+
+    devices = cloud.devices_info([2, 4, 2])
+    assert sorted(devices) == [2, 4]
+    assert devices[4] == cloud.device_info(4)
+    assert len(calls) == 4
+
+    calls[:] = []
+    acks = cloud.devices_acknowledgements([1, 6])
+    assert sorted(x.ack for x in acks[1]) == [100, 200]
+    assert acks[6] == []
+    assert len(calls) == 3
+
@@ -4,6 +4,14 @@ from iotile.core.dev.semver import SemanticVersion
 from iotile.cloud.apps import OtaUpdater
 
 
+@pytest.fixture(autouse=True)
+def device_dir(tmpdir, monkeypatch):
+    """Keep the device files written by simple_hw out of the package folder."""
+
+    monkeypatch.chdir(str(tmpdir))
+    return tmpdir
+
+
 def test_ota_app_creation(ota_cloud, simple_hw):
 
     cloud, _proj_id, _server = ota_cloud
@@ -0,0 +1,100 @@
+"""Tests for the pipelined StreamingReportUploader."""
+
+import json
+import pytest
+from iotile.core.exceptions import ExternalError
+from iotile.core.hw.reports import SignedListReport, IOTileReading
+from iotile.cloud.report_uploader import StreamingReportUploader, UploadCheckpoint
+
+
+def make_report(iotile_id, first_id, num_readings, streamer=0):
+    readings = [IOTileReading(i, 0x5000, i, reading_id=i) for i in range(first_id, first_id + num_readings)]
+    return SignedListReport.FromReadings(iotile_id, readings, streamer=streamer)
+
+
+class FailingCloud(object):
+    """A fake cloud that fails to upload specific reports."""
+
+    def __init__(self, fail_ids):
+        self.fail_ids = fail_ids
+
+    def upload_report(self, report):
+        if report.lowest_id in self.fail_ids:
+            raise ExternalError("Upload failed")
+
+        return len(report.visible_readings)
+
+
+def test_pipelined_upload(basic_cloud, tmpdir):
+    """Make sure reports are uploaded concurrently and checkpointed."""
+
+    cloud, _proj_id, server = basic_cloud
+    checkpoint_path = str(tmpdir.join('checkpoint.json'))
+
+    reports = [make_report(1, 1000 + i*10, 10) for i in range(0, 10)]
+
+    checkpoint = UploadCheckpoint(checkpoint_path)
+    with StreamingReportUploader(cloud, max_workers=3, max_pending=2, checkpoint=checkpoint) as uploader:
+        for report in reports:
+            assert uploader.put(report) is True
+
+    assert uploader.uploaded == 10
+    assert uploader.skipped == 0
+    assert checkpoint.get(1, 0) == 1099
+    assert server.streamers['t--0000-0000-0000-0001--0000']['last_id'] == 1099
+
+    with open(checkpoint_path, "r") as infile:
+        assert json.load(infile) == {'1/0': 1099}
+
+    # Make sure we resume from the saved checkpoint
+    resumed = UploadCheckpoint(checkpoint_path)
+    assert resumed.streamers(1) == {0: 1099}
+
+    with StreamingReportUploader(cloud, checkpoint=resumed) as uploader:
+        for report in reports:
+            assert uploader.put(report) is False
+
+        assert uploader.put(make_report(1, 1100, 5)) is True
+
+    assert uploader.skipped == 10
+    assert uploader.uploaded == 1
+    assert resumed.get(1, 0) == 1104
+
+
+def test_checkpoint_stops_at_failure():
+    """Make sure the checkpoint never advances past a failed upload."""
+
+    reports = [make_report(1, 1 + i*10, 10) for i in range(0, 5)]
+    reports.append(make_report(1, 1000, 10, streamer=1))
+
+    checkpoint = UploadCheckpoint()
+    uploader = StreamingReportUploader(FailingCloud([21]), max_workers=2, checkpoint=checkpoint)
+    uploader.start()
+
+    for report in reports:
+        uploader.put(report)
+
+    with pytest.raises(ExternalError):
+        uploader.finish()
+
+    assert uploader.uploaded == 5
+    assert checkpoint.get(1, 0) == 20
+    assert checkpoint.get(1, 1) == 1009
+
+
+def test_failed_streamer_not_tracked():
+    """Make sure reports queued after a failure are not held for the checkpoint."""
+
+    checkpoint = UploadCheckpoint()
+    uploader = StreamingReportUploader(FailingCloud([1]), max_workers=1, max_pending=2, checkpoint=checkpoint)
+    uploader.start()
+
+    for i in range(0, 50):
+        assert uploader.put(make_report(1, 1 + i*10, 10)) is True
+
+    with pytest.raises(ExternalError):
+        uploader.finish()
+
+    assert uploader.uploaded == 49
+    assert checkpoint.get(1, 0) == 0
+    assert uploader._in_order == {}
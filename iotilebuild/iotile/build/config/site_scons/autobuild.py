@@ -224,7 +224,8 @@ def autobuild_documentation(tile):
     env.Clean(outfile, outdir)
 
 
-def autobuild_trub_script(file_name, slot_assignments=None, os_info=None, sensor_graph=None, app_info=None, use_safeupdate=False):
+def autobuild_trub_script(file_name, slot_assignments=None, os_info=None, sensor_graph=None, app_info=None, use_safeupdate=False,
+                          sensor_graph_cache=None):
     """Build a trub script that loads given firmware into the given slots.
 
     slot_assignments should be a list of tuples in the following form:
@@ -247,9 +248,14 @@ def autobuild_trub_script(file_name, slot_assignments=None, os_info=None, sensor
             number that will be set as part of the OTA script if included. Optional.
         use_safeupdate (bool): If True, Enables safemode before the firmware update records, then 
             disables them after the firmware update records.
+        sensor_graph_cache (str): Optional folder to cache compiled sensor
+            graphs in, so that unchanged sgf files are only compiled once
+            across builds.  By default the sensor graph is compiled from
+            scratch on every build.
     """
 
-    build_update_script(file_name, slot_assignments, os_info, sensor_graph, app_info, use_safeupdate)
+    build_update_script(file_name, slot_assignments, os_info, sensor_graph, app_info, use_safeupdate,
+                        sensor_graph_cache)
 
 
 def autobuild_bootstrap_file(file_name, image_list):
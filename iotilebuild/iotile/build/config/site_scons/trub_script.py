@@ -11,10 +11,12 @@ from iotile.core.hw.update.records import ReflashTileRecord, ReflashControllerRe
 from iotile.build.build import ProductResolver
 from iotile.core.utilities.intelhex import IntelHex
 from iotile.sg.compiler import compile_sgf
+from iotile.sg.compile_cache import CompileCache
 from iotile.sg.output_formats.script import format_script
 from iotile.core.hw.update.script import UpdateScript
 
-def build_update_script(file_name, slot_assignments=None, os_info=None, sensor_graph=None, app_info=None, use_safeupdate=False):
+def build_update_script(file_name, slot_assignments=None, os_info=None, sensor_graph=None, app_info=None, use_safeupdate=False,
+                        sensor_graph_cache=None):
     """Build a trub script that loads given firmware into the given slots.
 
     slot_assignments should be a list of tuples in the following form:
@@ -36,6 +38,10 @@ def build_update_script(file_name, slot_assignments=None, os_info=None, sensor_g
         app_info (tuple(int, str)): A tuple of App version tag and X.Y version
             number that will be set as part of the OTA script if included. Optional.
         use_safeupdate (bool): Enables safe firmware update
+        sensor_graph_cache (str): Optional folder to cache compiled sensor
+            graphs in, so that unchanged sgf files are only compiled once
+            across builds.  By default the sensor graph is compiled from
+            scratch on every build.
     """
 
     resolver = ProductResolver.Create()
@@ -53,6 +59,7 @@ def build_update_script(file_name, slot_assignments=None, os_info=None, sensor_g
     env['OS_INFO'] = os_info
     env['APP_INFO'] = app_info
     env['UPDATE_SENSORGRAPH'] = False
+    env['SENSORGRAPH_CACHE'] = sensor_graph_cache
 
     if sensor_graph is not None:
         files.append(sensor_graph)
@@ -98,7 +105,11 @@ def _build_reflash_script_action(target, source, env):
     #Update sensorgraph
     if env['UPDATE_SENSORGRAPH']:
         sensor_graph_file = source[-1]
-        sensor_graph = compile_sgf(sensor_graph_file)
+        cache = None
+        if env['SENSORGRAPH_CACHE'] is not None:
+            cache = CompileCache(env['SENSORGRAPH_CACHE'])
+
+        sensor_graph = compile_sgf(sensor_graph_file, cache=cache)
         output = format_script(sensor_graph)
         records += UpdateScript.FromBinary(output).records
 
@@ -140,7 +140,8 @@ class DependencyManager (object):
         return dep_stati
 
     @param("path", "path", "exists", desc="Path to IOTile to check")
-    def update_local(self, path='.'):
+    @param("jobs", "integer", desc="Maximum number of dependencies to resolve at once")
+    def update_local(self, path='.', jobs=4):
         """Attempt to resolve all LOCAL dependencies in this IOTile by installing them into build/deps
         """
 
@@ -154,6 +155,7 @@ class DependencyManager (object):
         resolver_chain = DependencyResolverChain()
         reg = ComponentRegistry()
 
+        local_deps = []
         for dep in tile.dependencies:
 
             # Check each dependency to see if it's local
@@ -162,16 +164,22 @@ class DependencyManager (object):
                 if local_tile.release:
                     continue
                 if local_tile is not None:
-                    result = resolver_chain.update_dependency(tile, dep)
+                    local_deps.append(dep)
 
             except ArgumentError:
                 continue
 
+        results = resolver_chain.update_dependencies(tile, local_deps, max_workers=jobs)
+        for dep, result in zip(local_deps, results):
             iprint("Resolving %s: %s" % (dep['name'], result))
 
     @param("path", "path", "exists", desc="Path to IOTile to check")
-    def update(self, path='.'):
+    @param("jobs", "integer", desc="Maximum number of dependencies to resolve at once")
+    def update(self, path='.', jobs=4):
         """Attempt to resolve all dependencies in this IOTile by installing them into build/deps
+
+        Independent dependencies are resolved and installed concurrently,
+        up to jobs at a time.
         """
 
         tile = IOTile(path)
@@ -183,8 +191,8 @@ class DependencyManager (object):
         #FIXME: Read resolver_settings.json file
         resolver_chain = DependencyResolverChain()
 
-        for dep in tile.dependencies:
-            result = resolver_chain.update_dependency(tile, dep)
+        results = resolver_chain.update_dependencies(tile, tile.dependencies, max_workers=jobs)
+        for dep, result in zip(tile.dependencies, results):
             iprint("Resolving %s: %s" % (dep['name'], result))
 
     @param("path", "path", "exists", desc="Path to IOTile to check")
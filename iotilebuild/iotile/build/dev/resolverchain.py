@@ -5,6 +5,10 @@ import json
 import pkg_resources
 import logging
 import shutil
+import sys
+import threading
+from queue import Queue
+from future.utils import raise_
 
 class DependencyResolverChain(object):
     """A set of rules mapping dependencies to DependencyResolver instances
@@ -103,6 +107,66 @@ class DependencyResolverChain(object):
         if result != "installed":
             raise ArgumentError("Could not find component to satisfy name/version combination")
 
+    def update_dependencies(self, tile, depinfos, max_workers=4):
+        """Install or update many dependencies of a tile concurrently.
+
+        Each dependency is installed into its own folder so they do not
+        interact and can be resolved at the same time, using up to
+        max_workers threads.
+
+        Args:
+            tile (IOTile): An IOTile object describing the tile that has the dependencies
+            depinfos (list of dict): The dictionaries from tile.dependencies specifying
+                each dependency
+            max_workers (int): The maximum number of dependencies to resolve at once
+
+        Returns:
+            list of string: The outcome of update_dependency() for each dependency in
+                the same order as depinfos.
+
+        Raises:
+            IOTileException: If resolving any dependency failed.  All other dependencies
+                are still resolved before the first error is raised.
+        """
+
+        if max_workers < 1:
+            raise ArgumentError("You must allow at least one worker", max_workers=max_workers)
+
+        results = [None]*len(depinfos)
+        errors = [None]*len(depinfos)
+
+        work = Queue()
+        for i, depinfo in enumerate(depinfos):
+            work.put((i, depinfo))
+
+        def _worker():
+            while True:
+                i, depinfo = work.get()
+                if i is None:
+                    break
+
+                try:
+                    results[i] = self.update_dependency(tile, depinfo)
+                except Exception:  #pylint:disable=broad-except;The error is reraised in the calling thread
+                    errors[i] = sys.exc_info()
+
+        workers = []
+        for _i in range(min(max_workers, len(depinfos))):
+            work.put((None, None))
+            worker = threading.Thread(target=_worker)
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        for worker in workers:
+            worker.join()
+
+        for error in errors:
+            if error is not None:
+                raise_(error[0], error[1], error[2])
+
+        return results
+
     def update_dependency(self, tile, depinfo, destdir=None):
         """Attempt to install or update a dependency to the latest version.
 
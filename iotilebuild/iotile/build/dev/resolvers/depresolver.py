@@ -41,6 +41,55 @@ class DependencyResolver (object):
         raise NotFoundError("DependencyResolver did not implement check method")
 
     def _copy_folder_contents(self, source, dest):
-        
-        import shutil
-        shutil.copytree(source, dest)
+        install_folder(source, dest)
+
+
+def install_folder(source, dest):
+    """Install a copy of a folder tree, hard linking files where possible.
+
+    Dependencies are never modified once installed, so a hard link to each
+    file is just as good as a copy and much faster.  Files are copied
+    instead if they cannot be linked, for example because source and dest
+    are on different filesystems.
+
+    Args:
+        source (string): The folder to install
+        dest (string): The folder to create, which must not already exist
+    """
+
+    import os
+    import shutil
+
+    can_link = hasattr(os, 'link')
+
+    for root, dirs, files in os.walk(source):
+        relroot = os.path.relpath(root, source)
+        destroot = os.path.normpath(os.path.join(dest, relroot))
+        os.makedirs(destroot)
+        shutil.copystat(root, destroot)
+
+        for name in dirs:
+            srcpath = os.path.join(root, name)
+            if os.path.islink(srcpath):
+                os.symlink(os.readlink(srcpath), os.path.join(destroot, name))
+
+        # os.walk does not descend into symlinked folders
+        dirs[:] = [x for x in dirs if not os.path.islink(os.path.join(root, x))]
+
+        for name in files:
+            srcpath = os.path.join(root, name)
+            destpath = os.path.join(destroot, name)
+
+            if os.path.islink(srcpath):
+                os.symlink(os.readlink(srcpath), destpath)
+                continue
+
+            if can_link:
+                try:
+                    os.link(srcpath, destpath)
+                    continue
+                except OSError:
+                    can_link = False
+
+            shutil.copy2(srcpath, destpath)
+
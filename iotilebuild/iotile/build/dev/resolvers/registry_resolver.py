@@ -1,4 +1,5 @@
 import os
+import hashlib
 from .depresolver import DependencyResolver
 from iotile.core.exceptions import ArgumentError, ExternalError, IOTileException
 from iotile.core.utilities.typedargs import iprint
@@ -37,7 +38,7 @@ class ComponentRegistryResolver (DependencyResolver):
             raise ExternalError("Component found in registry but its build/output folder is not valid", path=comp.folder, name=comp.name, suggestion="Cleanly rebuild the component")
 
         self._copy_folder_contents(comp.output_folder, destdir)
-        return {'found': True}
+        return {'found': True, 'settings': {'content_hash': _content_hash(comp.output_folder)}}
 
     def check(self, depinfo, deptile, depsettings):
         from iotile.core.dev.registry import ComponentRegistry
@@ -55,6 +56,11 @@ class ComponentRegistryResolver (DependencyResolver):
         if not reqver.check(comp.parsed_version):
             return True
 
+        #If we know which build we installed, we are up to date only if it is still the same build.
+        #Installed files may be hard links to the component's files so we cannot compare against them.
+        if depsettings.get('content_hash') is not None:
+            return depsettings['content_hash'] == _content_hash(comp.output_folder)
+
         #If the component in the registry has a higher version or a newer release date, it should
         #be updated
         if comp.parsed_version > deptile.parsed_version:
@@ -64,3 +70,17 @@ class ComponentRegistryResolver (DependencyResolver):
             return False
 
         return True
+
+
+def _content_hash(output_folder):
+    """Hash the module_settings.json that identifies a built component.
+
+    Every build stamps its version and build date into this file so it
+    changes whenever the component is rebuilt.
+    """
+
+    try:
+        with open(os.path.join(output_folder, 'module_settings.json'), 'rb') as infile:
+            return hashlib.sha256(infile.read()).hexdigest()
+    except IOError:
+        return None
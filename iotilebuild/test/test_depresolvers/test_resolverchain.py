@@ -3,6 +3,7 @@ import os
 import shutil
 from iotile.core.exceptions import ExternalError
 from iotile.build.dev.resolverchain import DependencyResolverChain
+from iotile.build.dev.resolvers.depresolver import install_folder
 from iotile.mock.mock_resolver import MockDependencyResolver
 from iotile.core.dev.iotileobj import IOTile
 from iotile.core.dev.registry import ComponentRegistry
@@ -181,3 +182,59 @@ def test_multiple_resolvers(tmpdir, chain_composite):
     for dep in tile.dependencies:
         result = chain_composite.update_dependency(tile, dep)
         assert result == 'already installed'
+
+def test_update_dependencies_concurrent(tmpdir, chain_composite):
+    """Make sure we can resolve all dependencies of a tile at once
+    """
+
+    tile = copy_comp('comp4_v1.0', tmpdir.strpath)
+
+    results = chain_composite.update_dependencies(tile, tile.dependencies, max_workers=2)
+    assert results == ['installed']*len(tile.dependencies)
+
+    results = chain_composite.update_dependencies(tile, tile.dependencies, max_workers=2)
+    assert results == ['already installed']*len(tile.dependencies)
+
+def test_install_folder_links(tmpdir):
+    """Make sure installed dependency files are linked to their source when possible
+    """
+
+    source = tmpdir.mkdir('source')
+    source.mkdir('include').join('header.h').write('int x;')
+    source.join('module_settings.json').write('{}')
+
+    dest = os.path.join(tmpdir.strpath, 'dest')
+    install_folder(source.strpath, dest)
+
+    installed = os.path.join(dest, 'include', 'header.h')
+    with open(installed, 'r') as infile:
+        assert infile.read() == 'int x;'
+
+    if hasattr(os, 'link'):
+        assert os.stat(installed).st_ino == os.stat(os.path.join(source.strpath, 'include', 'header.h')).st_ino
+
+def test_registry_content_hash(tmpdir):
+    """Make sure the registry resolver records which build it installed
+    """
+
+    reg = ComponentRegistry()
+    chain = DependencyResolverChain()
+
+    tile = copy_comp('comp2_dev_v1.1', tmpdir.strpath)
+
+    try:
+        reg.add_component(comp_path('comp1_v1.1'))
+        for dep in tile.dependencies:
+            assert chain.update_dependency(tile, dep) == 'installed'
+
+            deptile = IOTile(os.path.join(tile.folder, 'build', 'deps', dep['unique_id']))
+            settings = chain._load_depsettings(deptile)
+            assert settings['settings']['content_hash'] is not None
+
+            #A different build of the same version must be reinstalled
+            settings['settings']['content_hash'] = 'old build'
+            chain._save_depsettings(deptile.folder, settings)
+            assert chain.update_dependency(tile, dep) == 'updated'
+            assert chain.update_dependency(tile, dep) == 'already installed'
+    finally:
+        reg.remove_component('comp1')
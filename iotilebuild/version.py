@@ -1 +1 @@
-version = "2.6.17"
+version = "2.7.0"
@@ -1,14 +1,20 @@
 # This file is copyright Arch Systems, Inc.
 # Except as otherwise provided in the relevant LICENSE file, all rights are reserved.
 
+import atexit
+import copy
 import itertools
 from collections import namedtuple
 import json
+import os
 import os.path
+import platform
 import sys
+import threading
 from future.utils import viewitems, itervalues
 from past.builtins import basestring
 from iotile.core.exceptions import DataError, ExternalError
+from iotile.core.utilities.paths import settings_directory
 from .semver import SemanticVersion, SemanticVersionRange
 
 ReleaseStep = namedtuple('ReleaseStep', ['provider', 'args'])
@@ -16,6 +22,163 @@ ReleaseInfo = namedtuple('ReleaseInfo', ['release_date', 'dependency_versions'])
 TileInfo = namedtuple('TileInfo', ['module_name', 'settings', 'architectures', 'targets', 'release_data'])
 
 
+class _MetadataEntry(object):
+    """The parsed contents of a single json file and anything derived from them."""
+
+    def __init__(self, stamp, settings):
+        self.stamp = stamp
+        self.settings = settings
+        self.derived = {}
+
+
+class _MetadataCache(object):
+    """A process wide cache of parsed module_settings.json files.
+
+    Entries are keyed by the real path of each file and are only reused
+    while the file's modification time, size and inode are unchanged, so
+    edits to a component are always picked up.
+
+    If a persistent cache file is set, entries are also saved to that file
+    when the process exits so that the next process can load all of the
+    components it needs from a single file rather than parsing each
+    component's module_settings.json separately.
+    """
+
+    FILE_VERSION = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._disk_path = None
+        self._disk_entries = {}
+        self._disk_dirty = False
+        self._atexit_registered = False
+
+    @classmethod
+    def _file_stamp(cls, path):
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+
+        mtime = getattr(info, 'st_mtime_ns', info.st_mtime)
+        return [mtime, info.st_size, info.st_ino]
+
+    def load(self, path):
+        """Load a json file, reusing the cached copy if it has not changed.
+
+        Args:
+            path (str): The path to the json file.
+
+        Returns:
+            _MetadataEntry: The parsed file or None if it does not exist.
+
+        Raises:
+            ExternalError: If the file exists but cannot be read.
+        """
+
+        key = os.path.realpath(path)
+        stamp = self._file_stamp(key)
+        if stamp is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                return entry
+
+            saved = self._disk_entries.get(key)
+            if saved is not None and saved['stamp'] == stamp:
+                entry = _MetadataEntry(stamp, saved['settings'])
+                self._entries[key] = entry
+                return entry
+
+        try:
+            with open(key, "r") as infile:
+                settings = json.load(infile)
+        except (IOError, ValueError) as exc:
+            raise ExternalError("Could not parse json file", path=path, error=str(exc))
+
+        entry = _MetadataEntry(stamp, settings)
+
+        with self._lock:
+            self._entries[key] = entry
+
+            if self._disk_path is not None:
+                self._disk_entries[key] = {'stamp': stamp, 'settings': settings}
+                self._disk_dirty = True
+
+        return entry
+
+    def clear(self):
+        """Forget all cached entries, including those loaded from disk."""
+
+        with self._lock:
+            self._entries = {}
+            self._disk_entries = {}
+
+    def enable_persistent(self, path):
+        """Load and start saving entries to a persistent cache file."""
+
+        entries = {}
+
+        try:
+            with open(path, "r") as infile:
+                contents = json.load(infile)
+
+            if contents.get('version') == self.FILE_VERSION:
+                entries = contents.get('files', {})
+        except (IOError, ValueError, AttributeError):
+            # A missing or corrupt cache file just means everything is parsed again
+            pass
+
+        with self._lock:
+            self._disk_path = path
+            self._disk_entries = entries
+            self._disk_dirty = False
+
+            if not self._atexit_registered:
+                atexit.register(self.save_persistent)
+                self._atexit_registered = True
+
+    def disable_persistent(self):
+        """Stop using a persistent cache file without saving it."""
+
+        with self._lock:
+            self._disk_path = None
+            self._disk_entries = {}
+            self._disk_dirty = False
+
+    def save_persistent(self):
+        """Save the persistent cache file if anything was added to it."""
+
+        with self._lock:
+            if self._disk_path is None or not self._disk_dirty:
+                return
+
+            path = self._disk_path
+            contents = {'version': self.FILE_VERSION, 'files': self._disk_entries}
+
+            folder = os.path.dirname(path)
+            if folder != '' and not os.path.exists(folder):
+                os.makedirs(folder)
+
+            if platform.system() == 'Windows':
+                with open(path, "w") as outfile:
+                    json.dump(contents, outfile)
+            else:
+                newpath = path + '.new'
+                with open(newpath, "w") as outfile:
+                    json.dump(contents, outfile)
+
+                os.rename(newpath, path)
+
+            self._disk_dirty = False
+
+
+_metadata_cache = _MetadataCache()
+
+
 class IOTile(object):
     """
     IOTile
@@ -27,27 +190,79 @@ class IOTile(object):
     V1_FORMAT = "v1"
     V2_FORMAT = "v2"
 
+    PersistentCacheFileName = 'iotile_metadata_cache.json'
+
     def __init__(self, folder):
         self.folder = folder
         self.filter_prods = False
 
+        self._dependencies = None
+        self._support_wheel_depends = None
+        self._has_wheel = None
+
         modfile = os.path.join(self.folder, 'module_settings.json')
 
-        try:
-            with open(modfile, "r") as infile:
-                settings = json.load(infile)
-        except IOError:
+        entry = _metadata_cache.load(modfile)
+        if entry is None:
             raise ExternalError("Could not load module_settings.json file, make sure this directory is an IOTile component", path=self.folder)
 
-        file_format = settings.get('file_format', IOTile.V1_FORMAT)
-        if file_format == IOTile.V1_FORMAT:
-            info = self._find_v1_settings(settings)
-        elif file_format == IOTile.V2_FORMAT:
-            info = self._find_v2_settings(settings)
-        else:
-            raise DataError("Unknown file format in module_settings.json", format=file_format, path=modfile)
+        # Parsing release dates is slow so we share the parsed info between
+        # every IOTile object created from the same unchanged file.  Each
+        # IOTile gets its own deep copy since callers are free to modify
+        # the settings dictionaries they are given.
+        info = entry.derived.get('info')
+        if info is None:
+            settings = entry.settings
+
+            file_format = settings.get('file_format', IOTile.V1_FORMAT)
+            if file_format == IOTile.V1_FORMAT:
+                info = self._find_v1_settings(settings)
+            elif file_format == IOTile.V2_FORMAT:
+                info = self._find_v2_settings(settings)
+            else:
+                raise DataError("Unknown file format in module_settings.json", format=file_format, path=modfile)
+
+            entry.derived['info'] = info
 
-        self._load_settings(info)
+        self._load_settings(copy.deepcopy(info))
+
+    @classmethod
+    def EnablePersistentCache(cls, path=None):
+        """Save parsed component metadata to disk to speed up future processes.
+
+        All IOTile objects are created from a process wide cache of parsed
+        module_settings.json files, which is refreshed whenever a file
+        changes.  Enabling the persistent cache also loads that cache from
+        a single file when called and saves it back when the process exits,
+        so that later processes do not need to parse every component again.
+
+        Args:
+            path (str): Optional path to the cache file.  By default it is
+                stored in the per user iotile settings directory.
+        """
+
+        if path is None:
+            path = os.path.join(settings_directory(), cls.PersistentCacheFileName)
+
+        _metadata_cache.enable_persistent(path)
+
+    @classmethod
+    def DisablePersistentCache(cls):
+        """Stop using the persistent metadata cache without saving it."""
+
+        _metadata_cache.disable_persistent()
+
+    @classmethod
+    def SavePersistentCache(cls):
+        """Save the persistent metadata cache now rather than at exit."""
+
+        _metadata_cache.save_persistent()
+
+    @classmethod
+    def ClearCache(cls):
+        """Forget all cached component metadata so that it is parsed again."""
+
+        _metadata_cache.clear()
 
     def _find_v1_settings(self, settings):
         """Parse a v1 module_settings.json file.
@@ -167,44 +382,63 @@ class IOTile(object):
 
             #If this tile is a development tile and it has been built at least one, add in a release date
             #from the last time it was built
-            if os.path.exists(os.path.join(self.output_folder, 'module_settings.json')):
-                release_settings = os.path.join(self.output_folder, 'module_settings.json')
+            self.release_date = self._load_build_date()
 
-                with open(release_settings, 'rb') as infile:
-                    release_dict = json.load(infile)
+        if 'depends' in self.settings and not isinstance(self.settings['depends'], dict):
+            raise DataError("module must have a depends key that is a dictionary", found=str(self.settings['depends']))
 
-                import dateutil.parser
-                self.release_date = dateutil.parser.parse(release_dict['release_date'])
-            else:
-                self.release_date = None
+        if 'python_depends' in self.settings:
+            python_depends = self.settings['python_depends']
+            if not isinstance(python_depends, list) or not all(isinstance(x, basestring) for x in python_depends):
+                raise DataError("module must have a python_depends key that is a list of strings",
+                                found=str(python_depends))
 
-        #Find all of the things that this module could possibly depend on
-        #Dependencies include those defined in the module itself as well as
-        #those defined in architectures that are present in the module_settings.json
-        #file.
-        self.dependencies = []
+        # Store any architectures that we find in this json file for future reference
+        self.architectures = architectures
 
-        archs_with_deps = [viewitems(y['depends']) for _x, y in viewitems(architectures) if 'depends' in y]
-        if 'depends' in self.settings:
-            if not isinstance(self.settings['depends'], dict):
-                raise DataError("module must have a depends key that is a dictionary", found=str(self.settings['depends']))
+        # Setup our support package information
+        self.support_distribution = "iotile_support_{0}_{1}".format(self.short_name, self.parsed_version.major)
 
-            archs_with_deps.append(viewitems(self.settings['depends']))
+        if 'python_universal' in self.settings:
+            py_version = "py2.py3"
+        elif sys.version_info[0] >= 3:
+            py_version = "py3"
+        else:
+            py_version = "py2"
 
-        #Find all python package needed
-        self.support_wheel_depends = []
+        self.support_wheel = "{0}-{1}-{2}-none-any.whl".format(self.support_distribution,
+                                                               self.parsed_version.pep440_string(),
+                                                               py_version)
 
-        if 'python_depends' in self.settings:
-            if not isinstance(self.settings['python_depends'], list):
-                raise DataError("module must have a python_depends key that is a list of strings",
-                                found=str(self.settings['python_depends']))
+    def _load_build_date(self):
+        """Find the date this development tile was last built or None."""
+
+        entry = _metadata_cache.load(os.path.join(self.output_folder, 'module_settings.json'))
+        if entry is None:
+            return None
+
+        if 'release_date' not in entry.derived:
+            import dateutil.parser
+            entry.derived['release_date'] = dateutil.parser.parse(entry.settings['release_date'])
 
-            for python_depend in self.settings['python_depends']:
-                if not isinstance(python_depend, basestring):
-                    raise DataError("module must have a python_depends key that is a list of strings",
-                                    found=str(self.settings['python_depends']))
+        return entry.derived['release_date']
 
-                self.support_wheel_depends.append(python_depend)
+    @property
+    def dependencies(self):
+        """All of the components that this module could possibly depend on.
+
+        Dependencies include those defined in the module itself as well as
+        those defined in architectures and architecture overlays that are
+        present in the module_settings.json file.  They are only parsed the
+        first time they are needed.
+        """
+
+        if self._dependencies is not None:
+            return self._dependencies
+
+        archs_with_deps = [viewitems(y['depends']) for _x, y in viewitems(self.architectures) if 'depends' in y]
+        if 'depends' in self.settings:
+            archs_with_deps.append(viewitems(self.settings['depends']))
 
         #Also search through overlays to architectures that are defined in this module_settings.json file
         #and see if those overlays contain dependencies.
@@ -212,6 +446,7 @@ class IOTile(object):
             if 'depends' in overlay_arch:
                 archs_with_deps.append(viewitems(overlay_arch['depends']))
 
+        dependencies = []
         found_deps = set()
         for dep, _ in itertools.chain(*archs_with_deps):
             name, _, version = dep.partition(',')
@@ -231,31 +466,34 @@ class IOTile(object):
             }
 
             if name not in found_deps:
-                self.dependencies.append(depdict)
+                dependencies.append(depdict)
 
             found_deps.add(name)
 
-        # Store any architectures that we find in this json file for future reference
-        self.architectures = architectures
+        self._dependencies = dependencies
+        return dependencies
 
-        # Setup our support package information
-        self.support_distribution = "iotile_support_{0}_{1}".format(self.short_name, self.parsed_version.major)
+    @property
+    def support_wheel_depends(self):
+        """All of the python packages needed by this module's support wheel."""
 
-        if 'python_universal' in self.settings:
-            py_version = "py2.py3"
-        elif sys.version_info[0] >= 3:
-            py_version = "py3"
-        else:
-            py_version = "py2"
+        if self._support_wheel_depends is None:
+            self._support_wheel_depends = list(self.settings.get('python_depends', []))
 
-        self.support_wheel = "{0}-{1}-{2}-none-any.whl".format(self.support_distribution,
-                                                               self.parsed_version.pep440_string(),
-                                                               py_version)
-        self.has_wheel = False
+        return self._support_wheel_depends
+
+    @property
+    def has_wheel(self):
+        """Whether this module provides any python products in a support wheel.
+
+        This does not depend on any filter set with filter_products().
+        """
+
+        if self._has_wheel is None:
+            wheel_types = frozenset(['proxy_module', 'proxy_plugin', 'type_package', 'app_module', 'build_step'])
+            self._has_wheel = any(x in wheel_types for x in itervalues(self.products))
 
-        if len(self.proxy_modules()) > 0 or len(self.proxy_plugins()) > 0 or len(self.type_packages()) > 0 or \
-           len(self.app_modules()) > 0 or len(self.build_steps()) > 0:
-            self.has_wheel = True
+        return self._has_wheel
 
     def include_directories(self):
         """
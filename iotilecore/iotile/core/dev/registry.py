@@ -85,6 +85,23 @@ class ComponentRegistry(object):
 
         self.kvstore.set(tile.name, value)
 
+    def add_components(self, components):
+        """Register multiple components with ComponentRegistry at once.
+
+        This is equivalent to calling add_component for each component but
+        all of them are saved to the registry in a single batch.
+
+        Args:
+            components (list of string): The paths to the components to add.
+        """
+
+        items = []
+        for component in components:
+            tile = IOTile(component)
+            items.append((tile.name, os.path.normpath(os.path.abspath(component))))
+
+        self.kvstore.set_many(items)
+
     def get_component(self, component):
         try:
             comp_path = self.kvstore.get(component)
@@ -121,8 +138,9 @@ class ComponentRegistry(object):
         """Clear all of the registered components
         """
 
-        for key in self.list_components():
-            self.remove_component(key)
+        with self.kvstore.transaction():
+            for key in self.list_components():
+                self.remove_component(key)
 
     def clear(self):
         """Clear all data from the registry
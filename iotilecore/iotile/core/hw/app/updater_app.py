@@ -160,8 +160,6 @@ class DeviceUpdater(IOTileApp):
                 after running the script.
         """
 
-        raw_data = script.encode()
-
         status, _err = self._query_status()
         if status == self.ReceivedScript and force:
             self._reset_script()
@@ -174,7 +172,7 @@ class DeviceUpdater(IOTileApp):
 
         progress.start()
         try:
-            self.push_script(raw_data, progress)
+            self.push_script(script, progress)
         finally:
             progress.end()
 
@@ -277,7 +275,11 @@ class DeviceUpdater(IOTileApp):
             sys.stdout.write('\n')
 
     def push_script(self, data, progress=None):
-        """Push a byte array into the controller as a remote script."""
+        """Push a byte array or UpdateScript into the controller as a remote script.
+
+        If an UpdateScript is passed and the transport supports it, the
+        script is encoded incrementally as it is sent.
+        """
 
         def _update_progress(current, total):
             if progress is not None:
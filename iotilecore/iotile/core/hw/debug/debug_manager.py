@@ -15,6 +15,7 @@ from typedargs.annotate import context, docannotate
 from iotile.core.exceptions import ArgumentError, ExternalError
 from iotile.core.utilities.console import ProgressBar
 from iotile.core.utilities.intelhex import IntelHex
+from .snapshot import encode_snapshot, decode_snapshot, is_binary_snapshot
 
 
 @context("DebugManager")
@@ -51,7 +52,7 @@ class DebugManager(object):
             outfile.write(ram_contents)
 
     @docannotate
-    def save_snapshot(self, out_path):
+    def save_snapshot(self, out_path, binary=False, compress=True, base=None):
         """Save the current state of an emulated device.
 
         This debug routine is only supported for emulated devices that
@@ -61,19 +62,46 @@ class DebugManager(object):
         be used in a later call to load_snapshot() in order to reload
         the exact same state.
 
+        Snapshots can be saved as JSON or in a compact binary format that
+        packs stored readings into 16 byte records.  Binary snapshots may
+        also be saved as a delta against a previous full binary snapshot,
+        in which case only the changes since that snapshot are saved.
+
         Args:
             out_path (path): The output path at which to save
                 the binary core dump.  This core dump consists
                 of the current contents of RAM for the device.
+            binary (bool): Save the snapshot in the compact binary format
+                rather than as JSON.  Defaults to False.
+            compress (bool): Whether to compress binary snapshots.  This
+                is ignored for JSON snapshots.
+            base (path): Optional path to a full binary snapshot.  If given,
+                a binary delta snapshot is saved that can only be loaded
+                together with this base snapshot.
         """
 
+        if base is not None and not binary:
+            raise ArgumentError("Delta snapshots are only supported in the binary snapshot format")
+
         internal_state = self.dump_snapshot()
 
-        with open(out_path, "w") as outfile:
-            json.dump(internal_state, outfile, indent=4)
+        if not binary:
+            with open(out_path, "w") as outfile:
+                json.dump(internal_state, outfile, indent=4)
+            return
+
+        base_data = None
+        if base is not None:
+            with open(base, "rb") as infile:
+                base_data = infile.read()
+
+        encoded = encode_snapshot(internal_state, compress=compress, base=base_data)
+
+        with open(out_path, "wb") as outfile:
+            outfile.write(encoded)
 
     @docannotate
-    def load_snapshot(self, in_path):
+    def load_snapshot(self, in_path, base=None):
         """Load the current state of an emulated device.
 
         This debug routine is only supported for emulated devices that
@@ -81,16 +109,30 @@ class DebugManager(object):
 
         For those devices this method takes a path to a previously produced
         snapshot file from a call to save_snapshot() and will load that
-        snapshot into the currently emulated device.
+        snapshot into the currently emulated device.  Both JSON and binary
+        snapshots are supported and detected automatically.
 
         Args:
             in_path (path): The output path at which to save
                 the binary core dump.  This core dump consists
                 of the current contents of RAM for the device.
+            base (path): The path to the full binary snapshot that a
+                delta snapshot was saved against.  This is required when
+                loading a delta snapshot.
         """
 
-        with open(in_path, "r") as infile:
-            internal_state = json.load(infile)
+        with open(in_path, "rb") as infile:
+            data = infile.read()
+
+        if is_binary_snapshot(data):
+            base_data = None
+            if base is not None:
+                with open(base, "rb") as infile:
+                    base_data = infile.read()
+
+            internal_state = decode_snapshot(data, base=base_data)
+        else:
+            internal_state = json.loads(data.decode('utf-8'))
 
         self.restore_snapshot(internal_state)
 
@@ -0,0 +1,421 @@
+"""A compact binary format for emulated device state snapshots.
+
+Snapshots of emulated devices are nested dictionaries that are mostly made
+up of lists of readings produced by IOTileReading.asdict().  Saved as JSON,
+each reading takes around 100 bytes.  This module saves snapshots using
+msgpack instead, with every list of readings packed into 16 byte records in
+the same format used by signed list reports:
+
+    <HHLLL: stream, reserved, reading_id, raw_time, value
+
+Readings that do not fit into that format, for example because they have
+a UTC timestamp attached, are left as dictionaries.
+
+Snapshots can optionally be compressed and can be saved as a delta against
+a previous full snapshot.  A delta only contains the values that changed
+and, for lists of readings, only the readings that were added since the base
+snapshot, which makes frequent checkpoints of a device cheap.
+
+When a snapshot is decoded, lists of readings are returned as PackedReadings
+objects that only unpack each reading when it is accessed.
+"""
+
+from builtins import range
+import struct
+import zlib
+import msgpack
+from future.utils import viewitems
+from iotile.core.exceptions import ArgumentError, DataError
+
+SNAPSHOT_MAGIC = b'IOTSNAP\x00'
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<8sBBL")
+_READING = struct.Struct("<HHLLL")
+_SKIP = struct.Struct("<L")
+
+_FLAG_COMPRESSED = 1 << 0
+_FLAG_DELTA = 1 << 1
+
+_EXT_READINGS = 1
+_EXT_READINGS_DELTA = 2
+_EXT_DICT_DELTA = 3
+
+_READING_KEYS = frozenset(['stream', 'device_timestamp', 'streamer_local_id', 'timestamp', 'value'])
+
+_SAME = object()
+
+
+class PackedReadings(object):
+    """A read-only list of reading dictionaries stored as packed records.
+
+    Readings are only unpacked when they are accessed, so restoring a
+    snapshot does not need to create any intermediate dictionaries until
+    the readings are actually used.
+
+    Args:
+        data (bytes): The packed 16 byte reading records.
+    """
+
+    def __init__(self, data):
+        if len(data) % _READING.size != 0:
+            raise DataError("Packed reading data is not a multiple of the record size",
+                            length=len(data), record_size=_READING.size)
+
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // _READING.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if index < 0 or index >= len(self):
+            raise IndexError("PackedReadings index out of range")
+
+        return _unpack_reading(self.data, index * _READING.size)
+
+    def __iter__(self):
+        for offset in range(0, len(self.data), _READING.size):
+            yield _unpack_reading(self.data, offset)
+
+    def __eq__(self, other):
+        if isinstance(other, PackedReadings):
+            return self.data == other.data
+
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "PackedReadings(%d readings)" % len(self)
+
+
+class _ReadingsDelta(object):
+    def __init__(self, data):
+        self.skip, = _SKIP.unpack_from(data)
+        self.data = data[_SKIP.size:]
+
+
+class _DictDelta(object):
+    def __init__(self, changed, removed):
+        self.changed = changed
+        self.removed = removed
+
+
+def _unpack_reading(data, offset):
+    stream, _reserved, reading_id, raw_time, value = _READING.unpack_from(data, offset)
+
+    return {
+        'stream': stream,
+        'device_timestamp': raw_time,
+        'streamer_local_id': reading_id,
+        'timestamp': None,
+        'value': value
+    }
+
+
+def _pack_readings(value):
+    """Pack a list of reading dicts into records or return None if not possible."""
+
+    if isinstance(value, PackedReadings):
+        return value.data
+
+    if not isinstance(value, list) or len(value) == 0:
+        return None
+
+    packed = bytearray()
+    for reading in value:
+        if not isinstance(reading, dict) or frozenset(reading) != _READING_KEYS:
+            return None
+
+        if reading['timestamp'] is not None:
+            return None
+
+        try:
+            packed += _READING.pack(reading['stream'], 0, reading['streamer_local_id'],
+                                    reading['device_timestamp'], reading['value'])
+        except (struct.error, TypeError):
+            return None
+
+    return bytes(packed)
+
+
+def _compact(value):
+    """Replace all lists of readings inside value with packed records."""
+
+    if isinstance(value, dict):
+        return {key: _compact(val) for key, val in viewitems(value)}
+
+    if isinstance(value, (list, PackedReadings)):
+        packed = _pack_readings(value)
+        if packed is not None:
+            return msgpack.ExtType(_EXT_READINGS, packed)
+
+        return [_compact(x) for x in value]
+
+    return value
+
+
+def _diff(base, value):
+    """Build the delta that turns base into value or _SAME if they are equal."""
+
+    if isinstance(value, dict) and isinstance(base, dict):
+        changed = {}
+        for key, val in viewitems(value):
+            if key not in base:
+                changed[key] = _compact(val)
+                continue
+
+            delta = _diff(base[key], val)
+            if delta is not _SAME:
+                changed[key] = delta
+
+        removed = [key for key in base if key not in value]
+        if len(changed) == 0 and len(removed) == 0:
+            return _SAME
+
+        return msgpack.ExtType(_EXT_DICT_DELTA, _packb([changed, removed]))
+
+    packed = _pack_readings(value)
+    if packed is not None and isinstance(base, PackedReadings):
+        if packed == base.data:
+            return _SAME
+
+        skip = _find_overlap(base.data, packed)
+        if skip is not None:
+            overlap = len(base.data) - skip
+            return msgpack.ExtType(_EXT_READINGS_DELTA, _SKIP.pack(skip // _READING.size) + packed[overlap:])
+
+        return msgpack.ExtType(_EXT_READINGS, packed)
+
+    if base == value:
+        return _SAME
+
+    return _compact(value)
+
+
+def _find_overlap(base, packed):
+    """Find where packed continues base after dropping readings from its start.
+
+    Readings buffers only ever have readings removed from the front and added
+    to the back so the new buffer is a suffix of the old one followed by any
+    new readings.
+
+    Returns:
+        int: The offset in base of the first reading that is still present or
+            None if packed is not a continuation of base.
+    """
+
+    first = packed[:_READING.size]
+    offset = base.find(first)
+    while offset >= 0 and offset % _READING.size != 0:
+        offset = base.find(first, offset + 1)
+
+    if offset < 0:
+        return None
+
+    if packed[:len(base) - offset] != base[offset:]:
+        return None
+
+    return offset
+
+
+def _apply(base, delta):
+    if isinstance(delta, _DictDelta):
+        if not isinstance(base, dict):
+            raise DataError("Snapshot delta does not match its base snapshot")
+
+        result = dict(base)
+        for key, val in viewitems(delta.changed):
+            result[key] = _apply(base.get(key), val)
+
+        for key in delta.removed:
+            result.pop(key, None)
+
+        return result
+
+    if isinstance(delta, _ReadingsDelta):
+        if not isinstance(base, PackedReadings) or delta.skip > len(base):
+            raise DataError("Snapshot delta does not match its base snapshot")
+
+        return PackedReadings(base.data[delta.skip * _READING.size:] + delta.data)
+
+    return delta
+
+
+def _ext_hook(code, data):
+    if code == _EXT_READINGS:
+        return PackedReadings(data)
+    elif code == _EXT_READINGS_DELTA:
+        return _ReadingsDelta(data)
+    elif code == _EXT_DICT_DELTA:
+        changed, removed = _unpackb(data)
+        return _DictDelta(changed, removed)
+
+    raise DataError("Unknown extension type in snapshot", code=code)
+
+
+def _packb(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def _unpack_options():
+    """Allow non-string map keys, which newer msgpack versions reject by default."""
+
+    try:
+        msgpack.unpackb(_packb({}), strict_map_key=False)
+    except TypeError:
+        return {}
+
+    return {'strict_map_key': False}
+
+
+_UNPACK_OPTIONS = _unpack_options()
+
+
+def _unpackb(data):
+    return msgpack.unpackb(data, raw=False, ext_hook=_ext_hook, **_UNPACK_OPTIONS)
+
+
+def _parse(data):
+    if len(data) < _HEADER.size:
+        raise DataError("Snapshot is too short to contain a header", length=len(data))
+
+    magic, version, flags, base_crc = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise DataError("Snapshot does not start with the binary snapshot magic number")
+
+    if version != SNAPSHOT_VERSION:
+        raise DataError("Unsupported binary snapshot version", version=version, supported=SNAPSHOT_VERSION)
+
+    body = data[_HEADER.size:]
+
+    try:
+        if flags & _FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+
+        state = _unpackb(body)
+    except (ValueError, zlib.error, msgpack.ExtraData, msgpack.UnpackException) as exc:
+        raise DataError("Could not decode snapshot contents: %s" % str(exc))
+
+    return state, bool(flags & _FLAG_DELTA), base_crc
+
+
+def _checksum(data):
+    return zlib.crc32(data) & 0xFFFFFFFF
+
+
+def is_binary_snapshot(data):
+    """Check if data contains a binary snapshot.
+
+    Args:
+        data (bytes): The contents of a snapshot file.
+
+    Returns:
+        bool: True if this is a binary snapshot, False if it is not and should
+            be treated as JSON.
+    """
+
+    return data[:len(SNAPSHOT_MAGIC)] == SNAPSHOT_MAGIC
+
+
+def is_delta_snapshot(data):
+    """Check if data contains a binary snapshot that needs a base to be decoded.
+
+    Args:
+        data (bytes): The contents of a snapshot file.
+
+    Returns:
+        bool: True if this is a delta snapshot.
+    """
+
+    if not is_binary_snapshot(data) or len(data) < _HEADER.size:
+        return False
+
+    _magic, _version, flags, _base_crc = _HEADER.unpack_from(data)
+    return bool(flags & _FLAG_DELTA)
+
+
+def encode_snapshot(state, compress=True, base=None):
+    """Encode a snapshot dictionary into the binary snapshot format.
+
+    Args:
+        state (dict): The snapshot to encode, as returned by
+            DebugManager.dump_snapshot().
+        compress (bool): Whether to compress the encoded snapshot with zlib.
+        base (bytes): Optional full binary snapshot, previously returned by
+            this function, to encode state as a delta against.  Delta
+            snapshots can only be decoded with the same base snapshot.
+
+    Returns:
+        bytes: The encoded snapshot.
+    """
+
+    flags = 0
+    base_crc = 0
+
+    if base is not None:
+        base_state, base_delta, _base_crc = _parse(base)
+        if base_delta:
+            raise ArgumentError("The base for a delta snapshot must be a full snapshot")
+
+        body = _diff(base_state, state)
+        if body is _SAME:
+            body = msgpack.ExtType(_EXT_DICT_DELTA, _packb([{}, []]))
+
+        flags |= _FLAG_DELTA
+        base_crc = _checksum(base)
+    else:
+        body = _compact(state)
+
+    body = _packb(body)
+    if compress:
+        flags |= _FLAG_COMPRESSED
+        body = zlib.compress(body)
+
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags, base_crc) + body
+
+
+def decode_snapshot(data, base=None):
+    """Decode a snapshot previously encoded with encode_snapshot().
+
+    Lists of readings are returned as PackedReadings objects that behave
+    like read-only lists of reading dictionaries but only unpack each
+    reading when it is accessed.
+
+    Args:
+        data (bytes): The encoded snapshot.
+        base (bytes): The full snapshot that data was encoded against, if it
+            is a delta snapshot.
+
+    Returns:
+        dict: The decoded snapshot state.
+
+    Raises:
+        ArgumentError: If data is a delta snapshot and base is missing or is
+            not the snapshot it was encoded against.
+        DataError: If data is not a valid binary snapshot.
+    """
+
+    state, delta, base_crc = _parse(data)
+    if not delta:
+        return state
+
+    if base is None:
+        raise ArgumentError("A base snapshot is required to decode a delta snapshot")
+
+    if _checksum(base) != base_crc:
+        raise ArgumentError("Delta snapshot was not encoded against the given base snapshot",
+                            expected_crc=base_crc, actual_crc=_checksum(base))
+
+    base_state, base_delta, _base_crc = _parse(base)
+    if base_delta:
+        raise ArgumentError("The base for a delta snapshot must be a full snapshot")
+
+    return _apply(base_state, state)
@@ -17,6 +17,16 @@ from iotile.core.exceptions import *
 from ..virtual import unpack_rpc_payload
 from builtins import str, int
 
+try:
+    import asyncio
+except ImportError:  # asyncio is only available on python 3
+    asyncio = None
+
+# Settings for retrying RPCs in rpc_async when a tile reports that it is busy
+BUSY_RETRY_COUNT = 10
+BUSY_BACKOFF_INITIAL = 0.05
+BUSY_BACKOFF_MAX = 2.0
+
 
 class TileBusProxyObject(object):
     def __init__(self, stream, address):
@@ -42,31 +52,12 @@ class TileBusProxyObject(object):
         """
 
         rpc_id = (feature << 8 | cmd)
-
-        if 'arg_format' in kw:
-            packed_args = struct.pack("<{}".format(kw['arg_format']), *args)
-        elif not args:
-            packed_args = b''
-        else:
-            packed_args = self._format_args(args)
+        packed_args = self._pack_rpc_args(args, kw)
 
         status, payload = self.stream.send_rpc(self.addr, rpc_id, packed_args, **kw)
 
-        unpack_flag = False
-        if "result_type" in kw:
-            res_type = kw['result_type']
-        elif "result_format" in kw:
-            unpack_flag = True
-            res_type = (0, True)
-        else:
-            res_type = (0, False)
-
         try:
-            res = self._parse_rpc_result(status, payload, *res_type, command=rpc_id)
-            if unpack_flag:
-                return unpack_rpc_payload("%s" % kw["result_format"], res['buffer'])
-
-            return res
+            return self._interpret_rpc_result(rpc_id, status, payload, kw)
         except ModuleBusyError:
             pass
 
@@ -80,6 +71,119 @@ class TileBusProxyObject(object):
             sleep(0.1)
             return self.rpc(feature, cmd, *args, **kw)
 
+    def rpc_async(self, feature, cmd, *args, **kw):
+        """Send an RPC call to this module without blocking.
+
+        This is the asyncio counterpart of rpc() and takes the same arguments
+        and keywords.  It returns a future that resolves to the same value
+        that rpc() would return, so many RPCs, potentially to different
+        tiles or devices, can be run concurrently using asyncio.gather().
+
+        If the tile reports that it is busy, the RPC is retried after a delay
+        that doubles on every attempt.  The delay is scheduled on the event
+        loop so no thread is blocked while waiting for the tile.
+
+        Args:
+            feature (int): The high byte of the RPC id.
+            cmd (int): The low byte of the RPC id.
+            *args: The RPC arguments, packed the same way as in rpc().
+            **kw: The same keywords as rpc() plus two additional ones:
+                loop (asyncio.AbstractEventLoop): The event loop to use.
+                    Defaults to the current event loop.
+                retries (int): The maximum number of times to retry the RPC
+                    if the tile is busy.  Defaults to 10.
+
+        Returns:
+            asyncio.Future: A future with the result of the RPC.  If the tile
+            is still busy after all retries, the future fails with
+            ModuleBusyError.
+        """
+
+        if asyncio is None:
+            raise StreamOperationNotSupportedError(command="rpc_async")
+
+        loop = kw.pop('loop', None)
+        if loop is None:
+            loop = asyncio.get_event_loop()
+
+        retries = kw.pop('retries', BUSY_RETRY_COUNT)
+
+        rpc_id = (feature << 8 | cmd)
+        packed_args = self._pack_rpc_args(args, kw)
+
+        return self._send_rpc_with_backoff(loop, rpc_id, packed_args, retries, kw)
+
+    def _send_rpc_with_backoff(self, loop, rpc_id, packed_args, retries, kw):
+        """Send an RPC asynchronously, retrying with exponential backoff if busy."""
+
+        result = loop.create_future()
+        state = {'retries': retries, 'delay': BUSY_BACKOFF_INITIAL}
+
+        def _send_attempt():
+            if result.cancelled():
+                return
+
+            try:
+                pending = self.stream.send_rpc_async(self.addr, rpc_id, packed_args, loop=loop, **kw)
+            except Exception as exc:  # pylint: disable=W0703; all errors are passed back through the future
+                result.set_exception(exc)
+                return
+
+            pending.add_done_callback(_on_response)
+
+        def _on_response(pending):
+            if result.cancelled():
+                return
+
+            try:
+                status, payload = pending.result()
+                value = self._interpret_rpc_result(rpc_id, status, payload, kw)
+            except ModuleBusyError as exc:
+                if state['retries'] <= 0:
+                    result.set_exception(exc)
+                    return
+
+                state['retries'] -= 1
+                loop.call_later(state['delay'], _send_attempt)
+                state['delay'] = min(state['delay'] * 2, BUSY_BACKOFF_MAX)
+                return
+            except Exception as exc:  # pylint: disable=W0703; all errors are passed back through the future
+                result.set_exception(exc)
+                return
+
+            result.set_result(value)
+
+        _send_attempt()
+        return result
+
+    def _pack_rpc_args(self, args, kw):
+        """Pack RPC arguments according to the arg_format keyword if given."""
+
+        if 'arg_format' in kw:
+            return struct.pack("<{}".format(kw['arg_format']), *args)
+        elif not args:
+            return b''
+
+        return self._format_args(args)
+
+    def _interpret_rpc_result(self, rpc_id, status, payload, kw):
+        """Parse an RPC response according to the result_type or result_format keywords."""
+
+        unpack_flag = False
+        if "result_type" in kw:
+            res_type = kw['result_type']
+        elif "result_format" in kw:
+            unpack_flag = True
+            res_type = (0, True)
+        else:
+            res_type = (0, False)
+
+        res = self._parse_rpc_result(status, payload, *res_type, command=rpc_id)
+        if unpack_flag:
+            return unpack_rpc_payload("%s" % kw["result_format"], res['buffer'])
+
+        return res
+
     def _convert_int(self, arg):
         out = bytearray(2)
 
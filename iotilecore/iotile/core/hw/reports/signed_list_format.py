@@ -10,6 +10,8 @@ from iotile.core.exceptions import ArgumentError, NotFoundError, ExternalError
 from iotile.core.hw.auth.auth_provider import AuthProvider
 from iotile.core.hw.auth.auth_chain import ChainedAuthProvider
 
+_READING = struct.Struct("<HHLLL")
+
 
 class SignedListReport(IOTileReport):
     """A report that consists of a signed list of readings.
@@ -83,11 +85,8 @@ class SignedListReport(IOTileReport):
         header = struct.pack("<BBHLLLBBH", cls.ReportType, len_low, len_high, uuid, report_id, sent_timestamp, root_key, streamer, selector)
         header = bytearray(header)
 
-        packed_readings = bytearray()
-
-        for reading in readings:
-            packed_reading = struct.pack("<HHLLL", reading.stream, 0, reading.reading_id, reading.raw_time, reading.value)
-            packed_readings += bytearray(packed_reading)
+        pack = _READING.pack
+        packed_readings = bytearray(b''.join([pack(x.stream, 0, x.reading_id, x.raw_time, x.value) for x in readings]))
 
         footer_stats = struct.pack("<LL", lowest_id, highest_id)
 
@@ -18,11 +18,22 @@ reconstruction process is exact.
 However, in the general case, an exact assignment is not possible and
 UTCAssigner uses various other methods to infer an appoximate UTC timestamp,
 returning confidence metrics along with the assigned value.
+
+Assigning UTC times to a large number of readings is done using a table of
+all of the anchor points.  For every anchor it stores the next anchor with a
+known UTC time and running totals of the uptime that passes and the number
+of inexact steps and breaks between anchors, so any reading can be assigned
+with a single binary search and a few subtractions rather than walking
+forward over anchors one at a time.  New anchors are inserted into the table
+as they are added and only the totals after the earliest new anchor are
+updated, so adding reports in order and assigning times in between costs
+time proportional to the size of each report rather than to every anchor
+seen so far.
 """
 
+import bisect
 import datetime
 from typedargs.exceptions import ArgumentError
-from sortedcontainers import SortedKeyList
 from .signed_list_format import SignedListReport
 
 
@@ -41,6 +52,144 @@ class _TimeAnchor(object):
         return _TimeAnchor(self.reading_id, self.uptime, self.utc, self.is_break)
 
 
+def _anchor_step(last_uptime, curr):
+    """Classify moving from one anchor to the next.
+
+    Returns:
+        (int, bool, bool): The uptime that passed, whether the step was
+            exact and whether it crossed a break.
+    """
+
+    if curr.uptime is None or last_uptime is None:
+        return 0, False, False
+    elif curr.is_break or curr.uptime < last_uptime:
+        return 0, False, True
+
+    return curr.uptime - last_uptime, True, False
+
+
+class _AnchorTable(object):
+    """Running totals over a sorted list of anchor points.
+
+    All running totals are indexed by anchor and count every step from the
+    first anchor up to and including that anchor, so the totals over the
+    steps between anchors i and j are the difference of their entries.
+
+    Anchors are inserted in reading id order as they are added, after any
+    existing anchors with the same reading id.  The totals are brought up
+    to date lazily, starting from the earliest anchor inserted since they
+    were last updated.
+    """
+
+    def __init__(self):
+        self.anchors = []
+        self.reading_ids = []
+        self.next_utc = []
+        self.uptime = []
+        self.inexact = []
+        self.breaks = []
+
+        self._stale_from = 0
+
+    def __len__(self):
+        return len(self.anchors)
+
+    def insert(self, anchor):
+        """Insert a single anchor point."""
+
+        i = bisect.bisect_right(self.reading_ids, anchor.reading_id)
+
+        self.anchors.insert(i, anchor)
+        self.reading_ids.insert(i, anchor.reading_id)
+        self.next_utc.insert(i, None)
+        self.uptime.insert(i, 0)
+        self.inexact.insert(i, 0)
+        self.breaks.insert(i, 0)
+
+        self._stale_from = min(self._stale_from, i)
+
+    def extend(self, anchors):
+        """Insert many anchor points."""
+
+        for anchor in sorted(anchors, key=lambda x: x.reading_id):
+            self.insert(anchor)
+
+    def _update(self):
+        """Recompute the totals of every anchor after the earliest new one."""
+
+        start = self._stale_from
+        count = len(self.anchors)
+        if start >= count:
+            return
+
+        anchors = self.anchors
+
+        if start == 0:
+            uptime = inexact = breaks = 0
+            start = 1
+        else:
+            uptime = self.uptime[start - 1]
+            inexact = self.inexact[start - 1]
+            breaks = self.breaks[start - 1]
+
+        for i in range(start, count):
+            delta, exact, crossed_break = _anchor_step(anchors[i - 1].uptime, anchors[i])
+            uptime += delta
+            inexact += not exact
+            breaks += crossed_break
+
+            self.uptime[i] = uptime
+            self.inexact[i] = inexact
+            self.breaks[i] = breaks
+
+        # Anchors before the last utc anchor ahead of the new ones still
+        # point at it and it has not moved, so we can stop there.
+        next_utc = None
+        for i in range(count - 1, -1, -1):
+            self.next_utc[i] = next_utc
+            if anchors[i].utc is not None:
+                next_utc = i
+                if i < self._stale_from:
+                    break
+
+        self._stale_from = count
+
+    def assign(self, reading_id, uptime=None):
+        """Assign a utc time to a reading, see UTCAssigner.assign_utc."""
+
+        self._update()
+
+        i = bisect.bisect_left(self.reading_ids, reading_id)
+        if i == len(self.reading_ids):
+            return None
+
+        anchor = self.anchors[i]
+        found_id = anchor.reading_id == reading_id
+        if found_id and anchor.utc is not None:
+            return UTCAssignment(reading_id, anchor.utc, True, True, False)
+
+        j = self.next_utc[i]
+        if j is None:
+            return None
+
+        accum_delta = self.uptime[j] - self.uptime[i]
+        inexact = self.inexact[j] - self.inexact[i]
+        breaks = self.breaks[j] - self.breaks[i]
+
+        # If we are given an uptime, it replaces the uptime of the anchor
+        # that we start from, which only changes the first step
+        if uptime is not None:
+            old_delta, old_exact, old_break = _anchor_step(anchor.uptime, self.anchors[i + 1])
+            delta, exact, crossed_break = _anchor_step(uptime, self.anchors[i + 1])
+
+            accum_delta += delta - old_delta
+            inexact += old_exact - exact
+            breaks += crossed_break - old_break
+
+        time_delta = datetime.timedelta(seconds=accum_delta)
+        return UTCAssignment(reading_id, self.anchors[j].utc - time_delta, found_id, inexact == 0, breaks > 0)
+
+
 class UTCAssignment(object):
     _Y2KReference = datetime.datetime(2000, 1, 1)
 
@@ -64,7 +213,7 @@ class UTCAssigner(object):
     _Y2KReference = datetime.datetime(2000, 1, 1)
 
     def __init__(self):
-        self._anchor_points = SortedKeyList(key=lambda x: x.reading_id)
+        self._anchor_points = _AnchorTable()
         self._anchor_streams = {}
         self._break_streams = set()
 
@@ -96,34 +245,25 @@ class UTCAssigner(object):
         delta = datetime.timedelta(seconds=timestamp)
         return cls._Y2KReference + delta
 
-    def add_point(self, reading_id, uptime=None, utc=None, is_break=False):
-        """Add a time point that could be used as a UTC reference."""
-
+    def _create_anchor(self, reading_id, uptime=None, utc=None, is_break=False):
         if reading_id == 0:
-            return
+            return None
 
         if uptime is None and utc is None:
-            return
+            return None
 
-        if uptime & (1 << 31):
+        if uptime is not None and uptime & (1 << 31):
             if utc is not None:
-                return
+                return None
 
             uptime &= ~(1 << 31)
 
             utc = self.convert_rtc(uptime)
             uptime = None
 
-        anchor = _TimeAnchor(reading_id, uptime, utc, is_break)
-
-        if anchor in self._anchor_points:
-            return
-
-        self._anchor_points.add(anchor)
-
-    def add_reading(self, reading):
-        """Add an IOTileReading."""
+        return _TimeAnchor(reading_id, uptime, utc, is_break)
 
+    def _anchor_for_reading(self, reading):
         is_break = False
         utc = None
 
@@ -133,7 +273,42 @@ class UTCAssigner(object):
         if reading.stream in self._anchor_streams:
             utc = self._anchor_streams[reading.stream](reading)
 
-        self.add_point(reading.reading_id, reading.raw_time, utc, is_break=is_break)
+        return self._create_anchor(reading.reading_id, reading.raw_time, utc, is_break=is_break)
+
+    def add_point(self, reading_id, uptime=None, utc=None, is_break=False):
+        """Add a time point that could be used as a UTC reference."""
+
+        anchor = self._create_anchor(reading_id, uptime, utc, is_break)
+        if anchor is None:
+            return
+
+        self._anchor_points.insert(anchor)
+
+    def add_reading(self, reading):
+        """Add an IOTileReading."""
+
+        anchor = self._anchor_for_reading(reading)
+        if anchor is None:
+            return
+
+        self._anchor_points.insert(anchor)
+
+    def add_readings(self, readings):
+        """Add many IOTileReadings at once.
+
+        This is equivalent to calling add_reading on each reading but the
+        anchor points are inserted in a single batch.
+
+        Args:
+            readings (iterable of IOTileReading): The readings to add.
+        """
+
+        anchors = [self._anchor_for_reading(x) for x in readings]
+        anchors = [x for x in anchors if x is not None]
+        if len(anchors) == 0:
+            return
+
+        self._anchor_points.extend(anchors)
 
     def add_report(self, report, ignore_errors=False):
         """Add all anchors from a report."""
@@ -144,11 +319,35 @@ class UTCAssigner(object):
 
             raise ArgumentError("You can only add SignedListReports to a UTCAssigner", report=report)
 
-        for reading in report.visible_readings:
-            self.add_reading(reading)
-
+        self.add_readings(report.visible_readings)
         self.add_point(report.report_id, report.sent_timestamp, report.received_time)
 
+    def add_reports(self, reports, ignore_errors=False):
+        """Add all anchors from many reports in a single batch.
+
+        Args:
+            reports (iterable of IOTileReport): The reports to add.
+            ignore_errors (bool): Skip reports that are not SignedListReports
+                rather than raising an exception.
+        """
+
+        anchors = []
+        for report in reports:
+            if not isinstance(report, SignedListReport):
+                if ignore_errors:
+                    continue
+
+                raise ArgumentError("You can only add SignedListReports to a UTCAssigner", report=report)
+
+            anchors.extend(self._anchor_for_reading(x) for x in report.visible_readings)
+            anchors.append(self._create_anchor(report.report_id, report.sent_timestamp, report.received_time))
+
+        anchors = [x for x in anchors if x is not None]
+        if len(anchors) == 0:
+            return
+
+        self._anchor_points.extend(anchors)
+
     def assign_utc(self, reading_id, uptime=None):
         """Assign a utc datetime to a reading id.
 
@@ -161,38 +360,34 @@ class UTCAssigner(object):
         if len(self._anchor_points) == 0:
             return None
 
-        if reading_id > self._anchor_points[-1].reading_id:
-            return None
-
-        i = self._anchor_points.bisect_key_left(reading_id)
-        found_id = False
-        crossed_break = False
-        exact = True
+        return self._anchor_points.assign(reading_id, uptime)
 
-        last = self._anchor_points[i].copy()
-        if uptime is not None:
-            last.uptime = uptime
+    def assign_utc_many(self, reading_ids, uptimes=None):
+        """Assign utc datetimes to many reading ids at once.
 
-        if last.reading_id == reading_id:
-            found_id = True
+        This is equivalent to calling assign_utc for each reading id.
 
-            if last.utc is not None:
-                return last.utc
+        Args:
+            reading_ids (iterable of int): The reading ids to assign.
+            uptimes (iterable of int): Optional uptimes for each reading, as
+                would be passed to assign_utc.  If given, it must have the same
+                length as reading_ids.
 
-        accum_delta = 0
-        for curr in self._anchor_points.islice(i + 1):
-            if curr.uptime is None or last.uptime is None:
-                exact = False
-            elif curr.is_break or curr.uptime < last.uptime:
-                exact = False
-                crossed_break = True
-            else:
-                accum_delta += curr.uptime - last.uptime
+        Returns:
+            list of UTCAssignment: The assignment for each reading id or None
+                if a utc value could not be assigned to it.
+        """
 
-            if curr.utc is not None:
-                time_delta = datetime.timedelta(seconds=accum_delta)
-                return UTCAssignment(reading_id, curr.utc - time_delta, found_id, exact, crossed_break)
+        reading_ids = list(reading_ids)
+        if uptimes is None:
+            uptimes = [None] * len(reading_ids)
+        else:
+            uptimes = list(uptimes)
+            if len(uptimes) != len(reading_ids):
+                raise ArgumentError("You must pass one uptime per reading id", reading_ids=len(reading_ids), uptimes=len(uptimes))
 
-            last = curr
+        if len(self._anchor_points) == 0:
+            return [None] * len(reading_ids)
 
-        return None
+        assign = self._anchor_points.assign
+        return [assign(reading_id, uptime) for reading_id, uptime in zip(reading_ids, uptimes)]
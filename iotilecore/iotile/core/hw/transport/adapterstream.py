@@ -11,6 +11,7 @@ import time
 from iotile.core.exceptions import HardwareError, ArgumentError
 from iotile.core.utilities.typedargs import iprint
 from iotile.core.hw.reports import BroadcastReport
+from iotile.core.hw.update import UpdateScript
 
 
 class AdapterCMDStream(CMDStream):
@@ -205,11 +206,82 @@ class AdapterCMDStream(CMDStream):
 
         return status, payload
 
+    def _send_rpc_async(self, address, rpc_id, payload, callback, loop, **kwargs):
+        """Send an RPC through the adapter's callback based API.
+
+        callback is called as callback(exception, status, payload) from
+        whatever thread the DeviceAdapter uses to report completion.  If the
+        connection needs to be recovered before or after the RPC, the
+        reconnection is run in the default executor of loop so that neither
+        the event loop nor the adapter's thread are blocked by it.
+        """
+
+        timeout = 3.0
+        if 'timeout' in kwargs:
+            timeout = float(kwargs['timeout'])
+
+        def _in_executor(func):
+            # This may be called from any thread so always hop onto the loop first
+            loop.call_soon_threadsafe(loop.run_in_executor, None, func)
+
+        def _reconnect():
+            try:
+                self._try_reconnect()
+            except Exception as exc:  # pylint: disable=W0703; all errors are passed back through the callback
+                callback(exc)
+                return False
+
+            return True
+
+        def _finish_rpc(success, failure_reason, status, resp_payload):
+            if not success:
+                callback(HardwareError("Could not send RPC", reason=failure_reason))
+                return
+
+            callback(None, status, resp_payload)
+
+        def _on_rpc_done(_conn_id, _adapter_id, success, failure_reason, status, resp_payload):
+            # Sometimes RPCs can cause the device to go offline, so try to reconnect to it.
+            # For example, the RPC could cause the device to reset itself.
+            if self.connection_interrupted:
+                def _reconnect_and_finish():
+                    if _reconnect():
+                        _finish_rpc(success, failure_reason, status, resp_payload)
+
+                _in_executor(_reconnect_and_finish)
+                return
+
+            _finish_rpc(success, failure_reason, status, resp_payload)
+
+        def _start_rpc():
+            self.adapter.periodic_callback()
+            self.adapter.send_rpc_async(0, address, rpc_id, payload, timeout, _on_rpc_done)
+
+        # If our connection was interrupted before this RPC, try to recover it
+        if self.connection_interrupted:
+            def _reconnect_and_send():
+                if not _reconnect():
+                    return
+
+                try:
+                    _start_rpc()
+                except Exception as exc:  # pylint: disable=W0703; all errors are passed back through the callback
+                    callback(exc)
+
+            _in_executor(_reconnect_and_send)
+            return
+
+        _start_rpc()
+
     def _send_highspeed(self, data, progress_callback):
         if isinstance(data, str) and not isinstance(data, bytes):
-            raise ArgumentError("You must send bytes or bytearray to _send_highspeed", type=type(data))
+            raise ArgumentError("You must send bytes, bytearray or an UpdateScript to _send_highspeed", type=type(data))
 
-        if not isinstance(data, bytes):
+        if isinstance(data, UpdateScript):
+            # Adapters that pull chunks through a ScriptStream can encode the script as they send it
+            if not self.adapter.get_config('script_streaming_supported', False):
+                data = bytes(data.encode())
+        elif not isinstance(data, bytes):
             data = bytes(data)
 
         self.adapter.send_script_sync(0, data, progress_callback)
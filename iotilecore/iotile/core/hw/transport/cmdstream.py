@@ -14,6 +14,11 @@ from monotonic import monotonic
 from iotile.core.hw.exceptions import StreamOperationNotSupportedError, ModuleBusyError, ModuleNotFoundError
 from iotile.core.exceptions import HardwareError
 
+try:
+    import asyncio
+except ImportError:  # asyncio is only available on python 3
+    asyncio = None
+
 class _RecordedRPC(object):
     """Internal helper class for saving recorded RPCs to csv files."""
 
@@ -182,13 +187,90 @@ class CMDStream(object):
         finally:
             #If we are recording this, save off the call and response
             if self.record is not None:
-                end_time = monotonic()
-                duration = end_time - start_time
+                self._record_rpc(start_stamp, start_time, address, rpc_id, call_payload, payload, status)
+
+        return self._check_rpc_status(address, status, payload)
+
+    def send_rpc_async(self, address, rpc_id, call_payload, loop=None, **kwargs):
+        """Send an RPC without blocking the calling thread.
+
+        This is the asyncio counterpart of send_rpc.  It returns a future
+        that resolves to the same (status, payload) tuple that send_rpc
+        returns or fails with the same exceptions.  Streams that define
+        _send_rpc_async are driven directly through their callback based
+        API and are given the event loop so that they can move any blocking
+        work onto its executor.  Other streams fall back to running _send_rpc in the default
+        executor of the event loop.
+
+        Args:
+            address (int): The address of the tile that should receive the RPC.
+            rpc_id (int): The 16-bit id of the RPC to call.
+            call_payload (bytes): The already packed RPC arguments.
+            loop (asyncio.AbstractEventLoop): The event loop that the returned
+                future should belong to.  Defaults to the current event loop.
+            **kwargs: Stream specific keyword arguments like timeout.
+
+        Returns:
+            asyncio.Future: A future resolving to a (status, payload) tuple.
+        """
+
+        if asyncio is None:
+            raise StreamOperationNotSupportedError(command="send_rpc_async")
+
+        if not self.connected:
+            raise HardwareError("Cannot send an RPC if we are not in a connected state")
+
+        if not hasattr(self, '_send_rpc_async') and not hasattr(self, '_send_rpc'):
+            raise StreamOperationNotSupportedError(command="send_rpc_async")
 
-                recording = _RecordedRPC(self.connection_string, start_stamp, duration, address, rpc_id,
-                                         call_payload, payload, status)
+        if loop is None:
+            loop = asyncio.get_event_loop()
 
-                self._recording.append(recording)
+        result = loop.create_future()
+        start_time = monotonic()
+        start_stamp = datetime.utcnow()
+
+        def _finish_rpc(exc, status, payload):
+            if self.record is not None:
+                self._record_rpc(start_stamp, start_time, address, rpc_id, call_payload, payload, status)
+
+            if result.cancelled():
+                return
+
+            if exc is not None:
+                result.set_exception(exc)
+                return
+
+            try:
+                result.set_result(self._check_rpc_status(address, status, payload))
+            except HardwareError as err:
+                result.set_exception(err)
+
+        def _on_rpc_done(exc, status=-1, payload=b''):
+            # This may be called from any thread so always hop back onto the loop
+            loop.call_soon_threadsafe(_finish_rpc, exc, status, payload)
+
+        if hasattr(self, '_send_rpc_async'):
+            try:
+                self._send_rpc_async(address, rpc_id, call_payload, _on_rpc_done, loop, **kwargs)
+            except Exception as exc:  # pylint: disable=W0703; all errors are passed back through the future
+                _on_rpc_done(exc)
+        else:
+            def _send_blocking_rpc():
+                try:
+                    status, payload = self._send_rpc(address, rpc_id, call_payload, **kwargs)
+                except Exception as exc:  # pylint: disable=W0703; all errors are passed back through the future
+                    _on_rpc_done(exc)
+                else:
+                    _on_rpc_done(None, status, payload)
+
+            loop.run_in_executor(None, _send_blocking_rpc)
+
+        return result
+
+    @classmethod
+    def _check_rpc_status(cls, address, status, payload):
+        """Convert special RPC status codes into exceptions."""
 
         if status == 0:
             raise ModuleBusyError(address)
@@ -197,6 +279,14 @@ class CMDStream(object):
 
         return status, bytearray(payload)
 
+    def _record_rpc(self, start_stamp, start_time, address, rpc_id, call_payload, payload, status):
+        """Save off the call and response of an RPC that we are recording."""
+
+        duration = monotonic() - start_time
+        recording = _RecordedRPC(self.connection_string, start_stamp, duration, address, rpc_id,
+                                 call_payload, payload, status)
+
+        self._recording.append(recording)
 
     def enable_streaming(self):
         if not self.connected:
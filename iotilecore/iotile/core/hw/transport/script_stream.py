@@ -0,0 +1,95 @@
+"""A source of fixed size chunks for sending scripts to a device."""
+
+from iotile.core.exceptions import ArgumentError
+from iotile.core.hw.update import UpdateScript
+
+
+class ScriptStream(object):
+    """Split a script into fixed size chunks as a transport asks for them.
+
+    Transports that can only send small packets at a time, like BLE
+    characteristics or RPCs, should pull chunks from a ScriptStream rather
+    than slicing the script themselves.  If the script is given as an
+    UpdateScript object, it is encoded one record at a time as chunks are
+    pulled, so the binary script is never entirely in memory and encoding
+    overlaps with sending the previous chunks.
+
+    Progress is tracked in bytes and in chunks so that transports can report
+    whichever is more natural for them.
+
+    Args:
+        script (bytes, bytearray or UpdateScript): The script to send.
+        chunk_size (int): The maximum size of each chunk.  Every chunk except
+            the last will be exactly this size.
+    """
+
+    def __init__(self, script, chunk_size):
+        if chunk_size <= 0:
+            raise ArgumentError("Invalid chunk size for script stream", chunk_size=chunk_size)
+
+        if isinstance(script, UpdateScript):
+            self.total = script.encoded_length()
+            self._pieces = script.iter_encode()
+        elif isinstance(script, (bytes, bytearray, memoryview)):
+            self.total = len(script)
+            self._pieces = iter([script])
+        else:
+            raise ArgumentError("Unknown script type, must be bytes, bytearray or UpdateScript", type=type(script))
+
+        self.chunk_size = chunk_size
+        self.sent = 0
+        self.sent_chunks = 0
+        self.total_chunks = (self.total + chunk_size - 1) // chunk_size
+
+        self._piece = memoryview(b'')
+        self._offset = 0
+
+    @property
+    def finished(self):
+        """Whether every chunk has been pulled from this stream."""
+
+        return self.sent >= self.total
+
+    def next_chunk(self):
+        """Get the next chunk of the script.
+
+        Returns:
+            bytes: The next chunk or None if there are no more chunks.
+        """
+
+        chunk = bytearray()
+
+        while len(chunk) < self.chunk_size:
+            if self._offset == len(self._piece):
+                piece = next(self._pieces, None)
+                if piece is None:
+                    break
+
+                self._piece = memoryview(piece)
+                self._offset = 0
+
+            needed = self.chunk_size - len(chunk)
+            part = self._piece[self._offset:self._offset + needed]
+            self._offset += len(part)
+
+            # Don't copy the chunk twice in the common case where it comes from a single piece
+            if len(chunk) == 0 and len(part) == self.chunk_size:
+                chunk = part.tobytes()
+                break
+
+            chunk += part.tobytes()
+
+        if len(chunk) == 0:
+            return None
+
+        self.sent += len(chunk)
+        self.sent_chunks += 1
+        return bytes(chunk)
+
+    def __iter__(self):
+        while True:
+            chunk = self.next_chunk()
+            if chunk is None:
+                return
+
+            yield chunk
@@ -11,6 +11,7 @@ from ws4py.client.threadedclient import WebSocketClient
 from iotile.core.hw.exceptions import *
 from iotile.core.exceptions import *
 from iotile.core.hw.reports import IOTileReportParser, BroadcastReport, IOTileReading
+from iotile.core.hw.update import UpdateScript
 from .cmdstream import CMDStream
 
 
@@ -222,4 +223,7 @@ class WebSocketStream(CMDStream):
         return result
 
     def _send_highspeed(self, data, progress_callback):
+        if isinstance(data, UpdateScript):
+            data = data.encode()
+
         self.send('send_script', {'data': str(data)}, progress=progress_callback)
@@ -37,6 +37,11 @@ class UpdateRecord(object):
     KNOWN_CLASSES = {}
     PLUGINS_LOADED = False
 
+    # A dispatch index of the classes in KNOWN_CLASSES that can match a single record,
+    # keyed by (record_type, rpc_id) for classes that only match one RPC and by
+    # (record_type, None) for everything else.
+    SINGLE_RECORD_INDEX = {}
+
     @classmethod
     def MatchType(cls):
         """Return the record type that this record matches.
@@ -78,6 +83,19 @@ class UpdateRecord(object):
 
         raise NotImplementedError()
 
+    def encoded_length(self):
+        """Calculate the length of this record once it is encoded.
+
+        The default implementation encodes the record.  Records that embed
+        large payloads should override this so that the length of a script
+        can be calculated without encoding them.
+
+        Returns:
+            int: The length of the encoded record in bytes, including its header.
+        """
+
+        return len(self.encode())
+
     @classmethod
     def LoadPlugins(cls):
         """Load all registered iotile.update_record plugins."""
@@ -132,6 +150,11 @@ class UpdateRecord(object):
     def RegisterRecordType(cls, record_class):
         """Register a known record type in KNOWN_CLASSES.
 
+        Record classes that have an RPC_ID attribute are assumed to be
+        single RPC records, whose contents start with the 16-bit RPC id, that
+        never match any other RPC.  They are indexed by that RPC id so that
+        they are only asked to match records that call it.
+
         Args:
             record_class (UpdateRecord): An update record subclass.
         """
@@ -142,6 +165,26 @@ class UpdateRecord(object):
 
         UpdateRecord.KNOWN_CLASSES[record_type].append(record_class)
 
+        key = (record_type, getattr(record_class, 'RPC_ID', None))
+        if key not in UpdateRecord.SINGLE_RECORD_INDEX:
+            UpdateRecord.SINGLE_RECORD_INDEX[key] = []
+
+        UpdateRecord.SINGLE_RECORD_INDEX[key].append(record_class)
+
+    @classmethod
+    def _SingleRecordCandidates(cls, record_type, record_data):
+        """Find the classes that could match a single record using our dispatch index."""
+
+        candidates = UpdateRecord.SINGLE_RECORD_INDEX.get((record_type, None), [])
+
+        if len(record_data) >= UpdateRecord.HEADER_LENGTH + 2:
+            rpc_id, = struct.unpack_from("<H", record_data, UpdateRecord.HEADER_LENGTH)
+            rpc_candidates = UpdateRecord.SINGLE_RECORD_INDEX.get((record_type, rpc_id))
+            if rpc_candidates is not None:
+                candidates = candidates + rpc_candidates
+
+        return candidates
+
     @classmethod
     def FromBinary(cls, record_data, record_count=1):
         """Create an UpdateRecord subclass from binary record data.
@@ -181,15 +224,16 @@ class UpdateRecord(object):
         if len(record_classes) == 0:
             raise DataError("No matching record type found for record", record_type=record_type, known_types=[x for x in UpdateRecord.KNOWN_CLASSES])
 
+        if record_count > 1:
+            match_data = record_data
+        else:
+            match_data = record_data[UpdateRecord.HEADER_LENGTH:]
+            record_classes = cls._SingleRecordCandidates(record_type, record_data)
+
         best_match = MatchQuality.NoMatch
         matching_class = None
 
         for record_class in record_classes:
-            match_data = record_data[UpdateRecord.HEADER_LENGTH:]
-
-            if record_count > 1:
-                match_data = record_data
-
             quality = record_class.MatchQuality(match_data, record_count)
 
             if quality > best_match:
@@ -37,6 +37,15 @@ class ReflashControllerRecord(UpdateRecord):
         header = struct.pack("<LL", self.offset, len(self.raw_data))
         return bytearray(header) + self.raw_data
 
+    def encoded_length(self):
+        """Calculate the length of this record once it is encoded.
+
+        Returns:
+            int: The length of the encoded record in bytes, including its header.
+        """
+
+        return UpdateRecord.HEADER_LENGTH + ReflashControllerRecord.RecordHeaderLength + len(self.raw_data)
+
     @classmethod
     def MatchType(cls):
         """Return the record type that this record matches.
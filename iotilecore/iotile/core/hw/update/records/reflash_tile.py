@@ -44,6 +44,15 @@ class ReflashTileRecord(UpdateRecord):
         header = struct.pack("<LL8sBxxx", self.offset, len(self.raw_data), _create_target(slot=self.slot), self.hardware_type)
         return bytearray(header) + self.raw_data
 
+    def encoded_length(self):
+        """Calculate the length of this record once it is encoded.
+
+        Returns:
+            int: The length of the encoded record in bytes, including its header.
+        """
+
+        return UpdateRecord.HEADER_LENGTH + ReflashTileRecord.RecordHeaderLength + len(self.raw_data)
+
     @classmethod
     def MatchType(cls):
         """Return the record type that this record matches.
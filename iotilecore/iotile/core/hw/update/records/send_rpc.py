@@ -59,6 +59,15 @@ class SendRPCRecord(UpdateRecord):
         header = struct.pack("<HBB", self.rpc_id, self.address, resp_length)
         return bytearray(header) + self.payload
 
+    def encoded_length(self):
+        """Calculate the length of this record once it is encoded.
+
+        Returns:
+            int: The length of the encoded record in bytes, including its header.
+        """
+
+        return UpdateRecord.HEADER_LENGTH + SendRPCRecord.RecordHeaderLength + len(self.payload)
+
     @classmethod
     def MatchType(cls):
         """Return the record type that this record matches.
@@ -11,6 +11,16 @@ from iotile.core.exceptions import ArgumentError, DataError
 from .record import UpdateRecord, DeferMatching
 from .records import UnknownRecord, SendRPCRecord, SendErrorCheckingRPCRecord
 
+class _LazyHex(object):
+    """Only hexlify data if a log message is actually going to be emitted."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return hexlify(self.data).decode('utf-8')
+
+
 ScriptHeader = namedtuple('ScriptHeader', ['header_length', 'authenticated', 'integrity_checked', 'encrypted'])
 
 
@@ -58,7 +68,7 @@ class UpdateScript(object):
         if total_length != len(script_data):
             raise ArgumentError("Script length does not match embedded length", embedded_length=total_length, length=len(script_data))
 
-        hashed_data = script_data[16:]
+        hashed_data = memoryview(script_data)[16:]
 
         sha = hashlib.sha256()
         sha.update(hashed_data)
@@ -88,43 +98,78 @@ class UpdateScript(object):
             UpdateScript: The parsed update script.
         """
 
-        curr = 0
-        records = []
+        return UpdateScript(list(cls.IterRecords(script_data, allow_unknown, show_rpcs)))
+
+    @classmethod
+    def IterRecords(cls, script_data, allow_unknown=True, show_rpcs=False):
+        """Lazily parse the records in a binary update script.
+
+        This is a generator that yields each record as soon as it has been
+        parsed, so very large scripts can be inspected or forwarded without
+        building the entire list of records in memory.  The script is only
+        accessed through a memoryview so parsing is linear in the size of the
+        script.
+
+        The script header is checked before the first record is yielded.
+
+        Args:
+            script_data (bytearray): The binary data containing the script.
+            allow_unknown (bool): Allow the script to contain unknown records
+                so long as they have correct headers to allow us to skip them.
+            show_rpcs (bool): Show SendRPCRecord matches for each record rather than
+                the more specific operation
+        Raises:
+            ArgumentError: If the script contains malformed data that cannot
+                be parsed.
+            DataError: If the script contains unknown records and allow_unknown=False
+
+        Yields:
+            UpdateRecord: Each record in the script in order.
+        """
+
+        view = memoryview(script_data)
+        script_length = len(view)
 
-        header = cls.ParseHeader(script_data)
+        header = cls.ParseHeader(view)
         curr = header.header_length
 
         cls.logger.debug("Parsed script header: %s, skipping %d bytes", header, curr)
 
+        rpc_types = (SendRPCRecord.MatchType(), SendErrorCheckingRPCRecord.MatchType())
+
+        # We accumulate records in view[record_start:curr] when asked to defer matching
         record_count = 0
-        record_data = bytearray()
+        record_start = curr
         partial_match = None
         match_offset = 0
 
-        while curr < len(script_data):
-            if len(script_data) - curr < UpdateRecord.HEADER_LENGTH:
-                raise ArgumentError("Script ended with a partial record", remaining_length=len(script_data) - curr)
-
-            # Add another record to our current list of records that we're parsing
+        while curr < script_length:
+            if script_length - curr < UpdateRecord.HEADER_LENGTH:
+                raise ArgumentError("Script ended with a partial record", remaining_length=script_length - curr)
 
-            total_length, record_type = struct.unpack_from("<LB", script_data[curr:])
+            total_length, record_type = struct.unpack_from("<LB", view, curr)
             cls.logger.debug("Found record of type %d, length %d", record_type, total_length)
 
-            record_data += script_data[curr:curr+total_length]
-            record_count += 1
+            if total_length < UpdateRecord.HEADER_LENGTH or total_length > script_length - curr:
+                raise ArgumentError("Script contained a record with an invalid length", offset=curr, embedded_length=total_length, remaining_length=script_length - curr)
 
-            curr += total_length
+            if record_count == 0:
+                record_start = curr
 
+            record_count += 1
+            curr += total_length
 
             try:
-                if show_rpcs and record_type == SendRPCRecord.MatchType():
-                    cls.logger.debug("   {0}".format(hexlify(record_data)))
-                    record = SendRPCRecord.FromBinary(record_data[UpdateRecord.HEADER_LENGTH:], record_count)
-                elif show_rpcs and record_type == SendErrorCheckingRPCRecord.MatchType():
-                    cls.logger.debug("   {0}".format(hexlify(record_data)))
-                    record = SendErrorCheckingRPCRecord.FromBinary(record_data[UpdateRecord.HEADER_LENGTH:], record_count)
+                if show_rpcs and record_type in rpc_types:
+                    record_data = bytearray(view[record_start + UpdateRecord.HEADER_LENGTH:curr])
+                    cls.logger.debug("   %s", _LazyHex(record_data))
+
+                    if record_type == SendRPCRecord.MatchType():
+                        record = SendRPCRecord.FromBinary(record_data, record_count)
+                    else:
+                        record = SendErrorCheckingRPCRecord.FromBinary(record_data, record_count)
                 else:
-                    record = UpdateRecord.FromBinary(record_data, record_count)
+                    record = UpdateRecord.FromBinary(bytearray(view[record_start:curr]), record_count)
 
             except DeferMatching as defer:
                 # If we're told to defer matching, continue accumulating record_data
@@ -145,17 +190,14 @@ class UpdateScript(object):
                 elif allow_unknown and record_count > 1:
                     raise ArgumentError("A record matched an initial record subset but failed matching a subsequent addition without leaving a partial_match")
                 else:
-                    record = UnknownRecord(record_type, record_data[UpdateRecord.HEADER_LENGTH:])
+                    record = UnknownRecord(record_type, bytearray(view[record_start + UpdateRecord.HEADER_LENGTH:curr]))
 
             # Reset our record accumulator since we successfully matched one or more records
             record_count = 0
-            record_data = bytearray()
             partial_match = None
             match_offset = 0
 
-            records.append(record)
-
-        return UpdateScript(records)
+            yield record
 
     def encode(self):
         """Encode this record into a binary blob.
@@ -180,6 +222,52 @@ class UpdateScript(object):
 
         return bytearray(hash_value) + blob
 
+    def encoded_length(self):
+        """Calculate the length of this script once it is encoded.
+
+        Returns:
+            int: The length of the encoded script in bytes.
+        """
+
+        return self.SCRIPT_HEADER_LENGTH + sum(record.encoded_length() for record in self.records)
+
+    def iter_encode(self):
+        """Encode this script incrementally, one record at a time.
+
+        This produces exactly the same bytes as encode() without ever
+        holding more than a single encoded record in memory, so it is
+        suitable for streaming very large scripts to a device.  Since the
+        script header contains a hash of the entire script, each record is
+        encoded once to calculate the header and then lazily again as it is
+        yielded.  Record lengths come from UpdateRecord.encoded_length() so
+        large records are not encoded just to find their size.
+
+        Raises:
+            DataError: If a record does not encode to the same length that
+                was used to build the script header.
+
+        Yields:
+            bytearray: The script header followed by each encoded record.
+        """
+
+        lengths = [record.encoded_length() for record in self.records]
+        header = struct.pack("<LL", self.SCRIPT_MAGIC, self.SCRIPT_HEADER_LENGTH + sum(lengths))
+
+        sha = hashlib.sha256()
+        sha.update(header)
+        for record in self.records:
+            sha.update(record.encode())
+
+        yield bytearray(sha.digest()[:16]) + header
+
+        for record, length in zip(self.records, lengths):
+            encoded = record.encode()
+            if len(encoded) != length:
+                raise DataError("Record encoded to a different length than was used in the script header",
+                                record=str(record), expected_length=length, actual_length=len(encoded))
+
+            yield encoded
+
     def __eq__(self, other):
         if not isinstance(other, UpdateScript):
             return False
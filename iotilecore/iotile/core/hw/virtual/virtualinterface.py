@@ -6,8 +6,11 @@ Virtual things are designed to allow the same level of configurability and robus
 thing.
 """
 
-from queue import Queue, Empty
+from queue import PriorityQueue, Empty
+from collections import deque
+import itertools
 import logging
+import threading
 from iotile.core.exceptions import ArgumentError
 from . import audit
 from ..reports import IOTileReport
@@ -37,9 +40,13 @@ class IOTilePushChannel(object):
                 a bool value of True when this report actually gets streamed.
                 If the client disconnects and the report is dropped instead,
                 callback will be called with False
+
+        Returns:
+            bool: False if the report was dropped immediately because the
+                interface's streaming queue is full, otherwise True.
         """
 
-        self._interface._queue_reports((report, callback))
+        return self._interface._queue_reports((report, callback)) is not False
 
     def trace(self, data, callback=None):
         """Queue data for tracing
@@ -51,9 +58,161 @@ class IOTilePushChannel(object):
                 a bool value of True when this data actually gets traced.
                 If the client disconnects and the data is dropped instead,
                 callback will be called with False.
+
+        Returns:
+            bool: False if the data was dropped immediately because the
+                interface's tracing queue is full, otherwise True.
+        """
+
+        return self._interface._queue_traces((data, callback)) is not False
+
+
+class PushQueue(object):
+    """A thread-safe, optionally bounded queue of (item, callback) tuples.
+
+    When the queue is full, new items are handled according to a drop
+    policy, which makes a virtual interface behave like real hardware with
+    limited buffer space rather than using unbounded memory when its client
+    is slow:
+
+    - drop_oldest: the oldest queued item is discarded to make room.
+    - drop_newest: the new item is discarded.
+
+    The callback of any discarded item is called with False, just like when
+    a client disconnects before an item is sent.
+
+    Args:
+        maxsize (int): The maximum number of queued items or None for no
+            limit.
+        policy (str): The drop policy to use when the queue is full.
+    """
+
+    DropPolicies = frozenset([u'drop_oldest', u'drop_newest'])
+
+    def __init__(self, maxsize=None, policy=u'drop_oldest'):
+        if policy not in self.DropPolicies:
+            raise ArgumentError("Unknown queue drop policy", policy=policy, known_policies=list(self.DropPolicies))
+
+        if maxsize is not None and maxsize < 1:
+            raise ArgumentError("Queue size limit must be at least 1", maxsize=maxsize)
+
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self.dropped = 0
+        self.max_depth = 0
+
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        """Queue an (item, callback) tuple.
+
+        Returns:
+            bool: False if the item was dropped because the queue is full.
+        """
+
+        dropped = None
+        accepted = True
+
+        with self._lock:
+            if self.maxsize is not None and len(self._items) >= self.maxsize:
+                self.dropped += 1
+
+                if self.policy == u'drop_newest':
+                    dropped = item
+                    accepted = False
+                else:
+                    dropped = self._items.popleft()
+
+            if accepted:
+                self._items.append(item)
+                self.max_depth = max(self.max_depth, len(self._items))
+
+        if dropped is not None and dropped[1] is not None:
+            dropped[1](False)
+
+        return accepted
+
+    def get(self, block=False):
+        """Remove and return the oldest item.
+
+        This queue never blocks, the block argument is only accepted for
+        compatibility with queue.Queue.
+
+        Raises:
+            Empty: If there are no items in the queue.
+        """
+
+        with self._lock:
+            if len(self._items) == 0:
+                raise Empty()
+
+            return self._items.popleft()
+
+    def get_nowait(self):
+        """Remove and return the oldest item, see get()."""
+
+        return self.get()
+
+    def clear(self):
+        """Remove all items from the queue.
+
+        Returns:
+            list: The items that were removed.
         """
 
-        self._interface._queue_traces((data, callback))
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+
+        return items
+
+    def empty(self):
+        return len(self._items) == 0
+
+    def qsize(self):
+        return len(self._items)
+
+    def stats(self):
+        """Return a dict describing the depth of this queue and any dropped items."""
+
+        return {
+            u'depth': len(self._items),
+            u'max_depth': self.max_depth,
+            u'limit': self.maxsize,
+            u'dropped': self.dropped
+        }
+
+
+class _ChunkCursor(object):
+    """A report or trace that is partially sent.
+
+    Chunks are taken from a memoryview of the data so that sending a large
+    report in small chunks does not copy the rest of the report each time.
+
+    Args:
+        data (bytes or bytearray): The data that needs to be sent.
+        callback (callable): Optional callback to call with True once all of
+            the data has been sent.
+    """
+
+    __slots__ = ('view', 'offset', 'callback')
+
+    def __init__(self, data, callback):
+        self.view = memoryview(data)
+        self.offset = 0
+        self.callback = callback
+
+    def remaining(self):
+        return len(self.view) - self.offset
+
+    def take(self, size):
+        """Take up to size bytes from the data."""
+
+        piece = self.view[self.offset:self.offset + size]
+        self.offset += len(piece)
+        return piece
 
 
 class VirtualIOTileInterface(object):
@@ -72,22 +231,50 @@ class VirtualIOTileInterface(object):
     The second is to provide an API to that device for it to asynchronously stream
     or trace data back to any client that might be connected over the virtual interface.
 
+    Actions queued with _defer are run in priority order so that RPC responses
+    are never stuck behind a long stream of report or tracing chunks.  Reports
+    and traces waiting to be sent can be bounded so that a slow client does
+    not cause them to use unbounded memory.
+
+    Args:
+        args (dict): Optional configuration for the interface.  The following
+            keys are used by this base class:
+
+            max_queued_reports (int): The maximum number of reports waiting to be
+                streamed.  Defaults to no limit.
+            max_queued_traces (int): The maximum number of trace items waiting
+                to be sent.  Defaults to no limit.
+            queue_drop_policy (str): What to do when one of the above limits is
+                reached, either drop_oldest (the default) or drop_newest.
     """
 
-    def __init__(self):
+    RPCPriority = 0
+    DefaultPriority = 1
+    StreamingPriority = 2
+    TracingPriority = 2
+
+    def __init__(self, args=None):
+        if args is None:
+            args = {}
+
         self.device = None
         self.audit_logger = logging.getLogger('virtual.audit')
         self.audit_logger.addHandler(logging.NullHandler())
 
-        self.actions = Queue()
-        self.reports = Queue()
-        self.traces = Queue()
+        max_reports = args.get('max_queued_reports')
+        max_traces = args.get('max_queued_traces')
+        policy = args.get('queue_drop_policy', u'drop_oldest')
+
+        self.actions = PriorityQueue()
+        self.reports = PushQueue(None if max_reports is None else int(max_reports), policy)
+        self.traces = PushQueue(None if max_traces is None else int(max_traces), policy)
+
+        # Keep actions with the same priority in the order they were queued
+        self._action_counter = itertools.count()
 
         # Track whether we are chunking a report or a trace
         self._in_progress_report = None
-        self._in_progress_report_callback = None
         self._in_progress_trace = None
-        self._in_progress_trace_callback = None
 
     def start(self, device):
         """Begin allowing connections to a virtual IOTile device.
@@ -110,11 +297,26 @@ class VirtualIOTileInterface(object):
 
         try:
             while True:
-                func, args = self.actions.get(timeout=0.1)
+                _priority, _index, func, args = self.actions.get(timeout=0.1)
                 func(*args)
         except Empty:
             pass
 
+    def queue_stats(self):
+        """Return the current depth of all queues and how many items were dropped.
+
+        Returns:
+            dict: A dict with actions, reports and traces keys.  Actions
+                has a depth key with the number of queued actions and reports
+                and traces have the keys returned by PushQueue.stats().
+        """
+
+        return {
+            u'actions': {u'depth': self.actions.qsize()},
+            u'reports': self.reports.stats(),
+            u'traces': self.traces.stats()
+        }
+
     def stop(self):
         """Stop allowing connections to this virtual IOTile device."""
 
@@ -140,7 +342,7 @@ class VirtualIOTileInterface(object):
         else:
             self.audit_logger.info(audit_evt.message, extra={'event_name': audit_evt.name})
 
-    def _defer(self, action, args=None):
+    def _defer(self, action, args=None, priority=None):
         """Queue an action to be executed the next time process is called.
 
         This is very useful for callbacks that should be called on the main thread but are queued
@@ -149,12 +351,26 @@ class VirtualIOTileInterface(object):
         Args:
             action (callable): A function to be called as action(*args)
             args (list): A list of arguments (possibly empty) to be passed to action
+            priority (int): The priority of this action, lower numbers run first.
+                Defaults to DefaultPriority.
         """
 
         if args is None:
             args = []
 
-        self.actions.put((action, args))
+        if priority is None:
+            priority = self.DefaultPriority
+
+        self.actions.put((priority, next(self._action_counter), action, args))
+
+    def _clear_actions(self):
+        """Discard all queued actions without running them."""
+
+        try:
+            while True:
+                self.actions.get_nowait()
+        except Empty:
+            pass
 
     def _clear_reports(self):
         """Clear all queued reports and any in progress reports.
@@ -163,13 +379,9 @@ class VirtualIOTileInterface(object):
         future clients don't get a partial report streamed to them.
         """
 
-        try:
-            while not self.reports.empty():
-                _report, callback = self.reports.get(block=False)
-                if callback is not None:
-                    callback(False)
-        except Empty:
-            pass
+        for _report, callback in self.reports.clear():
+            if callback is not None:
+                callback(False)
 
         self._in_progress_report = None
 
@@ -180,13 +392,9 @@ class VirtualIOTileInterface(object):
         future clients don't get old tracing data.
         """
 
-        try:
-            while not self.traces.empty():
-                _trace, callback = self.traces.get(block=False)
-                if callback is not None:
-                    callback(False)
-        except Empty:
-            pass
+        for _trace, callback in self.traces.clear():
+            if callback is not None:
+                callback(False)
 
         self._in_progress_trace = None
 
@@ -210,13 +418,20 @@ class VirtualIOTileInterface(object):
 
                 Your callback, if supplied will be called when the report
                 finishes being streamed.
+
+        Returns:
+            bool: False if any of the reports were dropped because the
+                streaming queue is full.
         """
 
+        accepted = True
         for report in reports:
             if isinstance(report, IOTileReport):
                 report = (report, None)
 
-            self.reports.put(report)
+            accepted = self.reports.put(report) and accepted
+
+        return accepted
 
     def _queue_traces(self, *traces):
         """Queue tracing information for transmission over the tracing interface.
@@ -233,92 +448,101 @@ class VirtualIOTileInterface(object):
         Args:
             *traces (list): A list of bytes or bytearray objects that should be sent over
                 the tracing interface.
+
+        Returns:
+            bool: False if any of the traces were dropped because the tracing
+                queue is full.
         """
 
+        accepted = True
         for trace in traces:
             if not isinstance(trace, tuple):
                 trace = (trace, None)
 
-            self.traces.put(trace)
+            accepted = self.traces.put(trace) and accepted
+
+        return accepted
 
     def _next_streaming_chunk(self, max_size):
         """Get the next chunk of data that should be streamed
 
         Args:
-            max_size (int): The maximum size of the chunk to be returned
+            max_size (int): The maximum size of the chunk to be returned.  If
+                this is None, every report that is currently queued is
+                returned in a single chunk.
 
         Returns:
             bytearray: the chunk of raw data with size up to but not exceeding
                 max_size.
         """
 
-        chunk = bytearray()
-
-        while len(chunk) < max_size:
-            desired_size = max_size - len(chunk)
-
-            # If we don't have an in progress report at the moment, attempt to get one
-            if self._in_progress_report is None:
-                try:
-                    next_report, next_callback = self.reports.get_nowait()
-                except Empty:
-                    return chunk
-
-                self._audit('ReportStreamed', report=str(next_report))
-                self._in_progress_report = bytearray(next_report.encode())
-                self._in_progress_report_callback = next_callback
-
-            if len(self._in_progress_report) <= desired_size:
-                chunk += self._in_progress_report
-                self._in_progress_report = None
-                if self._in_progress_report_callback is not None:
-                    self._in_progress_report_callback(True)
-                    self._in_progress_report_callback = None
-            else:
-                remaining = self._in_progress_report[desired_size:]
-                chunk += self._in_progress_report[:desired_size]
-
-                self._in_progress_report = remaining
-
+        chunk, self._in_progress_report = self._fill_chunk(self.reports, self._in_progress_report,
+                                                           max_size, self._start_report)
         return chunk
 
     def _next_tracing_chunk(self, max_size):
         """Get the next chunk of data that should be traced
 
         Args:
-            max_size (int): The maximum size of the chunk to be returned
+            max_size (int): The maximum size of the chunk to be returned.  If
+                this is None, all tracing data that is currently queued is
+                returned in a single chunk.
 
         Returns:
             bytearray: the chunk of raw data with size up to but not exceeding
                 max_size.
         """
 
-        chunk = bytearray()
+        chunk, self._in_progress_trace = self._fill_chunk(self.traces, self._in_progress_trace,
+                                                          max_size, self._start_trace)
+        return chunk
 
-        while len(chunk) < max_size:
-            desired_size = max_size - len(chunk)
+    def _start_report(self, report, callback):
+        # The report is only converted to a string if the audit event is actually logged
+        self._audit('ReportStreamed', report=report)
+        return _ChunkCursor(report.encode(), callback)
 
-            # If we don't have an in progress report at the moment, attempt to get one
-            if self._in_progress_trace is None:
+    def _start_trace(self, trace, callback):
+        self._audit('TraceSent', trace=trace)
+        return _ChunkCursor(bytearray(trace), callback)
+
+    @classmethod
+    def _fill_chunk(cls, queue, cursor, max_size, start):
+        """Fill a chunk from an in progress cursor and then a queue of items.
+
+        Args:
+            queue (Queue): The queue of (item, callback) tuples to take new
+                items from once cursor is finished.
+            cursor (_ChunkCursor): The item currently being sent or None.
+            max_size (int): The maximum size of the chunk or None for no limit.
+            start (callable): A function called as start(item, callback) that
+                returns a _ChunkCursor for a new item.
+
+        Returns:
+            (bytearray, _ChunkCursor): The chunk and the cursor for the item
+                that is still in progress, if any.
+        """
+
+        chunk = bytearray()
+
+        while max_size is None or len(chunk) < max_size:
+            if cursor is None:
                 try:
-                    next_trace, next_callback = self.traces.get_nowait()
+                    item, callback = queue.get_nowait()
                 except Empty:
-                    return chunk
-
-                self._audit('TraceSent', trace=str(next_trace))
-                self._in_progress_trace = bytearray(next_trace)
-                self._in_progress_trace_callback = next_callback
-
-            if len(self._in_progress_trace) <= desired_size:
-                chunk += self._in_progress_trace
-                self._in_progress_trace = None
-                if self._in_progress_trace_callback is not None:
-                    self._in_progress_trace_callback(True)
-                    self._in_progress_trace_callback = None
+                    break
+
+                cursor = start(item, callback)
+
+            if max_size is None:
+                chunk += cursor.take(cursor.remaining())
             else:
-                remaining = self._in_progress_trace[desired_size:]
-                chunk += self._in_progress_trace[:desired_size]
+                chunk += cursor.take(max_size - len(chunk))
 
-                self._in_progress_trace = remaining
+            if cursor.remaining() == 0:
+                if cursor.callback is not None:
+                    cursor.callback(True)
 
-        return chunk
+                cursor = None
+
+        return chunk, cursor
@@ -64,6 +64,7 @@ from .compat import (
     )
 
 from .getsizeof import total_size
+from .segments import SegmentBuffer
 
 
 class _DeprecatedParam(object):
@@ -89,7 +90,7 @@ class IntelHex(object):
         self.start_addr = None
 
         # private members
-        self._buf = {}
+        self._buf = SegmentBuffer()
         self._offset = 0
 
         if source is not None:
@@ -148,13 +149,13 @@ class IntelHex(object):
         if record_type == 0:
             # data record
             addr += self._offset
-            for i in range_g(4, 4+record_length):
-                if not self._buf.get(addr, None) is None:
-                    raise AddressOverlapError(address=addr, line=line)
-                self._buf[addr] = bin[i]
-                addr += 1   # FIXME: addr should be wrapped
-                            # BUT after 02 record (at 64K boundary)
-                            # and after 04 record (at 4G boundary)
+            overlap = self._buf.overlap(addr, record_length)
+            if overlap is not None:
+                raise AddressOverlapError(address=overlap, line=line)
+            self._buf.write(addr, bin[4:4+record_length])
+            # FIXME: addr should be wrapped
+            # BUT after 02 record (at 64K boundary)
+            # and after 04 record (at 4G boundary)
 
         elif record_type == 1:
             # end of file record
@@ -290,16 +291,14 @@ class IntelHex(object):
         """Load data from array or list of bytes.
         Similar to loadbin() method but works directly with iterable bytes.
         """
-        for b in bytes:
-            self._buf[offset] = b
-            offset += 1
+        self._buf.write(offset, bytes)
 
     def _get_start_end(self, start=None, end=None, size=None):
         """Return default values for start and end if they are None.
         If this IntelHex object is empty then it's error to
         invoke this method with both start and end as None.
         """
-        if (start,end) == (None,None) and self._buf == {}:
+        if (start,end) == (None,None) and len(self._buf) == 0:
             raise EmptyIntelHexError
         if size is not None:
             if None not in (start, end):
@@ -350,13 +349,12 @@ class IntelHex(object):
         if pad is None:
             pad = self.padding
         bin = array('B')
-        if self._buf == {} and None in (start, end):
+        if len(self._buf) == 0 and None in (start, end):
             return bin
         if size is not None and size <= 0:
             raise ValueError("tobinarray: wrong value for size")
         start, end = self._get_start_end(start, end, size)
-        for i in range_g(start, end+1):
-            bin.append(self._buf.get(i, pad))
+        bin.extend(self._buf.tobytes(start, end+1, pad))
         return bin
 
     def tobinstr(self, start=None, end=None, pad=_DEPRECATED, size=None):
@@ -437,21 +435,13 @@ class IntelHex(object):
         '''Get minimal address of HEX content.
         @return         minimal address or None if no data
         '''
-        aa = dict_keys(self._buf)
-        if aa == []:
-            return None
-        else:
-            return min(aa)
+        return self._buf.minaddr()
 
     def maxaddr(self):
         '''Get maximal address of HEX content.
         @return         maximal address or None if no data
         '''
-        aa = dict_keys(self._buf)
-        if aa == []:
-            return None
-        else:
-            return max(aa)
+        return self._buf.maxaddr()
 
     def __getitem__(self, addr):
         ''' Get requested byte from address.
@@ -508,6 +498,9 @@ class IntelHex(object):
                 raise TypeError('start address cannot be negative')
             if stop < 0:
                 raise TypeError('stop address cannot be negative')
+            if step == 1:
+                self._buf.write(start, byte)
+                return
             j = 0
             for i in range_g(start, stop, step):
                 self._buf[i] = byte[j]
@@ -538,7 +531,7 @@ class IntelHex(object):
 
     def __len__(self):
         """Return count of bytes with real values."""
-        return len(dict_keys(self._buf))
+        return len(self._buf)
 
     def _get_eol_textfile(eolstyle, platform):
         if eolstyle == 'native':
@@ -736,21 +729,16 @@ class IntelHex(object):
         from addr through addr+length, a NotEnoughDataError exception will
         be raised. Padding is not used.
         """
-        a = array('B', asbytes('\0'*length))
-        try:
-            for i in range_g(length):
-                a[i] = self._buf[addr+i]
-        except KeyError:
+        a = self._buf.read(addr, length)
+        if a is None:
             raise NotEnoughDataError(address=addr, length=length)
-        return array_tobytes(a)
+        return bytes(a)
 
     def puts(self, addr, s):
         """Put string of bytes at given address. Will overwrite any previous
         entries.
         """
-        a = array('B', asbytes(s))
-        for i in range_g(len(a)):
-            self._buf[addr+i] = a[i]
+        self._buf.write(addr, array('B', asbytes(s)))
 
     def getsz(self, addr):
         """Get zero-terminated bytes string from given address. Will raise
@@ -859,15 +847,18 @@ class IntelHex(object):
                 "'error', 'ignore' or 'replace'")
         # merge data
         this_buf = self._buf
-        other_buf = other._buf
-        for i in other_buf:
-            if i in this_buf:
-                if overlap == 'error':
+        other_segments = list(other._buf.iter_segments())
+        if overlap == 'error':
+            for start, data in other_segments:
+                i = this_buf.overlap(start, len(data))
+                if i is not None:
                     raise AddressOverlapError(
                         'Data overlapped at address 0x%X' % i)
-                elif overlap == 'ignore':
-                    continue
-            this_buf[i] = other_buf[i]
+        for start, data in other_segments:
+            if overlap == 'ignore':
+                this_buf.fill(start, data)
+            else:
+                this_buf.write(start, data)
         # merge start_addr
         if self.start_addr != other.start_addr:
             if self.start_addr is None:     # set start addr from other
@@ -886,18 +877,7 @@ class IntelHex(object):
         Each tuple has a length of two and follows the semantics of the range and xrange objects.
         The second entry of the tuple is always an integer greater than the first entry.
         """
-        addresses = self.addresses()
-        if not addresses:
-            return []
-        elif len(addresses) == 1:
-            return([(addresses[0], addresses[0]+1)])
-        adjacent_differences = [(b - a) for (a, b) in zip(addresses[:-1], addresses[1:])]
-        breaks = [i for (i, x) in enumerate(adjacent_differences) if x > 1]
-        endings = [addresses[b] for b in breaks]
-        endings.append(addresses[-1])
-        beginings = [addresses[b+1] for b in breaks]
-        beginings.insert(0, addresses[0])
-        return [(a, b+1) for (a, b) in zip(beginings, endings)]
+        return self._buf.segments()
 
     def get_memory_size(self):
         """Returns the approximate memory footprint for data."""
@@ -977,22 +957,22 @@ class IntelHex16bit(IntelHex):
 
         @return         minimal address used in this object
         '''
-        aa = dict_keys(self._buf)
-        if aa == []:
+        aa = self._buf.minaddr()
+        if aa is None:
             return 0
         else:
-            return min(aa)>>1
+            return aa>>1
 
     def maxaddr(self):
         '''Get maximal address of HEX content in 16-bit mode.
 
         @return         maximal address used in this object
         '''
-        aa = dict_keys(self._buf)
-        if aa == []:
+        aa = self._buf.maxaddr()
+        if aa is None:
             return 0
         else:
-            return max(aa)>>1
+            return aa>>1
 
     def tobinarray(self, start=None, end=None, size=None):
         '''Convert this object to binary form as array (of 2-bytes word data).
@@ -1005,7 +985,7 @@ class IntelHex16bit(IntelHex):
         '''
         bin = array('H')
 
-        if self._buf == {} and None in (start, end):
+        if len(self._buf) == 0 and None in (start, end):
             return bin
 
         if size is not None and size <= 0:
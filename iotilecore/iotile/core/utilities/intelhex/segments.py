@@ -0,0 +1,343 @@
+# This file is copyright Arch Systems, Inc.
+# Except as otherwise provided in the relevant LICENSE file, all rights are reserved.
+
+"""Sparse byte storage for IntelHex objects.
+
+IntelHex originally stored every byte of an image as a separate entry in a
+dictionary of address -> byte, which takes around 100 bytes of memory per
+byte of firmware and needs a dictionary lookup per byte to convert an image
+to binary.  Firmware images are almost entirely made of a few large
+contiguous runs of bytes, so SegmentBuffer stores each run as a single
+bytearray instead.
+
+SegmentBuffer behaves like the dictionary it replaces so existing code that
+accesses individual addresses keeps working, and adds bulk operations that
+work on whole runs of bytes at a time.
+"""
+
+from bisect import bisect_right
+import sys
+
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:
+    from collections import Mapping, MutableMapping
+
+
+class SegmentBuffer(MutableMapping):
+    """A sorted list of non-overlapping, non-adjacent runs of bytes.
+
+    Two segments never touch, so every contiguous range of occupied
+    addresses is stored in exactly one bytearray.
+
+    Args:
+        data (dict): Optional initial contents as a dictionary of address
+            -> byte value.
+    """
+
+    def __init__(self, data=None):
+        self._starts = []
+        self._segments = []
+        self._count = 0
+
+        if data is not None:
+            self.update(data)
+
+    def _find(self, addr):
+        """Find the index of the last segment starting at or before addr."""
+
+        return bisect_right(self._starts, addr) - 1
+
+    def __getitem__(self, addr):
+        idx = self._find(addr)
+        if idx >= 0:
+            offset = addr - self._starts[idx]
+            segment = self._segments[idx]
+            if offset < len(segment):
+                return segment[offset]
+
+        raise KeyError(addr)
+
+    def get(self, addr, default=None):
+        idx = self._find(addr)
+        if idx >= 0:
+            offset = addr - self._starts[idx]
+            segment = self._segments[idx]
+            if offset < len(segment):
+                return segment[offset]
+
+        return default
+
+    def __contains__(self, addr):
+        idx = self._find(addr)
+        return idx >= 0 and addr - self._starts[idx] < len(self._segments[idx])
+
+    def __setitem__(self, addr, value):
+        idx = self._find(addr)
+        if idx >= 0:
+            offset = addr - self._starts[idx]
+            segment = self._segments[idx]
+            if offset < len(segment):
+                segment[offset] = value
+                return
+
+        self.write(addr, bytearray((value,)))
+
+    def __delitem__(self, addr):
+        idx = self._find(addr)
+        if idx < 0:
+            raise KeyError(addr)
+
+        offset = addr - self._starts[idx]
+        segment = self._segments[idx]
+        if offset >= len(segment):
+            raise KeyError(addr)
+
+        if len(segment) == 1:
+            del self._starts[idx]
+            del self._segments[idx]
+        elif offset == 0:
+            del segment[0]
+            self._starts[idx] += 1
+        elif offset == len(segment) - 1:
+            del segment[-1]
+        else:
+            self._starts.insert(idx + 1, addr + 1)
+            self._segments.insert(idx + 1, segment[offset + 1:])
+            del segment[offset:]
+
+        self._count -= 1
+
+    def __iter__(self):
+        for start, segment in zip(self._starts, self._segments):
+            for addr in range(start, start + len(segment)):
+                yield addr
+
+    def __len__(self):
+        return self._count
+
+    def __eq__(self, other):
+        if isinstance(other, SegmentBuffer):
+            return self._starts == other._starts and self._segments == other._segments
+
+        if isinstance(other, Mapping) and len(other) != len(self):
+            return False
+
+        return Mapping.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "SegmentBuffer(%d bytes in %d segments)" % (self._count, len(self._segments))
+
+    def __sizeof__(self):
+        size = object.__sizeof__(self) + sys.getsizeof(self._starts) + sys.getsizeof(self._segments)
+        return size + sum(sys.getsizeof(x) for x in self._segments)
+
+    def copy(self):
+        """Make an independent copy of this buffer."""
+
+        copied = SegmentBuffer()
+        copied._starts = list(self._starts)
+        copied._segments = [bytearray(x) for x in self._segments]
+        copied._count = self._count
+        return copied
+
+    def clear(self):
+        self._starts = []
+        self._segments = []
+        self._count = 0
+
+    def write(self, addr, data):
+        """Store a run of bytes starting at addr, overwriting existing data.
+
+        Args:
+            addr (int): The address of the first byte.
+            data (bytearray, bytes, array or list of int): The bytes to store.
+        """
+
+        if not isinstance(data, bytearray):
+            data = bytearray(data)
+
+        length = len(data)
+        if length == 0:
+            return
+
+        end = addr + length
+
+        # Every segment from first through last overlaps or touches [addr, end)
+        first = self._find(addr)
+        if first < 0 or self._starts[first] + len(self._segments[first]) < addr:
+            first += 1
+
+        last = self._find(end)
+
+        if first > last:
+            self._starts.insert(first, addr)
+            self._segments.insert(first, data)
+            self._count += length
+            return
+
+        first_start = self._starts[first]
+        first_segment = self._segments[first]
+
+        # The common case when loading an image in order is appending to the last segment
+        if first == last and first_start + len(first_segment) == addr:
+            first_segment += data
+            self._count += length
+            return
+
+        last_start = self._starts[last]
+        last_segment = self._segments[last]
+
+        merged = bytearray()
+        if first_start < addr:
+            merged += first_segment[:addr - first_start]
+
+        merged += data
+
+        if last_start + len(last_segment) > end:
+            merged += last_segment[end - last_start:]
+
+        self._count += len(merged) - sum(len(x) for x in self._segments[first:last + 1])
+        self._starts[first:last + 1] = [min(first_start, addr)]
+        self._segments[first:last + 1] = [merged]
+
+    def fill(self, addr, data):
+        """Store a run of bytes but keep any existing data where they overlap.
+
+        Args:
+            addr (int): The address of the first byte.
+            data (bytearray, bytes, array or list of int): The bytes to store.
+        """
+
+        if not isinstance(data, bytearray):
+            data = bytearray(data)
+
+        end = addr + len(data)
+
+        gaps = []
+        cursor = addr
+        idx = max(self._find(addr), 0)
+
+        while idx < len(self._starts) and self._starts[idx] < end:
+            start = self._starts[idx]
+            if start > cursor:
+                gaps.append((cursor, start))
+
+            cursor = max(cursor, start + len(self._segments[idx]))
+            idx += 1
+
+        if cursor < end:
+            gaps.append((cursor, end))
+
+        for gap_start, gap_end in gaps:
+            self.write(gap_start, data[gap_start - addr:gap_end - addr])
+
+    def overlap(self, addr, length):
+        """Find the first occupied address in a range.
+
+        Args:
+            addr (int): The first address in the range.
+            length (int): The number of addresses in the range.
+
+        Returns:
+            int: The lowest occupied address in [addr, addr + length) or None
+                if the entire range is empty.
+        """
+
+        idx = self._find(addr)
+        if idx >= 0 and self._starts[idx] + len(self._segments[idx]) > addr:
+            return addr
+
+        idx += 1
+        if idx < len(self._starts) and self._starts[idx] < addr + length:
+            return self._starts[idx]
+
+        return None
+
+    def read(self, addr, length):
+        """Read a run of bytes that must all be present.
+
+        Returns:
+            bytearray: The bytes or None if any address in the range is empty.
+        """
+
+        idx = self._find(addr)
+        if idx < 0:
+            return None
+
+        offset = addr - self._starts[idx]
+        segment = self._segments[idx]
+        if offset + length > len(segment):
+            return None
+
+        return segment[offset:offset + length]
+
+    def tobytes(self, start, stop, pad):
+        """Convert the addresses in [start, stop) to bytes.
+
+        Args:
+            start (int): The first address to include.
+            stop (int): One past the last address to include.
+            pad (int): The value to use for empty addresses.
+
+        Returns:
+            bytearray: The contents of the range.
+        """
+
+        result = bytearray()
+        cursor = start
+
+        idx = max(self._find(start), 0)
+        while idx < len(self._starts) and self._starts[idx] < stop:
+            seg_start = self._starts[idx]
+            segment = self._segments[idx]
+            idx += 1
+
+            copy_start = max(cursor, seg_start)
+            copy_stop = min(stop, seg_start + len(segment))
+            if copy_start >= copy_stop:
+                continue
+
+            # Only build padding when there is a gap so that pad does not
+            # need to be a valid byte for fully occupied ranges.
+            if copy_start > cursor:
+                result += bytearray((pad,)) * (copy_start - cursor)
+
+            result += segment[copy_start - seg_start:copy_stop - seg_start]
+            cursor = copy_stop
+
+        if cursor < stop:
+            result += bytearray((pad,)) * (stop - cursor)
+
+        return result
+
+    def iter_segments(self):
+        """Iterate over (start address, bytearray) for each contiguous run."""
+
+        return zip(self._starts, self._segments)
+
+    def segments(self):
+        """Return a list of (start, stop) tuples for each contiguous run."""
+
+        return [(start, start + len(segment)) for start, segment in zip(self._starts, self._segments)]
+
+    def minaddr(self):
+        """The lowest occupied address or None if empty."""
+
+        if self._count == 0:
+            return None
+
+        return self._starts[0]
+
+    def maxaddr(self):
+        """The highest occupied address or None if empty."""
+
+        if self._count == 0:
+            return None
+
+        return self._starts[-1] + len(self._segments[-1]) - 1
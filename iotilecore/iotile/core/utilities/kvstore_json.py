@@ -6,15 +6,27 @@ import os.path
 import sys
 import os
 import platform
+import threading
+from contextlib import contextmanager
 from iotile.core.utilities.paths import settings_directory
 
+
 class JSONKVStore(object):
     """A Key Value store based on flat json files with atomic write semantics
 
-    This is intended as a drop in replacement for SQLiteKVStore.  Note that the
-    implementation is not meant to be efficient in the sense of caching the file
-    in memory.  Instead it has read-through and write-through semantics where the
-    file is reloaded every time a request is made.
+    This is intended as a drop in replacement for SQLiteKVStore.  The contents
+    of the file are parsed once and cached in memory, shared between all
+    JSONKVStore objects in this process that refer to the same file.  Before
+    every operation the file is stat'ed and the cache is reloaded if its
+    modification time, size or inode has changed, so changes made by other
+    processes are still seen.  The modification time is compared with
+    nanosecond resolution where the platform provides it.  None of these
+    values is guaranteed to change on every write (an inode may be reused
+    and coarse filesystem timestamps can collide), but a change to any of
+    them forces a reload.
+
+    Multiple changes can be batched into a single write of the backing file
+    using the transaction() context manager.
 
     Args:
         name (string): The name of the file to use as a persistent store for this KVStore
@@ -26,6 +38,10 @@ class JSONKVStore(object):
 
     DefaultFolder = settings_directory()
 
+    # Maps the realpath of a backing file to a (stamp, data) tuple
+    _cache = {}
+    _cache_lock = threading.Lock()
+
     def __init__(self, name, folder=None, respect_venv=False):
         if folder is None:
             folder = JSONKVStore.DefaultFolder
@@ -43,26 +59,74 @@ class JSONKVStore(object):
         jsonfile = os.path.join(folder, name)
 
         self.file = jsonfile
+        self._cache_key = os.path.realpath(jsonfile)
+        self._transaction_depth = 0
+        self._pending = None
+        self._dirty = False
+
+    def _file_stamp(self):
+        """Return a tuple that changes whenever the backing file is replaced or modified."""
+
+        try:
+            info = os.stat(self.file)
+        except OSError:
+            return None
+
+        # st_mtime_ns is not available on python 2
+        mtime_ns = getattr(info, 'st_mtime_ns', None)
+        if mtime_ns is None:
+            mtime_ns = int(info.st_mtime * 1e9)
+
+        return (mtime_ns, info.st_size, info.st_ino)
 
     def _load_file(self):
         """Load all entries from json backing file
+
+        The file is only parsed again if it has changed since it was last
+        loaded or saved.  Inside a transaction, the uncommitted data is
+        returned instead.
+
+        The returned dictionary is shared and must not be modified.
         """
 
-        if not os.path.exists(self.file):
-            return {}
+        if self._pending is not None:
+            return self._pending
+
+        with JSONKVStore._cache_lock:
+            cached = JSONKVStore._cache.get(self._cache_key)
 
-        with open(self.file, "r") as infile:
-            data = json.load(infile)
+        stamp = self._file_stamp()
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
 
+        if stamp is None:
+            data = {}
+        else:
+            with open(self.file, "r") as infile:
+                data = json.load(infile)
+
+        self._update_cache(stamp, data)
         return data
 
+    def _update_cache(self, stamp, data):
+        with JSONKVStore._cache_lock:
+            JSONKVStore._cache[self._cache_key] = (stamp, data)
+
     def _save_file(self, data):
         """Attempt to atomically save file by saving and then moving into position
 
         The goal is to make it difficult for a crash to corrupt our data file since
         the move operation can be made atomic if needed on mission critical filesystems.
+
+        If we are inside a transaction, the save is deferred until the
+        outermost transaction finishes.
         """
 
+        if self._pending is not None:
+            self._pending = data
+            self._dirty = True
+            return
+
         if platform.system() == 'Windows':
             with open(self.file, "w") as outfile:
                 json.dump(data, outfile)
@@ -71,12 +135,74 @@ class JSONKVStore(object):
 
             with open(newpath, "w") as outfile:
                 json.dump(data, outfile)
+                outfile.flush()
+                os.fsync(outfile.fileno())
 
             os.rename(
                 os.path.realpath(newpath),
                 os.path.realpath(self.file)
             )
 
+        self._update_cache(self._file_stamp(), data)
+
+    def _writable_data(self):
+        """Get a copy of the current data that can be modified and saved.
+
+        Inside a transaction the pending data is modified in place since it
+        is private to this object.
+        """
+
+        if self._pending is not None:
+            return self._pending
+
+        return dict(self._load_file())
+
+    @contextmanager
+    def transaction(self):
+        """Batch multiple changes into a single write of the backing file.
+
+        All changes made inside the with block are kept in memory and the
+        file is written once when the block exits.  If an exception is
+        raised inside the block, the changes are discarded and the file is
+        left untouched.  Transactions may be nested, in which case only the
+        outermost one writes the file.  A nested transaction acts as a
+        savepoint: if it exits with an exception, only the changes made
+        inside it are discarded and the outer transaction continues with
+        the data it had before the nested block started.
+
+        Example:
+            with store.transaction():
+                store.set('a', '1')
+                store.set('b', '2')
+        """
+
+        savepoint = None
+        if self._transaction_depth == 0:
+            self._pending = dict(self._load_file())
+            self._dirty = False
+        else:
+            savepoint = (dict(self._pending), self._dirty)
+
+        self._transaction_depth += 1
+
+        completed = False
+        try:
+            yield self
+            completed = True
+        finally:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                data = self._pending
+                dirty = self._dirty
+
+                self._pending = None
+                self._dirty = False
+
+                if completed and dirty:
+                    self._save_file(data)
+            elif not completed:
+                self._pending, self._dirty = savepoint
+
     def get(self, key):
         """Get a value by its key
 
@@ -101,7 +227,7 @@ class JSONKVStore(object):
         """
 
         data = self._load_file()
-        return data.items()
+        return list(data.items())
 
     def remove(self, key):
         """Remove a key from the data store
@@ -113,7 +239,7 @@ class JSONKVStore(object):
             KeyError: if the key was not found
         """
 
-        data = self._load_file()
+        data = self._writable_data()
         del data[key]
         self._save_file(data)
 
@@ -138,10 +264,21 @@ class JSONKVStore(object):
             value (string): The value to store
         """
 
-        data = self._load_file()
+        data = self._writable_data()
         data[key] = value
         self._save_file(data)
 
+    def set_many(self, items):
+        """Set the values of multiple keys with a single write.
+
+        Args:
+            items (iterable of (string, string)): The key, value pairs to set.
+        """
+
+        data = self._writable_data()
+        data.update(items)
+        self._save_file(data)
+
     def clear(self):
         """Clear all values from this kv store
         """
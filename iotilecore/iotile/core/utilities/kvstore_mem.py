@@ -3,6 +3,8 @@
 # This file is copyright Arch Systems, Inc.
 # Except as otherwise provided in the relevant LICENSE file, all rights are reserved.
 
+from contextlib import contextmanager
+
 
 class InMemoryKVStore(object):
     """A Key Value store based on an in memory dict
@@ -81,6 +83,29 @@ class InMemoryKVStore(object):
 
         self._shared_data[key] = value
 
+    def set_many(self, items):
+        """Set the values of multiple keys.
+
+        Args:
+            items (iterable of (string, string)): The key, value pairs to set.
+        """
+
+        self._shared_data.update(items)
+
+    @contextmanager
+    def transaction(self):
+        """Undo all changes made inside a with block if it raises an exception."""
+
+        saved = dict(self._shared_data)
+
+        completed = False
+        try:
+            yield self
+            completed = True
+        finally:
+            if not completed:
+                InMemoryKVStore._shared_data = saved
+
     def clear(self):
         """Clear all values from this kv store."""
 
@@ -3,6 +3,7 @@
 
 #Sqlite3 textual key value store
 from iotile.core.utilities.paths import settings_directory
+from contextlib import contextmanager
 import sqlite3
 import os.path
 import sys
@@ -12,11 +13,26 @@ class SQLiteKVStore(object):
     """
     A simple string - string persistent map backed by sqlite for concurrent access
 
+    The database is opened in WAL mode so that readers in other processes
+    are never blocked by a writer.  Reads are served from an in memory copy
+    of the table that is refreshed whenever another connection commits a
+    change, which is detected using sqlite's data_version pragma.
+
+    Multiple changes can be committed together using set_many() or the
+    transaction() context manager, which avoids syncing the database to
+    disk after every single change.
+
     The KeyValueStore can be made to respect python virtual environments if desired
     """
 
     DefaultFolder = settings_directory()
 
+    # Seconds to wait for another process to release a write lock
+    LockTimeout = 10.0
+
+    SetQuery = "insert or replace into KVStore values (?, ?)"
+    RemoveQuery = "delete from KVStore where key is ?"
+
     def __init__(self, name, folder=None, respect_venv=False):
         if folder is None:
             folder = SQLiteKVStore.DefaultFolder
@@ -32,43 +48,106 @@ class SQLiteKVStore(object):
             os.makedirs(folder, 0o755)
 
         dbfile = os.path.join(folder, name)
-        self.connection = sqlite3.connect(dbfile)
+        self.connection = sqlite3.connect(dbfile, timeout=self.LockTimeout)
         self.cursor = self.connection.cursor()
 
         self.file = dbfile
+        self._cache = None
+        self._data_version = None
+        self._transaction_depth = 0
+
+        self._setup_connection()
         self._setup_table()
 
+    def _setup_connection(self):
+        # WAL mode is persistent in the database file but it cannot be used on
+        # some network filesystems, in which case sqlite keeps the old mode
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        mode = self.cursor.fetchone()[0]
+
+        # In WAL mode, NORMAL is still safe against corruption and only skips
+        # syncing on every commit
+        if mode.lower() == 'wal':
+            self.cursor.execute('PRAGMA synchronous=NORMAL')
+
     def _setup_table(self):
         query = 'create table if not exists KVStore (key TEXT PRIMARY KEY, value TEXT);'
         self.cursor.execute(query)
         self.connection.commit()
 
+    def _commit(self):
+        if self._transaction_depth == 0:
+            self.connection.commit()
+
+    def _load_cache(self):
+        """Make sure our cached copy of the table is up to date and return it."""
+
+        # Our own uncommitted changes are always applied to the cache directly
+        if self._transaction_depth == 0:
+            self.cursor.execute('PRAGMA data_version')
+            version = self.cursor.fetchone()[0]
+
+            if version != self._data_version:
+                self._data_version = version
+                self._cache = None
+
+        if self._cache is None:
+            self.cursor.execute('select key, value from KVStore')
+            self._cache = dict(self.cursor.fetchall())
+
+        return self._cache
+
+    @contextmanager
+    def transaction(self):
+        """Commit all changes made inside a with block at once.
+
+        If an exception is raised inside the block, all of the changes are
+        rolled back.  Transactions may be nested, in which case only the
+        outermost one commits.
+
+        Example:
+            with store.transaction():
+                store.set('a', '1')
+                store.remove('b')
+        """
+
+        if self._transaction_depth == 0:
+            self._load_cache()
+
+        self._transaction_depth += 1
+
+        completed = False
+        try:
+            yield self
+            completed = True
+        finally:
+            self._transaction_depth -= 1
+            if completed:
+                self._commit()
+            elif self._transaction_depth == 0:
+                self.connection.rollback()
+                self._cache = None
+
     def size(self):
-        query = 'select count(*) from KVStore'
-        self.cursor.execute(query)
-        return self.cursor.fetchone()[0]
+        return len(self._load_cache())
 
     def get_all(self):
-        query = 'select key, value from KVStore'
-        self.cursor.execute(query)
-
-        vals = self.cursor.fetchall()
-        return vals
+        return list(self._load_cache().items())
 
     def get(self, id):
-        query = 'select value from KVStore where key is ?'
-        self.cursor.execute(query, (id,))
-
-        val = self.cursor.fetchone()
+        val = self._load_cache().get(id)
         if val is None:
             raise KeyError("id not in key-value store: %s" % str(id))
 
-        return val[0]
+        return val
 
     def remove(self, key):
-        query = "delete from KVStore where key is ?"
-        self.cursor.execute(query, (key,))
-        self.connection.commit()
+        cache = self._load_cache()
+
+        self.cursor.execute(self.RemoveQuery, (key,))
+        self._commit()
+
+        cache.pop(key, None)
 
     def try_get(self, id):
         try:
@@ -77,13 +156,27 @@ class SQLiteKVStore(object):
             return None
 
     def set(self, key, value):
-        query = "insert or replace into KVStore values (?, ?)"
-        self.cursor.execute(query, (key, str(value)))
-        self.connection.commit()
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        """Set the values of multiple keys in a single commit.
+
+        Args:
+            items (iterable of (string, string)): The key, value pairs to set.
+        """
+
+        cache = self._load_cache()
+
+        items = [(key, str(value)) for key, value in items]
+        self.cursor.executemany(self.SetQuery, items)
+        self._commit()
+
+        cache.update(items)
 
     def clear(self):
-        query = 'drop table KVStore'
-        self.cursor.execute(query)
-        self.connection.commit()
+        self._load_cache()
 
-        self._setup_table()
+        self.cursor.execute('delete from KVStore')
+        self._commit()
+
+        self._cache = {}
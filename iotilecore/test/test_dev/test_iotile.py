@@ -4,6 +4,7 @@ import pytest
 import datetime
 from dateutil.tz import tzutc
 import os
+import json
 
 
 def load_tile(name):
@@ -173,3 +174,79 @@ def test_depfinding_overlays():
     assert 'dep3' in deps
     assert 'dep4' in deps
     assert 'dep5' in deps
+
+
+def test_metadata_cache(tmpdir):
+    """Make sure IOTile objects reuse parsed settings until the file changes."""
+
+    parent = os.path.dirname(__file__)
+    with open(os.path.join(parent, 'comp_w_deps', 'module_settings.json'), "r") as infile:
+        settings = json.load(infile)
+
+    comp = tmpdir.mkdir('comp')
+    modfile = comp.join('module_settings.json')
+    modfile.write(json.dumps(settings))
+
+    tile1 = IOTile(str(comp))
+    tile2 = IOTile(str(comp))
+    assert tile1.settings == tile2.settings
+    assert tile1.settings is not tile2.settings
+    assert tile1 is not tile2
+    assert len(tile2.dependencies) == 3
+
+    settings['modules']['test_comp']['version'] = '2.0.0'
+    modfile.write(json.dumps(settings, indent=4))
+
+    tile3 = IOTile(str(comp))
+    assert tile3.version == '2.0.0'
+    assert tile1.version != '2.0.0'
+
+
+def test_metadata_cache_isolation(tmpdir):
+    """Make sure changing one IOTile's settings does not affect later IOTiles."""
+
+    comp = tmpdir.mkdir('comp')
+    comp.join('module_settings.json').write(json.dumps({
+        'module_name': 'comp',
+        'architectures': {'arm': {'defines': {'X': 1}}},
+        'module_targets': {'comp': ['arm']},
+        'modules': {'comp': {'version': '1.0.0'}}
+    }))
+
+    tile1 = IOTile(str(comp))
+    tile1.architectures['arm']['defines']['Y'] = 2
+    tile1.settings['version'] = '2.0.0'
+
+    tile2 = IOTile(str(comp))
+    assert tile2.architectures == {'arm': {'defines': {'X': 1}}}
+    assert tile2.settings['version'] == '1.0.0'
+
+
+def test_persistent_metadata_cache(tmpdir):
+    """Make sure parsed settings are reloaded from the persistent cache."""
+
+    cache_file = str(tmpdir.join('cache.json'))
+    path = os.path.join(os.path.dirname(__file__), 'comp_w_deps')
+
+    IOTile.ClearCache()
+    IOTile.EnablePersistentCache(cache_file)
+
+    try:
+        tile = IOTile(path)
+        IOTile.SavePersistentCache()
+
+        with open(cache_file, "r") as infile:
+            saved = json.load(infile)
+
+        modfile = os.path.realpath(os.path.join(path, 'module_settings.json'))
+        assert modfile in saved['files']
+
+        IOTile.ClearCache()
+        IOTile.EnablePersistentCache(cache_file)
+        tile2 = IOTile(path)
+
+        assert tile2.settings == tile.settings
+        assert len(tile2.dependencies) == 3
+    finally:
+        IOTile.DisablePersistentCache()
+        IOTile.ClearCache()
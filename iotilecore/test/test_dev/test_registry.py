@@ -67,3 +67,14 @@ def test_backing_store_type(tmpdir):
     _check_registry_type(str(regdir))
 
     assert ComponentRegistry.BackingType is JSONKVStore
+
+
+def test_add_components(registry):
+    """Make sure we can register multiple components at once."""
+
+    registry.add_components([tile_path('devmode_component'), tile_path('comp_w_deps')])
+
+    names = registry.list_components()
+    assert len(names) == 2
+    for name in names:
+        assert registry.get_component(name).name == name
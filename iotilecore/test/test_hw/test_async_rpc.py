@@ -0,0 +1,169 @@
+"""Tests for sending RPCs asynchronously through TileBusProxyObject.rpc_async."""
+
+import os
+import sys
+import pytest
+from iotile.core.hw.hwmanager import HardwareManager
+from iotile.core.hw.proxy.proxy import TileBusProxyObject
+from iotile.core.hw.exceptions import ModuleBusyError, UnsupportedCommandError
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 5), reason="rpc_async requires asyncio")
+
+
+@pytest.fixture
+def tile_based():
+    conf_file = os.path.join(os.path.dirname(__file__), 'tile_config.json')
+
+    if '@' in conf_file or ',' in conf_file or ';' in conf_file:
+        pytest.skip('Cannot pass device config because path has [@,;] in it')
+
+    hw = HardwareManager('virtual:tile_based@%s' % conf_file)
+    yield hw
+
+    hw.disconnect()
+
+
+@pytest.fixture
+def loop():
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    yield loop
+
+    loop.close()
+
+
+class BusyStream(object):
+    """A fake stream that reports busy a fixed number of times before responding."""
+
+    def __init__(self, busy_count):
+        self.busy_count = busy_count
+        self.attempts = 0
+
+    def send_rpc_async(self, address, rpc_id, call_payload, loop=None, **kwargs):
+        self.attempts += 1
+
+        future = loop.create_future()
+        if self.attempts <= self.busy_count:
+            future.set_exception(ModuleBusyError(address))
+        else:
+            future.set_result((0xC0, bytearray(b'\x01\x00\x00\x00')))
+
+        return future
+
+
+def test_async_rpc_gather(tile_based, loop):
+    """Make sure we can run many RPCs concurrently."""
+
+    import asyncio
+
+    hw = tile_based
+    hw.connect(1)
+
+    con = hw.get(8, basic=True)
+    tile1 = hw.get(11, basic=True)
+
+    calls = [con.rpc_async(0x80, 0x00, 1, 2, arg_format="LL", result_format="L", loop=loop),
+             tile1.rpc_async(0x80, 0x00, 3, 5, arg_format="LL", result_format="L", loop=loop),
+             tile1.rpc_async(0x00, 0x04, result_format="H6sBBBB", loop=loop)]
+
+    results = loop.run_until_complete(asyncio.gather(*calls))
+
+    assert results[0] == (3,)
+    assert results[1] == (8,)
+    assert results[2][1] == b'test01'
+
+
+def test_async_rpc_errors(tile_based, loop):
+    """Make sure RPC errors are passed back through the future."""
+
+    hw = tile_based
+    hw.connect(1)
+
+    tile1 = hw.get(11, basic=True)
+
+    with pytest.raises(UnsupportedCommandError):
+        loop.run_until_complete(tile1.rpc_async(0x90, 0x00, loop=loop))
+
+
+def test_async_busy_backoff(loop):
+    """Make sure busy tiles are retried and eventually give up."""
+
+    stream = BusyStream(3)
+    proxy = TileBusProxyObject(stream, 8)
+
+    res = loop.run_until_complete(proxy.rpc_async(0x80, 0x01, result_format="L", loop=loop))
+    assert res == (1,)
+    assert stream.attempts == 4
+
+    stream = BusyStream(3)
+    proxy = TileBusProxyObject(stream, 8)
+
+    with pytest.raises(ModuleBusyError):
+        loop.run_until_complete(proxy.rpc_async(0x80, 0x01, result_format="L", retries=2, loop=loop))
+
+    assert stream.attempts == 3
+
+
+def test_async_rpc_reconnect(tile_based, loop, monkeypatch):
+    """Make sure interrupted connections are recovered off the event loop."""
+
+    import threading
+
+    hw = tile_based
+    hw.connect(1)
+
+    stream = hw.stream
+    tile1 = hw.get(11, basic=True)
+    reconnects = []
+
+    def _fake_reconnect():
+        reconnects.append(threading.current_thread())
+        stream.connection_interrupted = False
+
+    monkeypatch.setattr(stream, '_try_reconnect', _fake_reconnect)
+
+    # Reconnect before the RPC is sent
+    stream.connection_interrupted = True
+    res = loop.run_until_complete(tile1.rpc_async(0x80, 0x00, 3, 5, arg_format="LL", result_format="L", loop=loop))
+    assert res == (8,)
+    assert len(reconnects) == 1
+    assert reconnects[0] is not threading.current_thread()
+
+    # Reconnect after an RPC that caused the device to go offline
+    send_rpc_async = stream.adapter.send_rpc_async
+
+    def _interrupting_send(*args):
+        stream.connection_interrupted = True
+        send_rpc_async(*args)
+
+    monkeypatch.setattr(stream.adapter, 'send_rpc_async', _interrupting_send)
+
+    res = loop.run_until_complete(tile1.rpc_async(0x80, 0x00, 3, 5, arg_format="LL", result_format="L", loop=loop))
+    assert res == (8,)
+    assert len(reconnects) == 2
+    assert reconnects[1] is not threading.current_thread()
+    assert not stream.connection_interrupted
+
+
+def test_async_rpc_reconnect_failure(tile_based, loop, monkeypatch):
+    """Make sure a failed reconnection is reported through the future."""
+
+    from iotile.core.exceptions import HardwareError
+
+    hw = tile_based
+    hw.connect(1)
+
+    stream = hw.stream
+    tile1 = hw.get(11, basic=True)
+
+    def _failed_reconnect():
+        raise HardwareError("Device disconnected unexpectedly and we could not reconnect")
+
+    monkeypatch.setattr(stream, '_try_reconnect', _failed_reconnect)
+    stream.connection_interrupted = True
+
+    with pytest.raises(HardwareError):
+        loop.run_until_complete(tile1.rpc_async(0x80, 0x00, 3, 5, arg_format="LL", result_format="L", loop=loop))
+
+    stream.connection_interrupted = False
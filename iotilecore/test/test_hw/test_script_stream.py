@@ -0,0 +1,111 @@
+"""Tests of incremental script encoding and chunking."""
+
+import pytest
+from iotile.core.exceptions import ArgumentError, DataError
+from iotile.core.hw.update.records import ReflashTileRecord, SendRPCRecord
+from iotile.core.hw import UpdateScript
+from iotile.core.hw.transport.script_stream import ScriptStream
+
+
+@pytest.fixture
+def script():
+    records = [ReflashTileRecord(1, bytearray(range(0, 256))*4, 0x1000)]
+    records += [SendRPCRecord(10, 0x8000 + i, bytearray([i]*(i % 7))) for i in range(0, 50)]
+    return UpdateScript(records)
+
+
+def test_iter_encode(script):
+    """Make sure incremental encoding matches encoding all at once."""
+
+    encoded = script.encode()
+
+    assert bytearray().join(script.iter_encode()) == encoded
+    assert script.encoded_length() == len(encoded)
+    assert bytearray().join(UpdateScript([]).iter_encode()) == UpdateScript([]).encode()
+
+
+def test_lazy_encoding(script):
+    """Make sure records are encoded lazily as the script is streamed."""
+
+    encoded = bytes(script.encode())
+    calls = []
+
+    def _counting_encode(record):
+        original = record.encode
+
+        def _encode():
+            calls.append(record)
+            return original()
+
+        return _encode
+
+    for record in script.records:
+        assert record.encoded_length() == len(record.encode())
+        record.encode = _counting_encode(record)
+
+    # The firmware record's length is known without encoding it
+    stream = ScriptStream(script, 20)
+    assert stream.total == len(encoded)
+    assert calls.count(script.records[0]) == 0
+
+    # The header needs a hash of every record, then records are encoded as they are sent
+    assert stream.next_chunk() == encoded[:20]
+    assert calls == script.records
+
+    assert stream.next_chunk() + b''.join(stream) == encoded[20:]
+    assert calls == script.records + script.records
+
+
+def test_inconsistent_record_length(script):
+    """Make sure we notice if a record's length does not match its encoding."""
+
+    script.records[1].encoded_length = lambda: 3
+
+    with pytest.raises(DataError):
+        bytearray().join(script.iter_encode())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 20, 4096])
+def test_chunking(script, chunk_size):
+    """Make sure chunks are pulled correctly from scripts and binary data."""
+
+    encoded = bytes(script.encode())
+
+    for source in (script, encoded, bytearray(encoded)):
+        stream = ScriptStream(source, chunk_size)
+        assert stream.total == len(encoded)
+
+        chunks = list(stream)
+        assert b''.join(chunks) == encoded
+        assert all(len(x) == chunk_size for x in chunks[:-1])
+        assert 0 < len(chunks[-1]) <= chunk_size
+
+        assert stream.finished
+        assert stream.sent == stream.total
+        assert stream.sent_chunks == stream.total_chunks == len(chunks)
+        assert stream.next_chunk() is None
+
+
+def test_lazy_pulling(script):
+    """Make sure progress is tracked as chunks are pulled."""
+
+    stream = ScriptStream(script, 20)
+    assert stream.sent == 0
+    assert not stream.finished
+
+    chunk = stream.next_chunk()
+    assert chunk == bytes(script.encode()[:20])
+    assert stream.sent == 20
+    assert stream.sent_chunks == 1
+
+
+def test_invalid_scripts():
+    """Make sure we reject things that are not scripts."""
+
+    assert ScriptStream(b'', 20).next_chunk() is None
+
+    with pytest.raises(ArgumentError):
+        ScriptStream(u'hello', 20)
+
+    with pytest.raises(ArgumentError):
+        ScriptStream(b'hello', 0)
@@ -0,0 +1,98 @@
+"""Tests of the binary snapshot format."""
+
+import pytest
+from iotile.core.hw.reports import IOTileReading
+from iotile.core.hw.debug.snapshot import encode_snapshot, decode_snapshot, is_binary_snapshot, PackedReadings
+from iotile.core.exceptions import ArgumentError, DataError
+
+
+def _readings(start, count):
+    return [IOTileReading(i * 10, 0x5001, i + 100, reading_id=i).asdict() for i in range(start, start + count)]
+
+
+def _state(readings, counter=0):
+    return {
+        'tile_states': {
+            8: {
+                'storage': {'engine': {'storage_data': readings, 'streaming_data': []}},
+                'counter': counter,
+                'name': u'controller'
+            }
+        }
+    }
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_roundtrip(compress):
+    """Make sure snapshots are packed and restored exactly."""
+
+    state = _state(_readings(0, 100))
+    encoded = encode_snapshot(state, compress=compress)
+
+    assert is_binary_snapshot(encoded)
+    assert not is_binary_snapshot(b'{"tile_states": {}}')
+
+    decoded = decode_snapshot(encoded)
+    storage = decoded['tile_states'][8]['storage']['engine']['storage_data']
+
+    assert isinstance(storage, PackedReadings)
+    assert len(storage) == 100
+    assert storage[5] == state['tile_states'][8]['storage']['engine']['storage_data'][5]
+    assert decoded == state
+
+    # Each reading is packed into 16 bytes
+    assert len(encode_snapshot(state, compress=False)) < 100*16 + 200
+
+
+def test_unpackable_readings():
+    """Make sure readings with UTC timestamps are kept as dictionaries."""
+
+    reading = IOTileReading(0, 0x5001, 1, reading_id=1).asdict()
+    reading['timestamp'] = '2018-01-01T00:00:00'
+    readings = [reading] + _readings(2, 2)
+
+    state = _state(readings)
+    decoded = decode_snapshot(encode_snapshot(state))
+
+    assert decoded == state
+
+
+def test_delta():
+    """Make sure delta snapshots only save what changed."""
+
+    base = encode_snapshot(_state(_readings(0, 1000)))
+
+    # Drop the first 10 readings and add 5 more
+    new_state = _state(_readings(10, 995), counter=5)
+    delta = encode_snapshot(new_state, compress=False, base=base)
+
+    assert len(delta) < 200
+    assert decode_snapshot(delta, base=base) == new_state
+
+    with pytest.raises(ArgumentError):
+        decode_snapshot(delta)
+
+    with pytest.raises(ArgumentError):
+        decode_snapshot(delta, base=encode_snapshot(_state([])))
+
+    with pytest.raises(ArgumentError):
+        encode_snapshot(new_state, base=delta)
+
+    # A delta against unrelated readings falls back to saving all of them
+    other_state = _state(_readings(2000, 10))
+    assert decode_snapshot(encode_snapshot(other_state, base=base), base=base) == other_state
+
+    # An unchanged state produces an empty delta
+    assert decode_snapshot(encode_snapshot(_state(_readings(0, 1000)), base=base), base=base) == _state(_readings(0, 1000))
+
+
+def test_invalid_snapshot():
+    """Make sure we reject corrupt snapshots."""
+
+    encoded = encode_snapshot(_state(_readings(0, 10)))
+
+    with pytest.raises(DataError):
+        decode_snapshot(encoded[:5])
+
+    with pytest.raises(DataError):
+        decode_snapshot(encoded[:-10])
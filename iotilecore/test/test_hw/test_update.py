@@ -1,8 +1,10 @@
 """Test our update script generation and parsing."""
 
+import hashlib
 import pytest
 from iotile.core.exceptions import ArgumentError, DataError
 from iotile.core.hw.update.records import *
+from iotile.core.hw.update.records import ResetDeviceRecord
 from iotile.core.hw import UpdateScript
 
 
@@ -64,3 +66,47 @@ def test_set_version():
     assert str(script2.records[0]) == u'Set device app to (tag:12 version:3.4)'
     assert str(script2.records[1]) == u'Set device os to (tag:56, version:7.8)'
     assert str(script2.records[2]) == u'Set device os to (tag:12, version:3.4) and app to (tag:56, version:7.8)'
+
+
+def test_lazy_parsing():
+    """Make sure we can iterate over the records in a script without parsing it all."""
+
+    records = [SendRPCRecord(10, 0x1234 + i, bytearray([i])) for i in range(0, 100)]
+    encoded = UpdateScript(records + [ResetDeviceRecord()]).encode()
+
+    parsed = UpdateScript.IterRecords(encoded)
+    first = next(parsed)
+    assert first == records[0]
+
+    rest = list(parsed)
+    assert rest[:-1] == records[1:]
+    assert isinstance(rest[-1], ResetDeviceRecord)
+
+    assert UpdateScript.FromBinary(bytes(encoded)).records == [first] + rest
+
+
+def test_rpc_dispatch():
+    """Make sure specific RPC records are still matched through the dispatch index."""
+
+    version = SetDeviceTagRecord(app_tag=12, app_version='3.4')
+    generic = SendErrorCheckingRPCRecord(8, 0x100A, bytearray(4), 4)
+
+    script = UpdateScript.FromBinary(UpdateScript([version, generic]).encode())
+    assert isinstance(script.records[0], SetDeviceTagRecord)
+    assert type(script.records[1]) is SendErrorCheckingRPCRecord
+
+    script = UpdateScript.FromBinary(UpdateScript([version, generic]).encode(), show_rpcs=True)
+    assert type(script.records[0]) is SendErrorCheckingRPCRecord
+
+
+def test_corrupt_record_length():
+    """Make sure we don't loop forever on records with a bad length."""
+
+    encoded = UpdateScript([ResetDeviceRecord()]).encode()
+    encoded[24] = 0
+
+    # Fix the embedded hash so that we get past the script header
+    encoded[:16] = hashlib.sha256(encoded[16:]).digest()[:16]
+
+    with pytest.raises(ArgumentError):
+        UpdateScript.FromBinary(encoded)
@@ -0,0 +1,108 @@
+"""Tests of report and trace chunking in VirtualIOTileInterface."""
+
+from iotile.core.hw.virtual.virtualinterface import VirtualIOTileInterface
+from iotile.core.hw.reports import IndividualReadingReport, IOTileReading
+
+
+def _make_report(value):
+    return IndividualReadingReport.FromReadings(1, [IOTileReading(0, 0x1000, value)])
+
+
+def test_report_chunking():
+    """Make sure reports are split into chunks that span report boundaries."""
+
+    iface = VirtualIOTileInterface()
+    finished = []
+
+    reports = [_make_report(i) for i in range(0, 3)]
+    for i, report in enumerate(reports):
+        iface._queue_reports((report, lambda success, index=i: finished.append((index, success))))
+
+    expected = b''.join(bytes(x.encode()) for x in reports)
+
+    received = bytearray()
+    while True:
+        chunk = iface._next_streaming_chunk(7)
+        if len(chunk) == 0:
+            break
+
+        assert len(chunk) == 7 or len(received) + len(chunk) == len(expected)
+        received += chunk
+
+    assert bytes(received) == expected
+    assert finished == [(0, True), (1, True), (2, True)]
+
+
+def test_batch_chunking():
+    """Make sure a max_size of None drains everything that is queued."""
+
+    iface = VirtualIOTileInterface()
+
+    iface._queue_traces(b'abc', bytearray(b'defg'))
+    assert iface._next_tracing_chunk(2) == b'ab'
+    assert iface._next_tracing_chunk(None) == b'cdefg'
+    assert iface._next_tracing_chunk(None) == b''
+
+    reports = [_make_report(i) for i in range(0, 10)]
+    iface._queue_reports(*reports)
+    assert iface._next_streaming_chunk(None) == b''.join(bytes(x.encode()) for x in reports)
+
+
+def test_clear_in_progress():
+    """Make sure clearing reports drops any partially sent report."""
+
+    iface = VirtualIOTileInterface()
+    finished = []
+
+    iface._queue_reports((_make_report(1), finished.append), (_make_report(2), finished.append))
+    iface._next_streaming_chunk(5)
+    iface._clear_reports()
+
+    assert finished == [False]
+    assert iface._next_streaming_chunk(20) == b''
+
+
+def test_action_priorities():
+    """Make sure deferred actions run in priority order."""
+
+    iface = VirtualIOTileInterface()
+    order = []
+
+    iface._defer(order.append, ['trace1'], priority=iface.TracingPriority)
+    iface._defer(order.append, ['stream1'], priority=iface.StreamingPriority)
+    iface._defer(order.append, ['default'])
+    iface._defer(order.append, ['rpc'], priority=iface.RPCPriority)
+    iface._defer(order.append, ['trace2'], priority=iface.TracingPriority)
+
+    assert iface.queue_stats()['actions']['depth'] == 5
+
+    iface.process()
+    assert order == ['rpc', 'default', 'trace1', 'stream1', 'trace2']
+
+
+def test_bounded_queues():
+    """Make sure full report and trace queues apply their drop policy."""
+
+    iface = VirtualIOTileInterface({'max_queued_reports': 2, 'max_queued_traces': '1', 'queue_drop_policy': 'drop_newest'})
+    results = []
+
+    reports = [_make_report(i) for i in range(0, 3)]
+    assert iface._queue_reports((reports[0], results.append), (reports[1], results.append)) is True
+    assert iface._queue_reports((reports[2], results.append)) is False
+    assert results == [False]
+
+    assert iface._queue_traces(b'abc') is True
+    assert iface._queue_traces(b'def') is False
+
+    stats = iface.queue_stats()
+    assert stats['reports'] == {'depth': 2, 'max_depth': 2, 'limit': 2, 'dropped': 1}
+    assert stats['traces'] == {'depth': 1, 'max_depth': 1, 'limit': 1, 'dropped': 1}
+
+    assert iface._next_streaming_chunk(None) == b''.join(bytes(x.encode()) for x in reports[:2])
+    assert results == [False, True, True]
+
+    iface = VirtualIOTileInterface({'max_queued_traces': 2})
+    dropped = []
+    iface._queue_traces((b'a', dropped.append), b'b', b'c')
+    assert dropped == [False]
+    assert iface._next_tracing_chunk(None) == b'bc'
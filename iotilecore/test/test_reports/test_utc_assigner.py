@@ -0,0 +1,192 @@
+"""Tests of UTCAssigner."""
+
+import datetime
+import random
+from iotile.core.hw.reports import UTCAssigner
+from iotile.core.hw.reports.signed_list_format import SignedListReport
+from iotile.core.hw.reports.report import IOTileReading
+
+
+def _walk_assign(points, reading_id, uptime=None):
+    """Assign a utc time by walking forward over sorted anchor tuples one at a time."""
+
+    later = [x for x in points if x[0] >= reading_id]
+    if len(later) == 0:
+        return None
+
+    last_id, last_uptime, last_utc, _last_break = later[0]
+    if uptime is not None:
+        last_uptime = uptime
+
+    found_id = last_id == reading_id
+    if found_id and last_utc is not None:
+        return last_utc, True, True, False
+
+    exact = True
+    crossed_break = False
+    accum_delta = 0
+    for _curr_id, curr_uptime, curr_utc, curr_break in later[1:]:
+        if curr_uptime is None or last_uptime is None:
+            exact = False
+        elif curr_break or curr_uptime < last_uptime:
+            exact = False
+            crossed_break = True
+        else:
+            accum_delta += curr_uptime - last_uptime
+
+        if curr_utc is not None:
+            return curr_utc - datetime.timedelta(seconds=accum_delta), found_id, exact, crossed_break
+
+        last_uptime = curr_uptime
+
+    return None
+
+
+def test_assign_matches_walk():
+    """Make sure table based assignment matches walking over every anchor."""
+
+    rand = random.Random(1234)
+    base = datetime.datetime(2018, 1, 1)
+
+    assigner = UTCAssigner()
+    points = []
+    uptime = 0
+
+    for reading_id in range(1, 2000, 2):
+        uptime += rand.randint(1, 100)
+        utc = None
+        is_break = False
+
+        choice = rand.random()
+        if choice < 0.05:
+            utc = base + datetime.timedelta(seconds=reading_id * 10)
+        elif choice < 0.08:
+            is_break = True
+            uptime = rand.randint(0, 50)
+
+        point_uptime = uptime
+        if choice > 0.97:
+            point_uptime = None
+            utc = base + datetime.timedelta(seconds=reading_id * 10)
+
+        assigner.add_point(reading_id, point_uptime, utc, is_break=is_break)
+        points.append((reading_id, point_uptime, utc, is_break))
+
+    reading_ids = list(range(0, 2010))
+    uptimes = [rand.choice([None, rand.randint(0, 100000)]) for _x in reading_ids]
+
+    results = assigner.assign_utc_many(reading_ids, uptimes)
+
+    assigned = 0
+    for reading_id, uptime, result in zip(reading_ids, uptimes, results):
+        expected = _walk_assign(points, reading_id, uptime)
+        single = assigner.assign_utc(reading_id, uptime)
+
+        if expected is None:
+            assert result is None
+            assert single is None
+            continue
+
+        assigned += 1
+        assert (result.utc, result.found_id, result.exact, result.crossed_break) == expected
+        assert (single.utc, single.found_id, single.exact, single.crossed_break) == expected
+
+    assert assigned > 1000
+
+
+def test_add_reports():
+    """Make sure adding reports in bulk is the same as adding them one at a time."""
+
+    received = datetime.datetime(2018, 1, 1)
+    reports = []
+    for i in range(0, 5):
+        readings = [IOTileReading(j * 10, 0x5000, j, reading_id=i * 100 + j + 1) for j in range(0, 50)]
+        report = SignedListReport.FromReadings(1, readings, report_id=i * 100 + 51, sent_timestamp=500)
+        report.received_time = received + datetime.timedelta(seconds=1000 * i)
+        reports.append(report)
+
+    single = UTCAssigner()
+    for report in reports:
+        single.add_report(report)
+
+    bulk = UTCAssigner()
+    bulk.add_reports(reports)
+
+    reading_ids = list(range(1, 500))
+    single_results = [single.assign_utc(x) for x in reading_ids]
+    bulk_results = bulk.assign_utc_many(reading_ids)
+
+    for single_result, bulk_result in zip(single_results, bulk_results):
+        if single_result is None:
+            assert bulk_result is None
+        else:
+            assert (single_result.utc, single_result.exact) == (bulk_result.utc, bulk_result.exact)
+
+    result = bulk.assign_utc(41)
+    assert result.exact is True
+    assert result.crossed_break is False
+    assert result.utc == received - datetime.timedelta(seconds=100)
+
+
+def test_interleaved_adds(monkeypatch):
+    """Make sure anchors can be added between assignments incrementally."""
+
+    import iotile.core.hw.reports.utc_assigner as utc_assigner
+
+    rand = random.Random(4321)
+    base = datetime.datetime(2018, 1, 1)
+
+    points = []
+    uptime = 0
+    for reading_id in range(1, 1000, 2):
+        uptime += rand.randint(1, 100)
+        utc = None
+        is_break = False
+
+        choice = rand.random()
+        if choice < 0.05:
+            utc = base + datetime.timedelta(seconds=reading_id * 10)
+        elif choice < 0.08:
+            is_break = True
+            uptime = rand.randint(0, 50)
+
+        points.append((reading_id, uptime, utc, is_break))
+
+    # Add anchors mostly in order but with some arriving late
+    order = list(points)
+    for i in range(0, len(order) - 5, 7):
+        order[i], order[i + 5] = order[i + 5], order[i]
+
+    assigner = UTCAssigner()
+    added = []
+    for i in range(0, len(order), 25):
+        for reading_id, point_uptime, utc, is_break in order[i:i + 25]:
+            assigner.add_point(reading_id, point_uptime, utc, is_break=is_break)
+            added.append((reading_id, point_uptime, utc, is_break))
+
+        added.sort(key=lambda x: x[0])
+        for reading_id in range(0, 1010, 13):
+            expected = _walk_assign(added, reading_id)
+            result = assigner.assign_utc(reading_id)
+
+            if expected is None:
+                assert result is None
+            else:
+                assert (result.utc, result.found_id, result.exact, result.crossed_break) == expected
+
+    # Appending anchors only updates the totals of the new anchors
+    steps = []
+    anchor_step = utc_assigner._anchor_step
+
+    def _counting_step(last_uptime, curr):
+        steps.append(curr)
+        return anchor_step(last_uptime, curr)
+
+    monkeypatch.setattr(utc_assigner, '_anchor_step', _counting_step)
+
+    for reading_id in range(2000, 2010):
+        assigner.add_point(reading_id, uptime + reading_id)
+
+    assigner.add_point(2010, utc=base)
+    assigner.assign_utc(2005)
+    assert len(steps) == 11
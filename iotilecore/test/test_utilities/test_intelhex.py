@@ -0,0 +1,90 @@
+"""Tests of the segment based storage inside IntelHex."""
+
+from io import StringIO
+import pytest
+from iotile.core.utilities.intelhex import IntelHex, AddressOverlapError
+from iotile.core.utilities.intelhex.segments import SegmentBuffer
+
+
+def test_segment_buffer_merging():
+    """Make sure adjacent and overlapping writes are merged into one segment."""
+
+    buf = SegmentBuffer()
+    buf.write(10, b'\x01\x02')
+    buf.write(20, b'\x05')
+    assert buf.segments() == [(10, 12), (20, 21)]
+
+    buf.write(12, bytearray(range(3, 8)))
+    buf.write(17, b'\x08\x09\x0a')
+    assert buf.segments() == [(10, 21)]
+    assert len(buf) == 11
+    assert buf.tobytes(10, 21, 0xFF) == bytearray(range(1, 11)) + b'\x05'
+
+    buf.write(8, b'\xaa\xbb\xcc')
+    assert buf.segments() == [(8, 21)]
+    assert buf[10] == 0xcc
+    assert buf[11] == 2
+
+    del buf[15]
+    assert buf.segments() == [(8, 15), (16, 21)]
+    assert 15 not in buf
+    assert buf.tobytes(14, 17, 0xFF) == b'\x05\xff\x07'
+    assert len(buf) == 12
+
+
+def test_segment_buffer_dict_compatible():
+    """Make sure a SegmentBuffer compares and iterates like a dict."""
+
+    data = {0: 1, 1: 2, 5: 3}
+    buf = SegmentBuffer(data)
+
+    assert buf == data
+    assert buf != {0: 1}
+    assert list(buf) == [0, 1, 5]
+    assert buf.get(2) is None
+    assert buf.overlap(2, 3) is None
+    assert buf.overlap(2, 4) == 5
+    assert buf.read(0, 2) == b'\x01\x02'
+    assert buf.read(0, 3) is None
+
+
+def test_load_hex_bulk():
+    """Make sure hex files load into contiguous segments and convert back."""
+
+    ih = IntelHex()
+    ih.frombytes(bytearray(range(0, 256)) * 64, offset=0x1000)
+    ih.puts(0x30000, b'\x01\x02\x03')
+
+    out = StringIO()
+    ih.write_hex_file(out)
+    out.seek(0)
+
+    loaded = IntelHex(out)
+    assert loaded.segments() == [(0x1000, 0x5000), (0x30000, 0x30003)]
+    assert loaded.minaddr() == 0x1000
+    assert loaded.maxaddr() == 0x30002
+    assert loaded.tobinstr(start=0x1000, end=0x4fff) == bytes(bytearray(range(0, 256)) * 64)
+    assert loaded.tobinarray(start=0x4fff, size=3).tolist() == [255, 0xFF, 0xFF]
+    assert loaded.gets(0x30000, 3) == b'\x01\x02\x03'
+
+
+def test_merge_segments():
+    """Make sure merge keeps its overlap semantics."""
+
+    ih1 = IntelHex()
+    ih1.puts(0, b'\x01\x02\x03')
+
+    ih2 = IntelHex()
+    ih2.puts(2, b'\x0a\x0b')
+
+    with pytest.raises(AddressOverlapError):
+        ih1.merge(ih2)
+
+    assert ih1.tobinstr() == b'\x01\x02\x03'
+
+    ih1.merge(ih2, overlap='ignore')
+    assert ih1.tobinstr() == b'\x01\x02\x03\x0b'
+
+    ih1.merge(ih2, overlap='replace')
+    assert ih1.tobinstr() == b'\x01\x02\x0a\x0b'
+    assert ih1.segments() == [(0, 4)]
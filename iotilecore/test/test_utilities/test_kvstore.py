@@ -1,7 +1,9 @@
 import pytest
 import os
+import json
 from iotile.core.utilities.kvstore_json import JSONKVStore
 from iotile.core.utilities.kvstore_sqlite import SQLiteKVStore
+from iotile.core.utilities.kvstore_mem import InMemoryKVStore
 
 
 @pytest.fixture(scope='function', params=['json', 'sqlite'])
@@ -34,3 +36,188 @@ def test_json_kvstore(kvstore):
     kvstore.set('config:a', 'value2')
 
     assert kvstore.get('config:a') == 'value2'
+
+
+def test_json_kvstore_external_changes(tmpdir):
+    """Make sure cached json data is reloaded when the file changes."""
+
+    folder = str(tmpdir)
+    store = JSONKVStore('cached.json', folder=folder)
+    other = JSONKVStore('cached.json', folder=folder)
+
+    store.set('a', 'value')
+    assert other.get('a') == 'value'
+
+    with open(store.file, "w") as outfile:
+        json.dump({'b': 'external value'}, outfile)
+
+    assert store.try_get('a') is None
+    assert store.get('b') == 'external value'
+
+
+def test_json_kvstore_transaction(tmpdir):
+    """Make sure transactions batch writes and roll back on errors."""
+
+    store = JSONKVStore('transaction.json', folder=str(tmpdir))
+    store.set('a', 'value')
+
+    with store.transaction():
+        store.set('b', '1')
+
+        with store.transaction():
+            store.set('c', '2')
+            store.remove('a')
+
+        assert store.get('c') == '2'
+
+        with open(store.file, "r") as infile:
+            assert json.load(infile) == {'a': 'value'}
+
+    with open(store.file, "r") as infile:
+        assert json.load(infile) == {'b': '1', 'c': '2'}
+
+    with pytest.raises(ValueError):
+        with store.transaction():
+            store.set('d', '3')
+            raise ValueError("error in transaction")
+
+    assert store.try_get('d') is None
+    assert sorted(store.get_all()) == [('b', '1'), ('c', '2')]
+
+    with pytest.raises(KeyboardInterrupt):
+        with store.transaction():
+            store.set('e', '4')
+            raise KeyboardInterrupt()
+
+    assert store.try_get('e') is None
+
+    with open(store.file, "r") as infile:
+        assert json.load(infile) == {'b': '1', 'c': '2'}
+
+
+def test_json_kvstore_nested_rollback(tmpdir):
+    """Make sure a failed nested transaction only discards its own changes."""
+
+    store = JSONKVStore('nested.json', folder=str(tmpdir))
+    store.set('a', 'value')
+
+    with store.transaction():
+        store.set('b', '1')
+
+        try:
+            with store.transaction():
+                store.set('c', '2')
+                store.remove('a')
+                raise ValueError("error in nested transaction")
+        except ValueError:
+            pass
+
+        assert store.get('a') == 'value'
+        assert store.try_get('c') is None
+        store.set('d', '3')
+
+    with open(store.file, "r") as infile:
+        assert json.load(infile) == {'a': 'value', 'b': '1', 'd': '3'}
+
+    # A rolled back nested block should not make a clean transaction dirty
+    stamp = store._file_stamp()
+    with store.transaction():
+        try:
+            with store.transaction():
+                store.set('e', '4')
+                raise ValueError("error in nested transaction")
+        except ValueError:
+            pass
+
+    assert store._file_stamp() == stamp
+    assert store.try_get('e') is None
+
+
+def test_kvstore_batches(kvstore):
+    """Make sure set_many and transactions work on every store type."""
+
+    kvstore.set_many([('a', '1'), ('b', '2')])
+    assert sorted(kvstore.get_all()) == [('a', '1'), ('b', '2')]
+
+    with pytest.raises(ValueError):
+        with kvstore.transaction():
+            kvstore.set('c', '3')
+            kvstore.remove('a')
+            raise ValueError("error in transaction")
+
+    assert kvstore.try_get('c') is None
+    assert kvstore.get('a') == '1'
+
+    with kvstore.transaction():
+        kvstore.set('c', '3')
+        kvstore.remove('a')
+
+    assert sorted(kvstore.get_all()) == [('b', '2'), ('c', '3')]
+
+
+def test_sqlite_kvstore_concurrent(tmpdir):
+    """Make sure cached sqlite data is refreshed when another connection commits."""
+
+    store = SQLiteKVStore('concurrent.db', folder=str(tmpdir))
+    other = SQLiteKVStore('concurrent.db', folder=str(tmpdir))
+
+    store.set('a', 'value')
+    assert other.get('a') == 'value'
+
+    with other.transaction():
+        other.set('a', 'new value')
+        other.set('b', 'value 2')
+
+        # Uncommitted changes are not visible to other connections
+        assert store.get('a') == 'value'
+
+    assert store.get('a') == 'new value'
+    assert store.get('b') == 'value 2'
+
+    other.clear()
+    assert store.try_get('a') is None
+
+
+def test_sqlite_kvstore_interrupted_transaction(tmpdir):
+    """Make sure transactions are rolled back if they are interrupted."""
+
+    store = SQLiteKVStore('interrupted.db', folder=str(tmpdir))
+    other = SQLiteKVStore('interrupted.db', folder=str(tmpdir))
+    store.set('a', 'value')
+
+    with pytest.raises(KeyboardInterrupt):
+        with store.transaction():
+            store.set('a', 'new value')
+            store.set('b', 'value 2')
+            raise KeyboardInterrupt()
+
+    assert store.get('a') == 'value'
+    assert store.try_get('b') is None
+    assert sorted(other.get_all()) == [('a', 'value')]
+
+    with store.transaction():
+        store.set('b', 'value 2')
+
+    assert other.get('b') == 'value 2'
+
+
+def test_mem_kvstore_interrupted_transaction():
+    """Make sure in memory transactions are undone if they are interrupted."""
+
+    store = InMemoryKVStore('interrupted')
+    store.clear()
+    store.set('a', 'value')
+
+    with pytest.raises(KeyboardInterrupt):
+        with store.transaction():
+            store.set('a', 'new value')
+            store.set('b', 'value 2')
+            raise KeyboardInterrupt()
+
+    assert sorted(store.get_all()) == [('a', 'value')]
+
+    with store.transaction():
+        store.set('b', 'value 2')
+
+    assert store.get('b') == 'value 2'
+    store.clear()
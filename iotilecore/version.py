@@ -1 +1 @@
-version = "3.24.1"
+version = "3.25.0"
@@ -63,6 +63,14 @@ You are free to send the same periodic inputs to sensor-graph yourself using
 rpcs if you wish to control the passage of emulation time (as seen by your
 sensor-graph rules) in a fine-grained fashion.
 
+Time only passes on an emulated device when something advances its virtual
+clock, either by calling EmulatedDevice.advance_time() or run_until(), or
+through an EmulationHost shared by many devices.  Advancing time does not
+wait for real time to pass, it jumps directly from one tick to the next, so
+days of device behavior can be emulated in seconds.  run_until() waits for
+the device to finish processing each tick before moving on to the next one,
+so any RPCs triggered by a tick are interleaved deterministically.
+
 Handling Time When Loading Snapshots
 -----------------------------------
 
@@ -139,16 +147,58 @@ class ClockManagerSubsystem(object):
     def handle_tick(self):
         """Internal callback every time 1 second has passed."""
 
-        self.uptime += 1
+        self.advance(1)
+
+    def next_tick(self):
+        """Get the number of seconds until the next tick input is generated.
+
+        Returns:
+            int: The number of seconds until the next tick or None if all
+                ticks are disabled.
+        """
+
+        remaining = None
 
         for name, interval in viewitems(self.ticks):
             if interval == 0:
                 continue
 
-            self.tick_counters[name] += 1
-            if self.tick_counters[name] == interval:
-                self.graph_input(self.TICK_STREAMS[name], self.uptime)
-                self.tick_counters[name] = 0
+            until_tick = max(interval - self.tick_counters[name], 1)
+            if remaining is None or until_tick < remaining:
+                remaining = until_tick
+
+        return remaining
+
+    def advance(self, seconds):
+        """Advance device time by a number of seconds.
+
+        Rather than stepping one second at a time, time jumps directly to
+        each second where a tick input is generated, so advancing by a
+        long time only costs as much as the number of ticks that happen.
+        The tick inputs sent to sensor graph are exactly the same as if
+        handle_tick() had been called once per second.
+
+        Args:
+            seconds (int): The number of seconds to advance.
+        """
+
+        while seconds > 0:
+            step = seconds
+            until_tick = self.next_tick()
+            if until_tick is not None and until_tick < step:
+                step = until_tick
+
+            self.uptime += step
+            seconds -= step
+
+            for name, interval in viewitems(self.ticks):
+                if interval == 0:
+                    continue
+
+                self.tick_counters[name] += step
+                if self.tick_counters[name] >= interval:
+                    self.graph_input(self.TICK_STREAMS[name], self.uptime)
+                    self.tick_counters[name] = 0
 
     def set_tick(self, index, interval):
         """Update the a tick's interval.
@@ -82,6 +82,20 @@ class ReferenceDevice(EmulatedDevice):
 
         self.wait_idle()
 
+    def handle_ticks(self, seconds):
+        """Advance the controller's clock by a number of seconds.
+
+        Args:
+            seconds (int): The number of seconds that have passed.
+        """
+
+        self.controller.clock_manager.advance(seconds)
+
+    def next_event(self):
+        """Get the number of seconds until the controller's next tick."""
+
+        return self.controller.clock_manager.next_tick()
+
     def reset_peripheral_tiles(self):
         """Reset all peripheral tiles (asynchronously)."""
 
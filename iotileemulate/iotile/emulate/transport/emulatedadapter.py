@@ -24,12 +24,30 @@ class EmulatedDeviceAdapter(VirtualDeviceAdapter):
             device_name1@<optional_config_json1;device_name2@optional_config_json2
         devices (list of EmulatedDevice): Optional list of specif, precreated emulated
             devices that should be added to the device adapter.
+        host (EmulationHost): Optional shared host that all devices in this
+            adapter should be run on rather than each using its own background
+            thread.  The host must already be started.
     """
 
-    def __init__(self, port, devices=None):
+    def __init__(self, port, devices=None, host=None):
+        self._host = host
+
+        if host is not None and devices is not None:
+            for device in devices:
+                if device not in host.devices:
+                    host.add_device(device)
+
         super(EmulatedDeviceAdapter, self).__init__(port, devices)
         self._logger = logging.getLogger(__name__)
 
+    def _load_device(self, name, config):
+        device = super(EmulatedDeviceAdapter, self)._load_device(name, config)
+
+        if self._host is not None and self._validate_device(device):
+            self._host.add_device(device)
+
+        return device
+
     @classmethod
     def _validate_device(cls, device):
         """Hook for subclases to ensure that only specific kinds of devices are loaded.
@@ -99,5 +99,6 @@ from .emulated_device import EmulatedDevice
 from .peripheral_tile import EmulatedPeripheralTile
 from .emulated_tile import EmulatedTile
 from .simple_state import SerializableState
+from .emulation_host import EmulationHost
 
-__all__ = ['EmulatedDevice', 'EmulatedTile', 'SerializableState', 'EmulatedPeripheralTile']
+__all__ = ['EmulatedDevice', 'EmulatedTile', 'SerializableState', 'EmulatedPeripheralTile', 'EmulationHost']
@@ -6,7 +6,7 @@ import sys
 from collections import namedtuple
 from queue import Queue
 from future.utils import viewitems, raise_
-from iotile.core.exceptions import DataError
+from iotile.core.exceptions import ArgumentError, DataError
 from iotile.core.utilities import WorkQueueThread
 from iotile.core.hw.virtual import VirtualIOTileDevice
 from iotile.core.hw.virtual.common_types import pack_rpc_payload, unpack_rpc_payload
@@ -46,6 +46,7 @@ class EmulatedDevice(EmulationMixin, VirtualIOTileDevice):
 
         self._logger = logging.getLogger(__name__)
         self._rpc_queue = WorkQueueThread(self._background_dispatch_rpc)
+        self.virtual_time = 0
 
     def _background_dispatch_rpc(self, action):
         """Background work queue handler to dispatch RPCs."""
@@ -65,6 +66,89 @@ class EmulatedDevice(EmulationMixin, VirtualIOTileDevice):
         finally:
             self._track_change('device.rpc_sent', (address, rpc_id, arg_payload, resp, exc_status), formatter=format_rpc)
 
+    def use_host(self, host):
+        """Dispatch RPCs on a shared EmulationHost instead of a dedicated thread.
+
+        This must be called before start().  RPCs sent to this device are
+        still processed one at a time but by one of the host's worker threads
+        rather than by a background thread dedicated to this device.
+
+        Args:
+            host (EmulationHost): The host that should run this device.
+        """
+
+        if self._rpc_queue.is_alive():
+            raise ArgumentError("You must set an emulation host before starting the device")
+
+        self._rpc_queue = host.create_queue(self._background_dispatch_rpc)
+
+    def handle_ticks(self, seconds):
+        """Called when emulated time has advanced by a number of seconds.
+
+        This is called in the RPC dispatch thread whenever the device's
+        virtual clock advances.  The default implementation does nothing,
+        subclasses that have a concept of time should override it.
+
+        Args:
+            seconds (int): The number of seconds that have passed.
+        """
+
+        pass
+
+    def next_event(self):
+        """Get the number of seconds until this device has something to do.
+
+        Subclasses that override handle_ticks() should override this as well
+        so that run_until() can skip directly to the next time anything
+        happens on the device.  It is only called while the device is idle.
+
+        Returns:
+            int: The number of seconds until the next timed event or None if
+                there are no timed events scheduled.
+        """
+
+        return None
+
+    def advance_time(self, seconds):
+        """Advance this device's virtual clock without waiting.
+
+        The time change is processed in the RPC dispatch thread so that it
+        is serialized with any RPCs currently queued.  Call wait_idle() to
+        wait until it has been processed.
+
+        Args:
+            seconds (int): The number of seconds to advance time by.
+        """
+
+        self.virtual_time += seconds
+        self.deferred_task(self.handle_ticks, seconds)
+
+    def run_until(self, seconds):
+        """Run this device until its virtual clock reaches a given time.
+
+        Time jumps directly to each scheduled event reported by next_event()
+        and the device is allowed to become idle after each one, so any RPCs
+        triggered by one event always finish before the next event happens.
+
+        **Calling run_until from the emulation thread will deadlock.**
+
+        Args:
+            seconds (int): The virtual time, in seconds since the device was
+                created, to run until.
+        """
+
+        self.wait_idle()
+
+        while self.virtual_time < seconds:
+            step = seconds - self.virtual_time
+
+            until_event = self.next_event()
+            if until_event is not None and until_event < step:
+                step = until_event
+
+            self.advance_time(step)
+            self.wait_idle()
+
     def start(self, channel=None):
         """Start this emulated device.
 
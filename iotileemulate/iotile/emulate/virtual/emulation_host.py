@@ -0,0 +1,382 @@
+"""Run many emulated devices on a small shared pool of threads.
+
+Normally every EmulatedDevice starts its own background thread to dispatch
+RPCs one at a time.  That is fine for a handful of devices but emulating
+hundreds of devices, for example to load test a gateway, would need hundreds
+of threads that are almost always idle.
+
+An EmulationHost replaces each device's dedicated RPC thread with a
+SharedWorkQueue that has the same interface as WorkQueueThread but is
+serviced by a fixed pool of worker threads.  Each device's queue is only
+ever processed by one worker at a time, so RPCs on a single device are still
+serialized exactly as before, while different devices run in parallel on
+whichever worker is free.
+
+The host also keeps a shared virtual clock so that time can be advanced on
+every device at once.
+"""
+
+from __future__ import unicode_literals, absolute_import, print_function
+import logging
+import sys
+import threading
+from collections import deque
+from queue import Queue
+from builtins import range
+from future.utils import raise_
+from iotile.core.exceptions import ArgumentError, TimeoutExpiredError
+from iotile.core.utilities.workqueue_thread import STOP_WORKER_ITEM, MarkLocationItem, WorkItem, WaitIdleItem
+
+_STOP_HOST = object()
+
+
+class SharedWorkQueue(object):
+    """A per-device work queue serviced by an EmulationHost's worker pool.
+
+    This class has the same interface as WorkQueueThread so that it can be
+    used as a drop in replacement for the RPC queue of an EmulatedDevice.
+    Items are processed in order and never concurrently with each other.
+
+    Args:
+        host (EmulationHost): The host whose workers will process this queue.
+        handler (callable): The handler function that will be passed all of
+            the work items queued in dispatch().
+    """
+
+    # Maximum number of items to process before letting another queue run
+    BATCH_SIZE = 16
+
+    def __init__(self, host, handler):
+        self._host = host
+        self._routine = handler
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._idle_watchers = []
+        self._scheduled = False
+        self._started = False
+        self._stopped = threading.Event()
+        self._logger = logging.getLogger(__name__)
+
+    def start(self):
+        """Allow this queue to start processing items."""
+
+        with self._lock:
+            self._started = True
+            self._schedule_locked()
+
+    def is_alive(self):
+        """Check if this queue has been started and not stopped."""
+
+        return self._started and not self._stopped.is_set()
+
+    def _put(self, item):
+        with self._lock:
+            self._items.append(item)
+            self._schedule_locked()
+
+    def _schedule_locked(self):
+        if self._started and not self._scheduled and len(self._items) > 0:
+            self._scheduled = True
+            self._host.schedule(self)
+
+    def dispatch(self, value, callback=None):
+        """Dispatch an item to the workqueue and optionally wait.
+
+        See WorkQueueThread.dispatch for details.
+
+        Args:
+            value (object): The work item to pass to the handler.
+            callback (callable): Optional callback to be called as
+                callback(exc_info, return_value) when the item finishes.  If
+                this is None, this method blocks until the item finishes.
+
+        Returns:
+            object: The return value of the handler if callback is None.
+        """
+
+        done = None
+
+        if callback is None:
+            done = threading.Event()
+            shared_data = [None, None]
+
+            def _callback(exc_info, return_value):
+                shared_data[0] = exc_info
+                shared_data[1] = return_value
+
+                done.set()
+
+            callback = _callback
+
+        self._put(WorkItem(value, callback))
+        if done is None:
+            return None
+
+        done.wait()
+        exc_info, return_value = shared_data
+        if exc_info is not None:
+            raise_(*exc_info)  #pylint:disable=not-an-iterable;We know it is iterable when done is not None
+
+        return return_value
+
+    def flush(self):
+        """Synchronously wait until all items queued before this call are processed."""
+
+        done = threading.Event()
+        self.defer(done.set)
+        done.wait()
+
+    def defer(self, callback):
+        """Schedule a callback once all current items in the queue are finished."""
+
+        self._put(MarkLocationItem(callback))
+
+    def defer_until_idle(self, callback):
+        """Schedule a callback for the next time the queue is empty."""
+
+        self._put(WaitIdleItem(callback))
+
+    def wait_until_idle(self):
+        """Block the calling thread until the work queue is (temporarily) empty."""
+
+        done = threading.Event()
+        self.defer_until_idle(done.set)
+        done.wait()
+
+    def stop(self, timeout=None, force=False):
+        """Process all queued items and then stop this queue.
+
+        Args:
+            timeout (float): The maximum time to wait for the queue to stop.
+            force (bool): If True, don't raise an error if the queue does not
+                stop in time.
+        """
+
+        self.signal_stop()
+        self.wait_stopped(timeout, force)
+
+    def signal_stop(self):
+        """Signal that this queue should stop once all current items are processed."""
+
+        self._put(STOP_WORKER_ITEM)
+
+    def wait_stopped(self, timeout=None, force=False):
+        """Wait for this queue to stop after signal_stop() was called."""
+
+        self._stopped.wait(timeout)
+
+        if not self._stopped.is_set() and force is False:
+            raise TimeoutExpiredError("Error waiting for shared work queue to stop", timeout=timeout)
+
+    def process(self):
+        """Process a batch of items, called from an EmulationHost worker.
+
+        Idle watchers are called whenever the queue is empty at the end of a
+        batch and when the queue is stopped, since it will never become idle
+        again after that.
+        """
+
+        stopped = False
+
+        for _i in range(0, self.BATCH_SIZE):
+            with self._lock:
+                if len(self._items) == 0:
+                    break
+
+                item = self._items.popleft()
+
+            if item is STOP_WORKER_ITEM:
+                stopped = True
+                break
+
+            self._process_item(item)
+
+        watchers = []
+
+        with self._lock:
+            if stopped or len(self._items) == 0:
+                watchers = self._idle_watchers
+                self._idle_watchers = []
+
+            self._scheduled = False
+            if stopped:
+                self._started = False
+            else:
+                self._schedule_locked()
+
+        for watcher in watchers:
+            try:
+                watcher()
+            except:  #pylint:disable=bare-except;We can't let one idle watcher failure impact any other watcher
+                self._logger.exception("Error inside queue idle watcher")
+
+        if stopped:
+            self._stopped.set()
+
+    def _process_item(self, item):
+        try:
+            if isinstance(item, MarkLocationItem):
+                item.callback()
+                return
+            elif isinstance(item, WaitIdleItem):
+                self._idle_watchers.append(item.callback)
+                return
+            elif not isinstance(item, WorkItem):
+                self._logger.error("Invalid item passed to SharedWorkQueue: %s, ignoring", item)
+                return
+
+            try:
+                exc_info = None
+                retval = None
+
+                retval = self._routine(item.arg)
+            except:  #pylint:disable=bare-except;We need to capture the exception and feed it back to the caller
+                exc_info = sys.exc_info()
+
+            if item.callback is not None:
+                item.callback(exc_info, retval)
+        except:  #pylint:disable=bare-except;We cannot let a worker thread die because of a bad item
+            self._logger.exception("Error inside shared work queue")
+
+
+class EmulationHost(object):
+    """A shared worker pool and virtual clock for many emulated devices.
+
+    Devices must be added to the host with add_device() before they are
+    started.  They can then be passed to an EmulatedDeviceAdapter as usual,
+    which will start them.
+
+    Example:
+        host = EmulationHost(workers=4)
+        host.start()
+
+        devices = [ReferenceDevice({'iotile_id': i}) for i in range(1, 501)]
+        for device in devices:
+            host.add_device(device)
+
+        adapter = EmulatedDeviceAdapter(None, devices=devices)
+
+    Args:
+        workers (int): The number of worker threads used to run all of the
+            devices on this host.
+    """
+
+    def __init__(self, workers=4):
+        if workers < 1:
+            raise ArgumentError("An emulation host needs at least one worker", workers=workers)
+
+        self.devices = []
+        self.uptime = 0
+
+        self._ready = Queue()
+        self._workers = [threading.Thread(target=self._run_worker) for _i in range(0, workers)]
+        for worker in self._workers:
+            worker.daemon = True
+
+        self._logger = logging.getLogger(__name__)
+
+    def start(self):
+        """Start the worker threads."""
+
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self):
+        """Stop the worker threads.
+
+        All devices on this host should be stopped first.
+        """
+
+        for _worker in self._workers:
+            self._ready.put(_STOP_HOST)
+
+        for worker in self._workers:
+            worker.join()
+
+    def create_queue(self, handler):
+        """Create a work queue that is serviced by this host.
+
+        Args:
+            handler (callable): The handler that will be passed each item.
+
+        Returns:
+            SharedWorkQueue: The new work queue.
+        """
+
+        return SharedWorkQueue(self, handler)
+
+    def schedule(self, queue):
+        """Mark a SharedWorkQueue as having items that are ready to process."""
+
+        self._ready.put(queue)
+
+    def add_device(self, device):
+        """Run an EmulatedDevice on this host.
+
+        This must be called before the device is started.
+
+        Args:
+            device (EmulatedDevice): The device to add.
+        """
+
+        device.use_host(self)
+        self.devices.append(device)
+
+    def advance_time(self, seconds=1):
+        """Advance the shared virtual clock on every device.
+
+        The time passes on each device inside its RPC queue so that it is
+        serialized with any RPCs the device is currently processing.  This
+        method returns immediately; call wait_idle() to wait until every
+        device has processed the time change.
+
+        Args:
+            seconds (int): The number of seconds to advance time by.
+        """
+
+        self.uptime += seconds
+
+        for device in self.devices:
+            device.advance_time(seconds)
+
+    def run_until(self, seconds):
+        """Run every device until the shared virtual clock reaches a given time.
+
+        Time jumps directly to the next event on any device and all devices
+        are allowed to become idle before moving on, so every device sees
+        the same sequence of times.
+
+        Args:
+            seconds (int): The virtual time, in seconds since the host was
+                created, to run until.
+        """
+
+        self.wait_idle()
+
+        while self.uptime < seconds:
+            step = seconds - self.uptime
+
+            for device in self.devices:
+                until_event = device.next_event()
+                if until_event is not None and until_event < step:
+                    step = until_event
+
+            self.advance_time(step)
+            self.wait_idle()
+
+    def wait_idle(self):
+        """Wait until every device on this host is idle."""
+
+        for device in self.devices:
+            device.wait_idle()
+
+    def _run_worker(self):
+        while True:
+            queue = self._ready.get()
+            if queue is _STOP_HOST:
+                return
+
+            try:
+                queue.process()
+            except:  #pylint:disable=bare-except;We cannot let a worker thread die until we are told to stop
+                self._logger.exception("Error processing emulated device queue")
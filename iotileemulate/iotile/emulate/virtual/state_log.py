@@ -4,7 +4,10 @@ from __future__ import unicode_literals, absolute_import, print_function
 
 import sys
 import threading
-from collections import namedtuple
+import heapq
+import itertools
+import weakref
+from collections import namedtuple, deque
 import csv
 import monotonic
 
@@ -12,13 +15,98 @@ StateChange = namedtuple("StateChange", ['time', 'tile', 'property', 'value', 's
 
 
 class EmulationStateLog(object):
-    """A thread safe list of state changes to an emulated device."""
+    """A thread safe, bounded list of state changes to an emulated device.
 
-    def __init__(self):
-        self.changes = []
+    Recording a change is designed to be as cheap as possible since it
+    happens on every RPC when tracking is enabled.  Each thread appends
+    the raw value and formatter to its own ring buffer without taking any
+    lock, and values are only converted to strings when the changes are
+    read.  The per-thread buffers are merged in time order when the changes
+    are read and the buffers of threads that have exited are folded into a
+    single shared buffer.
+
+    Only the most recent `max_changes` changes across all threads are
+    returned.  Older changes are silently dropped, by each thread from its
+    own buffer the next time it records a change.  Since values are
+    formatted lazily, they should not be modified after they are passed to
+    track_change().
+
+    Args:
+        max_changes (int): The maximum number of changes to retain.
+    """
+
+    DEFAULT_MAX_CHANGES = 100000
+
+    def __init__(self, max_changes=DEFAULT_MAX_CHANGES):
         self.tracking = False
+        self.max_changes = max_changes
+
         self._lock = threading.Lock()
-        self._whitelist = set()
+        self._local = threading.local()
+        self._buffers = []
+        self._retired = deque(maxlen=max_changes)
+        self._oldest = None
+        self._sequence = itertools.count()
+        self._whitelist = None
+
+    @property
+    def changes(self):
+        """All retained changes, oldest first.
+
+        Returns:
+            list of StateChange: The changes with their values converted to strings.
+        """
+
+        with self._lock:
+            self._retire_dead_buffers()
+            buffers = [list(buffer) for _thread, buffer in self._buffers]
+            buffers.append(list(self._retired))
+
+        merged = deque(heapq.merge(*buffers), maxlen=self.max_changes)
+
+        # Anything older than the oldest change we kept can never be read
+        # again, so let each thread drop it from its buffer on its next change
+        if len(merged) > 0:
+            self._oldest = merged[0]
+
+            with self._lock:
+                _drop_older_than(self._retired, self._oldest)
+
+        return [StateChange(time, tile, prop, value, _format(value, formatter))
+                for time, _seq, tile, prop, value, formatter in merged]
+
+    def _thread_buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = deque(maxlen=self.max_changes)
+            self._local.buffer = buffer
+
+            with self._lock:
+                self._retire_dead_buffers()
+                self._buffers.append((weakref.ref(threading.current_thread()), buffer))
+
+        return buffer
+
+    def _retire_dead_buffers(self):
+        """Fold the buffers of threads that have exited into _retired.
+
+        This must be called with _lock held.
+        """
+
+        alive = []
+        dead = []
+        for thread_ref, buffer in self._buffers:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, buffer))
+            else:
+                dead.append(buffer)
+
+        if len(dead) == 0:
+            return
+
+        self._retired = deque(heapq.merge(self._retired, *dead), maxlen=self.max_changes)
+        self._buffers = alive
 
     def track_change(self, tile, property_name, value, formatter=None):
         """Record that a change happened on a given tile's property.
@@ -34,22 +122,34 @@ class EmulationStateLog(object):
                 string.  This function will only be called if track_changes()
                 is enabled and `name` is on the whitelist for properties that
                 should be tracked.  If `formatter` is not passed or is None,
-                it will default to `str`.
+                it will default to `str`.  It is called lazily when the
+                changes are read or dumped.
         """
 
         if not self.tracking:
             return
 
-        if len(self._whitelist) > 0 and (tile, property_name) not in self._whitelist:
+        whitelist = self._whitelist
+        if whitelist is not None and property_name not in whitelist.get(tile, ()):
             return
 
-        if formatter is None:
-            formatter = str
+        change = (monotonic.monotonic(), next(self._sequence), tile, property_name, value, formatter)
+
+        buffer = self._thread_buffer()
+        buffer.append(change)
 
-        change = StateChange(monotonic.monotonic(), tile, property_name, value, formatter(value))
+        oldest = self._oldest
+        if oldest is not None and buffer[0] < oldest:
+            _drop_older_than(buffer, oldest)
+
+    def clear(self):
+        """Drop all recorded changes."""
 
         with self._lock:
-            self.changes.append(change)
+            for _thread, buffer in self._buffers:
+                buffer.clear()
+
+            self._retired.clear()
 
     def enable(self):
         """Start tracking changes."""
@@ -72,7 +172,15 @@ class EmulationStateLog(object):
                 should be included in the emulation state log.
         """
 
-        self._whitelist = set(whitelist)
+        if len(whitelist) == 0:
+            self._whitelist = None
+            return
+
+        index = {}
+        for tile, property_name in whitelist:
+            index.setdefault(tile, set()).add(property_name)
+
+        self._whitelist = index
 
     def disable(self):
         """Stop tracking changes."""
@@ -108,3 +216,15 @@ class EmulationStateLog(object):
 
             for entry in self.changes:
                 writer.writerow([entry.time, entry.tile, entry.property, entry.string_value])
+
+
+def _drop_older_than(buffer, oldest):
+    while len(buffer) > 0 and buffer[0] < oldest:
+        buffer.popleft()
+
+
+def _format(value, formatter):
+    if formatter is None:
+        formatter = str
+
+    return formatter(value)
@@ -120,6 +120,37 @@ def test_tick_inputs(basic_device):
     assert key_parts_4 == list(zip(range(5, 11, 5), range(5, 11, 5)))
 
 
+def test_run_until(basic_device):
+    """Make sure we can jump through long periods of virtual time."""
+
+    hw, device = basic_device
+
+    con = hw.get(8, basic=True)
+    sensor_graph = find_proxy_plugin('iotile_standard_library/lib_controller', 'SensorGraphPlugin')(con)
+    clock_man = device.controller.clock_manager
+
+    sensor_graph.enable()
+    sensor_graph.set_user_tick(1, 600)
+    sensor_graph.set_user_tick(2, 7)
+
+    assert clock_man.next_tick() == 7
+
+    device.run_until(3600)
+    assert device.virtual_time == 3600
+    assert clock_man.uptime == 3600
+
+    assert [x.raw_time for x in sensor_graph.download_stream('output 1')] == list(range(10, 3601, 10))
+    assert [x.raw_time for x in sensor_graph.download_stream('output 3')] == list(range(600, 3601, 600))
+    assert [x.raw_time for x in sensor_graph.download_stream('output 4')] == list(range(7, 3601, 7))
+
+    # Advancing in one big step generates the same inputs
+    device.advance_time(600)
+    device.wait_idle()
+    assert clock_man.uptime == 4200
+    assert sensor_graph.count_stream('output 3') == 7
+    assert sensor_graph.count_stream('output 1') == 420
+
+
 @pytest.mark.xfail(reason="synchronize_clock is still in prerelease")
 def test_utc_time(basic_device):
     """Make sure we can get and set utc time."""
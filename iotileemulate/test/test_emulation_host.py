@@ -0,0 +1,116 @@
+"""Tests of running many emulated devices on a shared EmulationHost."""
+
+import threading
+import pytest
+from iotile.emulate.virtual.emulation_host import SharedWorkQueue
+from iotile.core.hw import HardwareManager
+from iotile.emulate.virtual import EmulationHost
+from iotile.emulate.reference import ReferenceDevice
+from iotile.emulate.constants import rpcs
+from iotile.emulate.transport import EmulatedDeviceAdapter
+
+
+@pytest.fixture(scope="function")
+def host():
+    emulation_host = EmulationHost(workers=2)
+    emulation_host.start()
+
+    yield emulation_host
+
+    emulation_host.stop()
+
+
+def test_shared_queue_serialization(host):
+    """Make sure items on a single queue never run concurrently."""
+
+    active = []
+    overlaps = []
+    results = []
+
+    def _handler(value):
+        active.append(value)
+        if len(active) > 1:
+            overlaps.append(value)
+
+        results.append(value)
+        active.remove(value)
+        return value * 2
+
+    queue = host.create_queue(_handler)
+    queue.start()
+
+    for i in range(0, 99):
+        queue.dispatch(i, callback=lambda exc, ret: None)
+
+    assert queue.dispatch(99) == 198
+    queue.wait_until_idle()
+
+    assert results == list(range(0, 100))
+    assert overlaps == []
+
+    queue.stop()
+    assert not queue.is_alive()
+
+
+
+@pytest.mark.parametrize("count", [SharedWorkQueue.BATCH_SIZE - 1, SharedWorkQueue.BATCH_SIZE])
+def test_shared_queue_idle_after_batch(host, count):
+    """Make sure idle watchers are called when a batch empties the queue."""
+
+    queue = host.create_queue(lambda value: value)
+    idle = threading.Event()
+
+    # Queue everything before starting so the batch boundaries are deterministic
+    for i in range(0, count):
+        queue.dispatch(i, callback=lambda exc, ret: None)
+
+    queue.defer_until_idle(idle.set)
+    queue.start()
+
+    assert idle.wait(5.0)
+
+    queue.wait_until_idle()
+    queue.stop()
+
+
+def test_shared_queue_idle_on_stop(host):
+    """Make sure idle watchers pending when a queue stops are still called."""
+
+    queue = host.create_queue(lambda value: value)
+    idle = threading.Event()
+
+    queue.defer_until_idle(idle.set)
+    queue.signal_stop()
+    queue.start()
+
+    queue.wait_stopped(5.0)
+    assert idle.is_set()
+
+def test_many_devices(host):
+    """Make sure many devices can share a small number of threads."""
+
+    thread_count = threading.active_count()
+    devices = [ReferenceDevice({'iotile_id': i}) for i in range(1, 21)]
+
+    adapter = EmulatedDeviceAdapter(None, devices=devices, host=host)
+    assert threading.active_count() == thread_count
+    assert len(host.devices) == 20
+
+    with HardwareManager(adapter=adapter) as hw:
+        for iotile_id in (1, 10, 20):
+            hw.connect(iotile_id)
+            con = hw.get(8, basic=True)
+            rpc_id = rpcs.GET_CURRENT_TIME.rpc_id
+            assert con.rpc(rpc_id >> 8, rpc_id & 0xFF, result_format="L")[0] == 0
+            hw.disconnect()
+
+        host.advance_time(15)
+        host.wait_idle()
+
+        for device in devices:
+            assert device.rpc(8, rpcs.GET_CURRENT_TIME)[0] == 15
+
+        host.run_until(100)
+        for device in devices:
+            assert device.rpc(8, rpcs.GET_CURRENT_TIME)[0] == 100
+            assert device.virtual_time == 100
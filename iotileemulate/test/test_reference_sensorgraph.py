@@ -198,3 +198,38 @@ def test_streaming(streaming_sg):
     for i, reading in enumerate(readings):
         assert reading.value == 5 + i
         assert reading.reading_id == 4 + i
+
+
+def test_binary_snapshots(basic_sg, tmpdir):
+    """Make sure stored readings survive binary and delta snapshots."""
+
+    sg, hw, device = basic_sg
+    sg.enable()
+
+    sg.push_reading('constant 1030', 1)
+    for i in range(0, 4):
+        sg.input('input 1', i)
+
+    device.wait_idle()
+    assert sg.count_stream('output 1') == 4
+
+    debug = hw.debug()
+    base = str(tmpdir.join('base.snapshot'))
+    delta = str(tmpdir.join('delta.snapshot'))
+
+    debug.save_snapshot(base, binary=True)
+
+    for i in range(4, 8):
+        sg.input('input 1', i)
+
+    device.wait_idle()
+    assert sg.count_stream('output 1') == 8
+
+    debug.save_snapshot(delta, binary=True, base=base)
+
+    debug.load_snapshot(base)
+    assert sg.count_stream('output 1') == 4
+
+    debug.load_snapshot(delta, base=base)
+    assert sg.count_stream('output 1') == 8
+    assert [x.value for x in sg.download_stream('output 1')] == [3, 3, 3, 3, 7, 7, 7, 7]
@@ -0,0 +1,125 @@
+"""Tests of the EmulationStateLog."""
+
+import threading
+from iotile.emulate.virtual.state_log import EmulationStateLog
+
+
+def test_lazy_formatting():
+    """Make sure values are only formatted when changes are read."""
+
+    formatted = []
+
+    def _formatter(value):
+        formatted.append(value)
+        return "value %d" % value
+
+    log = EmulationStateLog()
+    log.track_change(8, 'prop', 1, _formatter)
+    assert len(log.changes) == 0
+
+    log.enable()
+    log.track_change(8, 'prop', 2, _formatter)
+    log.track_change(8, 'other', 3)
+    assert formatted == []
+
+    changes = log.changes
+    assert formatted == [2]
+    assert [x.string_value for x in changes] == ['value 2', '3']
+    assert [x.value for x in changes] == [2, 3]
+
+
+def test_bounded():
+    """Make sure only the most recent changes are kept."""
+
+    log = EmulationStateLog(max_changes=10)
+    log.enable()
+
+    for i in range(0, 25):
+        log.track_change(8, 'prop', i)
+
+    assert [x.value for x in log.changes] == list(range(15, 25))
+
+    log.clear()
+    assert len(log.changes) == 0
+
+
+def test_whitelist():
+    """Make sure the whitelist filters changes by tile and property."""
+
+    log = EmulationStateLog()
+    log.enable()
+    log.set_whitelist([(8, 'prop'), (None, 'device.rpc_sent')])
+
+    log.track_change(8, 'prop', 1)
+    log.track_change(8, 'other', 2)
+    log.track_change(10, 'prop', 3)
+    log.track_change(None, 'device.rpc_sent', 4)
+
+    assert [x.value for x in log.changes] == [1, 4]
+
+    log.set_whitelist([])
+    log.track_change(10, 'prop', 5)
+    assert [x.value for x in log.changes] == [1, 4, 5]
+
+
+def test_multiple_threads():
+    """Make sure changes from multiple threads are merged in order."""
+
+    log = EmulationStateLog(max_changes=1000)
+    log.enable()
+
+    def _track(tile):
+        for i in range(0, 100):
+            log.track_change(tile, 'prop', i)
+
+    threads = [threading.Thread(target=_track, args=(i,)) for i in range(0, 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    changes = log.changes
+    assert len(changes) == 400
+    assert [x.time for x in changes] == sorted(x.time for x in changes)
+
+    for tile in range(0, 4):
+        assert [x.value for x in changes if x.tile == tile] == list(range(0, 100))
+
+
+def test_dead_thread_buffers():
+    """Make sure buffers of exited threads are pruned and the cap is global."""
+
+    log = EmulationStateLog(max_changes=10)
+    log.enable()
+
+    def _track(tile):
+        for i in range(0, 10):
+            log.track_change(tile, 'prop', i)
+
+    for tile in range(0, 20):
+        thread = threading.Thread(target=_track, args=(tile,))
+        thread.start()
+        thread.join()
+
+    # Buffers of exited threads are folded together when new threads start
+    assert len(log._buffers) <= 1
+
+    changes = log.changes
+    assert len(log._buffers) == 0
+    assert len(log._retired) == 10
+    assert [(x.tile, x.value) for x in changes] == [(19, i) for i in range(0, 10)]
+
+    # Live threads drop changes that fell out of the most recent max_changes
+    for i in range(0, 5):
+        log.track_change(8, 'prop', i)
+
+    changes = log.changes
+    assert [(x.tile, x.value) for x in changes] == [(19, i) for i in range(5, 10)] + [(8, i) for i in range(0, 5)]
+    assert len(log._retired) == 5
+
+    for i in range(5, 15):
+        log.track_change(8, 'prop', i)
+
+    assert [x.value for x in log.changes] == list(range(5, 15))
+    log.track_change(8, 'prop', 15)
+    assert len(log._buffers[0][1]) + len(log._retired) == 10
@@ -6,7 +6,9 @@ from .sensor_log import SensorLog
 from .slot import SlotIdentifier
 from .node import SGNode
 from .compiler import compile_sgf
+from .compile_cache import CompileCache
 
 
 __all__ = ['DeviceModel', 'DataStream', 'SensorGraph', 'DataStreamSelector',
-           'StreamEmptyError',  'SensorLog', 'SlotIdentifier', 'SGNode', 'compile_sgf']
+           'StreamEmptyError',  'SensorLog', 'SlotIdentifier', 'SGNode', 'compile_sgf',
+           'CompileCache']
@@ -0,0 +1,355 @@
+"""A persistent cache of compiled and optimized sensor graphs.
+
+Compiling a sensor graph file runs the full pyparsing grammar over the
+file, executes every statement, parses every generated node descriptor and
+then runs the optimizer until nothing changes.  The result only depends on
+the contents of the file, the device model and whether the optimizer was
+run, so it can be saved and reused the next time the same file is compiled.
+
+Cached graphs are stored as json files in a cache folder, named by a hash
+of everything that the compiled result depends on, including the source
+code of the iotile.sg package itself so that editing the compiler in a
+development checkout never returns stale graphs.  Loading a cached graph
+rebuilds the SensorGraph object directly without any parsing.
+"""
+
+from __future__ import unicode_literals, absolute_import, print_function
+import hashlib
+import json
+import logging
+import numbers
+import os
+import platform
+from binascii import hexlify, unhexlify
+from builtins import str
+import pkg_resources
+from future.utils import viewitems
+from past.builtins import basestring
+from iotile.core.exceptions import ArgumentError, IOTileException
+from iotile.core.utilities.paths import settings_directory
+from .engine import InMemoryStorageEngine
+from .graph import SensorGraph
+from .node import SGNode, InputTrigger, TrueTrigger
+from .optimizer import SensorGraphOptimizer
+from .sensor_log import SensorLog
+from .slot import SlotIdentifier
+from .stream import DataStream, DataStreamSelector
+from .streamer import DataStreamer
+from .walker import InvalidStreamWalker
+
+CACHE_FORMAT_VERSION = 1
+
+
+class _UncacheableGraph(Exception):
+    pass
+
+
+_SOURCE_HASH = None
+
+
+def _compiler_version():
+    try:
+        return pkg_resources.get_distribution('iotile-sensorgraph').version
+    except pkg_resources.DistributionNotFound:
+        return 'unknown'
+
+
+def _compiler_source_hash():
+    """Hash the source code of the iotile.sg package.
+
+    The hash is only calculated once per process.
+    """
+
+    global _SOURCE_HASH  #pylint:disable=global-statement;the hash cannot change while we are running
+
+    if _SOURCE_HASH is not None:
+        return _SOURCE_HASH
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    sha = hashlib.sha256()
+
+    for root, dirs, files in os.walk(package_dir):
+        dirs.sort()
+
+        for name in sorted(files):
+            if not name.endswith('.py'):
+                continue
+
+            path = os.path.join(root, name)
+            sha.update(os.path.relpath(path, package_dir).replace(os.sep, '/').encode('utf-8'))
+
+            with open(path, "rb") as infile:
+                sha.update(hashlib.sha256(infile.read()).digest())
+
+    _SOURCE_HASH = sha.hexdigest()
+    return _SOURCE_HASH
+
+
+class CompileCache(object):
+    """A folder of compiled sensor graphs keyed by what they depend on.
+
+    Args:
+        folder (str): Optional folder to store cached graphs in.  By default
+            they are stored in the per user iotile settings directory.
+    """
+
+    CacheFolderName = 'sgcompile_cache'
+
+    def __init__(self, folder=None):
+        if folder is None:
+            folder = os.path.join(settings_directory(), self.CacheFolderName)
+
+        self.folder = folder
+        self._logger = logging.getLogger(__name__)
+
+    @classmethod
+    def compile_key(cls, in_path, model, optimize):
+        """Compute the cache key for compiling a sensor graph file.
+
+        Args:
+            in_path (str): The path to the sgf file that will be compiled.
+            model (DeviceModel): The device model it will be compiled for.
+            optimize (bool): Whether the optimizer will be run.
+
+        Returns:
+            str: The cache key.
+        """
+
+        try:
+            with open(in_path, "rb") as infile:
+                source = infile.read()
+        except IOError:
+            raise ArgumentError("Could not read sensor graph file", path=in_path)
+
+        settings = {
+            'format': CACHE_FORMAT_VERSION,
+            'compiler': _compiler_version(),
+            'compiler_source': _compiler_source_hash(),
+            'source': hashlib.sha256(source).hexdigest(),
+            'model': model._properties,  #pylint:disable=protected-access;DeviceModel has no public way to list its properties
+            'optimizer': sorted(SensorGraphOptimizer()._known_passes) if optimize else None  #pylint:disable=protected-access
+        }
+
+        encoded = json.dumps(settings, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + '.json')
+
+    def get(self, key, model):
+        """Load a cached sensor graph.
+
+        Args:
+            key (str): The key returned by compile_key().
+            model (DeviceModel): The device model to build the graph with.
+
+        Returns:
+            SensorGraph: The cached graph or None if there is no valid cached
+                graph for this key.
+        """
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "r") as infile:
+                data = json.load(infile)
+
+            return deserialize_graph(data, model)
+        except (IOError, ValueError, KeyError, TypeError, IOTileException) as exc:
+            self._logger.warning("Ignoring invalid cached sensor graph at %s: %s", path, str(exc))
+            return None
+
+    def put(self, key, sensor_graph):
+        """Save a compiled sensor graph in the cache.
+
+        Graphs that contain values that cannot be saved are silently not
+        cached.
+
+        Args:
+            key (str): The key returned by compile_key().
+            sensor_graph (SensorGraph): The compiled graph.
+        """
+
+        try:
+            data = serialize_graph(sensor_graph)
+        except _UncacheableGraph as exc:
+            self._logger.debug("Not caching sensor graph: %s", str(exc))
+            return
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+        path = self._path(key)
+
+        if platform.system() == 'Windows':
+            with open(path, "w") as outfile:
+                json.dump(data, outfile)
+        else:
+            newpath = path + '.new'
+            with open(newpath, "w") as outfile:
+                json.dump(data, outfile)
+
+            os.rename(newpath, path)
+
+
+def _encode_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'hex': hexlify(bytes(value)).decode('utf-8')}
+
+    if value is None or isinstance(value, (numbers.Number, basestring)):
+        return value
+
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(x) for x in value]
+
+    raise _UncacheableGraph("Unsupported value type %s" % type(value).__name__)
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return unhexlify(value['hex'])
+
+    if isinstance(value, list):
+        return [_decode_value(x) for x in value]
+
+    return value
+
+
+def _encode_trigger(trigger):
+    if isinstance(trigger, TrueTrigger):
+        return None
+
+    if isinstance(trigger, InputTrigger):
+        source = 'count' if trigger.use_count else 'value'
+        return [source, trigger.comp_string, trigger.reference]
+
+    raise _UncacheableGraph("Unsupported node trigger type %s" % type(trigger).__name__)
+
+
+def _decode_trigger(trigger):
+    if trigger is None:
+        return None
+
+    source, comparator, reference = trigger
+    return InputTrigger(source, comparator, reference)
+
+
+def serialize_graph(sensor_graph):
+    """Convert a compiled sensor graph into a json serializable dict.
+
+    Args:
+        sensor_graph (SensorGraph): The graph to serialize.
+
+    Returns:
+        dict: The serialized graph.
+    """
+
+    node_indices = {id(node): i for i, node in enumerate(sensor_graph.nodes)}
+
+    nodes = []
+    for node in sensor_graph.nodes:
+        inputs = []
+        for i, (walker, trigger) in enumerate(node.inputs):
+            if isinstance(walker, InvalidStreamWalker):
+                continue
+
+            inputs.append([i, str(walker.selector), _encode_trigger(trigger)])
+
+        nodes.append({
+            'stream': str(node.stream),
+            'inputs': inputs,
+            'combiner': node.trigger_combiner,
+            'processor': node.func_name,
+            'outputs': [node_indices[id(x)] for x in node.outputs]
+        })
+
+    streamers = []
+    for streamer in sensor_graph.streamers:
+        streamers.append({
+            'selector': str(streamer.selector),
+            'dest': str(streamer.dest),
+            'format': streamer.format,
+            'automatic': streamer.automatic,
+            'report_type': streamer.report_type,
+            'with_other': streamer.with_other
+        })
+
+    constants = [[str(stream), _encode_value(value)] for stream, value in viewitems(sensor_graph.constant_database)]
+    metadata = [[name, _encode_value(value)] for name, value in viewitems(sensor_graph.metadata_database)]
+
+    config = []
+    for slot, variables in viewitems(sensor_graph.config_database):
+        for config_id, (config_type, value) in viewitems(variables):
+            config.append([str(slot), config_id, config_type, _encode_value(value)])
+
+    return {
+        'format': CACHE_FORMAT_VERSION,
+        'nodes': nodes,
+        'roots': [node_indices[id(x)] for x in sensor_graph.roots],
+        'streamers': streamers,
+        'constants': constants,
+        'metadata': metadata,
+        'config': config
+    }
+
+
+def deserialize_graph(data, model):
+    """Rebuild a sensor graph previously serialized with serialize_graph().
+
+    Args:
+        data (dict): The serialized graph.
+        model (DeviceModel): The device model to build the graph with.
+
+    Returns:
+        SensorGraph: The rebuilt graph.
+    """
+
+    if data.get('format') != CACHE_FORMAT_VERSION:
+        raise ArgumentError("Unsupported cached sensor graph format", format=data.get('format'))
+
+    log = SensorLog(InMemoryStorageEngine(model), model)
+    graph = SensorGraph(log, model)
+
+    nodes = []
+    for node_data in data['nodes']:
+        node = SGNode(DataStream.FromString(node_data['stream']), model)
+        node.trigger_combiner = node_data['combiner']
+
+        for i, selector, trigger in node_data['inputs']:
+            walker = graph.create_input_walker(DataStreamSelector.FromString(selector))
+            node.connect_input(i, walker, _decode_trigger(trigger))
+
+        processor = node_data['processor']
+        func = graph.find_processing_function(processor)
+        if func is None:
+            raise ArgumentError("Could not find processing function for cached node", func_name=processor)
+
+        node.set_func(processor, func)
+        nodes.append(node)
+
+    for node, node_data in zip(nodes, data['nodes']):
+        for index in node_data['outputs']:
+            node.connect_output(nodes[index])
+
+    graph.nodes = nodes
+    graph.roots = [nodes[x] for x in data['roots']]
+
+    for streamer_data in data['streamers']:
+        streamer = DataStreamer(DataStreamSelector.FromString(streamer_data['selector']),
+                                SlotIdentifier.FromString(streamer_data['dest']),
+                                streamer_data['format'], streamer_data['automatic'],
+                                streamer_data['report_type'], with_other=streamer_data['with_other'])
+        graph.add_streamer(streamer)
+
+    for stream, value in data['constants']:
+        graph.add_constant(DataStream.FromString(stream), _decode_value(value))
+
+    for name, value in data['metadata']:
+        graph.add_metadata(name, _decode_value(value))
+
+    for slot, config_id, config_type, value in data['config']:
+        graph.add_config(SlotIdentifier.FromString(slot), config_id, config_type, _decode_value(value))
+
+    return graph
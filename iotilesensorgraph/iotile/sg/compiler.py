@@ -5,7 +5,7 @@ from .optimizer import SensorGraphOptimizer
 from .model import DeviceModel
 
 
-def compile_sgf(in_path, optimize=True, model=None):
+def compile_sgf(in_path, optimize=True, model=None, cache=None):
     """Compile and optionally optimize an SGF file.
 
     Args:
@@ -15,6 +15,10 @@ def compile_sgf(in_path, optimize=True, model=None):
         model (DeviceModel): Optional device model if we are
             compiling for a nonstandard device.  Normally you should
             leave this blank.
+        cache (CompileCache): Optional cache of previously compiled
+            sensor graphs.  If the same file was already compiled with
+            the same model and optimization settings, the cached result
+            is returned without parsing or optimizing the file again.
 
     Returns:
         SensorGraph: The compiled sensorgraph object
@@ -23,6 +27,12 @@ def compile_sgf(in_path, optimize=True, model=None):
     if model is None:
         model = DeviceModel()
 
+    if cache is not None:
+        key = cache.compile_key(in_path, model, optimize)
+        sensor_graph = cache.get(key, model)
+        if sensor_graph is not None:
+            return sensor_graph
+
     parser = SensorGraphFileParser()
     parser.parse_file(in_path)
     parser.compile(model)
@@ -31,4 +41,7 @@ def compile_sgf(in_path, optimize=True, model=None):
         opt = SensorGraphOptimizer()
         opt.optimize(parser.sensor_graph, model=model)
 
+    if cache is not None:
+        cache.put(key, parser.sensor_graph)
+
     return parser.sensor_graph
@@ -37,7 +37,13 @@ class InMemoryStorageEngine(object):
         }
 
     def restore(self, state):
-        """Restore the state of this InMemoryStorageEngine from a dict."""
+        """Restore the state of this InMemoryStorageEngine from a dict.
+
+        The serialized readings are kept as they are and each one is only
+        converted to an IOTileReading when it is accessed, so restoring a
+        large snapshot, for example one whose readings are stored packed,
+        does not create an object per reading up front.
+        """
 
         storage_data = state.get(u'storage_data', [])
         streaming_data = state.get(u'streaming_data', [])
@@ -47,8 +53,8 @@ class InMemoryStorageEngine(object):
                                 storage_size=len(storage_data), storage_max=self.storage_length,
                                 streaming_size=len(streaming_data), streaming_max=self.streaming_length)
 
-        self.storage_data = [IOTileReading.FromDict(x) for x in storage_data]
-        self.streaming_data = [IOTileReading.FromDict(x) for x in streaming_data]
+        self.storage_data = _RestoredReadings(storage_data)
+        self.streaming_data = _RestoredReadings(streaming_data)
 
     def count(self):
         """Count the number of readings.
@@ -59,6 +65,14 @@ class InMemoryStorageEngine(object):
 
         return (len(self.storage_data), len(self.streaming_data))
 
+    def _matching_data(self, selector, func_name):
+        if selector.output:
+            return self.streaming_data
+        elif selector.buffered:
+            return self.storage_data
+
+        raise ArgumentError("You can only pass a buffered selector to %s" % func_name, selector=selector)
+
     def count_matching(self, selector, offset=0):
         """Count the number of readings matching selector.
 
@@ -71,23 +85,51 @@ class InMemoryStorageEngine(object):
             int: The number of matching readings.
         """
 
-        if selector.output:
-            data = self.streaming_data
-        elif selector.buffered:
-            data = self.storage_data
-        else:
-            raise ArgumentError("You can only pass a buffered selector to count_matching", selector=selector)
+        data = self._matching_data(selector, 'count_matching')
+        matches = _StreamMatcher(selector)
 
         count = 0
         for i in range(offset, len(data)):
-            reading = data[i]
-
-            stream = DataStream.FromEncoded(reading.stream)
-            if selector.matches(stream):
+            if matches(data[i].stream):
                 count += 1
 
         return count
 
+    def iter_matching(self, selector, offset=0, limit=None):
+        """Iterate over the readings matching selector.
+
+        This is the bulk equivalent of calling get() on successive offsets
+        and checking each reading against selector.
+
+        Args:
+            selector (DataStreamSelector): The selector that we want to
+                find matching readings for.
+            offset (int): The starting offset that we should begin at.
+            limit (int): Optional maximum number of matching readings to
+                return.
+
+        Yields:
+            (int, IOTileReading): The offset and value of each matching reading.
+        """
+
+        data = self._matching_data(selector, 'iter_matching')
+        matches = _StreamMatcher(selector)
+
+        if limit is not None and limit <= 0:
+            return
+
+        found = 0
+        for i in range(offset, len(data)):
+            reading = data[i]
+            if not matches(reading.stream):
+                continue
+
+            yield i, reading
+
+            found += 1
+            if found == limit:
+                return
+
     def scan_storage(self, area_name, callable, start=0, stop=None):
         """Iterate over streaming or storage areas, calling callable.
 
@@ -211,3 +253,93 @@ class InMemoryStorageEngine(object):
             self.storage_data = remaining
 
         return popped
+
+
+class _StreamMatcher(object):
+    """Check encoded stream ids against a selector, remembering each result.
+
+    A buffer only ever contains a handful of distinct streams so this
+    avoids decoding and matching the stream of every reading.
+    """
+
+    def __init__(self, selector):
+        self.selector = selector
+        self._results = {}
+
+    def __call__(self, encoded):
+        result = self._results.get(encoded)
+        if result is None:
+            result = self.selector.matches(DataStream.FromEncoded(encoded))
+            self._results[encoded] = result
+
+        return result
+
+
+class _RestoredReadings(object):
+    """A reading buffer restored from serialized reading dicts.
+
+    The dicts are converted to IOTileReading objects each time they are
+    accessed rather than all at once.  New readings can be appended and
+    dropping readings from the front with a slice like data[count:] only
+    moves a start offset, which is all that InMemoryStorageEngine needs.
+
+    Args:
+        source (sequence of dict): The serialized readings.
+        start (int): The index of the first reading in source that is
+            part of this buffer.
+        appended (list of IOTileReading): Readings added after source.
+    """
+
+    def __init__(self, source, start=0, appended=None):
+        if appended is None:
+            appended = []
+
+        self._source = source
+        self._start = start
+        self._appended = appended
+
+    def _restored_length(self):
+        return len(self._source) - self._start
+
+    def __len__(self):
+        return self._restored_length() + len(self._appended)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if index.stop is None and step == 1:
+                return self._drop(start)
+
+            return [self[i] for i in range(start, stop, step)]
+
+        if index < 0:
+            index += len(self)
+
+        if index < 0 or index >= len(self):
+            raise IndexError("Reading index out of range")
+
+        restored = self._restored_length()
+        if index < restored:
+            return IOTileReading.FromDict(self._source[self._start + index])
+
+        return self._appended[index - restored]
+
+    def __iter__(self):
+        for i in range(self._start, len(self._source)):
+            yield IOTileReading.FromDict(self._source[i])
+
+        for reading in self._appended:
+            yield reading
+
+    def _drop(self, count):
+        restored = self._restored_length()
+        if count <= restored:
+            return _RestoredReadings(self._source, self._start + count, list(self._appended))
+
+        return self._appended[count - restored:]
+
+    def append(self, reading):
+        """Add a new reading to the end of the buffer."""
+
+        self._appended.append(reading)
+
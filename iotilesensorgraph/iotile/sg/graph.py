@@ -3,7 +3,7 @@
 from collections import deque
 import logging
 from pkg_resources import iter_entry_points
-from toposort import toposort_flatten
+from toposort import CircularDependencyError
 from iotile.core.exceptions import ArgumentError
 from iotile.core.hw.reports import IOTileReading
 from .node_descriptor import parse_node_descriptor
@@ -27,6 +27,9 @@ class SensorGraph(object):
             Defaults to False.
     """
 
+    # Loading an entry point is slow so cache processing functions once found
+    _processing_functions = {}
+
     def __init__(self, sensor_log, model=None, enforce_limits=False):
         self.roots = []
         self.nodes = []
@@ -42,6 +45,8 @@ class SensorGraph(object):
         self._manually_triggered_streamers = set()
         self._logger = logging.getLogger(__name__)
 
+        self._clear_index()
+
         if enforce_limits:
             if model is None:
                 raise ArgumentError("You must pass a device model if you set enforce_limits=True")
@@ -67,6 +72,86 @@ class SensorGraph(object):
         self.metadata_database = {}
         self.config_database = {}
 
+        self._clear_index()
+
+    def _clear_index(self):
+        """Reset the stream index used to connect nodes in add_node."""
+
+        self._indexed_nodes = self.nodes
+        self._indexed_count = 0
+        self._node_order = {}
+
+        # (stream_type, stream_id) -> nodes producing that stream
+        self._producers = {}
+        # stream_type -> nodes producing a stream of that type
+        self._type_producers = {}
+        # (stream_type, stream_id) -> nodes with a singular input selector for that stream
+        self._consumers = {}
+        # stream_type -> nodes with a wildcard input selector for that type
+        self._wildcard_consumers = {}
+
+    def _index_node(self, node):
+        """Add a node's output stream and input selectors to the stream index."""
+
+        self._node_order[id(node)] = self._indexed_count
+        self._indexed_count += 1
+
+        stream = node.stream
+        self._producers.setdefault((stream.stream_type, stream.stream_id), []).append(node)
+        self._type_producers.setdefault(stream.stream_type, []).append(node)
+
+        for walker, _trigger in node.inputs:
+            selector = walker.selector
+            if selector is None:
+                continue
+
+            if selector.singular:
+                consumers = self._consumers.setdefault((selector.match_type, selector.match_id), [])
+            else:
+                consumers = self._wildcard_consumers.setdefault(selector.match_type, [])
+
+            # A node with several inputs on the same stream is only indexed once
+            if len(consumers) == 0 or consumers[-1] is not node:
+                consumers.append(node)
+
+    def _ensure_index(self):
+        """Rebuild the stream index if self.nodes was modified directly.
+
+        Optimization passes and graph loaders add and remove nodes without
+        going through add_node, in which case the index is rebuilt from
+        scratch the next time it is needed.
+        """
+
+        if self._indexed_nodes is self.nodes and self._indexed_count == len(self.nodes):
+            return
+
+        self._clear_index()
+        for node in self.nodes:
+            self._index_node(node)
+
+    def _find_producers(self, selector):
+        """Find all nodes whose output stream matches a selector, in the order they were added."""
+
+        if selector.singular:
+            candidates = self._producers.get((selector.match_type, selector.match_id), [])
+        else:
+            candidates = self._type_producers.get(selector.match_type, [])
+
+        return [x for x in candidates if selector.matches(x.stream)]
+
+    def _find_consumers(self, stream):
+        """Find all nodes with an input selector that could match a stream, in the order they were added."""
+
+        exact = self._consumers.get((stream.stream_type, stream.stream_id), [])
+        wildcard = self._wildcard_consumers.get(stream.stream_type, [])
+
+        if len(wildcard) == 0:
+            return exact
+
+        candidates = {id(x): x for x in exact}
+        candidates.update({id(x): x for x in wildcard})
+        return sorted(candidates.values(), key=lambda x: self._node_order[id(x)])
+
     def add_node(self, node_descriptor):
         """Add a node to the sensor graph based on the description given.
 
@@ -83,18 +168,14 @@ class SensorGraph(object):
             raise ResourceUsageError("Maximum number of nodes exceeded", max_nodes=self._max_nodes)
 
         node, inputs, processor = parse_node_descriptor(node_descriptor, self.model)
+        self._ensure_index()
 
         in_root = False
 
         for i, input_data in enumerate(inputs):
             selector, trigger = input_data
 
-            walker = self.sensor_log.create_walker(selector)
-
-            # Constant walkers begin life initialized to 0 so they always read correctly
-            if walker.selector.inexhaustible:
-                walker.reading = IOTileReading(walker.selector.as_stream(), 0xFFFFFFFF, 0)
-
+            walker = self.create_input_walker(selector)
             node.connect_input(i, walker, trigger)
 
             if selector.input and not in_root:
@@ -102,10 +183,9 @@ class SensorGraph(object):
                 in_root = True  # Make sure we only add to root list once
             else:
                 found = False
-                for other in self.nodes:
-                    if selector.matches(other.stream):
-                        other.connect_output(node)
-                        found = True
+                for other in self._find_producers(selector):
+                    other.connect_output(node)
+                    found = True
 
                 if not found and selector.buffered:
                     raise NodeConnectionError("Node has input that refers to another node that has not been created yet", node_descriptor=node_descriptor, input_selector=str(selector), input_index=i)
@@ -113,7 +193,7 @@ class SensorGraph(object):
         # Also make sure we add this node's output to any other existing node's inputs
         # this is important for constant nodes that may be written from multiple places
         # FIXME: Make sure when we emit nodes, they are topologically sorted
-        for other_node in self.nodes:
+        for other_node in self._find_consumers(node.stream):
             for selector, trigger in other_node.inputs:
                 if selector.matches(node.stream):
                     node.connect_output(other_node)
@@ -125,6 +205,25 @@ class SensorGraph(object):
 
         node.set_func(processor, func)
         self.nodes.append(node)
+        self._index_node(node)
+
+    def create_input_walker(self, selector):
+        """Create a stream walker to use as a node input.
+
+        Args:
+            selector (DataStreamSelector): The streams that the input reads.
+
+        Returns:
+            StreamWalker: The walker for the input.
+        """
+
+        walker = self.sensor_log.create_walker(selector)
+
+        # Constant walkers begin life initialized to 0 so they always read correctly
+        if walker.selector.inexhaustible:
+            walker.reading = IOTileReading(walker.selector.as_stream(), 0xFFFFFFFF, 0)
+
+        return walker
 
     def add_config(self, slot, config_id, config_type, value):
         """Add a config variable assignment to this sensor graph.
@@ -431,32 +530,60 @@ class SensorGraph(object):
     def iterate_bfs(self):
         """Generator that yields node, [inputs], [outputs] in breadth first order.
 
-        This generator will iterate over all nodes in the sensor graph, yielding
-        a 3 tuple for each node with a list of all of the nodes connected to its
-        inputs and all of the nodes connected to its output.
+        This generator will iterate over all nodes in the sensor graph that
+        are reachable from a root node, yielding a 3 tuple for each node with
+        a list of all of the nodes connected to its inputs and all of the
+        nodes connected to its output.  Each node is yielded exactly once.
 
         Returns:
             (SGNode, list(SGNode), list(SGNode)): A tuple for each node in the graph
         """
 
-        working_set = deque(self.roots)
-        seen = []
+        order, producers = self._walk_bfs()
 
-        while len(working_set) > 0:
-            curr = working_set.popleft()
-
-            # Now build input and output node lists for this node
+        for curr in order:
+            # Order inputs by which input they are connected to and then by
+            # the order in which they were visited
             inputs = []
+            added = set()
+            curr_producers = producers.get(id(curr), [])
             for walker, _ in curr.inputs:
-                for other in seen:
-                    if walker.matches(other.stream) and other not in inputs:
+                for other in curr_producers:
+                    if id(other) not in added and walker.matches(other.stream):
                         inputs.append(other)
+                        added.add(id(other))
 
             outputs = [x for x in curr.outputs]
             yield curr, inputs, outputs
 
-            working_set.extend(curr.outputs)
-            seen.append(curr)
+    def _walk_bfs(self):
+        """Find all nodes reachable from the roots and the nodes feeding each one.
+
+        Returns:
+            (list(SGNode), dict): The reachable nodes in breadth first order
+                and a map of id(node) to a list of the reachable nodes that
+                have it as an output, in breadth first order.
+        """
+
+        working_set = deque(self.roots)
+        seen = set(id(x) for x in self.roots)
+        order = []
+        producers = {}
+
+        while len(working_set) > 0:
+            curr = working_set.popleft()
+            order.append(curr)
+
+            for output in curr.outputs:
+                node_producers = producers.setdefault(id(output), [])
+                if len(node_producers) == 0 or node_producers[-1] is not curr:
+                    node_producers.append(curr)
+
+                if id(output) not in seen:
+                    seen.add(id(output))
+                    working_set.append(output)
+
+        return order, producers
 
     def sort_nodes(self):
         """Topologically sort all of our nodes.
@@ -466,11 +593,16 @@ class SensorGraph(object):
         programming a sensorgraph into an embedded device whose engine assumes
         a topologically sorted graph.
 
+        Nodes are placed in order of the length of the longest path that
+        leads to them from a root node, with ties broken by their current
+        position in the list of nodes.
+
         The sorting is done in place on self.nodes
         """
 
         node_map = {id(node): i for i, node in enumerate(self.nodes)}
         node_deps = {}
+        dependents = {}
 
         for node, inputs, _outputs in self.iterate_bfs():
             node_index = node_map[id(node)]
@@ -478,9 +610,31 @@ class SensorGraph(object):
             deps = {node_map[id(x)] for x in inputs}
             node_deps[node_index] = deps
 
+            for dep in deps:
+                dependents.setdefault(dep, []).append(node_index)
+
         # Now that we have our dependency tree properly built, topologically
         # sort the nodes and reorder them.
-        node_order = toposort_flatten(node_deps)
+        remaining = {index: len(deps) for index, deps in node_deps.items()}
+        depth = {index: 0 for index in node_deps}
+        ready = deque(index for index, count in remaining.items() if count == 0)
+        node_order = []
+
+        while len(ready) > 0:
+            index = ready.popleft()
+            node_order.append(index)
+
+            for dependent in dependents.get(index, []):
+                depth[dependent] = max(depth[dependent], depth[index] + 1)
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(node_order) != len(node_deps):
+            sorted_nodes = set(node_order)
+            raise CircularDependencyError({index: deps for index, deps in node_deps.items() if index not in sorted_nodes})
+
+        node_order.sort(key=lambda x: (depth[x], x))
         self.nodes = [self.nodes[x] for x in node_order]
 
         #Check root nodes all topographically sorted to the beginning
@@ -502,8 +656,16 @@ class SensorGraph(object):
             callable: The processing function
         """
 
+        func = cls._processing_functions.get(name)
+        if func is not None:
+            return func
+
         for entry in iter_entry_points(u'iotile.sg_processor', name):
-            return entry.load()
+            func = entry.load()
+            cls._processing_functions[name] = func
+            return func
+
+        return None
 
     def dump_nodes(self):
         """Dump all of the nodes in this sensor graph as a list of strings."""
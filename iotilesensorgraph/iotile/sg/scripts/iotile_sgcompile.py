@@ -3,9 +3,8 @@
 import sys
 import argparse
 from builtins import str
-from iotile.sg import SensorGraph, SensorLog, DeviceModel
+from iotile.sg import SensorGraph, SensorLog, DeviceModel, CompileCache, compile_sgf
 from iotile.sg.parser import SensorGraphFileParser
-from iotile.sg.optimizer import SensorGraphOptimizer
 from iotile.sg.output_formats import known_formats
 
 
@@ -17,6 +16,8 @@ def build_args():
     parser.add_argument(u'-f', u'--format', default=u"nodes", choices=[u'nodes', u'ast', u'snippet', u'ascii', u'config', u'script'], type=str, help=u"the output format for the compiled result.")
     parser.add_argument(u'-o', u'--output', type=str, help=u"the output file to save the results (defaults to stdout)")
     parser.add_argument(u'--disable-optimizer', action="store_true", help=u"disable the sensor graph optimizer completely")
+    parser.add_argument(u'--cache', action="store_true", help=u"reuse the compiled result from a previous run if the file has not changed")
+    parser.add_argument(u'--cache-dir', type=str, help=u"the folder to store cached compiled results in (implies --cache)")
     return parser
 
 
@@ -26,8 +27,15 @@ def main():
 
     model = DeviceModel()
 
-    parser = SensorGraphFileParser()
-    parser.parse_file(args.sensor_graph)
+    if args.format == u'ast':
+        parser = SensorGraphFileParser()
+        parser.parse_file(args.sensor_graph)
+    else:
+        cache = None
+        if args.cache or args.cache_dir is not None:
+            cache = CompileCache(args.cache_dir)
+
+        sensor_graph = compile_sgf(args.sensor_graph, optimize=not args.disable_optimizer, model=model, cache=cache)
 
     outfile = sys.stdout
 
@@ -39,14 +47,8 @@ def main():
         outfile.close()
         sys.exit(0)
 
-    parser.compile(model)
-
-    if not args.disable_optimizer:
-        opt = SensorGraphOptimizer()
-        opt.optimize(parser.sensor_graph, model=model)
-
     if args.format == u'nodes':
-        for node in parser.sensor_graph.dump_nodes():
+        for node in sensor_graph.dump_nodes():
             outfile.write((node + u'\n').encode())
 
     else:
@@ -55,7 +57,7 @@ def main():
             outfile.close()
             sys.exit(1)
 
-        output = known_formats[args.format](parser.sensor_graph)
+        output = known_formats[args.format](sensor_graph)
 
         if args.format in (u'snippet', u'ascii', u'config'):
             outfile.write(output.encode())
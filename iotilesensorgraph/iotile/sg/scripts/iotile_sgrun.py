@@ -4,12 +4,10 @@ import sys
 import argparse
 from builtins import str
 from iotile.core.exceptions import ArgumentError, IOTileException
-from iotile.sg import DeviceModel, DataStreamSelector, SlotIdentifier
+from iotile.sg import DeviceModel, DataStreamSelector, SlotIdentifier, CompileCache, compile_sgf
 from iotile.sg.sim import SensorGraphSimulator
 from iotile.sg.sim.hosted_executor import SemihostedRPCExecutor
-from iotile.sg.parser import SensorGraphFileParser
 from iotile.sg.known_constants import user_connected
-from iotile.sg.optimizer import SensorGraphOptimizer
 
 DESCRIPTION = \
 u"""Load and run a sensor graph, either in a simulator or on a physical device.
@@ -67,6 +65,8 @@ def build_args():
     parser.add_argument(u'--watch', u'-w', action=u"append", default=[], help=u"A stream to watch and print whenever writes are made.")
     parser.add_argument(u'--trace', u'-t', help=u"Trace all writes to output streams to a file")
     parser.add_argument(u'--disable-optimizer', action="store_true", help=u"disable the sensor graph optimizer completely")
+    parser.add_argument(u'--cache', action="store_true", help=u"reuse the compiled sensor graph from a previous run if the file has not changed")
+    parser.add_argument(u'--cache-dir', type=str, help=u"the folder to store cached compiled sensor graphs in (implies --cache)")
     parser.add_argument(u"--mock-rpc", u"-m", action=u"append", type=str, default=[], help=u"mock an rpc, format should be <slot id>:<rpc_id> = value.  For example -m \"slot 1:0x500a = 10\"")
     parser.add_argument(u"--port", u"-p", help=u"The port to use to connect to a device if we are semihosting")
     parser.add_argument(u"--semihost-device", u"-d", type=lambda x: int(x, 0), help=u"The device id of the device we should semihost this sensor graph on.")
@@ -148,15 +148,11 @@ def main(argv=None):
 
         model = DeviceModel()
 
-        parser = SensorGraphFileParser()
-        parser.parse_file(args.sensor_graph)
-        parser.compile(model)
+        cache = None
+        if args.cache or args.cache_dir is not None:
+            cache = CompileCache(args.cache_dir)
 
-        if not args.disable_optimizer:
-            opt = SensorGraphOptimizer()
-            opt.optimize(parser.sensor_graph, model=model)
-
-        graph = parser.sensor_graph
+        graph = compile_sgf(args.sensor_graph, optimize=not args.disable_optimizer, model=model, cache=cache)
         sim = SensorGraphSimulator(graph)
 
         for stop in args.stop:
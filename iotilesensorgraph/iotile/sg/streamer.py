@@ -5,7 +5,6 @@ from collections import namedtuple
 from future.utils import viewitems, python_2_unicode_compatible
 from iotile.core.hw.reports import IndividualReadingReport, BroadcastReport, SignedListReport
 from iotile.core.exceptions import ArgumentError, InternalError
-from iotile.sg.exceptions import StreamEmptyError
 
 StreamerReport = namedtuple("StreamerReport", ['report', 'num_readings', 'highest_id'])
 
@@ -193,17 +192,8 @@ class DataStreamer(object):
             if max_readings <= 0:
                 raise InternalError("max_size is too small to hold even a single reading", max_size=max_size)
 
-            readings = []
-            highest_id = 0
-            try:
-                while len(readings) < max_readings:
-                    reading = self.walker.pop()
-                    readings.append(reading)
-                    if reading.reading_id > highest_id:
-                        highest_id = reading.reading_id
-            except StreamEmptyError:
-                if len(readings) == 0:
-                    raise
+            readings = self.walker.pop_many(max_readings)
+            highest_id = max(0, max(x.reading_id for x in readings))
 
             return StreamerReport(SignedListReport.FromReadings(device_id, readings, report_id=report_id, selector=self.selector.encode(),
                                                                 streamer=self.index, sent_timestamp=device_uptime), len(readings), highest_id)
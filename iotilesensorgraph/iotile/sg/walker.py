@@ -30,6 +30,46 @@ class StreamWalker(object):
 
         return self.selector.matches(stream)
 
+    def pop_many(self, count):
+        """Pop up to count readings off of this stream walker.
+
+        Args:
+            count (int): The maximum number of readings to pop.
+
+        Returns:
+            list(IOTileReading): The readings, oldest first.
+
+        Raises:
+            StreamEmptyError: If there are no readings available.
+        """
+
+        available = min(count, self.count())
+        if available == 0:
+            raise StreamEmptyError("pop_many called on stream walker without any data", selector=self.selector)
+
+        return [self.pop() for _i in range(0, available)]
+
+    def peek_many(self, count):
+        """Peek at up to count of the oldest readings in this stream walker.
+
+        Args:
+            count (int): The maximum number of readings to return.
+
+        Returns:
+            list(IOTileReading): The readings, oldest first.
+
+        Raises:
+            StreamEmptyError: If there are no readings available.
+        """
+
+        available = min(count, self.count())
+        if available == 0:
+            raise StreamEmptyError("peek_many called on stream walker without any data", selector=self.selector)
+
+        # Walkers that are not buffered store a single reading that is
+        # returned for every pop until they are empty.
+        return [self.peek()] * available
+
     @property
     def buffered(self):
         """Whether this stream walker is backed by actual persistent storage (True)."""
@@ -118,6 +158,52 @@ class BufferedStreamWalker(StreamWalker):
                 self._count -= 1
                 return curr
 
+    def pop_many(self, count):
+        """Pop up to count readings off of this stream walker.
+
+        This fetches all of the readings in a single pass over the
+        underlying storage engine rather than once per reading.
+
+        Args:
+            count (int): The maximum number of readings to pop.
+
+        Returns:
+            list(IOTileReading): The readings, oldest first.
+
+        Raises:
+            StreamEmptyError: If there are no readings available.
+        """
+
+        if self._count == 0:
+            raise StreamEmptyError("pop_many called on buffered stream walker without any data", selector=self.selector)
+
+        readings = []
+        last_offset = self.offset - 1
+        for last_offset, reading in self.engine.iter_matching(self.selector, self.offset, min(count, self._count)):
+            readings.append(reading)
+
+        self.offset = last_offset + 1
+        self._count -= len(readings)
+        return readings
+
+    def peek_many(self, count):
+        """Peek at up to count of the oldest readings in this stream walker.
+
+        Args:
+            count (int): The maximum number of readings to return.
+
+        Returns:
+            list(IOTileReading): The readings, oldest first.
+
+        Raises:
+            StreamEmptyError: If there are no readings available.
+        """
+
+        if self._count == 0:
+            raise StreamEmptyError("peek_many called on buffered stream walker without any data", selector=self.selector)
+
+        return [reading for _offset, reading in self.engine.iter_matching(self.selector, self.offset, min(count, self._count))]
+
     def seek(self, value, target="offset"):
         """Seek this stream to a specific offset or reading id.
 
@@ -6,7 +6,8 @@ from iotile.sg.exceptions import SensorGraphSyntaxError, SensorGraphSemanticErro
 from iotile.sg import DataStream, DeviceModel, DataStreamSelector, SlotIdentifier
 from iotile.sg.parser import SensorGraphFileParser
 from iotile.sg.sim import SensorGraphSimulator
-from iotile.sg import compile_sgf
+from iotile.sg import compile_sgf, CompileCache
+from iotile.sg.output_formats.script import format_script
 from iotile.sg.known_constants import user_connected
 import iotile.sg.parser.language as language
 from iotile.core.hw.reports import IOTileReading
@@ -553,3 +554,67 @@ def test_root_buffering(parser):
     assert output13.count() == 2
     assert output14.count() == 2
     assert output15.count() == 1
+
+
+@pytest.mark.parametrize("name", ['basic_complete.sgf', 'basic_config.sgf', 'basic_meta_file.sgf',
+                                  'basic_streamer.sgf', 'basic_when_on.sgf', 'binary_config.sgf',
+                                  'nested_block.sgf', 'count.sgf'])
+def test_compile_cache(tmpdir, name):
+    """Make sure cached sensor graphs are identical to freshly compiled ones."""
+
+    cache = CompileCache(str(tmpdir))
+    path = get_path(name)
+
+    sg = compile_sgf(path, cache=cache)
+    assert len(os.listdir(str(tmpdir))) == 1
+
+    cached = compile_sgf(path, cache=cache)
+    assert cached is not sg
+
+    assert cached.dump_nodes() == sg.dump_nodes()
+    assert cached.dump_streamers() == sg.dump_streamers()
+    assert [str(x) for x in cached.roots] == [str(x) for x in sg.roots]
+    assert [[str(y) for y in x.outputs] for x in cached.nodes] == [[str(y) for y in x.outputs] for x in sg.nodes]
+    assert cached.metadata_database == sg.metadata_database
+    assert cached.config_database == sg.config_database
+
+    # Changing any input to the compiler should not reuse the cached graph
+    compile_sgf(path, optimize=False, cache=cache)
+    assert len(os.listdir(str(tmpdir))) == 2
+
+
+def test_compile_cache_simulation(tmpdir):
+    """Make sure a cached sensor graph can be simulated."""
+
+    cache = CompileCache(str(tmpdir))
+    path = get_path(u'basic_every_1min.sgf')
+
+    compile_sgf(path, cache=cache)
+    sg = compile_sgf(path, cache=cache)
+
+    assert format_script(sg) == format_script(compile_sgf(path))
+
+    sg.load_constants()
+    counter15 = sg.sensor_log.create_walker(DataStreamSelector.FromString('counter 15'))
+
+    sim = SensorGraphSimulator(sg)
+    sim.stop_condition('run_time 120 seconds')
+    sim.run()
+
+    assert counter15.count() == 2
+
+
+def test_compile_cache_source_changes(tmpdir, monkeypatch):
+    """Make sure changing the compiler's own source invalidates cached graphs."""
+
+    import iotile.sg.compile_cache as compile_cache
+
+    cache = CompileCache(str(tmpdir))
+    path = get_path(u'basic_every_1min.sgf')
+    model = DeviceModel()
+
+    key = cache.compile_key(path, model, True)
+    assert cache.compile_key(path, model, True) == key
+
+    monkeypatch.setattr(compile_cache, '_SOURCE_HASH', 'edited compiler')
+    assert cache.compile_key(path, model, True) != key
@@ -74,6 +74,61 @@ def test_iteration():
     assert str(in1[0].stream) == u'unbuffered 1'
 
 
+def test_large_graph_iteration():
+    """Make sure iteration and sorting visit each node once on highly connected graphs."""
+
+    model = DeviceModel()
+    log = SensorLog(model=model)
+    sg = SensorGraph(log, model=model)
+
+    # Each level of this graph doubles the number of paths from the root
+    # so any traversal that visits nodes once per path would never finish
+    levels = 40
+    sg.add_node('(input 1 always) => unbuffered 0 using copy_all_a')
+    sg.add_node('(input 1 always) => unbuffered 1 using copy_all_a')
+    for i in range(1, levels):
+        for stream in (2*i, 2*i + 1):
+            sg.add_node('(unbuffered {} always && unbuffered {} always) => unbuffered {} using copy_all_a'.format(2*i - 2, 2*i - 1, stream))
+
+    visited = [node for node, _inputs, _outputs in sg.iterate_bfs()]
+    assert len(visited) == 2*levels
+
+    for node, inputs, outputs in sg.iterate_bfs():
+        if node.stream.stream_id < 2:
+            assert len(inputs) == 0
+        else:
+            base = node.stream.stream_id - node.stream.stream_id % 2
+            assert [x.stream.stream_id for x in inputs] == [base - 2, base - 1]
+
+        if node.stream.stream_id < 2*levels - 2:
+            assert len(outputs) == 2
+
+    sg.nodes.reverse()
+    sg.sort_nodes()
+    assert [x.stream.stream_id // 2 for x in sg.nodes] == [i // 2 for i in range(0, 2*levels)]
+
+
+def test_add_node_after_removal():
+    """Make sure nodes connect correctly after nodes are removed directly."""
+
+    model = DeviceModel()
+    log = SensorLog(model=model)
+    sg = SensorGraph(log, model=model)
+
+    sg.add_node('(input 1 always) => unbuffered 1 using copy_all_a')
+    sg.add_node('(unbuffered 1 always) => unbuffered 2 using copy_all_a')
+
+    removed = sg.nodes.pop()
+    sg.nodes[0].outputs.remove(removed)
+
+    sg.add_node('(unbuffered 1 always) => unbuffered 3 using copy_all_a')
+    sg.add_node('(unbuffered 3 always) => unbuffered 1 using copy_all_a')
+
+    assert [str(x.stream) for x in sg.nodes[0].outputs] == [u'unbuffered 3']
+    assert [str(x.stream) for x in sg.nodes[1].outputs] == [u'unbuffered 1']
+    assert [str(x.stream) for x in sg.nodes[2].outputs] == [u'unbuffered 3']
+
+
 def test_triggering_streamers():
     model = DeviceModel()
     log = SensorLog(model=model)
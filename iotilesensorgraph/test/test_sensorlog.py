@@ -183,6 +183,51 @@ def test_storage_streaming_walkers():
     assert output_walk.offset == 0
 
 
+def test_walker_bulk_pop():
+    """Make sure pop_many and peek_many match repeated calls to pop."""
+
+    model = DeviceModel()
+    engine = InMemoryStorageEngine(model)
+    log = SensorLog(engine, model=model)
+
+    walk = log.create_walker(DataStreamSelector.FromString('output 1'))
+    single_walk = log.create_walker(DataStreamSelector.FromString('output 1'))
+    counter_walk = log.create_walker(DataStreamSelector.FromString('counter 1'))
+    output1 = DataStream.FromString('output 1')
+    output2 = DataStream.FromString('output 2')
+
+    with pytest.raises(StreamEmptyError):
+        walk.pop_many(10)
+
+    for i in range(0, 100):
+        log.push(output1, IOTileReading(0, 0, i))
+        log.push(output2, IOTileReading(0, 0, i))
+
+    peeked = walk.peek_many(10)
+    assert [x.value for x in peeked] == list(range(0, 10))
+    assert walk.count() == 100
+
+    popped = walk.pop_many(30)
+    assert popped == [single_walk.pop() for _i in range(0, 30)]
+    assert walk.offset == single_walk.offset
+    assert walk.count() == 70
+
+    popped = walk.pop_many(1000)
+    assert [x.value for x in popped] == list(range(30, 100))
+    assert walk.count() == 0
+
+    with pytest.raises(StreamEmptyError):
+        walk.peek_many(1)
+
+    found = list(engine.iter_matching(DataStreamSelector.FromString('output 2'), offset=10, limit=3))
+    assert [(offset, reading.value) for offset, reading in found] == [(11, 5), (13, 6), (15, 7)]
+
+    log.push(DataStream.FromString('counter 1'), IOTileReading(0, 0, 5))
+    log.push(DataStream.FromString('counter 1'), IOTileReading(0, 0, 6))
+    assert [x.value for x in counter_walk.pop_many(5)] == [6, 6]
+    assert counter_walk.count() == 0
+
+
 def test_storage_scan():
     """Make sure scan_storage works."""
 
@@ -426,3 +471,48 @@ def test_dump_restore():
     log.destroy_all_walkers()
     walk2 = log.restore_walker(dump)
     assert walk2.count() == 25
+
+
+def test_lazy_restore():
+    """Make sure restored readings are only converted when accessed."""
+
+    class CountingReadings(object):
+        def __init__(self, readings):
+            self.readings = readings
+            self.accessed = 0
+
+        def __len__(self):
+            return len(self.readings)
+
+        def __getitem__(self, index):
+            self.accessed += 1
+            return self.readings[index]
+
+    model = DeviceModel()
+    engine = InMemoryStorageEngine(model)
+    storage = DataStream.FromString('buffered 1')
+
+    readings = [IOTileReading(i, storage.encode(), i, reading_id=i+1).asdict() for i in range(0, 100)]
+    source = CountingReadings(readings)
+    engine.restore({u'storage_data': source, u'streaming_data': []})
+
+    assert engine.count() == (100, 0)
+    assert source.accessed == 0
+
+    assert engine.get(u'storage', 10).value == 10
+    assert source.accessed == 1
+
+    engine.push(IOTileReading(100, storage.encode(), 100, reading_id=101))
+    popped = engine.popn(u'storage', 5)
+    assert [x.value for x in popped] == [0, 1, 2, 3, 4]
+    assert source.accessed == 6
+
+    assert engine.count() == (96, 0)
+    assert engine.get(u'storage', 0).value == 5
+    assert engine.get(u'storage', 95).value == 100
+
+    state = engine.dump()
+    assert [x['value'] for x in state[u'storage_data']] == list(range(5, 101))
+
+    engine.popn(u'storage', 96)
+    assert engine.count() == (0, 0)
@@ -1 +1 @@
-version = "0.8.0"
+version = "0.9.0"
@@ -17,8 +17,13 @@ class PipeSnippetStep(object):
         context (str): The starting context of which commands are to be performed
         commands (list[str]): List of commands to pipe into context
         expected (list[str]): List of expected piped outputs. Ignores the current context name.
+        base_dir (str): Optional directory to run the context in.  If not given,
+            the current working directory is used.
     """
-    def __init__(self, args):
+
+    USES_BASE_DIR = True
+
+    def __init__(self, args, base_dir=None):
         if args.get('context') is None:
             raise RecipeActionMissingParameter("PromptStep Parameter Missing", \
                 parameter_name='context')
@@ -29,6 +34,7 @@ class PipeSnippetStep(object):
         self._context = args['context']
         self._commands = args['commands']
         self._expect = args.get('expect', None)
+        self._base_dir = base_dir
 
         if self._expect is not None:
             if len(self._expect) != len(self._commands):
@@ -36,7 +42,7 @@ class PipeSnippetStep(object):
                     parameter_name='commands')
 
     def run(self):
-        process = Popen(shlex.split(self._context), stdout=PIPE, stdin=PIPE, stderr=STDOUT)
+        process = Popen(shlex.split(self._context), stdout=PIPE, stdin=PIPE, stderr=STDOUT, cwd=self._base_dir)
         out, err = process.communicate(input='\n'.join(self._commands).encode('utf-8'))
         if err is not None:
             raise ArgumentError("Output Errored", errors=err, commands=self._commands)
@@ -24,17 +24,21 @@ class SendOTAScriptStep(object):
 
     REQUIRED_RESOURCES = [('connection', 'hardware_manager')]
     FILES = ['file']
+    CACHES_FILES = True
 
-    def __init__(self, args):
+    def __init__(self, args, artifacts=None):
         if 'file' not in args:
             raise ArgumentError("SendOTAScriptStep required parameters missing", required=["file"], args=args)
 
         self._file = args['file']
         self._no_reboot = args.get('no_reboot', False)
 
-        with open(self._file, "rb") as infile:
-            data = infile.read()
-            self._script = UpdateScript.FromBinary(data)
+        if artifacts is not None:
+            self._script = artifacts.get(self._file, UpdateScript.FromBinary)
+        else:
+            with open(self._file, "rb") as infile:
+                data = infile.read()
+                self._script = UpdateScript.FromBinary(data)
 
     def run(self, resources):
         """Actually send the trub script.
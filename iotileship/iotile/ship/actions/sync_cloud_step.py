@@ -16,8 +16,13 @@ class SyncCloudStep(object):
         expected_app_tag (str): Optional. Expected app tag to check against in cloud
         overwrite (bool): Default to False. Raises an error if the device template and sensorgraph
             is not what you expect if overwrite if False, overwise it will update the cloud
+        prefetched (dict): Optional map of uuid to cloud device information
+            that was queried for a whole fleet by PrefetchFleet().
     """
-    def __init__(self, args):
+
+    PREFETCHES_FLEET = True
+
+    def __init__(self, args, prefetched=None):
         if args.get('uuid') is None:
             raise ArgumentError("LoadSensorGraphStep Parameter Missing", parameter_name='uuid')
 
@@ -30,10 +35,35 @@ class SyncCloudStep(object):
         self._expected_app_tag  = args.get('expected_app_tag')
 
         self._overwrite         = args.get('overwrite', False)
+        self._prefetched        = prefetched
+
+    @classmethod
+    def PrefetchFleet(cls, step_args):
+        """Query the cloud information for every device in a fleet at once.
+
+        Args:
+            step_args (list of dict): The arguments of this step for each device.
+
+        Returns:
+            dict: A map of uuid to the cloud information about that device.
+        """
+
+        uuids = [args['uuid'] for args in step_args if args.get('uuid') is not None]
+        if len(uuids) == 0:
+            return {}
+
+        cloud = IOTileCloud()
+        return cloud.devices_info(uuids)
 
     def run(self):
         cloud = IOTileCloud()
-        info = cloud.device_info(self._uuid)
+
+        info = None
+        if self._prefetched is not None:
+            info = self._prefetched.get(self._uuid)
+
+        if info is None:
+            info = cloud.device_info(self._uuid)
 
         if self._sensorgraph is not None:
             if info['sg'] != self._sensorgraph:
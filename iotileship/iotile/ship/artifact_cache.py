@@ -0,0 +1,249 @@
+"""A content addressed cache of files used by recipes.
+
+Running the same recipe for many devices would otherwise read and parse
+the same ota scripts and firmware images once per device and unpack the
+same .ship archive every time it is loaded.  ArtifactCache keeps the
+contents of each file, and anything parsed from it, keyed by a hash of the
+file contents so that this work is done once no matter how many times a
+recipe is prepared.
+"""
+
+from __future__ import (unicode_literals, print_function, absolute_import)
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from iotile.core.exceptions import ArgumentError
+from iotile.core.utilities.paths import settings_directory
+
+
+class ArtifactCache(object):
+    """A thread-safe cache of file contents keyed by their sha256 hash.
+
+    Files are only hashed again if their size or modification time
+    changes, so repeated lookups of the same path do not touch the file
+    contents.  Only the `max_entries` most recently used file contents, and
+    anything parsed from them, are kept.
+
+    Args:
+        max_entries (int): The maximum number of distinct file contents to
+            keep in the cache.
+    """
+
+    DEFAULT_MAX_ENTRIES = 32
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ArgumentError("An artifact cache must be able to hold at least one file", max_entries=max_entries)
+
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._digests = {}
+        self._paths = {}
+        self._contents = OrderedDict()
+        self._parsed = {}
+
+    def digest(self, path):
+        """Get the sha256 hash of a file's contents.
+
+        Args:
+            path (str): The path to the file.
+
+        Returns:
+            str: The hex encoded hash of the file.
+        """
+
+        return self._fetch(path)[0]
+
+    def load(self, path):
+        """Get the contents of a file.
+
+        Args:
+            path (str): The path to the file.
+
+        Returns:
+            bytes: The contents of the file.
+        """
+
+        return self._fetch(path)[1]
+
+    def get(self, path, parser):
+        """Get an object parsed from the contents of a file.
+
+        The parser is only called the first time a given file content is
+        requested, afterwards the same object is returned, so it must not
+        be modified by whoever uses it.
+
+        Args:
+            path (str): The path to the file.
+            parser (callable): A function that takes the contents of the
+                file as bytes and returns the parsed object.
+
+        Returns:
+            object: The parsed object.
+        """
+
+        digest, data = self._fetch(path)
+
+        with self._lock:
+            parsed = self._parsed.get(digest, {})
+            if parser in parsed:
+                return parsed[parser]
+
+        value = parser(data)
+
+        with self._lock:
+            # The contents may have been evicted while we were parsing them
+            if digest not in self._contents:
+                return value
+
+            return self._parsed.setdefault(digest, {}).setdefault(parser, value)
+
+    def prefetch(self, paths):
+        """Load a list of files into the cache.
+
+        Args:
+            paths (list of str): The files to load.
+        """
+
+        for path in paths:
+            self._fetch(path)
+
+    def _fetch(self, path):
+        path = os.path.abspath(path)
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise ArgumentError("Could not find file used by recipe", path=path)
+
+        stamp = (stat.st_size, stat.st_mtime)
+
+        with self._lock:
+            known = self._digests.get(path)
+            if known is not None and known[0] == stamp and known[1] in self._contents:
+                digest = known[1]
+                self._touch(digest)
+                return digest, self._contents[digest]
+
+        with open(path, "rb") as infile:
+            data = infile.read()
+
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            self._forget_path(path)
+            self._digests[path] = (stamp, digest)
+            self._paths.setdefault(digest, set()).add(path)
+
+            if digest in self._contents:
+                data = self._contents[digest]
+                self._touch(digest)
+            else:
+                self._contents[digest] = data
+                self._evict()
+
+        return digest, data
+
+    def _touch(self, digest):
+        """Mark a cached file content as the most recently used."""
+
+        self._contents[digest] = self._contents.pop(digest)
+
+    def _forget_path(self, path):
+        known = self._digests.pop(path, None)
+        if known is None:
+            return
+
+        paths = self._paths.get(known[1])
+        if paths is not None:
+            paths.discard(path)
+
+    def _evict(self):
+        """Drop the least recently used contents until we are under our limit."""
+
+        while len(self._contents) > self.max_entries:
+            digest, _data = self._contents.popitem(last=False)
+            self._parsed.pop(digest, None)
+
+            for path in self._paths.pop(digest, ()):
+                self._digests.pop(path, None)
+
+
+def hash_file(path):
+    """Compute the sha256 hash of a file by memory mapping it.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        str: The hex encoded hash of the file.
+    """
+
+    hasher = hashlib.sha256()
+
+    with open(path, "rb") as infile:
+        if os.fstat(infile.fileno()).st_size > 0:
+            mapped = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                hasher.update(mapped)
+            finally:
+                mapped.close()
+
+    return hasher.hexdigest()
+
+
+def extract_archive(path, name, folder=None):
+    """Extract a .ship archive into a folder named by its contents.
+
+    Archives with the same contents are only ever extracted once, later
+    calls return the existing folder.
+
+    Args:
+        path (str): The path to the .ship archive.
+        name (str): The name of the recipe inside the archive.
+        folder (str): Optional folder to extract archives into.  By default
+            they are extracted into the per user iotile settings directory.
+
+    Returns:
+        str: The folder containing the extracted archive.
+    """
+
+    if folder is None:
+        folder = os.path.join(settings_directory(), 'ship_archives')
+
+    digest_folder = os.path.join(folder, hash_file(path))
+    extract_path = os.path.join(digest_folder, name)
+
+    if os.path.isdir(extract_path):
+        return extract_path
+
+    if not os.path.isdir(digest_folder):
+        try:
+            os.makedirs(digest_folder)
+        except OSError:
+            if not os.path.isdir(digest_folder):
+                raise
+
+    # Extract into a private folder first so that no one can see a partially
+    # extracted archive
+    temp_path = tempfile.mkdtemp(dir=digest_folder)
+
+    try:
+        with zipfile.ZipFile(path, "r") as archive:
+            archive.extractall(temp_path)
+
+        os.rename(temp_path, extract_path)
+    except OSError:
+        if not os.path.isdir(extract_path):
+            raise
+    finally:
+        if os.path.isdir(temp_path):
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    return extract_path
@@ -5,17 +5,21 @@ from string import Template
 import re
 import os
 import sys
-import zipfile
 import tempfile
+import zipfile
+import threading
+from queue import Queue
 from future.utils import viewitems, viewvalues, raise_
 from past.builtins import basestring
 from iotile.core.exceptions import ArgumentError, ValidationError
 from .exceptions import RecipeFileInvalid, UnknownRecipeActionType, RecipeVariableNotPassed, UnknownRecipeResourceType, RecipeResourceManagementError
 from .recipe_format import RecipeSchema
+from .artifact_cache import ArtifactCache, extract_archive
 
 ResourceDeclaration = namedtuple("ResourceDeclaration", ["name", "type", "args", "autocreate", "description", "type_name"])
 ResourceUsage = namedtuple("ResourceUsage", ["used", "opened", "closed"])
 RecipeStep = namedtuple("RecipeStep", ["factory", "args", "resources", "fixed_files"])
+DeviceRunResult = namedtuple("DeviceRunResult", ["variables", "success", "error", "step_times", "runtime"])
 
 TEMPLATE_REGEX = r"((?<!\$)|(\$\$)+)\$({(?P<long_id>[a-zA-Z_]\w*)}|(?P<short_id>[a-zA-Z_]\w*))"
 
@@ -43,9 +47,17 @@ class RecipeObject(object):
             values that should be used if not set during a run.
         path (str): The path to the original yaml file that this recipe was loaded
             from.
+        dependencies (list of list of int): An optional list with the indices of
+            earlier steps that each step explicitly depends on.
+        concurrent (bool): Whether steps that do not depend on each other may
+            run at the same time.  Steps depend on the steps listed in
+            dependencies and on every earlier step that uses, opens or closes
+            one of the same shared resources.  If False, every step depends on
+            the step before it and steps run one at a time in order.
     """
 
-    def __init__(self, name, description=None, steps=None, resources=None, defaults=None, path=None):
+    def __init__(self, name, description=None, steps=None, resources=None, defaults=None, path=None,
+                 dependencies=None, concurrent=False):
         if steps is None:
             steps = []
 
@@ -62,12 +74,17 @@ class RecipeObject(object):
         self.resources = resources
         self.defaults = defaults
         self.path = path
+        self.artifacts = ArtifactCache()
 
         if path is not None:
             self.run_directory = os.path.dirname(path)
         else:
             self.run_directory = os.getcwd()
 
+        # Where run() executes the recipe.  This is only different from
+        # run_directory when the recipe files are shared with other loads.
+        self.working_directory = self.run_directory
+
         self.free_variables = set()
         self.external_files = False
 
@@ -86,6 +103,38 @@ class RecipeObject(object):
         self.required_variables = self.free_variables - default_names
         self.optional_variables = self.free_variables - self.required_variables
 
+        self.concurrent = concurrent
+        self.step_dependencies = self._build_step_graph(dependencies)
+
+    def _build_step_graph(self, dependencies):
+        """Find the earlier steps that each step must wait for."""
+
+        if dependencies is None:
+            dependencies = [[] for _step in self.steps]
+
+        if len(dependencies) != len(self.steps):
+            raise ArgumentError("There must be a list of dependencies for each step", steps=len(self.steps), dependencies=len(dependencies))
+
+        if not self.concurrent:
+            return [set([i - 1]) if i > 0 else set() for i in range(len(self.steps))]
+
+        graph = []
+        step_resources = []
+        for i, (_factory, _args, resources, _files) in enumerate(self.steps):
+            touched = set(viewvalues(resources.used)) | set(resources.opened) | set(resources.closed)
+            deps = set(dependencies[i])
+
+            if any(x < 0 or x >= i for x in deps):
+                raise ArgumentError("Steps may only depend on earlier steps", step=i, dependencies=sorted(deps))
+
+            # Steps that share a resource run in the order they are declared
+            deps.update(j for j, other in enumerate(step_resources) if other & touched)
+
+            graph.append(deps)
+            step_resources.append(touched)
+
+        return graph
+
     def archive(self, output_path):
         """Archive this recipe and all associated files into a .ship archive.
 
@@ -136,8 +185,11 @@ class RecipeObject(object):
             file_format (str): The file format of the recipe file.  Currently
                 we only support yaml.
             temp_dir (str): An optional temporary directory where this archive
-                should be unpacked. Otherwise a system wide temporary directory
-                is used.
+                should be unpacked. Otherwise the archive is unpacked once into
+                a per user cache folder named by a hash of its contents and
+                reused every time the same archive is loaded.  In that case
+                the recipe runs in a new temporary working directory so that
+                files written by one run never change the shared folder.
         """
 
         if not path.endswith(".ship"):
@@ -146,14 +198,19 @@ class RecipeObject(object):
         name = os.path.basename(path)[:-5]
 
         if temp_dir is None:
-            temp_dir = tempfile.mkdtemp()
-
-        extract_path = os.path.join(temp_dir, name)
-        archive = zipfile.ZipFile(path, "r")
-        archive.extractall(extract_path)
+            extract_path = extract_archive(path, name)
+        else:
+            extract_path = os.path.join(temp_dir, name)
+            archive = zipfile.ZipFile(path, "r")
+            archive.extractall(extract_path)
 
         recipe_yaml = os.path.join(extract_path, 'recipe_script.yaml')
-        return cls.FromFile(recipe_yaml, actions_dict, resources_dict, name=name)
+        recipe = cls.FromFile(recipe_yaml, actions_dict, resources_dict, name=name)
+
+        if temp_dir is None:
+            recipe.working_directory = tempfile.mkdtemp(prefix=name + '_')
+
+        return recipe
 
     @classmethod
     def FromFile(cls, path, actions_dict, resources_dict, file_format="yaml", name=None):
@@ -203,12 +260,16 @@ class RecipeObject(object):
             defaults = cls._parse_variable_defaults(recipe_info.get("defaults", []))
 
             steps = []
+            step_ids = {}
+            dependencies = []
             for i, action in enumerate(recipe_info.get('actions', [])):
                 action_name = action.pop('name')
                 if action_name is None:
                     raise RecipeFileInvalid("Action is missing required name parameter", \
                         parameters=action, path=path)
 
+                dependencies.append(cls._parse_step_dependencies(action, step_ids, i))
+
                 action_class = actions_dict.get(action_name)
                 if action_class is None:
                     raise UnknownRecipeActionType("Unknown step specified in recipe", \
@@ -222,7 +283,8 @@ class RecipeObject(object):
                 step = RecipeStep(action_class, action, step_resources, fixed_files)
                 steps.append(step)
 
-            return RecipeObject(name, description, steps, resources, defaults, path)
+            return RecipeObject(name, description, steps, resources, defaults, path,
+                                dependencies=dependencies, concurrent=recipe_info.get('concurrent', False))
         except RecipeFileInvalid as exc:
             raise_(RecipeFileInvalid, RecipeFileInvalid(exc.msg, recipe=name, **exc.params), sys.exc_info()[2])
 
@@ -249,6 +311,28 @@ class RecipeObject(object):
 
         return fixed_files, variable_files
 
+    @classmethod
+    def _parse_step_dependencies(cls, action_dict, step_ids, index):
+        """Parse out the id of a step and the earlier steps it depends on."""
+
+        step_id = action_dict.pop('id', None)
+        depends = action_dict.pop('depends', [])
+
+        dependencies = []
+        for dep in (x.strip() for x in depends):
+            if dep not in step_ids:
+                raise RecipeFileInvalid("Action depends on a step id that is not declared by an earlier step", depends=dep, step=index + 1, known_ids=sorted(step_ids))
+
+            dependencies.append(step_ids[dep])
+
+        if step_id is not None:
+            if step_id in step_ids:
+                raise RecipeFileInvalid("Attempted to add two steps with the same id", id=step_id)
+
+            step_ids[step_id] = index
+
+        return dependencies
+
     @classmethod
     def _parse_resource_declarations(cls, declarations, resource_map):
         """Parse out what resources are declared as shared for this recipe."""
@@ -345,13 +429,36 @@ class RecipeObject(object):
             info = yaml.load(infile)
             return info
 
-    def prepare(self, variables):
+    def prepare(self, variables, base_dir=None, prefetched=None):
         """Initialize all steps in this recipe using their parameters.
 
         Args:
             variables (dict): A dictionary of global variable definitions
                 that may be used to replace or augment the parameters given
                 to each step.
+            base_dir (str): An optional directory that relative paths used by
+                each step should be resolved against.  If not passed, they are
+                left as is and are relative to the current working directory
+                when the step runs.
+            prefetched (dict): An optional map of step index to the data that
+                step's PrefetchFleet() returned for a whole fleet run.
+
+        Steps that set CACHES_FILES = True are passed self.artifacts as an
+        artifacts keyword argument so they can reuse file contents and
+        anything parsed from them no matter how many times the recipe is
+        prepared.  Files that those steps list in FILES without any
+        variables are the same for every run, so they are loaded into the
+        cache here.  Files that depend on variables are only loaded if and
+        when the step asks for them.
+
+        Relative file arguments listed in a step's FILES are resolved against
+        base_dir.  Steps that use relative paths in other ways, for example
+        by running external commands, can set USES_BASE_DIR = True to be
+        passed base_dir as a keyword argument.
+
+        Steps that set PREFETCHES_FLEET = True are passed whatever their
+        PrefetchFleet() returned as a prefetched keyword argument, or None
+        if nothing was prefetched.
 
         Returns:
             list of RecipeActionObject like instances: The list of instantiated
@@ -360,32 +467,111 @@ class RecipeObject(object):
         initializedsteps = []
         if variables is None:
             variables = dict()
-        for step, params, _resources, _files in self.steps:
+        if prefetched is None:
+            prefetched = {}
+        for i, (step, params, _resources, fixed_files) in enumerate(self.steps):
             new_params = _complete_parameters(params, variables)
-            initializedsteps.append(step(new_params))
+            caches_files = getattr(step, 'CACHES_FILES', False)
+            step_kwargs = {}
+
+            for file_arg, file_path in _resolve_files(step, new_params, base_dir):
+                # Missing files are reported by the step itself
+                if caches_files and file_arg in fixed_files and os.path.isfile(file_path):
+                    self.artifacts.prefetch([file_path])
+
+            if caches_files:
+                step_kwargs['artifacts'] = self.artifacts
+
+            if getattr(step, 'USES_BASE_DIR', False):
+                step_kwargs['base_dir'] = base_dir
+
+            if getattr(step, 'PREFETCHES_FLEET', False):
+                step_kwargs['prefetched'] = prefetched.get(i)
+
+            initializedsteps.append(step(new_params, **step_kwargs))
         return initializedsteps
 
-    def _prepare_resources(self, variables, overrides=None):
-        """Create and optionally open all shared resources."""
+    def _prefetch_fleet(self, variables, variable_sets):
+        """Let steps query what they need for every device at once.
+
+        Each step that sets PREFETCHES_FLEET = True has its PrefetchFleet()
+        classmethod called with the list of its parameters for every device.
+        Prefetching is only an optimization, so devices whose parameters
+        cannot be completed are left out and a step whose prefetch fails
+        gets nothing; each device then reports its own errors when it runs.
+
+        Returns:
+            dict: A map of step index to the data that step prefetched.
+        """
+
+        prefetched = {}
+
+        for i, (step, params, _resources, _files) in enumerate(self.steps):
+            if not getattr(step, 'PREFETCHES_FLEET', False):
+                continue
+
+            step_params = []
+            for device_vars in variable_sets:
+                run_vars = dict(variables)
+                run_vars.update(device_vars)
+
+                try:
+                    step_params.append(_complete_parameters(params, run_vars))
+                except RecipeVariableNotPassed:
+                    continue
+
+            try:
+                prefetched[i] = step.PrefetchFleet(step_params)
+            except Exception:  #pylint:disable=broad-except;Devices report their own errors when they run
+                continue
+
+        return prefetched
+
+    def _prepare_resources(self, variables, overrides=None, names=None, base_dir=None):
+        """Create and optionally open all shared resources.
+
+        If names is passed, only the resources with those names are
+        created.  Relative file arguments listed in a resource type's FILES
+        are resolved against base_dir, just like for steps in prepare().
+
+        If creating or opening any resource fails, the resources that were
+        already created here are closed again before the error is raised.
+        """
 
         if overrides is None:
             overrides = {}
 
         res_map = {}
         own_map = {}
+        completed = False
+
+        try:
+            for decl in viewvalues(self.resources):
+                if names is not None and decl.name not in names:
+                    continue
 
-        for decl in viewvalues(self.resources):
-            resource = overrides.get(decl.name)
+                resource = overrides.get(decl.name)
 
-            if resource is None:
-                args = _complete_parameters(decl.args, variables)
-                resource = decl.type(args)
-                own_map[decl.name] = resource
+                if resource is None:
+                    args = _complete_parameters(decl.args, variables)
+                    _resolve_files(decl.type, args, base_dir)
+                    resource = decl.type(args)
+                    own_map[decl.name] = resource
 
-            if decl.autocreate:
-                resource.open()
+                if decl.autocreate:
+                    resource.open()
 
-            res_map[decl.name] = resource
+                res_map[decl.name] = resource
+
+            completed = True
+        finally:
+            if not completed:
+                try:
+                    self._cleanup_resources(own_map)
+                except RecipeResourceManagementError:
+                    # The error that stopped us from preparing resources is
+                    # more useful to the caller than any cleanup errors.
+                    pass
 
         return res_map, own_map
 
@@ -429,29 +615,231 @@ class RecipeObject(object):
 
         old_dir = os.getcwd()
         try:
-            os.chdir(self.run_directory)
+            os.chdir(self.working_directory)
+
+            base_dir = None
+            if self.working_directory != self.run_directory:
+                base_dir = self.run_directory
 
-            initialized_steps = self.prepare(variables)
+            initialized_steps = self.prepare(variables, base_dir=base_dir)
             owned_resources = {}
 
             try:
-                print("Running in %s" % self.run_directory)
-                initialized_resources, owned_resources = self._prepare_resources(variables, overrides)
+                print("Running in %s" % self.working_directory)
+                initialized_resources, owned_resources = self._prepare_resources(variables, overrides, base_dir=base_dir)
 
-                for i, (step, decl) in enumerate(zip(initialized_steps, self.steps)):
+                def _on_start(i):
                     print("===> Step %d: %s\t Description: %s" % (i+1, self.steps[i][0].__name__, \
                         self.steps[i][1].get('description', '')))
 
-                    runtime, out = _run_step(step, decl, initialized_resources)
+                def _on_finish(i, runtime, out):
+                    if self.concurrent:
+                        print("======> Step %d Time Elapsed: %.2f seconds" % (i+1, runtime))
+                    else:
+                        print("======> Time Elapsed: %.2f seconds" % runtime)
 
-                    print("======> Time Elapsed: %.2f seconds" % runtime)
                     if out is not None:
                         print(out[1])
+
+                self._run_steps(initialized_steps, initialized_resources, _on_start, _on_finish)
             finally:
                 self._cleanup_resources(owned_resources)
         finally:
             os.chdir(old_dir)
 
+    def run_fleet(self, variable_sets, max_workers=4, variables=None, shared=None, overrides=None):
+        """Run this recipe against many devices concurrently.
+
+        Each entry in variable_sets is one device and defines the variables
+        for that run, on top of any common variables.  Runs are spread over
+        a bounded pool of worker threads.  Unlike run(), this function never
+        changes the current working directory.  Instead, relative paths are
+        resolved against the recipe's run_directory: file arguments of steps
+        and resources are made absolute and steps that set USES_BASE_DIR
+        are told the directory.  Nothing is printed.  A failure on one device does not stop the others.
+
+        Resources named in shared, as well as any resources passed in
+        overrides, are prepared once with the common variables and then
+        used concurrently by every device, so they must be safe to share
+        and may not be opened or closed by individual steps.  All other
+        resources are created separately for each device.
+
+        Before any device runs, steps that set PREFETCHES_FLEET = True can
+        query what they need for all devices at once, for example the cloud
+        information of every device in one bulk request.
+
+        Args:
+            variable_sets (list of dict): The variables for each device.
+            max_workers (int): The maximum number of devices to run at once.
+            variables (dict): Optional variables common to all devices.
+            shared (list of str): Optional names of resources to share
+                between all devices.
+            overrides (dict): An optional dictionary of preinitialized
+                shared resource objects, as in run().
+
+        Returns:
+            list of DeviceRunResult: The result of each run in the same order
+                as variable_sets.  step_times is a list of (step name, seconds)
+                tuples for each step that finished and error is the exception
+                that stopped the run or None if it succeeded.
+        """
+
+        if max_workers < 1:
+            raise ArgumentError("You must allow at least one worker", max_workers=max_workers)
+
+        if variables is None:
+            variables = {}
+
+        if overrides is None:
+            overrides = {}
+
+        shared_names = set(overrides)
+        if shared is not None:
+            shared_names.update(shared)
+
+        unknown = shared_names - set(self.resources)
+        if len(unknown) > 0:
+            raise ArgumentError("Unknown shared resources specified", unknown=sorted(unknown), declared=sorted(self.resources))
+
+        for _factory, args, resources, _files in self.steps:
+            managed = shared_names.intersection(resources.opened, resources.closed)
+            if len(managed) > 0:
+                raise ArgumentError("Resources opened or closed by a step cannot be shared between devices", resources=sorted(managed), step=args.get('description'))
+
+        variable_sets = list(variable_sets)
+        results = [None]*len(variable_sets)
+        device_names = set(self.resources) - shared_names
+
+        prefetched = self._prefetch_fleet(variables, variable_sets)
+        shared_resources, owned_shared = self._prepare_resources(variables, overrides, names=shared_names,
+                                                                 base_dir=self.run_directory)
+
+        try:
+            work = Queue()
+            for i, device_vars in enumerate(variable_sets):
+                work.put((i, device_vars))
+
+            def _worker():
+                while True:
+                    i, device_vars = work.get()
+                    if i is None:
+                        break
+
+                    run_vars = dict(variables)
+                    run_vars.update(device_vars)
+                    results[i] = self._run_device(run_vars, shared_resources, device_names, prefetched)
+
+            workers = []
+            for _i in range(min(max_workers, len(variable_sets))):
+                work.put((None, None))
+                worker = threading.Thread(target=_worker)
+                worker.daemon = True
+                worker.start()
+                workers.append(worker)
+
+            for worker in workers:
+                worker.join()
+        finally:
+            self._cleanup_resources(owned_shared)
+
+        return results
+
+    def _run_device(self, variables, shared_resources, resource_names, prefetched=None):
+        """Run all steps for a single device in run_fleet()."""
+
+        start_time = time.time()
+        step_times = [None]*len(self.steps)
+        error = None
+        owned_resources = {}
+
+        try:
+            initialized_steps = self.prepare(variables, base_dir=self.run_directory, prefetched=prefetched)
+            initialized_resources, owned_resources = self._prepare_resources(variables, names=resource_names,
+                                                                             base_dir=self.run_directory)
+            initialized_resources.update(shared_resources)
+
+            def _on_finish(i, runtime, _out):
+                step_times[i] = (self.steps[i].factory.__name__, runtime)
+
+            self._run_steps(initialized_steps, initialized_resources, lambda i: None, _on_finish)
+        except Exception:  #pylint:disable=broad-except;Failures are reported per device
+            error = sys.exc_info()[1]
+
+        try:
+            self._cleanup_resources(owned_resources)
+        except RecipeResourceManagementError:
+            if error is None:
+                error = sys.exc_info()[1]
+
+        step_times = [x for x in step_times if x is not None]
+        return DeviceRunResult(variables, error is None, error, step_times, time.time() - start_time)
+
+    def _run_steps(self, initialized_steps, initialized_resources, on_start, on_finish):
+        """Run all steps, concurrently where allowed by step_dependencies.
+
+        on_start(index) is called just before a step starts and
+        on_finish(index, runtime, output) after it finishes, both from the
+        calling thread.  If a step fails, no more steps are started and the
+        first error is reraised once all running steps have finished.
+        """
+
+        if not self.concurrent:
+            for i, (step, decl) in enumerate(zip(initialized_steps, self.steps)):
+                on_start(i)
+                runtime, out = _run_step(step, decl, initialized_resources)
+                on_finish(i, runtime, out)
+
+            return
+
+        remaining = [set(x) for x in self.step_dependencies]
+        dependents = [[] for _step in self.steps]
+        for i, deps in enumerate(remaining):
+            for dep in deps:
+                dependents[dep].append(i)
+
+        finished = Queue()
+
+        def _step_thread(i):
+            try:
+                finished.put((i, _run_step(initialized_steps[i], self.steps[i], initialized_resources), None))
+            except BaseException:  #pylint:disable=broad-except;The error is reraised in the calling thread
+                finished.put((i, None, sys.exc_info()))
+
+        ready = [i for i, deps in enumerate(remaining) if len(deps) == 0]
+        running = 0
+        failure = None
+
+        while True:
+            if failure is None:
+                for i in ready:
+                    on_start(i)
+                    step_thread = threading.Thread(target=_step_thread, args=(i,))
+                    step_thread.daemon = True
+                    step_thread.start()
+                    running += 1
+
+            ready = []
+            if running == 0:
+                break
+
+            i, result, exc_info = finished.get()
+            running -= 1
+
+            if exc_info is not None:
+                if failure is None:
+                    failure = exc_info
+                continue
+
+            on_finish(i, *result)
+
+            for dependent in dependents[i]:
+                remaining[dependent].discard(i)
+                if len(remaining[dependent]) == 0:
+                    ready.append(dependent)
+
+        if failure is not None:
+            raise_(failure[0], failure[1], failure[2])
+
     def __str__(self):
         output_string = "========================================\n"
         output_string += "Recipe: \t%s\n" % (self.name)
@@ -493,6 +881,31 @@ def _complete_parameters(param, variables):
     return param
 
 
+def _resolve_files(factory, params, base_dir):
+    """Make the relative file arguments of a step or resource absolute.
+
+    The arguments listed in factory.FILES are updated in params in place.
+
+    Returns:
+        list of (str, str): The name and path of each file argument.
+    """
+
+    files = []
+
+    for file_arg in getattr(factory, 'FILES', []):
+        file_path = params.get(file_arg)
+        if not isinstance(file_path, basestring):
+            continue
+
+        if base_dir is not None and not os.path.isabs(file_path):
+            file_path = os.path.normpath(os.path.join(base_dir, file_path))
+            params[file_arg] = file_path
+
+        files.append((file_arg, file_path))
+
+    return files
+
+
 def _extract_variables(param):
     """Find all template variables in args."""
 
@@ -10,6 +10,8 @@ ActionItem.add_optional("description", StringVerifier("A short description for w
 ActionItem.add_optional("use", ListVerifier(StringVerifier("The name of a resource"), desc="A list of used resources"))
 ActionItem.add_optional("open_before", ListVerifier(StringVerifier("The name of a resource"), desc="A list of resources to open before this step"))
 ActionItem.add_optional("close_after", ListVerifier(StringVerifier("The name of a resource"), desc="A list of resources to close after this step"))
+ActionItem.add_optional("id", StringVerifier("A unique name for this step so that other steps can depend on it"))
+ActionItem.add_optional("depends", ListVerifier(StringVerifier("The id of an earlier step"), desc="A list of steps that must finish before this step in a concurrent recipe"))
 ActionItem.key_rule(None, Verifier("A parameter passed into the underlying action"))  # Allow any additional values
 
 ResourceItem = DictionaryVerifier(desc="A shared resource that can be used by one or more action steps")
@@ -25,6 +27,7 @@ RecipeSchema = DictionaryVerifier(desc="A recipe containing a list of actions")
 RecipeSchema.add_optional("name", StringVerifier("A descriptive name for this recipe"))
 RecipeSchema.add_required("description", StringVerifier("A description of what the recipe does"))
 RecipeSchema.add_optional("idempotent", BooleanVerifier(desc="Whether the recipe can be run multiple times without breaking"))
+RecipeSchema.add_optional("concurrent", BooleanVerifier(desc="Whether steps that do not depend on each other may run at the same time"))
 RecipeSchema.add_required("actions", ListVerifier(ActionItem.clone(), min_length=1, desc="A list of steps to perform to realize this recipe"))
 RecipeSchema.add_optional("resources", ListVerifier(ResourceItem.clone(), desc="An optional list of shared resources to setup"))
 RecipeSchema.add_optional("defaults", ListVerifier(VariableDefault.clone(), desc="An optional list of default values for free recipe variables"))
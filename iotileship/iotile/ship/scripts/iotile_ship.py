@@ -25,6 +25,9 @@ def build_args():
     parser.add_argument('-i', '--info', action='store_true', help="Lists out all the steps of that recipe, doesn't run the recipe steps")
     parser.add_argument('-a', '--archive', help="Archive the passed yaml recipe and do not run it")
     parser.add_argument('-c', '--config', default=None, help="A YAML config file with variable definitions")
+    parser.add_argument('-f', '--fleet', default=None, help="A YAML file with a list of variable definitions, run the recipe once for each entry concurrently")
+    parser.add_argument('-j', '--workers', type=int, default=4, help="The maximum number of concurrent runs with --fleet")
+    parser.add_argument('-s', '--shared', action="append", default=[], help="A resource to share between all concurrent runs with --fleet")
 
     return parser
 
@@ -97,6 +100,35 @@ def main(argv=None):
 
     start_time = time.time()
 
+    if args.fleet is not None:
+        with open(args.fleet, "rb") as fleet_file:
+            variable_sets = yaml.load(fleet_file)
+
+        if not isinstance(variable_sets, list):
+            print("Invalid fleet file, expected a list of variable definitions")
+            return 1
+
+        try:
+            results = recipe.run_fleet(variable_sets, max_workers=args.workers, variables=variables, shared=args.shared)
+        except IOTileException as exc:
+            print("Error running recipe: %s" % str(exc))
+            return 1
+
+        for i, result in enumerate(results):
+            status = "OK" if result.success else "ERROR: %s" % str(result.error)
+            print("===> Run %d: %s (%.2f seconds)" % (i + 1, status, result.runtime))
+            for step_name, runtime in result.step_times:
+                print("======> %s: %.2f seconds" % (step_name, runtime))
+
+        success = sum(1 for x in results if x.success)
+        end_time = time.time()
+        print("Performed %d of %d runs successfully in %.1f seconds" % (success, len(results), end_time - start_time))
+
+        if success != len(results):
+            return 1
+
+        return 0
+
     if args.loop is None:
         try:
             recipe.run(variables)
@@ -0,0 +1,148 @@
+"""Make sure recipe files and archives are cached by content."""
+
+from __future__ import unicode_literals, absolute_import
+import os
+import pytest
+from iotile.ship import RecipeManager
+from iotile.ship.recipe import RecipeObject
+from iotile.core.hw.update import UpdateScript
+from iotile.core.hw.update.records import SendRPCRecord
+from iotile.ship.artifact_cache import ArtifactCache, extract_archive, hash_file
+from iotile.core.exceptions import ArgumentError
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'test_recipe_manager')
+
+
+def test_artifact_cache(tmpdir):
+    """Make sure files are read and parsed once per content."""
+
+    path = tmpdir.join('script.bin')
+    path.write_binary(b'abc')
+
+    cache = ArtifactCache()
+    calls = []
+
+    def _parser(data):
+        calls.append(data)
+        return bytearray(data)
+
+    assert cache.load(str(path)) == b'abc'
+    assert cache.digest(str(path)) == hash_file(str(path))
+
+    first = cache.get(str(path), _parser)
+    assert cache.get(str(path), _parser) is first
+    assert calls == [b'abc']
+
+    path.write_binary(b'abcd')
+    os.utime(str(path), (0, 0))
+    assert cache.get(str(path), _parser) == b'abcd'
+    assert calls == [b'abc', b'abcd']
+
+    with pytest.raises(ArgumentError):
+        cache.load(str(tmpdir.join('missing.bin')))
+
+
+def test_extract_archive_once(tmpdir):
+    """Make sure the same archive is only extracted once."""
+
+    archive = os.path.join(DATA_DIR, 'test_recipes', 'archived_ota.ship')
+
+    first = extract_archive(archive, 'archived_ota', folder=str(tmpdir))
+    assert os.path.isfile(os.path.join(first, 'recipe_script.yaml'))
+
+    os.remove(os.path.join(first, 'recipe_script.yaml'))
+    second = extract_archive(archive, 'archived_ota', folder=str(tmpdir))
+    assert second == first
+    assert os.listdir(os.path.dirname(first)) == ['archived_ota']
+
+
+def test_prepare_reuses_files():
+    """Make sure preparing a recipe many times only parses its files once."""
+
+    man = RecipeManager()
+    man.add_recipe_folder(os.path.join(DATA_DIR, 'test_recipes'))
+    recipe = man.get_recipe('test_hardware_manager_resource')
+
+    first, = recipe.prepare({}, base_dir=recipe.run_directory)
+    second, = recipe.prepare({}, base_dir=recipe.run_directory)
+
+    assert first._script is second._script
+    assert recipe.artifacts.load(first._file) == recipe.artifacts.load(second._file)
+
+
+def test_artifact_cache_bounded(tmpdir):
+    """Make sure only the most recently used file contents are kept."""
+
+    paths = []
+    for i in range(0, 3):
+        path = tmpdir.join('file%d.bin' % i)
+        path.write_binary(b'contents %d' % i)
+        paths.append(str(path))
+
+    cache = ArtifactCache(max_entries=2)
+    calls = []
+
+    def _parser(data):
+        calls.append(data)
+        return data
+
+    cache.get(paths[0], _parser)
+    cache.get(paths[1], _parser)
+    cache.get(paths[0], _parser)
+    assert len(calls) == 2
+
+    # Loading a third file evicts the least recently used one, file1
+    cache.get(paths[2], _parser)
+    assert len(cache._contents) == 2
+    assert len(cache._digests) == 2
+
+    cache.get(paths[0], _parser)
+    assert len(calls) == 3
+
+    cache.get(paths[1], _parser)
+    assert calls == [b'contents 0', b'contents 1', b'contents 2', b'contents 1']
+
+    with pytest.raises(ArgumentError):
+        ArtifactCache(max_entries=0)
+
+
+def test_prepare_per_device_files(tmpdir):
+    """Make sure per device files do not grow the cache without bound."""
+
+    man = RecipeManager()
+    man.add_recipe_folder(os.path.join(DATA_DIR, 'test_recipes'))
+
+    recipe_path = tmpdir.join('per_device.yaml')
+    recipe_path.write("""name: "per_device"
+description: "send a different script to each device"
+actions:
+  - name: "SendOTAScriptStep"
+    file: "${script}"
+""")
+
+    recipe = RecipeObject.FromFile(str(recipe_path), man._recipe_actions, man._recipe_resources)
+    for i in range(0, ArtifactCache.DEFAULT_MAX_ENTRIES + 8):
+        script_path = tmpdir.join('device_%d.trub' % i)
+        script_path.write_binary(bytes(UpdateScript([SendRPCRecord(8, 0x8000 + i)]).encode()))
+        recipe.prepare({'script': str(script_path)})
+
+    assert len(recipe.artifacts._contents) == ArtifactCache.DEFAULT_MAX_ENTRIES
+
+
+def test_archive_working_directory():
+    """Make sure each load of a cached archive runs in its own directory."""
+
+    folder = os.path.join(DATA_DIR, 'test_recipes')
+
+    first = RecipeManager()
+    first.add_recipe_folder(folder)
+    second = RecipeManager()
+    second.add_recipe_folder(folder)
+
+    recipe1 = first.get_recipe('archived_ota')
+    recipe2 = second.get_recipe('archived_ota')
+
+    assert recipe1.run_directory == recipe2.run_directory
+    assert recipe1.working_directory != recipe2.working_directory
+    assert recipe1.working_directory != recipe1.run_directory
+    assert os.listdir(recipe1.working_directory) == []
@@ -60,3 +60,16 @@ def test_config(exitcode):
     total_time  = time.time()-start_time
 
     assert retval == 0
+
+
+def test_fleet(exitcode, tmpdir):
+    """Make sure we can run a recipe for many devices at once."""
+
+    recipe = os.path.join(os.path.dirname(__file__), 'test_recipes', 'test_replace_recipe.yaml')
+    fleet = tmpdir.join('fleet.yaml')
+    fleet.write("- custom_wait_time: 0.1\n- custom_wait_time: 0.2\n")
+
+    assert main([recipe, '-f', str(fleet), '-j', '2']) == 0
+
+    fleet.write("- custom_wait_time: 0.1\n- {}\n")
+    assert main([recipe, '-f', str(fleet)]) == 1
@@ -1,8 +1,9 @@
 import os
 import time
+from collections import OrderedDict
 import pytest
 
-from iotile.ship.recipe import RecipeObject
+from iotile.ship.recipe import RecipeObject, RecipeStep, ResourceUsage, ResourceDeclaration
 from iotile.ship.recipe_manager import RecipeManager
 from iotile.ship.exceptions import RecipeVariableNotPassed
 from iotile.core.exceptions import ArgumentError
@@ -92,3 +93,198 @@ def test_hardware_manager_resource(resman):
 
     recipe = resman.get_recipe('test_hardware_manager_resource')
     recipe.run()
+
+
+def test_run_fleet(resman):
+    """Make sure we can run a recipe concurrently for many devices."""
+
+    recipe = resman.get_recipe('test_replace_recipe')
+    variable_sets = [{'custom_wait_time': 0.3} for _i in range(4)]
+    variable_sets.insert(2, {})
+
+    start_time = time.time()
+    results = recipe.run_fleet(variable_sets, max_workers=5)
+    run_time = time.time() - start_time
+
+    assert run_time < 0.9
+    assert len(results) == 5
+    assert [x.success for x in results] == [True, True, False, True, True]
+    assert isinstance(results[2].error, RecipeVariableNotPassed)
+    assert results[2].step_times == []
+
+    for result in results[:2] + results[3:]:
+        assert result.error is None
+        assert result.variables == {'custom_wait_time': 0.3}
+        assert len(result.step_times) == 1
+        assert result.step_times[0][0] == 'WaitStep'
+        assert result.step_times[0][1] >= 0.25
+
+
+def test_run_fleet_files(resman):
+    """Make sure fleet runs resolve files without changing directory."""
+
+    recipe = resman.get_recipe('test_hardware_manager_resource')
+
+    cwd = os.getcwd()
+    results = recipe.run_fleet([{}, {}], max_workers=2)
+
+    assert os.getcwd() == cwd
+    assert [x.success for x in results] == [True, True]
+
+    with pytest.raises(ArgumentError):
+        recipe.run_fleet([{}], shared=['unknown'])
+
+
+def test_concurrent_steps(resman):
+    """Make sure independent steps run at the same time."""
+
+    recipe = resman.get_recipe('test_concurrent_recipe')
+    assert recipe.step_dependencies == [set(), set(), {0}]
+
+    start_time = time.time()
+    recipe.run()
+    run_time = time.time() - start_time
+
+    assert run_time >= 0.55
+    assert run_time < 0.85
+
+    results = recipe.run_fleet([{}])
+    assert results[0].success
+    assert [x[0] for x in results[0].step_times] == ['WaitStep']*3
+
+
+class PrefetchingStep(object):
+    """A step that records which devices it was prefetched for."""
+
+    PREFETCHES_FLEET = True
+    prefetches = []
+
+    def __init__(self, args, prefetched=None):
+        self._uuid = args['uuid']
+        self._prefetched = prefetched
+
+    @classmethod
+    def PrefetchFleet(cls, step_args):
+        uuids = [args['uuid'] for args in step_args]
+        cls.prefetches.append(uuids)
+        return {uuid: 'info ' + uuid for uuid in uuids}
+
+    def run(self):
+        return self._prefetched[self._uuid]
+
+
+def test_run_fleet_prefetch():
+    """Make sure steps can prefetch what they need for a whole fleet at once."""
+
+    PrefetchingStep.prefetches = []
+
+    step = RecipeStep(PrefetchingStep, {'uuid': '${uuid}'}, ResourceUsage({}, [], []), set())
+    recipe = RecipeObject('prefetch_recipe', steps=[step], resources={})
+
+    results = recipe.run_fleet([{'uuid': '1'}, {}, {'uuid': '3'}], max_workers=2)
+    assert PrefetchingStep.prefetches == [['1', '3']]
+    assert [x.success for x in results] == [True, False, True]
+    assert isinstance(results[1].error, RecipeVariableNotPassed)
+
+
+class PathResource(object):
+    """A resource that records its file argument and can fail to open."""
+
+    FILES = ['path']
+
+    def __init__(self, args):
+        self.path = args['path']
+        self.fail = args.get('fail', False)
+        self.opened = False
+
+    def open(self):
+        if self.fail:
+            raise ArgumentError("Could not open resource")
+
+        self.opened = True
+
+    def close(self):
+        self.opened = False
+
+
+class BaseDirStep(object):
+    """A step that records the directory it was told to use."""
+
+    USES_BASE_DIR = True
+
+    def __init__(self, args, base_dir=None):
+        self.base_dir = base_dir
+
+    def run(self, resources):
+        return (self.base_dir, resources['res'].path)
+
+
+def _resource(name, args):
+    return ResourceDeclaration(name, PathResource, args, True, None, 'path_resource')
+
+
+def test_run_fleet_relative_paths(tmpdir):
+    """Make sure fleet runs resolve resource files and tell steps their directory."""
+
+    resources = OrderedDict([('res', _resource('res', {'path': 'data.bin'}))])
+    step = RecipeStep(BaseDirStep, {}, ResourceUsage({'res': 'res'}, [], []), set())
+    recipe = RecipeObject('relative_paths', steps=[step], resources=resources, path=str(tmpdir.join('recipe.yaml')))
+
+    results = recipe.run_fleet([{}], shared=['res'])
+    assert results[0].success
+
+    initialized, _owned = recipe._prepare_resources({}, base_dir=recipe.run_directory)
+    assert initialized['res'].path == str(tmpdir.join('data.bin'))
+
+    steps = recipe.prepare({}, base_dir=recipe.run_directory)
+    assert steps[0].run({'res': initialized['res']}) == (str(tmpdir), str(tmpdir.join('data.bin')))
+
+
+def test_prepare_resources_failure():
+    """Make sure resources are closed if a later one fails to open."""
+
+    resources = OrderedDict([
+        ('first', _resource('first', {'path': 'first.bin'})),
+        ('second', _resource('second', {'path': 'second.bin', 'fail': True}))
+    ])
+    recipe = RecipeObject('failing_resources', resources=resources)
+
+    opened = []
+    original_open = PathResource.open
+
+    def _open(self):
+        original_open(self)
+        opened.append(self)
+
+    PathResource.open = _open
+    try:
+        with pytest.raises(ArgumentError):
+            recipe._prepare_resources({})
+    finally:
+        PathResource.open = original_open
+
+    assert len(opened) == 1
+    assert opened[0].opened is False
+
+
+class AbortError(BaseException):
+    pass
+
+
+class AbortStep(object):
+    def __init__(self, args):
+        pass
+
+    def run(self):
+        raise AbortError()
+
+
+def test_concurrent_step_base_exception():
+    """Make sure exceptions that are not Exceptions still stop concurrent runs."""
+
+    step = RecipeStep(AbortStep, {}, ResourceUsage({}, [], []), set())
+    recipe = RecipeObject('abort_recipe', steps=[step, step], resources={}, concurrent=True)
+
+    with pytest.raises(AbortError):
+        recipe.run()
+
@@ -70,3 +70,18 @@ def test_resource_renaming():
 
     step = recipe.steps[0]
     assert step.resources.used['internal_hardware'] == 'hardware'
+
+
+def test_step_dependencies():
+    """Make sure we build the step graph from depends and resource usage."""
+
+    recipe = load_recipe('valid_recipe.yaml')
+    assert recipe.concurrent is False
+    assert recipe.step_dependencies == [set(), {0}]
+
+    recipe = load_recipe('concurrent_resources.yaml')
+    assert recipe.concurrent is True
+    assert recipe.step_dependencies == [set(), set(), {0}, {0, 2}]
+
+    with pytest.raises(RecipeFileInvalid):
+        load_recipe('unknown_depends.yaml')
@@ -1 +1 @@
-version = "0.1.5"
+version = "0.2.0"
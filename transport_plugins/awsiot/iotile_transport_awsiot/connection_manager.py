@@ -69,13 +69,15 @@ class ConnectionManager(threading.Thread):
     InProgress = 3
     Disconnecting = 4
 
-    def __init__(self, adapter_id):
+    def __init__(self, adapter_id, periodic_check=None):
         """Constructor.
 
         Args:
             adapter_id (int): Since the ConnectionManager responds to callbacks on behalf
                 of a DeviceAdapter, it needs to know what adapter_id to send with the
                 callbacks.
+            periodic_check (callable): An optional function to call every time we check
+                for timeouts, so that other timeouts can be driven by this thread.
         """
 
         super(ConnectionManager, self).__init__()
@@ -86,6 +88,7 @@ class ConnectionManager(threading.Thread):
         self._connections = {}
         self._int_connections = {}
         self._data_lock = threading.Lock()
+        self._periodic_check = periodic_check
 
         # Our thread should be a daemon so that we don't block exiting the program if we hang
         self.daemon = True
@@ -265,6 +268,12 @@ class ConnectionManager(threading.Thread):
         timeout.
         """
 
+        if self._periodic_check is not None:
+            try:
+                self._periodic_check()
+            except Exception:  #pylint:disable=broad-except;This must not stop the connection manager thread
+                self._logger.exception("Exception in periodic timeout check")
+
         for conn_id, data in viewitems(self._connections):
             if 'timeout' in data and data['timeout'].expired:
                 if data['state'] == self.Connecting:
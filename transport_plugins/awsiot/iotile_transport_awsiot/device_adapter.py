@@ -1,6 +1,5 @@
 import os
 import binascii
-import base64
 import datetime
 import logging
 import queue
@@ -10,6 +9,7 @@ from iotile.core.hw.transport.adapter import DeviceAdapter
 from iotile.core.hw.reports.parser import IOTileReportParser
 from iotile.core.dev.registry import ComponentRegistry
 from .mqtt_client import OrderedAWSIOTClient
+from .packet_encoding import SUPPORTED_ENCODINGS, JSON_ENCODING
 from .topic_validator import MQTTTopicValidator
 from .connection_manager import ConnectionManager
 from . import messages
@@ -61,9 +61,11 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
         self.client.connect(self.name)
         self.prefix = port
 
-        self.conns = ConnectionManager(self.id)
+        self.conns = ConnectionManager(self.id, periodic_check=self.client.check_timeouts)
         self.conns.start()
 
+        self._agent_encodings = {}
+        self._connecting = {}
         self.client.subscribe(self.prefix + 'devices/+/data/advertisement', self._on_advertisement, ordered=False)
 
         self._deferred = queue.Queue()
@@ -97,15 +99,31 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
         name = self.name
 
         conn_message = {'type': 'command', 'operation': 'connect', 'key': key, 'client': name}
-        context = {'key': key, 'slug': connection_string, 'topics': topics}
 
-        self.conns.begin_connection(connection_id, connection_string, callback, context, self.get_config('default_timeout'))
+        # Only offer other encodings to agents that advertised support for them
+        # since older agents reject connect commands with unknown keys.
+        if connection_string in self._agent_encodings:
+            conn_message['encodings'] = SUPPORTED_ENCODINGS
+        context = {'key': key, 'slug': connection_string, 'topics': topics, 'encoding': JSON_ENCODING}
 
+        def _on_finished(conn_id, adapter_id, success, failure_reason):
+            # Stop tracking the attempt however it ends, including when it times out
+            if self._connecting.get(connection_string) is context:
+                self._connecting.pop(connection_string, None)
+
+            callback(conn_id, adapter_id, success, failure_reason)
+
+        self.conns.begin_connection(connection_id, connection_string, _on_finished, context, self.get_config('default_timeout'))
+
+        # The connection response can arrive before the ConnectionManager has processed
+        # begin_connection so keep our own reference to update the encoding.
+        self._connecting[connection_string] = context
         self._bind_topics(topics)
 
         try:
             self.client.publish(topics.connect, conn_message)
         except IOTileException:
+            self._connecting.pop(connection_string, None)
             self._unbind_topics(topics)
             self.conns.finish_connection(connection_id, False, 'Failed to send connection message')
 
@@ -130,7 +148,7 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
         topics = context['topics']
         disconn_message = {'key': context['key'], 'client': self.name, 'type': 'command', 'operation': 'disconnect'}
 
-        self.client.publish(topics.action, disconn_message)
+        self.client.publish(topics.action, disconn_message, context['encoding'])
 
     def send_script_async(self, conn_id, data, progress_callback, callback):
         """Asynchronously send a a script to this IOTile device
@@ -169,12 +187,11 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
         for i in range(0, chunks):
             start = i*self.mtu
             chunk = data[start:start + self.mtu]
-            encoded = base64.standard_b64encode(chunk)
 
             script_message = {'key': context['key'], 'client': self.name, 'type': 'command', 'operation': 'send_script',
-                              'script': encoded, 'fragment_count': chunks, 'fragment_index': i}
+                              'script': chunk, 'fragment_count': chunks, 'fragment_index': i}
 
-            self.client.publish(topics.action, script_message)
+            self.client.publish(topics.action, script_message, context['encoding'])
 
     def send_rpc_async(self, conn_id, address, rpc_id, payload, timeout, callback):
         """Asynchronously send an RPC to this IOTile device
@@ -205,12 +222,10 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
 
         topics = context['topics']
 
-        encoded_payload = binascii.hexlify(payload)
-
         rpc_message = {'key': context['key'], 'client': self.name, 'type': 'command', 'operation': 'rpc',
-                       'address': address, 'rpc_id': rpc_id, 'payload': encoded_payload, 'timeout': timeout}
+                       'address': address, 'rpc_id': rpc_id, 'payload': bytes(payload), 'timeout': timeout}
 
-        self.client.publish(topics.action, rpc_message)
+        self.client.publish(topics.action, rpc_message, context['encoding'])
 
     def _open_rpc_interface(self, conn_id, callback):
         """Enable RPC interface for this IOTile device
@@ -277,7 +292,7 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
         topics = context['topics']
 
         open_iface_message = {'key': context['key'], 'type': 'command', 'operation': 'open_interface', 'client': self.name, 'interface': iface}
-        self.client.publish(topics.action, open_iface_message)
+        self.client.publish(topics.action, open_iface_message, context['encoding'])
 
     def stop_sync(self):
         """Synchronously stop this adapter
@@ -294,6 +309,7 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
 
         self.client.disconnect()
         self.conns.stop()
+        self._connecting.clear()
 
     def probe_async(self, callback):
         """Probe for visible devices connected to this DeviceAdapter.
@@ -387,6 +403,10 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
 
             del message['operation']
             del message['type']
+
+            encodings = message.pop('encodings', None)
+            if encodings is not None and 'connection_string' in message:
+                self._agent_encodings[message['connection_string']] = encodings
             self._trigger_callback('on_scan', self.id, message, 60.) # FIXME: Get the timeout from somewhere
         except IOTileException as exc:
             pass
@@ -464,6 +484,11 @@ class AWSIOTDeviceAdapter(DeviceAdapter):
                 self._logger.debug("Connection response received for a different client, client=%s, name=%s", message['client'], self.name)
                 return
 
+            # Switch to whatever wire format the gateway agreed to use for this connection
+            context = self._connecting.pop(conn_key, None)
+            if message['success'] and context is not None:
+                context['encoding'] = message.get('encoding', JSON_ENCODING)
+
             self.conns.finish_connection(conn_key, message['success'], message.get('failure_reason', None))
         else:
             self._logger.warn("Dropping message that did not correspond with a known schema, message=%s", message)
@@ -2,9 +2,11 @@ import logging
 import tornado.gen
 import binascii
 import struct
+import itertools
 from . import messages
 from monotonic import monotonic
 from .mqtt_client import OrderedAWSIOTClient
+from .packet_encoding import choose_encoding, JSON_ENCODING, SUPPORTED_ENCODINGS
 from .topic_validator import MQTTTopicValidator
 from iotile.core.exceptions import ExternalError, ArgumentError, ValidationError
 from future.utils import viewitems
@@ -34,6 +36,8 @@ class AWSIOTGatewayAgent(object):
 
     """
 
+    ADVERTISED_ENCODINGS = SUPPORTED_ENCODINGS
+
     def __init__(self, args, manager, loop):
         self._args = args
         self._manager = manager
@@ -43,6 +47,8 @@ class AWSIOTGatewayAgent(object):
         self.topics = None
         self._disconnector = None
         self._connections = {}
+        self._pending_responses = {}
+        self._flush_scheduled = False
 
         self._logger = logging.getLogger(__name__)
         self._logger.addHandler(logging.NullHandler())
@@ -157,18 +163,57 @@ class AWSIOTGatewayAgent(object):
         self._logger.debug("Publishing status message: (topic=%s) (message=%s)", status_topic, str(data))
         self.client.publish(status_topic, data)
 
+    def _connection_encoding(self, uuid):
+        """Get the wire format negotiated with the client connected to a device.
+
+        Returns:
+            str: The encoding or None if the client did not negotiate one, in
+                which case it only understands unbatched json packets.
+        """
+
+        return self._connections.get(uuid, {}).get('encoding')
+
     def _publish_response(self, slug, message):
         """Publish a response message for a device
 
+        Responses are queued and sent the next time the event loop runs so
+        that all of the responses generated in one pass of the loop can be
+        batched into a single MQTT packet, if the client supports it.
+
         Args:
             slug (string): The device slug that we are publishing on behalf of
             message (dict): A set of key value pairs that are used to create the message
                 that is sent.
         """
 
-        resp_topic = self.topics.gateway_topic(slug, 'data/response')
-        self._logger.debug("Publishing response message: (topic=%s) (message=%s)", resp_topic, message)
-        self.client.publish(resp_topic, message)
+        encoding = self._connection_encoding(self._extract_device_uuid(slug))
+        self._pending_responses.setdefault(slug, []).append((encoding, message))
+
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.add_callback(self._flush_responses)
+
+    def _flush_responses(self):
+        """Publish all queued response messages."""
+
+        pending = self._pending_responses
+        self._pending_responses = {}
+        self._flush_scheduled = False
+
+        for slug, queued in viewitems(pending):
+            resp_topic = self.topics.gateway_topic(slug, 'data/response')
+
+            for encoding, group in itertools.groupby(queued, key=lambda x: x[0]):
+                group_messages = [x[1] for x in group]
+                self._logger.debug("Publishing %d response message(s): (topic=%s) (messages=%s)", len(group_messages), resp_topic, group_messages)
+
+                if encoding is None:
+                    for message in group_messages:
+                        self.client.publish(resp_topic, message)
+                elif len(group_messages) == 1:
+                    self.client.publish(resp_topic, group_messages[0], encoding)
+                else:
+                    self.client.publish_many(resp_topic, group_messages, encoding)
 
     def _on_action(self, sequence, topic, message):
         """Process a command action that we received on behalf of a device.
@@ -254,8 +299,9 @@ class AWSIOTGatewayAgent(object):
         if messages.ConnectCommand.matches(message):
             key = message['key']
             client = message['client']
+            encodings = message.get('encodings')
 
-            self._loop.add_callback(self._connect_to_device, uuid, key, client)
+            self._loop.add_callback(self._connect_to_device, uuid, key, client, encodings)
         else:
             self._logger.warn("Unknown message received on connect topic=%s, message=%s", topic, message)
 
@@ -295,7 +341,7 @@ class AWSIOTGatewayAgent(object):
             payload['failure_reason'] = resp['reason']
         else:
             payload['status'] = resp['status']
-            payload['payload'] = binascii.hexlify(resp['payload'])
+            payload['payload'] = bytes(resp['payload'])
 
         self._publish_response(slug, payload)
 
@@ -537,7 +583,7 @@ class AWSIOTGatewayAgent(object):
             self._publish_response(slug, message)
 
     @tornado.gen.coroutine
-    def _connect_to_device(self, uuid, key, client):
+    def _connect_to_device(self, uuid, key, client, encodings=None):
         """Connect to a device given its uuid
 
         Args:
@@ -545,6 +591,9 @@ class AWSIOTGatewayAgent(object):
             key (string): A 64 byte string used to secure this connection
             client (string): The client id for who is trying to connect
                 to the device.
+            encodings (list of str): The packet encodings that the client
+                supports, in order of preference.  Clients that do not send
+                this only support unbatched json packets.
         """
 
         slug = self._build_device_slug(uuid)
@@ -567,7 +616,12 @@ class AWSIOTGatewayAgent(object):
             conn_id = resp['connection_id']
             self._connections[uuid] = {'key': key, 'client': client, 'connection_id': conn_id, 'last_touch': monotonic(),
                                        'script': [], 'trace_accum': bytes(), 'last_trace': None, 'trace_scheduled': False,
-                                       'last_progress': None}
+                                       'last_progress': None, 'encoding': None}
+
+            if encodings is not None:
+                encoding = choose_encoding(encodings)
+                self._connections[uuid]['encoding'] = encoding
+                message['encoding'] = encoding
         else:
             message['failure_reason'] = resp['reason']
             self._connections[uuid] = {}
@@ -597,11 +651,11 @@ class AWSIOTGatewayAgent(object):
         data['received_time'] = ser['received_time'].strftime("%Y%m%dT%H:%M:%S.%fZ").encode()
         data['report_origin'] = ser['origin']
         data['report_format'] = ser['report_format']
-        data['report'] = binascii.hexlify(ser['encoded_report'])
+        data['report'] = bytes(ser['encoded_report'])
         data['fragment_count'] = 1
         data['fragment_index'] = 0
         self._logger.debug("Publishing report: (topic=%s)", streaming_topic)
-        self.client.publish(streaming_topic, data)
+        self.client.publish(streaming_topic, data, self._connection_encoding(device_uuid) or JSON_ENCODING)
 
     def _notify_trace(self, device_uuid, event_name, trace):
         """Notify that we have received tracing data from a device.
@@ -645,11 +699,11 @@ class AWSIOTGatewayAgent(object):
             tracing_topic = self.topics.prefix + 'devices/{}/data/tracing'.format(slug)
 
             data = {'type': 'notification', 'operation': 'trace'}
-            data['trace'] = binascii.hexlify(trace)
+            data['trace'] = bytes(trace)
             data['trace_origin'] = device_uuid
 
             self._logger.debug('Publishing trace: (topic=%s)', tracing_topic)
-            self.client.publish(tracing_topic, data)
+            self.client.publish(tracing_topic, data, self._connection_encoding(device_uuid) or JSON_ENCODING)
 
         conn_data['trace_scheduled'] = False
         conn_data['last_trace'] = monotonic()
@@ -700,6 +754,11 @@ class AWSIOTGatewayAgent(object):
             message['connection_string'] = slug
             message['signal_strength'] = info['signal_strength']
 
+            # Clients only offer us other encodings if we advertise them, since older
+            # agents reject connect commands containing unknown keys.
+            if self.ADVERTISED_ENCODINGS is not None:
+                message['encodings'] = list(self.ADVERTISED_ENCODINGS)
+
             converted_devs.append({x: y for x, y in viewitems(message)})
             message['type'] = 'notification'
             message['operation'] = 'advertisement'
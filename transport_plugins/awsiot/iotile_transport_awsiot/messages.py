@@ -1,4 +1,8 @@
-"""All known and accepted messages that can be sent over AWS IOT."""
+"""All known and accepted messages that can be sent over AWS IOT.
+
+Binary fields are verified as bytes, packet_encoding takes care of
+converting them to and from text when packets are sent as json.
+"""
 
 from iotile.core.utilities.schema_verify import Verifier, OptionsVerifier, EnumVerifier, ListVerifier, BytesVerifier, IntVerifier, LiteralVerifier, FloatVerifier, DictionaryVerifier, StringVerifier
 
@@ -23,6 +27,7 @@ ConnectCommand.add_required('type', LiteralVerifier('command'))
 ConnectCommand.add_required('operation', LiteralVerifier('connect'))
 ConnectCommand.add_required('key', StringVerifier())
 ConnectCommand.add_required('client', StringVerifier())
+ConnectCommand.add_optional('encodings', ListVerifier(StringVerifier()))
 
 ScriptCommand = DictionaryVerifier()  # pylint: disable=C0103
 ScriptCommand.add_required('type', LiteralVerifier('command'))
@@ -31,7 +36,7 @@ ScriptCommand.add_required('fragment_count', IntVerifier())
 ScriptCommand.add_required('fragment_index', IntVerifier())
 ScriptCommand.add_required('key', StringVerifier())
 ScriptCommand.add_required('client', StringVerifier())
-ScriptCommand.add_required('script', BytesVerifier(encoding="base64"))
+ScriptCommand.add_required('script', BytesVerifier())
 
 DisconnectCommand = DictionaryVerifier()  # pylint: disable=C0103
 DisconnectCommand.add_required('type', LiteralVerifier('command'))
@@ -47,7 +52,7 @@ RPCCommand.add_required('client', StringVerifier())
 RPCCommand.add_required('address', IntVerifier())
 RPCCommand.add_required('rpc_id', IntVerifier())
 RPCCommand.add_required('timeout', FloatVerifier())
-RPCCommand.add_required('payload', BytesVerifier(encoding='hex'))
+RPCCommand.add_required('payload', BytesVerifier())
 
 ProbeCommand = DictionaryVerifier()  # pylint: disable=C0103
 ProbeCommand.add_required('type', LiteralVerifier('command'))
@@ -78,6 +83,7 @@ SuccessfulConnectionResponse.add_required('type', LiteralVerifier('response'))
 SuccessfulConnectionResponse.add_required('operation', LiteralVerifier('connect'))
 SuccessfulConnectionResponse.add_required('client', StringVerifier())
 SuccessfulConnectionResponse.add_required('success', LiteralVerifier(True))
+SuccessfulConnectionResponse.add_optional('encoding', StringVerifier())
 
 FailedConnectionResponse = DictionaryVerifier()  # pylint: disable=C0103
 FailedConnectionResponse.add_required('type', LiteralVerifier('response'))
@@ -127,7 +133,7 @@ SuccessfulRPCResponse.add_required('operation', LiteralVerifier('rpc'))
 SuccessfulRPCResponse.add_required('client', StringVerifier())
 SuccessfulRPCResponse.add_required('success', LiteralVerifier(True))
 SuccessfulRPCResponse.add_required('status', IntVerifier())
-SuccessfulRPCResponse.add_required('payload', BytesVerifier(encoding='hex'))
+SuccessfulRPCResponse.add_required('payload', BytesVerifier())
 
 FailedRPCResponse = DictionaryVerifier()  # pylint: disable=C0103
 FailedRPCResponse.add_required('type', LiteralVerifier('response'))
@@ -160,7 +166,7 @@ ReportNotification.add_required('fragment_count', IntVerifier())
 ReportNotification.add_required('fragment_index', IntVerifier())
 ReportNotification.add_required('operation', LiteralVerifier('report'))
 ReportNotification.add_required('received_time', StringVerifier())
-ReportNotification.add_required('report', BytesVerifier(encoding='hex'))
+ReportNotification.add_required('report', BytesVerifier())
 ReportNotification.add_required('report_origin', IntVerifier())
 ReportNotification.add_required('report_format', IntVerifier())
 
@@ -168,7 +174,7 @@ TracingNotification = DictionaryVerifier()  # pylint: disable=C0103
 TracingNotification.add_required('type', LiteralVerifier('notification'))
 TracingNotification.add_required('operation', LiteralVerifier('trace'))
 TracingNotification.add_required('trace_origin', IntVerifier())
-TracingNotification.add_required('trace', BytesVerifier(encoding='hex'))
+TracingNotification.add_required('trace', BytesVerifier())
 
 ProgressNotification = DictionaryVerifier()  # pylint: disable=C0103
 ProgressNotification.add_required('type', LiteralVerifier('notification'))
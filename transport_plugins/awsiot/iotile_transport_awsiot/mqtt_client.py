@@ -1,11 +1,12 @@
-import json
 import logging
+import threading
 import AWSIoTPythonSDK.MQTTLib
 import re
 from AWSIoTPythonSDK.exception.operationError import operationError
 from iotile.core.exceptions import ArgumentError, ExternalError, InternalError
 from iotile.core.dev.registry import ComponentRegistry
 from .packet_queue import PacketQueue
+from .packet_encoding import encode_packet, decode_packet, JSON_ENCODING
 from .topic_sequencer import TopicSequencer
 
 
@@ -14,9 +15,12 @@ class OrderedAWSIOTClient(object):
 
     Args:
         args (dict): A dictionary of arguments for setting up the
-            MQTT connection.
+            MQTT connection.  The optional missing_timeout key sets how
+            long ordered topics wait for a missing packet before skipping it.
     """
 
+    DEFAULT_MISSING_TIMEOUT = 5.0
+
     def __init__(self, args):
         cert = args.get('certificate', None)
         key = args.get('private_key', None)
@@ -26,6 +30,7 @@ class OrderedAWSIOTClient(object):
         iamsecret = args.get('iam_secret', None)
         iamsession = args.get('iam_session', None)
         use_websockets = args.get('use_websockets', False)
+        missing_timeout = args.get('missing_timeout', self.DEFAULT_MISSING_TIMEOUT)
 
         try:
             if not use_websockets:
@@ -69,10 +74,12 @@ class OrderedAWSIOTClient(object):
         self.key = key
         self.root = root
         self.endpoint = endpoint
+        self.missing_timeout = missing_timeout
         self.client = None
         self.sequencer = TopicSequencer()
         self.queues = {}
         self.wildcard_queues = []
+        self._queue_lock = threading.RLock()
         self._logger = logging.getLogger(__name__)
 
     def connect(self, client_id):
@@ -121,45 +128,53 @@ class OrderedAWSIOTClient(object):
         except operationError as exc:
             raise InternalError("Could not disconnect from AWS IOT", message=exc.message)
 
-    def publish(self, topic, message):
-        """Publish a json message to a topic with a type and a sequence number
+    def publish(self, topic, message, encoding=JSON_ENCODING):
+        """Publish a message to a topic with a sequence number
 
-        The actual message will be published as a JSON object:
+        The actual message will be published as an object:
         {
             "sequence": <incrementing id>,
             "message": message
         }
 
+        Binary fields in the message may be passed as bytes and are
+        encoded as needed by the chosen encoding.
+
         Args:
             topic (string): The MQTT topic to publish in
             message (string, dict): The message to publish
+            encoding (string): The wire format to use, either json or msgpack.
+                This should only be something other than json if the receiver
+                has said that it supports it.
         """
 
         seq = self.sequencer.next_id(topic)
+        self._publish_packet(topic, encode_packet(seq, message, encoding))
 
-        packet = {
-            'sequence': seq,
-            'message': message
-        }
-        # Need to encode bytes types for json.dumps
-        if 'key' in packet['message']:
-            packet['message']['key'] = packet['message']['key'].decode('utf8')
-        if 'payload' in packet['message']:
-            packet['message']['payload'] = packet['message']['payload'].decode('utf8')
-        if 'script' in packet['message']:
-            packet['message']['script'] = packet['message']['script'].decode('utf8')
-        if 'trace' in packet['message']:
-            packet['message']['trace'] = packet['message']['trace'].decode('utf8')
-        if 'report' in packet['message']:
-            packet['message']['report'] = packet['message']['report'].decode('utf8')
-        if 'received_time' in packet['message']:
-            packet['message']['received_time'] = packet['message']['received_time'].decode('utf8')
-
-        serialized_packet = json.dumps(packet)
+    def publish_many(self, topic, messages, encoding=JSON_ENCODING):
+        """Publish several messages to a topic in a single MQTT packet
+
+        Each message is given its own sequence number so the receiver
+        processes them exactly as if they had been published one at a time.
+        The receiver must support batched packets, which is true of any
+        receiver that negotiated an encoding.
+
+        Args:
+            topic (string): The MQTT topic to publish in
+            messages (list of dict): The messages to publish, in order.
+            encoding (string): The wire format to use, either json or msgpack.
+        """
+
+        if len(messages) == 0:
+            return
+
+        seq = self.sequencer.next_id(topic, len(messages))
+        self._publish_packet(topic, encode_packet(seq, list(messages), encoding))
 
+    def _publish_packet(self, topic, serialized_packet):
         try:
             # Limit how much we log in case the message is very long
-            self._logger.debug("Publishing %s on topic %s", serialized_packet[:256], topic)
+            self._logger.debug("Publishing %r on topic %s", serialized_packet[:256], topic)
             self.client.publish(topic, serialized_packet, 1)
         except operationError as exc:
             raise InternalError("Could not publish message", topic=topic, message=exc.message)
@@ -167,8 +182,8 @@ class OrderedAWSIOTClient(object):
     def subscribe(self, topic, callback, ordered=True):
         """Subscribe to future messages in the given topic
 
-        The contents of topic should be in the format created by self.publish with a
-        sequence number of message type encoded as a json string.
+        The contents of topic should be in the format created by self.publish or
+        self.publish_many with a sequence number, encoded as json or msgpack.
 
         Wildcard topics containing + and # are allowed and
 
@@ -184,7 +199,7 @@ class OrderedAWSIOTClient(object):
             regex = re.compile(topic.replace('+', '[^/]+').replace('#', '.*'))
             self.wildcard_queues.append((topic, regex, callback, ordered))
         else:
-            self.queues[topic] = PacketQueue(0, callback, ordered)
+            self.queues[topic] = PacketQueue(self.missing_timeout, callback, ordered)
 
         try:
             self.client.subscribe(topic, 1, self._on_receive)
@@ -232,16 +247,9 @@ class OrderedAWSIOTClient(object):
         encoded = message.payload
 
         try:
-            packet = json.loads(encoded)
-        except ValueError:
-            self._logger.warn("Could not decode json packet: %s", encoded)
-            return
-
-        try:
-            seq = packet['sequence']
-            message_data = packet['message']
-        except KeyError:
-            self._logger.warn("Message received did not have required sequence and message keys: %s", packet)
+            seq, messages = decode_packet(encoded)
+        except ValueError as exc:
+            self._logger.warn("Could not decode packet (%s): %r", str(exc), encoded[:256])
             return
 
         # If we received a packet that does not fit into a queue, check our wildcard
@@ -250,7 +258,7 @@ class OrderedAWSIOTClient(object):
             found = False
             for _, regex, callback, ordered in self.wildcard_queues:
                 if regex.match(topic):
-                    self.queues[topic] = PacketQueue(0, callback, ordered)
+                    self.queues[topic] = PacketQueue(self.missing_timeout, callback, ordered)
                     found = True
                     break
 
@@ -258,4 +266,19 @@ class OrderedAWSIOTClient(object):
                 self._logger.warn("Received message for unknown topic: %s", topic)
                 return
 
-        self.queues[topic].receive(seq, [seq, topic, message_data])
+        queue = self.queues[topic]
+        with self._queue_lock:
+            for i, message_data in enumerate(messages):
+                queue.receive(seq + i, [seq + i, topic, message_data])
+
+    def check_timeouts(self):
+        """Skip packets that we have waited too long for on any topic.
+
+        This should be called periodically so that a lost packet does not
+        stall a topic forever when no later packets arrive to trigger the
+        check.
+        """
+
+        with self._queue_lock:
+            for queue in list(self.queues.values()):
+                queue.check_timeout()
@@ -0,0 +1,175 @@
+"""Wire formats used to serialize packets sent over AWS IOT.
+
+Every packet is a dictionary with a sequence number and either a single
+message or a list of messages that were batched together.  Packets can be
+serialized either as JSON or msgpack.  JSON is the original format and is
+always supported.  msgpack is used when both sides of a connection agree
+on it since it can carry binary data directly rather than encoding it as
+text.
+
+The receiving side does not need to know which format was used, a JSON
+packet always starts with '{' which is never the first byte of a msgpack
+encoded dictionary.
+"""
+
+import json
+import base64
+import binascii
+import msgpack
+from builtins import str as text
+from future.utils import viewitems
+
+JSON_ENCODING = 'json'
+MSGPACK_ENCODING = 'msgpack'
+
+# In order of preference
+SUPPORTED_ENCODINGS = [MSGPACK_ENCODING, JSON_ENCODING]
+
+# Fields that contain binary data and how they are encoded as text in JSON packets
+BINARY_FIELDS = {
+    'payload': 'hex',
+    'report': 'hex',
+    'trace': 'hex',
+    'script': 'base64'
+}
+
+
+def choose_encoding(offered):
+    """Choose the best encoding that both sides of a connection support.
+
+    Args:
+        offered (list of str): The encodings supported by the other side in
+            its order of preference.
+
+    Returns:
+        str: The chosen encoding, which falls back to json if nothing else
+            is supported.
+    """
+
+    for encoding in offered:
+        if encoding in SUPPORTED_ENCODINGS:
+            return encoding
+
+    return JSON_ENCODING
+
+
+def _prepare_message(message, encoding):
+    """Make a copy of message with all binary fields in the right form."""
+
+    if not isinstance(message, dict):
+        return message
+
+    prepared = {}
+    for key, value in viewitems(message):
+        if isinstance(value, (bytes, bytearray)):
+            if key not in BINARY_FIELDS:
+                value = bytes(value).decode('utf-8')
+            elif encoding == MSGPACK_ENCODING:
+                value = bytes(value)
+            elif BINARY_FIELDS[key] == 'hex':
+                value = binascii.hexlify(value).decode('utf-8')
+            else:
+                value = base64.standard_b64encode(value).decode('utf-8')
+
+        prepared[key] = value
+
+    return prepared
+
+
+def _restore_message(message, encoding):
+    """Decode any binary fields that were encoded as text back into bytes."""
+
+    if encoding != JSON_ENCODING or not isinstance(message, dict):
+        return message
+
+    for key, method in viewitems(BINARY_FIELDS):
+        value = message.get(key)
+        if not isinstance(value, text):
+            continue
+
+        if method == 'hex':
+            message[key] = binascii.unhexlify(value)
+        else:
+            message[key] = base64.b64decode(value)
+
+    return message
+
+
+def encode_packet(sequence, messages, encoding=JSON_ENCODING):
+    """Serialize one or more messages into a packet.
+
+    Binary fields in each message may be passed as bytes or bytearray
+    objects and are converted as necessary for the encoding.
+
+    Args:
+        sequence (int): The sequence number of the (first) message.
+        messages (dict or list of dict): A single message or a list of
+            messages that should be sent as a batch.  Each message in a batch
+            implicitly has the sequence number after the previous one.
+        encoding (str): The encoding to use, either json or msgpack.
+
+    Returns:
+        str or bytes: The serialized packet.
+    """
+
+    packet = {'sequence': sequence}
+    if isinstance(messages, list):
+        packet['messages'] = [_prepare_message(x, encoding) for x in messages]
+    else:
+        packet['message'] = _prepare_message(messages, encoding)
+
+    if encoding == MSGPACK_ENCODING:
+        return msgpack.packb(packet, use_bin_type=True)
+    elif encoding == JSON_ENCODING:
+        return json.dumps(packet)
+
+    raise ValueError("Unknown packet encoding: %s" % encoding)
+
+
+def decode_packet(encoded):
+    """Deserialize a packet in any supported encoding.
+
+    Args:
+        encoded (str or bytes): A packet created by encode_packet.
+
+    Returns:
+        (int, list of dict): The sequence number of the first message in
+            the packet and the list of messages that it contained.  Binary
+            fields are always returned as bytes.
+
+    Raises:
+        ValueError: The packet could not be decoded or did not have the
+            required sequence number and message keys.
+    """
+
+    if isinstance(encoded, bytearray):
+        encoded = bytes(encoded)
+
+    if encoded[:1] in (b'{', u'{'):
+        encoding = JSON_ENCODING
+        if isinstance(encoded, bytes):
+            encoded = encoded.decode('utf-8')
+
+        packet = json.loads(encoded)
+    else:
+        encoding = MSGPACK_ENCODING
+        try:
+            packet = msgpack.unpackb(encoded, raw=False)
+        except Exception as exc:
+            raise ValueError("Could not decode msgpack packet: %s" % str(exc))
+
+    try:
+        sequence = packet['sequence']
+        if 'messages' in packet:
+            messages = packet['messages']
+        else:
+            messages = [packet['message']]
+    except (KeyError, TypeError):
+        raise ValueError("Packet did not have required sequence and message keys")
+
+    try:
+        messages = [_restore_message(x, encoding) for x in messages]
+    except (TypeError, binascii.Error) as exc:
+        raise ValueError("Could not decode binary field in packet: %s" % str(exc))
+
+    return sequence, messages
@@ -1,18 +1,28 @@
-"""A packet queue for reordering out of order packets
+"""A packet queue for reordering out of order packets."""
 
-TODO:
-- Add timeout
-- replace list with a priority queue
-- Add maximum out of order window
-"""
+import heapq
+import logging
+from monotonic import monotonic
 
 
 class PacketQueue(object):
     """A queue for reordering out-of-order messages
 
+    Packets that arrive ahead of the next expected sequence number are kept
+    in a heap so that inserting a packet is O(log n).  If a gap in the
+    sequence numbers is not filled within missing_timeout seconds, or if
+    more than max_buffered packets are waiting, the missing sequence numbers
+    are skipped and the buffered packets are delivered in order.
+
+    Timeouts are checked whenever a packet is received and when
+    check_timeout() is called, which should be done periodically so that a
+    lost packet is skipped even if no more packets arrive.  The timeout for
+    each gap starts when that gap becomes the next thing we are waiting for.
+
     Args:
-        missing_timeout (int): The maximum time to wait for a missing packet
-            without triggering a timeout error
+        missing_timeout (float): The maximum time to wait for a missing packet
+            before skipping it.  If this is 0 or None, we wait forever unless
+            the buffer fills up.
         callback (callable): A callback function that should be called for
             each received message with the signature:
             callback(*args) where args is the list passed to receive
@@ -21,14 +31,27 @@ class PacketQueue(object):
             channel or if each packet is independent and sequence numbers
             should not be checked.  True means sequence numbers are checked
             and packets are reordered.
-
+        max_buffered (int): The maximum number of out of order packets to hold
+            while waiting for a missing packet.
+        clock (callable): Optional function returning the current time in
+            seconds.  Defaults to a monotonic clock.
     """
-    def __init__(self, missing_timeout, callback, reorder=True):
+
+    def __init__(self, missing_timeout, callback, reorder=True, max_buffered=256, clock=monotonic):
         self._out_of_order = []
+        self._buffered = set()
         self._next_expected = None
         self._callback = callback
         self._reorder = reorder
         self._missing_timeout = missing_timeout
+        self._max_buffered = max_buffered
+        self._clock = clock
+        self._gap_started = None
+        self._gap_sequence = None
+        self._logger = logging.getLogger(__name__)
+
+        self.dropped = 0
+        self.skipped = 0
 
     def receive(self, sequence, args):
         """Receive one packet
@@ -36,8 +59,8 @@ class PacketQueue(object):
         If the sequence number is one we've already seen before, it is dropped.
 
         If it is not the next expected sequence number, it is put into the
-        _out_of_order queue to be processed once the holes in sequence number
-        are filled in.
+        _out_of_order heap to be processed once the holes in sequence number
+        are filled in or skipped.
 
         Args:
             sequence (int): The sequence number of the received packet
@@ -50,27 +73,88 @@ class PacketQueue(object):
             self._callback(*args)
             return
 
-        # If this packet is in the past, drop it
-        if self._next_expected is not None and sequence < self._next_expected:
-            print("Dropping out of order packet, seq=%d" % sequence)
+        # If this packet is in the past or a duplicate, drop it
+        if (self._next_expected is not None and sequence < self._next_expected) or sequence in self._buffered:
+            self._logger.debug("Dropping out of order packet, seq=%d", sequence)
+            self.dropped += 1
             return
 
-        self._out_of_order.append((sequence, args))
-        self._out_of_order.sort(key=lambda x: x[0])
+        if sequence == self._next_expected:
+            self._deliver(sequence, args)
+        else:
+            heapq.heappush(self._out_of_order, (sequence, args))
+            self._buffered.add(sequence)
 
-        # If we have received packets, attempt to process them in order
-        while len(self._out_of_order) > 0:
-            seq, args = self._out_of_order[0]
+        # After a reset, the lowest packet we have defines where the sequence starts
+        if self._next_expected is None:
+            self._next_expected = self._out_of_order[0][0]
 
-            if self._next_expected is not None and seq != self._next_expected:
-                return
+        self._process_buffered()
 
-            self._callback(*args)
-            self._out_of_order.pop(0)
-            self._next_expected = seq+1
+        if len(self._out_of_order) > self._max_buffered:
+            self._logger.warning("Too many out of order packets buffered, skipping missing packets")
+            self._skip_gap()
+        else:
+            self.check_timeout()
+
+    def check_timeout(self):
+        """Skip missing packets if we have been waiting too long for them."""
+
+        if self._gap_started is None or not self._missing_timeout:
+            return
+
+        if (self._clock() - self._gap_started) >= self._missing_timeout:
+            self._logger.warning("Timed out waiting for missing packet, seq=%d", self._next_expected)
+            self._skip_gap()
+
+    @property
+    def buffered(self):
+        """The number of out of order packets waiting to be delivered."""
+
+        return len(self._out_of_order)
+
+    def _deliver(self, sequence, args):
+        self._callback(*args)
+        self._next_expected = sequence + 1
+
+    def _skip_gap(self):
+        """Skip the current gap in sequence numbers and deliver what we can."""
+
+        if len(self._out_of_order) == 0:
+            return
+
+        lowest = self._out_of_order[0][0]
+        self.skipped += lowest - self._next_expected
+        self._next_expected = lowest
+        self._process_buffered()
+
+    def _process_buffered(self):
+        while len(self._out_of_order) > 0 and self._out_of_order[0][0] == self._next_expected:
+            seq, args = heapq.heappop(self._out_of_order)
+            self._buffered.discard(seq)
+            self._deliver(seq, args)
+
+        if len(self._out_of_order) == 0:
+            self._gap_started = None
+        elif self._gap_started is None or self._gap_sequence != self._next_expected:
+            # We are now waiting on a new missing packet so restart the timeout
+            self._gap_started = self._clock()
+            self._gap_sequence = self._next_expected
 
     def reset(self):
         """Reset the expected next sequence number
+
+        Any out of order packets that are still waiting for a missing packet
+        belong to the old sequence, so they are discarded and counted as
+        dropped.
         """
 
+        if len(self._out_of_order) > 0:
+            self._logger.debug("Dropping %d buffered packets on reset", len(self._out_of_order))
+            self.dropped += len(self._out_of_order)
+
+        self._out_of_order = []
+        self._buffered = set()
         self._next_expected = None
+        self._gap_started = None
+        self._gap_sequence = None
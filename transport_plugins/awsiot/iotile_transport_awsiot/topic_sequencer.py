@@ -13,7 +13,7 @@ class TopicSequencer(object):
     def __init__(self):
         self.topics = {}
 
-    def next_id(self, channel):
+    def next_id(self, channel, count=1):
         """Get the next sequence number for a named channel or topic
 
         If channel has not been sent to next_id before, 0 is returned
@@ -22,17 +22,20 @@ class TopicSequencer(object):
         Args:
             channel (string): The name of the channel to get a sequential
                 id for.
+            count (int): The number of consecutive ids to reserve.  The
+                first one is returned.
 
         Returns:
             int: The next id for this channel
         """
 
         if channel not in self.topics:
-            self.topics[channel] = 0
+            self.topics[channel] = count - 1
             return 0
 
-        self.topics[channel] += 1
-        return self.topics[channel]
+        next_id = self.topics[channel] + 1
+        self.topics[channel] += count
+        return next_id
 
     def reset(self):
         """Reset the packet id in each topic
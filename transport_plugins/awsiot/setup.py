@@ -10,7 +10,8 @@ setup(
     install_requires=[
         "iotile-core>=3.6.2",
         "AWSIoTPythonSDK>=1.0.0",
-        "monotonic"
+        "monotonic",
+        "msgpack>=0.5.6"
     ],
 
     entry_points={'iotile.device_adapter': ['awsiot = iotile_transport_awsiot.device_adapter:AWSIOTDeviceAdapter'],
@@ -1,6 +1,15 @@
+import json
 import queue
+import pytest
 
 from iotile_transport_awsiot.mqtt_client import OrderedAWSIOTClient
+from iotile_transport_awsiot.packet_encoding import decode_packet
+from iotile_transport_awsiot.gateway_agent import AWSIOTGatewayAgent
+from iotile_transport_awsiot import messages
+from iotile.core.utilities.schema_verify import DictionaryVerifier, LiteralVerifier, StringVerifier
+from iotile.core.hw.hwmanager import HardwareManager
+from iotile.core.dev.registry import ComponentRegistry
+from iotile.core.exceptions import HardwareError
 import time
 
 def test_gateway(gateway, local_broker, args):
@@ -183,3 +192,116 @@ def test_autodisconnect(gateway, hw_man, local_broker):
 
     # Make sure we can connect normally again
     hw_man.connect(3, wait=0.1)
+
+
+def test_binary_encoding(gateway, hw_man, local_broker):
+    """Make sure we switch to msgpack once the gateway agrees to it."""
+
+    hw_man.connect(3, wait=0.1)
+    hw_man.controller()
+
+    status = local_broker.messages['devices/d--0000-0000-0000-0002/devices/d--0000-0000-0000-0003/data/status']
+    assert decode_packet(status[-1][1])[1][0]['encoding'] == 'msgpack'
+
+    actions = local_broker.messages['devices/d--0000-0000-0000-0002/devices/d--0000-0000-0000-0003/control/action']
+    responses = local_broker.messages['devices/d--0000-0000-0000-0002/devices/d--0000-0000-0000-0003/data/response']
+
+    for _seq, packet in actions + responses:
+        assert isinstance(packet, bytes)
+        assert packet[:1] != b'{'
+
+
+def test_json_fallback(gateway, local_broker, args):
+    """Make sure clients that do not negotiate an encoding still get json."""
+
+    prefix = 'devices/d--0000-0000-0000-0002/devices/d--0000-0000-0000-0003/'
+    received = queue.Queue()
+
+    client = OrderedAWSIOTClient(args)
+    client.connect('hello')
+    client.subscribe(prefix + 'data/status', lambda seq, topic, msg: received.put(msg))
+    client.subscribe(prefix + 'data/response', lambda seq, topic, msg: received.put(msg))
+
+    client.publish(prefix + 'control/connect', {'type': 'command', 'operation': 'connect', 'key': 'a' * 64, 'client': 'hello'})
+    resp = received.get(timeout=1.0)
+    assert resp['success'] is True
+    assert 'encoding' not in resp
+
+    client.publish(prefix + 'control/action', {'type': 'command', 'operation': 'open_interface', 'key': 'a' * 64,
+                                               'client': 'hello', 'interface': 'rpc'})
+    client.publish(prefix + 'control/action', {'type': 'command', 'operation': 'rpc', 'key': 'a' * 64, 'client': 'hello',
+                                               'address': 8, 'rpc_id': 0x0004, 'payload': b'', 'timeout': 1.0})
+
+    assert received.get(timeout=1.0)['success'] is True
+    resp = received.get(timeout=1.0)
+    assert resp['operation'] == 'rpc'
+    assert resp['success'] is True
+    assert len(resp['payload']) > 0
+
+    for _seq, packet in local_broker.messages[prefix + 'data/response']:
+        assert json.loads(packet)['message']['client'] == 'hello'
+
+
+def test_batched_publish(local_broker, args):
+    """Make sure batched messages are delivered individually and in order."""
+
+    received = []
+
+    sender = OrderedAWSIOTClient(args)
+    sender.connect('sender')
+    receiver = OrderedAWSIOTClient(args)
+    receiver.connect('receiver')
+    receiver.subscribe('batch_topic', lambda seq, topic, msg: received.append((seq, msg['index'])))
+
+    sender.publish('batch_topic', {'index': 0}, 'msgpack')
+    sender.publish_many('batch_topic', [{'index': 1}, {'index': 2}, {'index': 3}], 'msgpack')
+    sender.publish('batch_topic', {'index': 4})
+
+    assert received == [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4)]
+    assert len(local_broker.messages['batch_topic']) == 3
+
+
+def test_old_agent_connect(gateway, hw_man, local_broker, monkeypatch):
+    """Make sure a new adapter can still connect to an agent without encoding support."""
+
+    legacy_connect = DictionaryVerifier()
+    legacy_connect.add_required('type', LiteralVerifier('command'))
+    legacy_connect.add_required('operation', LiteralVerifier('connect'))
+    legacy_connect.add_required('key', StringVerifier())
+    legacy_connect.add_required('client', StringVerifier())
+
+    monkeypatch.setattr(messages, 'ConnectCommand', legacy_connect)
+    monkeypatch.setattr(AWSIOTGatewayAgent, 'ADVERTISED_ENCODINGS', None)
+
+    hw_man.connect(3, wait=0.1)
+    hw_man.controller()
+
+    connect = local_broker.messages['devices/d--0000-0000-0000-0002/devices/d--0000-0000-0000-0003/control/connect']
+    assert 'encodings' not in decode_packet(connect[-1][1])[1][0]
+
+    status = local_broker.messages['devices/d--0000-0000-0000-0002/devices/d--0000-0000-0000-0003/data/status']
+    assert 'encoding' not in decode_packet(status[-1][1])[1][0]
+
+
+def test_connect_timeout(local_broker):
+    """Make sure connection attempts that never get a response are forgotten."""
+
+    reg = ComponentRegistry()
+    reg.set_config('awsiot-endpoint', '')
+    reg.set_config('awsiot-rootcert', '')
+    reg.set_config('awsiot-iamkey', '')
+    reg.set_config('awsiot-iamtoken', '')
+
+    hw_dev = HardwareManager(port="awsiot:devices/d--0000-0000-0000-0002")
+
+    try:
+        adapter = hw_dev.stream.adapter
+        adapter.set_config('default_timeout', 0.2)
+
+        with pytest.raises(HardwareError):
+            hw_dev.connect_direct('d--0000-0000-0000-0003')
+
+        assert adapter._connecting == {}
+    finally:
+        hw_dev.close()
+
@@ -0,0 +1,78 @@
+"""Tests of the json and msgpack packet wire formats."""
+
+import json
+import pytest
+from iotile_transport_awsiot.packet_encoding import encode_packet, decode_packet, choose_encoding
+
+
+def _rpc_response(payload):
+    return {'client': 'hello', 'type': 'response', 'operation': 'rpc', 'success': True, 'status': 0, 'payload': payload}
+
+
+@pytest.mark.parametrize("encoding", ['json', 'msgpack'])
+def test_roundtrip(encoding):
+    """Make sure binary fields survive both encodings."""
+
+    script = {'key': b'abcd', 'client': 'hello', 'type': 'command', 'operation': 'send_script',
+              'script': bytearray(range(0, 256)), 'fragment_count': 1, 'fragment_index': 0}
+
+    encoded = encode_packet(5, script, encoding)
+    seq, messages = decode_packet(encoded)
+
+    assert seq == 5
+    assert len(messages) == 1
+    assert messages[0]['script'] == bytes(bytearray(range(0, 256)))
+    assert messages[0]['key'] == u'abcd'
+    assert messages[0]['operation'] == u'send_script'
+
+
+def test_json_compatible():
+    """Make sure json packets keep the original text encoding of binary fields."""
+
+    encoded = encode_packet(1, _rpc_response(b'\x01\x02'), 'json')
+    packet = json.loads(encoded)
+    assert packet['message']['payload'] == '0102'
+
+    seq, messages = decode_packet(encoded.encode('utf-8'))
+    assert seq == 1
+    assert messages[0]['payload'] == b'\x01\x02'
+
+
+def test_msgpack_smaller():
+    """Make sure msgpack actually saves space for binary payloads."""
+
+    message = _rpc_response(bytes(bytearray(20)))
+    assert len(encode_packet(1, message, 'msgpack')) < len(encode_packet(1, message, 'json'))
+
+
+@pytest.mark.parametrize("encoding", ['json', 'msgpack'])
+def test_batches(encoding):
+    """Make sure we can send multiple messages in one packet."""
+
+    batch = [_rpc_response(bytes(bytearray([i]))) for i in range(0, 3)]
+    seq, messages = decode_packet(encode_packet(10, batch, encoding))
+
+    assert seq == 10
+    assert [x['payload'] for x in messages] == [b'\x00', b'\x01', b'\x02']
+
+
+def test_invalid_packets():
+    """Make sure we reject garbage."""
+
+    with pytest.raises(ValueError):
+        decode_packet(b'{"message": {}}')
+
+    with pytest.raises(ValueError):
+        decode_packet(b'\xc1\x00')
+
+    with pytest.raises(ValueError):
+        decode_packet(encode_packet(0, _rpc_response(b''), 'json').replace('"payload": ""', '"payload": "0"'))
+
+
+def test_negotiation():
+    """Make sure we pick the first mutually supported encoding."""
+
+    assert choose_encoding(['cbor', 'msgpack', 'json']) == 'msgpack'
+    assert choose_encoding(['json', 'msgpack']) == 'json'
+    assert choose_encoding(['cbor']) == 'json'
+    assert choose_encoding([]) == 'json'
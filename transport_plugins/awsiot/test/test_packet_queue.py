@@ -0,0 +1,176 @@
+"""Tests of out of order packet reassembly."""
+
+import time
+import pytest
+from iotile_transport_awsiot.packet_queue import PacketQueue
+from iotile_transport_awsiot.connection_manager import ConnectionManager
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def queue():
+    received = []
+    clock = FakeClock()
+
+    def _callback(seq, message):
+        received.append(seq)
+
+    packets = PacketQueue(1.0, _callback, max_buffered=4, clock=clock)
+    return packets, received, clock
+
+
+def _send(packets, *seqs):
+    for seq in seqs:
+        packets.receive(seq, [seq, 'message %d' % seq])
+
+
+def test_reordering(queue):
+    """Make sure packets are delivered in order."""
+
+    packets, received, _clock = queue
+
+    _send(packets, 0, 2, 3, 1, 5, 4)
+    assert received == [0, 1, 2, 3, 4, 5]
+    assert packets.buffered == 0
+    assert packets.skipped == 0
+
+
+def test_duplicates(queue):
+    """Make sure duplicate and stale packets are dropped."""
+
+    packets, received, _clock = queue
+
+    _send(packets, 0, 2, 2, 0, 1)
+    assert received == [0, 1, 2]
+    assert packets.dropped == 2
+
+
+def test_gap_timeout(queue):
+    """Make sure we stop waiting for a missing packet after missing_timeout."""
+
+    packets, received, clock = queue
+
+    _send(packets, 0, 2, 3)
+    assert received == [0]
+
+    clock.now = 0.5
+    packets.check_timeout()
+    assert received == [0]
+
+    clock.now = 1.0
+    packets.check_timeout()
+    assert received == [0, 2, 3]
+    assert packets.skipped == 1
+
+    # The skipped packet is stale if it shows up late
+    _send(packets, 1, 4)
+    assert received == [0, 2, 3, 4]
+    assert packets.dropped == 1
+
+
+def test_buffer_limit(queue):
+    """Make sure we skip missing packets rather than buffering forever."""
+
+    packets, received, _clock = queue
+
+    _send(packets, 0, 2, 3, 4, 5)
+    assert received == [0]
+
+    _send(packets, 6)
+    assert received == [0, 2, 3, 4, 5, 6]
+    assert packets.skipped == 1
+    assert packets.buffered == 0
+
+
+def test_reset(queue):
+    """Make sure we can restart the sequence after a reset."""
+
+    packets, received, _clock = queue
+
+    _send(packets, 5, 6)
+    packets.reset()
+    _send(packets, 0, 1)
+    assert received == [5, 6, 0, 1]
+
+
+def test_reset_during_gap(queue):
+    """Make sure a reset discards packets buffered behind a gap."""
+
+    packets, received, clock = queue
+
+    _send(packets, 0, 2, 3)
+    assert packets.buffered == 2
+
+    packets.reset()
+    assert packets.buffered == 0
+    assert packets.dropped == 2
+
+    # Sequence numbers that were buffered before the reset are not duplicates
+    _send(packets, 2, 3)
+    assert received == [0, 2, 3]
+
+    # The old gap's timeout should not fire after the reset
+    clock.now = 5.0
+    packets.check_timeout()
+    assert received == [0, 2, 3]
+    assert packets.skipped == 0
+
+
+def test_unordered():
+    """Make sure we can pass packets straight through."""
+
+    received = []
+    packets = PacketQueue(0, lambda seq, msg: received.append(seq), False)
+
+    _send(packets, 3, 1, 1, 2)
+    assert received == [3, 1, 1, 2]
+
+
+def test_gap_timeout_per_gap(queue):
+    """Make sure each missing packet gets the full timeout."""
+
+    packets, received, clock = queue
+
+    _send(packets, 0, 2, 4)
+
+    clock.now = 0.9
+    _send(packets, 1)
+    assert received == [0, 1, 2]
+
+    clock.now = 1.0
+    packets.check_timeout()
+    assert received == [0, 1, 2]
+
+    clock.now = 2.0
+    packets.check_timeout()
+    assert received == [0, 1, 2, 4]
+    assert packets.skipped == 1
+
+
+def test_timeout_without_traffic(queue):
+    """Make sure the connection manager skips lost packets when nothing else arrives."""
+
+    packets, received, clock = queue
+
+    _send(packets, 0, 2)
+    clock.now = 1.0
+
+    manager = ConnectionManager(0, periodic_check=packets.check_timeout)
+    manager.start()
+
+    try:
+        for _i in range(50):
+            if received == [0, 2]:
+                break
+            time.sleep(0.02)
+    finally:
+        manager.stop()
+
+    assert received == [0, 2]
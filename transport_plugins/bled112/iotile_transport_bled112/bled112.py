@@ -18,6 +18,7 @@ from iotile.core.utilities.packed import unpack
 from iotile.core.exceptions import HardwareError
 from iotile.core.hw.reports import IOTileReportParser, IOTileReading, BroadcastReport
 from iotile.core.hw.transport.adapter import DeviceAdapter
+from iotile.core.hw.transport.script_stream import ScriptStream
 from .bled112_cmd import BLED112CommandProcessor
 from .tilebus import TileBusService, TileBusStreamingCharacteristic, TileBusTracingCharacteristic, TileBusHighSpeedCharacteristic
 from .async_packet import AsyncPacketBuffer
@@ -55,6 +56,9 @@ class BLED112Adapter(DeviceAdapter):
         # we tell them we need time to accumulate device advertising packets first
         self.set_config('minimum_scan_time', 2.0)
 
+        # We pull scripts through a ScriptStream so UpdateScripts can be encoded as they are sent
+        self.set_config('script_streaming_supported', True)
+
         if on_scan is not None:
             self.add_callback('on_scan', on_scan)
 
@@ -261,7 +265,8 @@ class BLED112Adapter(DeviceAdapter):
 
         Args:
             conn_id (int): A unique identifer that will refer to this connection
-            data (bytes): the script to send to the device
+            data (bytes or UpdateScript): the script to send to the device.  UpdateScripts
+                are encoded as they are sent.
             progress_callback (callable): A function to be called with status on our progress, called as:
                 progress_callback(done_count, total_count)
             callback (callable): A callback for when we have finished sending the script.  The callback will be called as"
@@ -284,7 +289,8 @@ class BLED112Adapter(DeviceAdapter):
 
         services = self._connections[found_handle]['services']
 
-        self._command_task.async_command(['_send_script', found_handle, services, data, 0, progress_callback],
+        script = ScriptStream(data, 20)
+        self._command_task.async_command(['_send_script', found_handle, services, script, None, progress_callback],
                                          self._send_script_finished, {'connection_id': conn_id,
                                                                       'callback': callback})
 
@@ -423,28 +423,40 @@ class BLED112CommandProcessor(threading.Thread):
 
         return True, None
 
-    def _send_script(self, conn, services, data, curr_loc, progress_callback):
+    def _send_script(self, conn, services, script, chunk, progress_callback):
+        """Send the next chunk of a script to the high speed characteristic.
+
+        Args:
+            conn (int): The connection handle.
+            services (dict): The services of the connected device.
+            script (ScriptStream): The stream of chunks to send.
+            chunk (bytes): A chunk that was pulled from script but could not be
+                sent yet and should be retried, or None to send the next chunk.
+            progress_callback (callable): Called as progress_callback(done, total)
+                after each chunk is sent.
+        """
+
         hschar = services[TileBusService]['characteristics'][TileBusHighSpeedCharacteristic]['handle']
 
-        chunk_size = 20
-        if len(data) - curr_loc < 20:
-            chunk_size = len(data) - curr_loc
+        if chunk is None:
+            chunk = script.next_chunk()
+            if chunk is None:
+                return True, None
 
-        chunk = data[curr_loc:curr_loc+chunk_size]
         success, reason = self._write_handle(conn, hschar, False, chunk)
 
         if not success:
             if 'error_code' in reason and reason['error_code'] == 0x182: #If we are streaming too fast, back off and try again
                 time.sleep(0.1)
-                self.async_command(['_send_script', conn, services, data, curr_loc, progress_callback], self._current_callback, self._current_context)
+                self.async_command(['_send_script', conn, services, script, chunk, progress_callback], self._current_callback, self._current_context)
                 return True, None, True
             else:
                 return False, reason
 
-        progress_callback(curr_loc // 20, len(data) // 20)
+        progress_callback((script.sent - len(chunk)) // script.chunk_size, script.total // script.chunk_size)
 
-        if curr_loc + chunk_size != len(data):
-            self.async_command(['_send_script', conn, services, data, curr_loc+chunk_size, progress_callback], self._current_callback, self._current_context)
+        if not script.finished:
+            self.async_command(['_send_script', conn, services, script, None, progress_callback], self._current_callback, self._current_context)
             return True, None, True
 
         return True, None
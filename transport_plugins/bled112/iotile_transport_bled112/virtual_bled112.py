@@ -59,7 +59,7 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
     virtual_info = {}
 
     def __init__(self, args):
-        super(BLED112VirtualInterface, self).__init__()
+        super(BLED112VirtualInterface, self).__init__(args)
 
         self._logger = logging.getLogger(__name__)
         self._logger.addHandler(logging.NullHandler())
@@ -211,8 +211,13 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
 
                 Your callback, if supplied will be called when the report
                 finishes being streamed.
+
+        Returns:
+            bool: False if any of the reports were dropped because the
+                streaming queue is full.
         """
 
+        accepted = True
         for report, callback  in reports:
             if isinstance(report, BroadcastReport):
                 with self._broadcast_lock:
@@ -229,7 +234,9 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
 
                 continue
 
-            self.reports.put((report, callback))
+            accepted = self.reports.put((report, callback)) and accepted
+
+        return accepted
 
     def _advertisement(self):
         # Flags for version 1 are:
@@ -417,7 +424,7 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
                 if len(self.rpc_payload) < 20:
                     self.rpc_payload += bytearray(20 - len(self.rpc_payload))
             elif handle == self.SendHeaderHandle:
-                self._defer(self._call_rpc, [bytearray(value)])
+                self._defer(self._call_rpc, [bytearray(value)], priority=self.RPCPriority)
 
     def _call_rpc(self, header):
         """Call an RPC given a header and possibly a previously sent payload
@@ -456,9 +463,9 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
         resp_header = struct.pack("<BBBB", status, 0, 0, len(response))
 
         if len(response) > 0:
-            self._defer(self._send_rpc_response, [(self.ReceiveHeaderHandle, resp_header), (self.ReceivePayloadHandle, response)])
+            self._defer(self._send_rpc_response, [(self.ReceiveHeaderHandle, resp_header), (self.ReceivePayloadHandle, response)], priority=self.RPCPriority)
         else:
-            self._defer(self._send_rpc_response, [(self.ReceiveHeaderHandle, resp_header)])
+            self._defer(self._send_rpc_response, [(self.ReceiveHeaderHandle, resp_header)], priority=self.RPCPriority)
 
     def _send_rpc_response(self, *packets):
         """Send an RPC response.
@@ -484,7 +491,7 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
             # If we're told we ran out of memory, wait and try again
             if code == 0x182:
                 time.sleep(.02)
-                self._defer(self._send_rpc_response, packets)
+                self._defer(self._send_rpc_response, packets, priority=self.RPCPriority)
             elif code == 0x181:  # Invalid state, the other side likely disconnected midstream
                 self._audit('ErrorSendingRPCResponse')
             else:
@@ -495,7 +502,7 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
             return
 
         if len(packets) > 1:
-            self._defer(self._send_rpc_response, packets[1:])
+            self._defer(self._send_rpc_response, packets[1:], priority=self.RPCPriority)
 
     def _send_notification(self, handle, payload):
         """Send a notification over BLE
@@ -528,14 +535,14 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
 
         try:
             self._send_notification(self.StreamingHandle, chunk)
-            self._defer(self._stream_data)
+            self._defer(self._stream_data, priority=self.StreamingPriority)
         except HardwareError as exc:
             retval = exc.params['return_value']
 
             # If we're told we ran out of memory, wait and try again
             if retval.get('code', 0) == 0x182:
                 time.sleep(.02)
-                self._defer(self._stream_data, [chunk])
+                self._defer(self._stream_data, [chunk], priority=self.StreamingPriority)
             elif retval.get('code', 0) == 0x181:  # Invalid state, the other side likely disconnected midstream
                 self._audit('ErrorStreamingReport')  # If there was an error, stop streaming but don't choke
             else:
@@ -563,14 +570,14 @@ class BLED112VirtualInterface(VirtualIOTileInterface):
 
         try:
             self._send_notification(self.TracingHandle, chunk)
-            self._defer(self._send_trace)
+            self._defer(self._send_trace, priority=self.TracingPriority)
         except HardwareError as exc:
             retval = exc.params['return_value']
 
             # If we're told we ran out of memory, wait and try again
             if retval.get('code', 0) == 0x182:
                 time.sleep(.02)
-                self._defer(self._send_trace, [chunk])
+                self._defer(self._send_trace, [chunk], priority=self.TracingPriority)
             elif retval.get('code', 0) == 0x181:  # Invalid state, the other side likely disconnected midstream
                 self._audit('ErrorStreamingTrace')  # If there was an error, stop streaming but don't choke
             else:
@@ -9,7 +9,7 @@ setup(
     version=version.version,
     license="LGPLv3",
     install_requires=[
-        "iotile-core>=3.6.2",
+        "iotile-core>=3.25.0",
         "pyserial>=3.1.1"
     ],
 
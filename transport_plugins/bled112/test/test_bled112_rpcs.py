@@ -8,6 +8,8 @@ from iotile.mock.mock_ble import MockBLEDevice
 from iotile.mock.mock_iotile import MockIOTileDevice
 import util.dummy_serial
 from iotile_transport_bled112.bled112 import BLED112Adapter
+from iotile.core.hw import UpdateScript
+from iotile.core.hw.update.records import SendRPCRecord
 import time
 
 class TestBLED112RPCs(unittest.TestCase):
@@ -60,6 +62,21 @@ class TestBLED112RPCs(unittest.TestCase):
         assert self._current == self._total
         assert self._total == (1027 // 20)
 
+    def test_send_update_script(self):
+        """Make sure UpdateScripts are encoded as they are sent."""
+
+        result = self.bled.connect_sync(1, "00:11:22:33:44:55")
+        assert result['success'] is True
+
+        result = self.bled.open_interface_sync(1, 'script')
+        assert result['success'] is True
+
+        script = UpdateScript([SendRPCRecord(10, 0x8000 + i, bytearray([i])) for i in range(0, 20)])
+        result = self.bled.send_script_sync(1, script, self._script_progress)
+
+        assert result['success'] is True
+        assert self.dev1.script == script.encode()
+
     def _script_progress(self, current, total):
         self._current = current
         self._total = total
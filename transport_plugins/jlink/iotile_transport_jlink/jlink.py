@@ -45,6 +45,9 @@ class JLinkAdapter(DeviceAdapter):
 
         self._parse_port(port)
 
+        # Scripts are sent from a ScriptStream so UpdateScripts can be encoded as they are sent
+        self.set_config('script_streaming_supported', True)
+
         if on_scan is not None:
             self.add_callback('on_scan', on_scan)
 
@@ -350,7 +353,8 @@ class JLinkAdapter(DeviceAdapter):
 
         Args:
             conn_id (int): A unique identifer that will refer to this connection
-            data (string): the script to send to the device
+            data (bytes or UpdateScript): the script to send to the device.  UpdateScripts
+                are encoded as they are sent.
             progress_callback (callable): A function to be called with status on our progress, called as:
                 progress_callback(done_count, total_count)
             callback (callable): A callback for when we have finished sending the script.  The callback will be called as"
@@ -8,6 +8,7 @@ import time
 from collections import namedtuple
 from monotonic import monotonic
 from iotile.core.exceptions import ArgumentError, HardwareError
+from iotile.core.hw.transport.script_stream import ScriptStream
 import iotile_transport_jlink.devices as devices
 from .structures import ControlStructure
 
@@ -147,11 +148,11 @@ class JLinkControlThread(threading.Thread):
         with each chunk of the script until it's finished.
         """
 
-        for i in xrange(0, len(script), 20):
-            chunk = script[i:i+20]
+        stream = ScriptStream(script, 20)
+        for chunk in stream:
             self._send_rpc(device_info, control_info, 8, 0x2101, chunk, 0.001, 1.0)
             if progress_callback is not None:
-                progress_callback(i + len(chunk), len(script))
+                progress_callback(stream.sent, stream.total)
 
     def _trigger_rpc(self, device_info):
         """Trigger an RPC in a device specific way."""
@@ -1 +1 @@
-version = "0.3.2"
+version = "0.4.0"
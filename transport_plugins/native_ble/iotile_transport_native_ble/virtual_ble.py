@@ -24,7 +24,7 @@ class NativeBLEVirtualInterface(VirtualIOTileInterface):
     """
 
     def __init__(self, args):
-        super(NativeBLEVirtualInterface, self).__init__()
+        super(NativeBLEVirtualInterface, self).__init__(args)
 
         # Create logger
         self._logger = logging.getLogger(__name__)
@@ -209,7 +209,7 @@ class NativeBLEVirtualInterface(VirtualIOTileInterface):
         # Stop the baBLE interface
         self.bable.stop()
 
-        self.actions.queue.clear()  # Clear the actions queue to prevent it to send commands to baBLE after stopped
+        self._clear_actions()  # Clear the actions queue to prevent it to send commands to baBLE after stopped
 
     def disconnect_sync(self, connection_handle):
         """Synchronously disconnect from whoever has connected to us
@@ -344,7 +344,7 @@ class NativeBLEVirtualInterface(VirtualIOTileInterface):
                     self.rpc_payload += bytearray(20 - len(self.rpc_payload))
             # Header
             elif attribute_handle == SendHeaderChar.value_handle:
-                self._defer(self._call_rpc, [bytearray(request['value'])])
+                self._defer(self._call_rpc, [bytearray(request['value'])], priority=self.RPCPriority)
 
             return True
         else:
@@ -433,7 +433,7 @@ class NativeBLEVirtualInterface(VirtualIOTileInterface):
         except bable_interface.BaBLEException as err:
             if err.packet.status == 'Rejected':  # If we are streaming too fast, back off and try again
                 time.sleep(0.05)
-                self._defer(self._send_rpc_response, list(packets))
+                self._defer(self._send_rpc_response, list(packets), priority=self.RPCPriority)
             else:
                 self._audit('ErrorSendingRPCResponse')
                 self._logger.exception("Error while sending RPC response, handle=%s, payload=%s", handle, payload)
@@ -441,7 +441,7 @@ class NativeBLEVirtualInterface(VirtualIOTileInterface):
             return
 
         if len(packets) > 1:
-            self._defer(self._send_rpc_response, list(packets[1:]))
+            self._defer(self._send_rpc_response, list(packets[1:]), priority=self.RPCPriority)
 
     def _stream_data(self, chunk=None):
         """Stream reports to the ble client in 20 byte chunks
@@ -463,11 +463,11 @@ class NativeBLEVirtualInterface(VirtualIOTileInterface):
 
         try:
             self._send_notification(StreamingChar.value_handle, chunk)
-            self._defer(self._stream_data)
+            self._defer(self._stream_data, priority=self.StreamingPriority)
         except bable_interface.BaBLEException as err:
             if err.packet.status == 'Rejected':  # If we are streaming too fast, back off and try again
                 time.sleep(0.05)
-                self._defer(self._stream_data, [chunk])
+                self._defer(self._stream_data, [chunk], priority=self.StreamingPriority)
             else:
                 self._audit('ErrorStreamingReport')  # If there was an error, stop streaming but don't choke
                 self._logger.exception("Error while streaming data")
@@ -491,11 +491,11 @@ class NativeBLEVirtualInterface(VirtualIOTileInterface):
 
         try:
             self._send_notification(TracingChar.value_handle, chunk)
-            self._defer(self._send_trace)
+            self._defer(self._send_trace, priority=self.TracingPriority)
         except bable_interface.BaBLEException as err:
             if err.packet.status == 'Rejected':  # If we are streaming too fast, back off and try again
                 time.sleep(0.05)
-                self._defer(self._send_trace, [chunk])
+                self._defer(self._send_trace, [chunk], priority=self.TracingPriority)
             else:
                 self._audit('ErrorStreamingTrace')  # If there was an error, stop streaming but don't choke
                 self._logger.exception("Error while tracing data")
@@ -8,7 +8,7 @@ setup(
     version=version.version,
     license="LGPLv3",
     install_requires=[
-        "iotile-core>=3.6.2",
+        "iotile-core>=3.25.0",
         "monotonic",
         "bable-interface>=1.2.0"
     ],
@@ -25,10 +25,14 @@ class WebSocketVirtualInterface(VirtualIOTileInterface):
 
                 port (int):
                     The port on which the server will listen (default: 5120)
+                batch_streaming (bool):
+                    Send all queued reports or traces in a single message
+                    rather than splitting them into chunk_size messages
+                    (default: False)
 
     """
     def __init__(self, args):
-        super(WebSocketVirtualInterface, self).__init__()
+        super(WebSocketVirtualInterface, self).__init__(args)
 
         if 'port' in args:
             port = int(args['port'])
@@ -37,6 +41,11 @@ class WebSocketVirtualInterface(VirtualIOTileInterface):
 
         self.chunk_size = 4*1024  # Config chunk size to be 4kb for traces and reports streaming
 
+        # A chunk size of None sends everything that is queued at once
+        self.stream_chunk_size = self.chunk_size
+        if args.get('batch_streaming', False):
+            self.stream_chunk_size = None
+
         # Set logger
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)  # TODO: remove this line
@@ -776,7 +785,7 @@ class WebSocketVirtualInterface(VirtualIOTileInterface):
 
         self.streaming_data = True
 
-        chunk = self._next_streaming_chunk(self.chunk_size)
+        chunk = self._next_streaming_chunk(self.stream_chunk_size)
 
         if len(chunk) == 0:
             self.streaming_data = False
@@ -788,7 +797,7 @@ class WebSocketVirtualInterface(VirtualIOTileInterface):
                 connection_string=connection_string,
                 payload=base64.b64encode(chunk)
             )
-            self._defer(self._stream_data, [device_uuid])
+            self._defer(self._stream_data, [device_uuid], priority=self.StreamingPriority)
         except HardwareError as err:
             self.logger.exception(err)
             self._audit('ErrorStreamingReport')
@@ -804,7 +813,7 @@ class WebSocketVirtualInterface(VirtualIOTileInterface):
 
         self.tracing_data = True
 
-        chunk = self._next_tracing_chunk(self.chunk_size)
+        chunk = self._next_tracing_chunk(self.stream_chunk_size)
 
         if len(chunk) == 0:
             self.tracing_data = False
@@ -816,7 +825,7 @@ class WebSocketVirtualInterface(VirtualIOTileInterface):
                 connection_string=connection_string,
                 payload=base64.b64encode(chunk)
             )
-            self._defer(self._send_trace, [device_uuid])
+            self._defer(self._send_trace, [device_uuid], priority=self.TracingPriority)
         except HardwareError as err:
             self.logger.exception(err)
             self._audit('ErrorStreamingReport')